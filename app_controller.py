@@ -55,6 +55,7 @@ class AppController:
 
         self.all_data_ai = None  # Cache dữ liệu
         self.dashboard_data_cache = {} # [V10.0 NEW] Cache lưu trữ kết quả phân tích để Safe Merge
+        self._pipeline_snapshot_checked = False  # Chỉ dùng Bảng Tổng Hợp tính sẵn ở lần mở đầu tiên
         
         # Khởi tạo Services (MVC Refactoring)
         # Lưu ý: logger sẽ được cập nhật sau bằng set_logger()
@@ -130,6 +131,7 @@ class AppController:
     def task_run_parsing(self, input_file):
         if self.data_service:
             def callback():
+                self._refresh_de_snapshot_async()
                 self.root_after(0, self.app.run_decision_dashboard)
             success, message = self.data_service.import_data_from_file(input_file, callback_on_success=callback)
             if not success:
@@ -138,6 +140,7 @@ class AppController:
     def task_run_parsing_append(self, input_file):
         if self.data_service:
             def callback():
+                self._refresh_de_snapshot_async()
                 self.root_after(0, self.app.run_decision_dashboard)
             success, message = self.data_service.append_data_from_file(input_file, callback_on_success=callback)
             if not success:
@@ -146,6 +149,7 @@ class AppController:
     def task_run_update_from_text(self, raw_data):
         if self.data_service:
             def callback():
+                self._refresh_de_snapshot_async()
                 self.root_after(0, self.app.clear_update_text_area)
                 time.sleep(0.5)
                 self.root_after(0, self.logger.log, "Đã thêm dữ liệu. Tự động chạy lại Bảng Tổng Hợp...")
@@ -208,14 +212,17 @@ class AppController:
             limit = 2000
         
         if self.analysis_service:
-            # [V10.0] Gọi Service với tham số mode
-            # Hàm này sẽ chỉ trả về những phần dữ liệu được yêu cầu tính toán
-            new_partial_data = self.analysis_service.prepare_dashboard_data(
-                all_data, 
-                data_limit=limit if limit > 0 else None,
-                lo_mode=lo_mode,
-                de_mode=de_mode
-            )
+            # Lần mở đầu tiên: dùng kết quả pipeline nightly nếu khớp đúng dữ liệu hiện tại
+            new_partial_data = self._load_pipeline_dashboard(all_data) if (lo_mode and de_mode) else None
+            if new_partial_data is None:
+                # [V10.0] Gọi Service với tham số mode
+                # Hàm này sẽ chỉ trả về những phần dữ liệu được yêu cầu tính toán
+                new_partial_data = self.analysis_service.prepare_dashboard_data(
+                    all_data, 
+                    data_limit=limit if limit > 0 else None,
+                    lo_mode=lo_mode,
+                    de_mode=de_mode
+                )
             
             if not new_partial_data:
                 self.logger.log("LỖI: Không thể chuẩn bị dữ liệu dashboard.")
@@ -236,14 +243,14 @@ class AppController:
             try:
                 # Cập nhật Tab Đề (Chỉ khi có dữ liệu Đề mới hoặc Đề mode bật)
                 if hasattr(self.app, 'de_dashboard_tab') and self.app.de_dashboard_tab:
-                    if final_data.get('df_de') is not None:
+                    if final_data.get('de_history') is not None:
                         # Chỉ log thông báo nếu đang chạy chế độ Đề
                         if de_mode:
                             self.logger.log("... (Soi Cầu Đề) Đang chuẩn bị dữ liệu...")
-                        self.root_after(0, self.app.de_dashboard_tab.update_data, final_data['df_de'])
+                        self.root_after(0, self.app.de_dashboard_tab.update_data, final_data['de_history'])
                         
                         if de_mode:
-                            self.logger.log(f"... (Soi Cầu Đề) Đã nạp {len(final_data['df_de'])} kỳ vào hệ thống.")
+                            self.logger.log(f"... (Soi Cầu Đề) Đã nạp {len(final_data['de_history'])} kỳ vào hệ thống.")
             except Exception as e_de:
                 self.logger.log(f"Cảnh báo: Lỗi cập nhật Tab Soi Cầu Đề: {e_de}")
             
@@ -266,6 +273,29 @@ class AppController:
                 self.logger.log(traceback.format_exc())
                 self.root_after(0, self.app._on_dashboard_close)
 
+    def _load_pipeline_dashboard(self, all_data):
+        """Bảng Tổng Hợp do scripts/jobs/run_pipeline.py tính sẵn (chỉ dùng một lần mỗi phiên)."""
+        if self._pipeline_snapshot_checked:
+            return None
+        self._pipeline_snapshot_checked = True
+        try:
+            from services.pipeline_service import load_dashboard_snapshot
+        except ImportError:
+            return None
+        snapshot = load_dashboard_snapshot(self.db_name, all_data)
+        if snapshot:
+            self.logger.log("⚡ Dùng Bảng Tổng Hợp đã tính sẵn bởi pipeline nightly (cùng dữ liệu).")
+        return snapshot
+
+    def _refresh_de_snapshot_async(self):
+        """Có kỳ mới: dựng lại snapshot Tab Soi Cầu Đề trên thread nền (tab mở ra chỉ việc đọc)."""
+        try:
+            from services.de_dashboard_service import refresh_de_dashboard_snapshot_async
+            refresh_de_dashboard_snapshot_async(self.db_name)
+        except Exception as e:
+            if self.logger:
+                self.logger.log(f"Cảnh báo: Không dựng được snapshot Soi Cầu Đề: {e}")
+
     def task_run_update_all_bridge_K2N_cache(self, title):
         all_data = self.load_data_ai_from_db_controller()
         if not all_data:
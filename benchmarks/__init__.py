@@ -0,0 +1 @@
+"""Bộ benchmark có seed cho các đường xử lý nặng (xem run_benchmarks.py)."""
@@ -0,0 +1,117 @@
+"""
+generator.py - Sinh lịch sử kỳ quay giả lập (có seed) cho bộ benchmark
+
+Cùng seed luôn cho cùng dữ liệu, nên số đo giữa các lần chạy (và giữa các
+nhánh code) so sánh được với nhau. Hàng sinh ra đúng bố cục DuLieu_AI:
+(MaSoKy, Col_A_Ky, GĐB, G1, G2, G3, G4, G5, G6, G7), các số trong một giải
+cách nhau bằng dấu phẩy như dữ liệu thật.
+"""
+
+import os
+import random
+
+from logic.bridges.bridges_memory import get_27_loto_names
+from logic.bridges.bridges_v16 import getPositionName_V17_Shadow
+from logic.db_manager import setup_database
+
+DAYS_PER_YEAR = 365
+
+# Số năm -> số kỳ (mỗi ngày một kỳ)
+HISTORY_SIZES = {
+    "1y": 1 * DAYS_PER_YEAR,
+    "5y": 5 * DAYS_PER_YEAR,
+    "20y": 20 * DAYS_PER_YEAR,
+}
+
+# (số lượng số, số chữ số) của từng giải GĐB..G7 - 27 con lô mỗi kỳ
+PRIZE_LAYOUT = ((1, 5), (1, 5), (2, 5), (6, 5), (4, 4), (6, 4), (3, 3), (4, 2))
+
+FIRST_KY = 23000
+
+
+def generate_history(n_days, seed=0, first_ky=FIRST_KY):
+    """Sinh n_days hàng DuLieu_AI (list 10 cột) từ seed."""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_days):
+        ky = first_ky + i
+        prizes = [
+            ",".join(f"{rng.randrange(10 ** width):0{width}d}" for _ in range(count))
+            for count, width in PRIZE_LAYOUT
+        ]
+        rows.append([ky, str(ky)] + prizes)
+    return rows
+
+
+def _sanitize(position_name):
+    # Cùng quy tắc đặt tên với _sanitize_name_v2 của lo_bridge_scanner
+    for old, new in (("[", "_"), ("]", ""), ("(", "_"), (")", ""), (".", "_"), ("+", "_"), (" ", "")):
+        position_name = position_name.replace(old, new)
+    return position_name
+
+
+def generate_managed_bridges(n_bridges, seed=0):
+    """
+    Sinh n_bridges Cầu Đã Lưu với tỷ lệ loại cầu gần với CSDL thật:
+    phần lớn Lô Vị Trí V17, kèm Lô cố định (LO_STL_FIXED), Lô Bạc Nhớ và Đề.
+    """
+    rng = random.Random(seed)
+    loto_names = get_27_loto_names()
+    bridges, names = [], set()
+    n_fixed = min(15, n_bridges // 10)
+    for k in range(n_fixed):
+        bridges.append({"name": f"LO_STL_FIXED_{k + 1:02d}", "type": "LO_STL_FIXED",
+                        "pos1_idx": None, "pos2_idx": None})
+
+    while len(bridges) < n_bridges:
+        kind = rng.random()
+        if kind < 0.70:
+            p1, p2 = sorted(rng.sample(range(214), 2))
+            name = f"LO_POS_{_sanitize(getPositionName_V17_Shadow(p1))}_{_sanitize(getPositionName_V17_Shadow(p2))}"
+            bridge = {"name": name, "type": "LO_POS", "pos1_idx": p1, "pos2_idx": p2}
+        elif kind < 0.85:
+            i, j = sorted(rng.sample(range(27), 2))
+            algorithm = rng.choice(("SUM", "DIFF"))
+            name = f"LO_MEM_{algorithm}_{loto_names[i]}_{loto_names[j]}"
+            bridge = {"name": name, "type": "LO_MEM", "pos1_idx": -1, "pos2_idx": -1}
+        else:
+            p1, p2 = sorted(rng.sample(range(107), 2))
+            name = f"DE_POS_{p1}_{p2}"
+            bridge = {"name": name, "type": "DE_POS", "pos1_idx": p1, "pos2_idx": p2}
+        if bridge["name"] in names:
+            continue
+        names.add(bridge["name"])
+        bridge["win_rate_text"] = f"{rng.uniform(30, 70):.2f}%"
+        bridge["current_streak"] = rng.randrange(10)
+        bridges.append(bridge)
+    return bridges
+
+
+def build_benchmark_db(db_path, n_days, n_bridges, seed=0):
+    """
+    Tạo CSDL SQLite tạm (đúng schema của setup_database) chứa n_days kỳ và
+    n_bridges Cầu Đã Lưu. Trả về các hàng đã ghi (dạng list như all_data_ai).
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn, _ = setup_database(db_path)
+    rows = generate_history(n_days, seed=seed)
+    bridges = generate_managed_bridges(n_bridges, seed=seed)
+    try:
+        conn.executemany(
+            """INSERT INTO DuLieu_AI (MaSoKy, Col_A_Ky, Col_B_GDB, Col_C_G1, Col_D_G2, Col_E_G3,
+                                      Col_F_G4, Col_G_G5, Col_H_G6, Col_I_G7)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows,
+        )
+        conn.executemany(
+            """INSERT INTO ManagedBridges (name, description, is_enabled, pos1_idx, pos2_idx, type,
+                                           win_rate_text, current_streak)
+               VALUES (?, ?, 1, ?, ?, ?, ?, ?)""",
+            [(b["name"], "Benchmark", b["pos1_idx"], b["pos2_idx"], b["type"],
+              b.get("win_rate_text", "N/A"), b.get("current_streak", 0)) for b in bridges],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    return rows
@@ -0,0 +1,295 @@
+"""
+run_benchmarks.py - Đo thời gian các đường xử lý nặng trên dữ liệu giả lập
+
+Mỗi kích thước lịch sử (1y / 5y / 20y) được sinh bằng generator.py (có seed)
+vào một CSDL SQLite tạm. Mỗi case chạy warmup lần không đo, sau đó repeats
+lần đo bằng time.perf_counter, rồi thêm một lần dưới tracemalloc để lấy bộ
+nhớ đỉnh (tách riêng để tracemalloc không làm sai số đo thời gian).
+
+Cách dùng:
+    python -m benchmarks.run_benchmarks --sizes 1y,5y --output results.json
+    python -m benchmarks.run_benchmarks --baseline baseline.json --threshold 0.2
+
+Khi có --baseline, case nào có median chậm hơn baseline quá threshold (và
+chênh lệch lớn hơn --min-delta giây) bị đánh dấu REGRESSION và lệnh thoát
+với mã 1.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.generator import HISTORY_SIZES, build_benchmark_db
+
+DEFAULT_SEED = 20240101
+DEFAULT_BRIDGES = 200
+
+
+# =============================================================================
+# CÁC CASE ĐO
+# =============================================================================
+
+def _case_tim_cau_v16(ctx):
+    from logic.bridges.lo_bridge_scanner import TIM_CAU_TOT_NHAT_V16
+    data, db = ctx["data"], ctx["db_path"]
+    return lambda: TIM_CAU_TOT_NHAT_V16(data, 2, len(data) + 1, db)
+
+
+def _case_de_scan_all(ctx):
+    from logic.bridges.de_bridge_scanner import DeBridgeScanner
+    data, db = ctx["data"], ctx["db_path"]
+    return lambda: DeBridgeScanner().scan_all(data, db)
+
+
+def _case_managed_k2n(ctx):
+    from logic.backtester_core import BACKTEST_MANAGED_BRIDGES_K2N
+    data, db = ctx["data"], ctx["db_path"]
+    return lambda: BACKTEST_MANAGED_BRIDGES_K2N(data, 2, len(data) + 1, db, history=False, as_result=True)
+
+
+def _case_dashboard(ctx):
+    from services.analysis_service import AnalysisService
+    service = AnalysisService(ctx["db_path"])
+    data = ctx["data"]
+    return lambda: service.prepare_dashboard_data(data, data_limit=0)
+
+
+def _case_ai_features(ctx):
+    from logic.ai_feature_extractor import _get_daily_bridge_predictions
+    data = ctx["data"]
+    return lambda: _get_daily_bridge_predictions(data)
+
+
+def _case_train_ai(ctx):
+    from logic.ai_feature_extractor import _get_daily_bridge_predictions
+    from logic.ml_model import train_ai_model
+    data = ctx["data"]
+    # Đặc trưng tính một lần ngoài phần đo (đã có case ai_features riêng)
+    with contextlib.redirect_stdout(io.StringIO()):
+        predictions = _get_daily_bridge_predictions(data)
+    return lambda: train_ai_model(data, predictions)
+
+
+# Tên case -> hàm chuẩn bị (nhận ctx, trả về callable không tham số để đo)
+CASES = {
+    "tim_cau_v16": _case_tim_cau_v16,
+    "de_scan_all": _case_de_scan_all,
+    "managed_k2n": _case_managed_k2n,
+    "dashboard": _case_dashboard,
+    "ai_features": _case_ai_features,
+    "train_ai": _case_train_ai,
+}
+
+
+# =============================================================================
+# MÔI TRƯỜNG CHẠY
+# =============================================================================
+
+def _redirect_paths(db_path, model_dir):
+    """
+    Trỏ mọi module đã nạp về CSDL benchmark (thay cho DB_NAME mặc định) và
+    thư mục mô hình tạm, để benchmark không đọc/ghi dữ liệu thật.
+    """
+    for name, module in list(sys.modules.items()):
+        if module is None or not name.startswith(("logic", "services", "lottery_service", "core_services")):
+            continue
+        if isinstance(getattr(module, "DB_NAME", None), str):
+            module.DB_NAME = db_path
+    try:
+        from logic import ml_model
+        ml_model.MODEL_DIR = model_dir
+        ml_model.MODEL_FILE_PATH = os.path.join(model_dir, "loto_model.joblib")
+        ml_model.SCALER_FILE_PATH = os.path.join(model_dir, "ai_scaler.joblib")
+    except ImportError:
+        pass
+    try:
+        from logic.instrumentation import get_recorder
+        recorder = get_recorder()
+        recorder.db_path = db_path
+        recorder.json_path = os.path.join(model_dir, "perf_log.json")
+    except ImportError:
+        pass
+
+
+def _import_hot_paths():
+    """Nạp trước các module của mọi case để _redirect_paths thấy được chúng."""
+    for module in ("logic.bridges.lo_bridge_scanner", "logic.bridges.de_bridge_scanner",
+                   "logic.backtester_core", "services.analysis_service",
+                   "logic.ai_feature_extractor", "logic.ml_model", "lottery_service"):
+        try:
+            __import__(module)
+        except Exception as e:
+            print(f"[benchmark] Không nạp được {module}: {e}")
+
+
+def measure(fn, warmup=1, repeats=3, quiet=True):
+    """Chạy fn: warmup lần bỏ qua, repeats lần đo thời gian, một lần đo bộ nhớ đỉnh."""
+    sink = io.StringIO() if quiet else None
+
+    def call():
+        if sink is None:
+            return fn()
+        with contextlib.redirect_stdout(sink):
+            result = fn()
+        sink.seek(0)
+        sink.truncate()
+        return result
+
+    for _ in range(warmup):
+        call()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "repeats": repeats,
+        "warmup": warmup,
+        "peak_mb": peak / (1024 * 1024),
+    }
+
+
+def run_suite(sizes, cases, n_bridges=DEFAULT_BRIDGES, seed=DEFAULT_SEED, warmup=1, repeats=3,
+              quiet=True, workdir=None):
+    """Chạy các case trên từng kích thước; trả về dict kết quả (ghi ra JSON được)."""
+    from logic.data_repository import load_data_ai_from_db
+
+    _import_hot_paths()
+    results = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for size in sizes:
+            db_path = os.path.join(tmp, f"bench_{size}.db")
+            build_benchmark_db(db_path, HISTORY_SIZES[size], n_bridges, seed=seed)
+            data, _ = load_data_ai_from_db(db_path)
+            _redirect_paths(db_path, tmp)
+            ctx = {"data": data, "db_path": db_path, "size": size}
+            for case in cases:
+                key = f"{case}@{size}"
+                print(f"[benchmark] {key} ({len(data)} kỳ, {n_bridges} cầu)...", flush=True)
+                try:
+                    fn = CASES[case](ctx)
+                    results[key] = measure(fn, warmup=warmup, repeats=repeats, quiet=quiet)
+                    print(f"[benchmark]   median {results[key]['median_s']:.3f}s, "
+                          f"peak {results[key]['peak_mb']:.1f} MB")
+                except Exception as e:
+                    results[key] = {"error": f"{type(e).__name__}: {e}"}
+                    print(f"[benchmark]   LỖI: {results[key]['error']}")
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": seed,
+            "bridges": n_bridges,
+            "sizes": {size: HISTORY_SIZES[size] for size in sizes},
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=0.2, min_delta=0.01):
+    """
+    So sánh median với baseline.
+    Trả về list (key, baseline_s, current_s, tỷ lệ, trạng thái) với trạng thái
+    là "REGRESSION", "FASTER", "OK" hoặc "NEW"/"ERROR".
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for key, current in results.get("results", {}).items():
+        base = base_results.get(key)
+        if "error" in current:
+            rows.append((key, None, None, None, "ERROR"))
+            continue
+        if not base or "median_s" not in base:
+            rows.append((key, None, current["median_s"], None, "NEW"))
+            continue
+        old, new = base["median_s"], current["median_s"]
+        ratio = new / old if old > 0 else float("inf")
+        status = "OK"
+        if new - old > min_delta and ratio > 1 + threshold:
+            status = "REGRESSION"
+        elif old - new > min_delta and ratio < 1 / (1 + threshold):
+            status = "FASTER"
+        rows.append((key, old, new, ratio, status))
+    return rows
+
+
+def _format_seconds(value):
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các đường xử lý nặng.")
+    parser.add_argument("--sizes", default=",".join(HISTORY_SIZES),
+                        help=f"Kích thước lịch sử, cách nhau dấu phẩy ({', '.join(HISTORY_SIZES)})")
+    parser.add_argument("--cases", default=",".join(CASES),
+                        help=f"Các case cần đo ({', '.join(CASES)})")
+    parser.add_argument("--bridges", type=int, default=DEFAULT_BRIDGES, help="Số Cầu Đã Lưu giả lập")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", default=None, help="Ghi kết quả JSON ra file này")
+    parser.add_argument("--baseline", default=None, help="File JSON kết quả cũ để so sánh")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Chậm hơn baseline quá tỷ lệ này là regression (mặc định 0.2 = 20%%)")
+    parser.add_argument("--min-delta", type=float, default=0.01,
+                        help="Bỏ qua chênh lệch nhỏ hơn số giây này")
+    parser.add_argument("--verbose", action="store_true", help="Giữ log in ra của các hàm được đo")
+    args = parser.parse_args(argv)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    cases = [c.strip() for c in args.cases.split(",") if c.strip()]
+    unknown = [s for s in sizes if s not in HISTORY_SIZES] + [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"Không hỗ trợ: {', '.join(unknown)}")
+
+    results = run_suite(sizes, cases, n_bridges=args.bridges, seed=args.seed,
+                        warmup=args.warmup, repeats=args.repeats, quiet=not args.verbose)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"[benchmark] Đã ghi kết quả: {args.output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, threshold=args.threshold, min_delta=args.min_delta)
+    print(f"\n{'Case':<28}{'Baseline':>12}{'Hiện tại':>12}{'Tỷ lệ':>9}  Trạng thái")
+    for key, old, new, ratio, status in rows:
+        ratio_text = "-" if ratio is None else f"{ratio:.2f}x"
+        print(f"{key:<28}{_format_seconds(old):>12}{_format_seconds(new):>12}{ratio_text:>9}  {status}")
+    return 1 if any(row[4] == "REGRESSION" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
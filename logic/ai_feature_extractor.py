@@ -17,6 +17,7 @@ try:
         get_27_loto_positions,
     )
     from .bridges.bridges_v16 import getAllPositions_V17_Shadow, taoSTL_V30_Bong
+    from .backtest.k2n_engine import classic_stl_matrix
 
     # 4. Config
     from .data_repository import get_all_managed_bridges, load_data_ai_from_db
@@ -34,6 +35,12 @@ except ImportError as e:
     # Không định nghĩa lại hàm ở đây, để logic chính chạy
     pass
 
+try:
+    from .instrumentation import perf_count, timed
+except ImportError:
+    def perf_count(name, n=1): pass
+    def timed(name): return lambda func: func
+
 
 # ==========================================================================
 # (DI CHUYỂN TỪ LOTTERY_SERVICE) HÀM TIỆN ÍCH TÍNH TOÁN
@@ -91,7 +98,8 @@ def _calculate_win_rate_stddev(win_rates, periods=100):
     return variance ** 0.5
 
 
-def _get_daily_bridge_predictions(all_data_ai):
+@timed("ai.features")
+def _get_daily_bridge_predictions(all_data_ai, db_name=None):
     print(
         "... (V7.0 G2 Feature Extraction) Bước 1: Tính toán dự đoán cầu cho toàn bộ lịch sử..."
     )
@@ -100,7 +108,7 @@ def _get_daily_bridge_predictions(all_data_ai):
         lambda: defaultdict(lambda: defaultdict(float))
     )
 
-    managed_bridges = get_all_managed_bridges(DB_NAME, only_enabled=True)
+    managed_bridges = get_all_managed_bridges(db_name or DB_NAME, only_enabled=True)
 
     # (Phase 2: Feature Engineering) Import SETTINGS for K2N risk threshold
     try:
@@ -136,6 +144,9 @@ def _get_daily_bridge_predictions(all_data_ai):
                 (i, j, "diff", f"Hiệu(|{loto_names[i]}-{loto_names[j]}|)")
             )
 
+    # STL 15 Cầu Cổ Điển cho toàn bộ lịch sử (tính một lần)
+    classic_codes = classic_stl_matrix(all_data_ai).codes
+
     for k in range(1, len(all_data_ai)):
         prev_row = all_data_ai[k - 1]
         current_row = all_data_ai[k]
@@ -151,7 +162,11 @@ def _get_daily_bridge_predictions(all_data_ai):
         # 1. 15 Cầu Cổ Điển
         for i, bridge_func in enumerate(ALL_15_BRIDGE_FUNCTIONS_V5):
             try:
-                stl = bridge_func(prev_row)
+                code = int(classic_codes[k - 1, i])
+                if code >= 0:
+                    stl = [f"{code // 100:02d}", f"{code % 100:02d}"]
+                else:
+                    stl = bridge_func(prev_row)
                 pair_key = _standardize_pair(stl)
                 if pair_key:
                     temp_bridge_preds[pair_key].append(f"C{i + 1}")
@@ -313,6 +328,8 @@ def _get_daily_bridge_predictions(all_data_ai):
             q_hit_in_last_3_days = 1 if len(recent_appearances) > 0 else 0
             daily_predictions_by_loto[current_ky][loto]["q_hit_in_last_3_days"] = q_hit_in_last_3_days
 
+    perf_count("days_scanned", max(len(all_data_ai) - 1, 0))
+    perf_count("bridges_evaluated", len(managed_bridges) + len(memory_bridges) + len(ALL_15_BRIDGE_FUNCTIONS_V5))
     return daily_predictions_by_loto
 
 
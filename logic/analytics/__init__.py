@@ -17,6 +17,8 @@ from .dashboard_scorer import (
     calculate_score_from_features,
     get_historical_dashboard_data,
 )
+from .walk_forward import WalkForwardSimulator, iter_daily_features
+from .threshold_sweep import RateDistribution, ThresholdSweep, sweep_thresholds
 
 __all__ = [
     'get_loto_stats_last_n_days',
@@ -31,4 +33,9 @@ __all__ = [
     'prepare_daily_features',
     'calculate_score_from_features',
     'get_historical_dashboard_data',
+    'WalkForwardSimulator',
+    'iter_daily_features',
+    'RateDistribution',
+    'ThresholdSweep',
+    'sweep_thresholds',
 ]
@@ -5,10 +5,10 @@ import itertools
 
 # Import SETTINGS
 try:
-    from ..config_manager import SETTINGS
+    from ..config_manager import SETTINGS, resolve_settings
 except ImportError:
     try:
-        from logic.config_manager import SETTINGS
+        from logic.config_manager import SETTINGS, resolve_settings
     except ImportError:
         print("LỖI: dashboard_scorer.py không thể import SETTINGS. Sử dụng fallback.")
         SETTINGS = type("obj", (object,), {
@@ -19,6 +19,9 @@ except ImportError:
             "RECENT_FORM_BONUS_LOW": 0.5, "RECENT_FORM_BONUS_MED": 1.0, "RECENT_FORM_BONUS_HIGH": 1.5,
         })
 
+        def resolve_settings(settings=None):
+            return settings if settings is not None else SETTINGS
+
 # Import Bridge/DB Logic và Helpers
 try:
     from ..backtester import BACKTEST_15_CAU_K2N_V30_AI_V8, BACKTEST_MANAGED_BRIDGES_K2N
@@ -38,8 +41,8 @@ except ImportError:
     def get_27_loto_positions(r): return []
     def calculate_bridge_stl(l1, l2, type): return ["00", "00"]
     def _parse_k2n_results(r): return [], {}
-    def BACKTEST_MANAGED_BRIDGES_K2N(a, b, c, d, e): return []
-    def BACKTEST_15_CAU_K2N_V30_AI_V8(a, b, c, d): return []
+    def BACKTEST_MANAGED_BRIDGES_K2N(*args, **kwargs): return []
+    def BACKTEST_15_CAU_K2N_V30_AI_V8(*args, **kwargs): return []
     DB_NAME = "xo_so_prizes_all_logic.db"
     def get_all_managed_bridges(d, o): return []
 
@@ -55,24 +58,27 @@ def get_loto_stats_last_n_days(all_data_ai, n=None):
         if len(all_data_ai) < n:
             n = len(all_data_ai)
         last_n_rows = all_data_ai[-n:]
-        all_lotos_hits = []
-        day_appearance_counter = Counter()
-        for row in last_n_rows:
-            lotos_in_this_row = getAllLoto_V30(row)
-            all_lotos_hits.extend(lotos_in_this_row)
-            unique_lotos_in_this_row = set(lotos_in_this_row)
-            day_appearance_counter.update(unique_lotos_in_this_row)
-        loto_hit_counts = Counter(all_lotos_hits)
-        sorted_lotos_by_hits = sorted(loto_hit_counts.items(), key=lambda item: item[1], reverse=True)
-        final_stats = []
-        for loto, hit_count in sorted_lotos_by_hits:
-            day_count = day_appearance_counter.get(loto, 0)
-            final_stats.append((loto, hit_count, day_count))
-        return final_stats
+        return _loto_stats_from_lotos([getAllLoto_V30(row) for row in last_n_rows])
     except Exception as e:
         print(f"Lỗi get_loto_stats_last_n_days: {e}")
         return []
 
+def _loto_stats_from_lotos(lotos_per_row):
+    """(loto, số nháy, số ngày về) từ danh sách loto đã tách sẵn của từng hàng."""
+    all_lotos_hits = []
+    day_appearance_counter = Counter()
+    for lotos_in_this_row in lotos_per_row:
+        all_lotos_hits.extend(lotos_in_this_row)
+        unique_lotos_in_this_row = set(lotos_in_this_row)
+        day_appearance_counter.update(unique_lotos_in_this_row)
+    loto_hit_counts = Counter(all_lotos_hits)
+    sorted_lotos_by_hits = sorted(loto_hit_counts.items(), key=lambda item: item[1], reverse=True)
+    final_stats = []
+    for loto, hit_count in sorted_lotos_by_hits:
+        day_count = day_appearance_counter.get(loto, 0)
+        final_stats.append((loto, hit_count, day_count))
+    return final_stats
+
 def get_loto_gan_stats(all_data_ai, n_days=None):
     """Tìm các loto (00-99) đã không xuất hiện trong n_days gần nhất (Lô Gan)."""
     gan_stats = []
@@ -122,13 +128,7 @@ def get_top_memory_bridge_predictions(all_data_ai, last_row, top_n=5):
         return not data or len(data) < 2
     if _validate_data(all_data_ai):
         return []
-    loto_names = get_27_loto_names()
-    num_positions = len(loto_names)
-    algorithms = []
-    for i in range(num_positions):
-        for j in range(i, num_positions):
-            algorithms.append((i, j, "sum"))
-            algorithms.append((i, j, "diff"))
+    algorithms = _memory_algorithms()
     num_algorithms = len(algorithms)
     processedData = []
     startCheckRow = 2
@@ -139,7 +139,7 @@ def get_top_memory_bridge_predictions(all_data_ai, last_row, top_n=5):
         if actualRow_idx >= len(all_data_ai) or prevRow_idx < 0:
             continue
         prevRow, actualRow = all_data_ai[prevRow_idx], all_data_ai[actualRow_idx]
-        if (not prevRow or not actualRow or not actualRow[0] or str(actualRow[0]).strip() == "" or len(actualRow) < 10 or not actualRow[9]):
+        if not _is_memory_test_day(prevRow, actualRow):
             continue
         processedData.append({"prevLotos": get_27_loto_positions(prevRow), "actualLotoSet": set(getAllLoto_V30(actualRow))})
     totalTestDays = len(processedData)
@@ -156,8 +156,27 @@ def get_top_memory_bridge_predictions(all_data_ai, last_row, top_n=5):
             pred_stl = calculate_bridge_stl(loto1, loto2, alg_type)
             if pred_stl[0] in actualLotoSet or pred_stl[1] in actualLotoSet:
                 win_counts[j] += 1
+    return _memory_bridge_predictions(algorithms, win_counts, totalTestDays, last_row, top_n)
+
+def _is_memory_test_day(prevRow, actualRow):
+    """Ngày kiểm tra hợp lệ của backtest Bạc Nhớ (có hàng trước và đủ giải đến G7)."""
+    return bool(prevRow and actualRow and actualRow[0] and str(actualRow[0]).strip() != "" and len(actualRow) >= 10 and actualRow[9])
+
+def _memory_algorithms():
+    """756 cầu Bạc Nhớ ngầm: (vị trí 1, vị trí 2, "sum"/"diff") trên 27 vị trí lô."""
+    num_positions = len(get_27_loto_names())
+    algorithms = []
+    for i in range(num_positions):
+        for j in range(i, num_positions):
+            algorithms.append((i, j, "sum"))
+            algorithms.append((i, j, "diff"))
+    return algorithms
+
+def _memory_bridge_predictions(algorithms, win_counts, totalTestDays, last_row, top_n=5):
+    """Xếp hạng cầu Bạc Nhớ theo số lần trúng N1 và trả về dự đoán của TOP N cầu từ last_row."""
+    loto_names = get_27_loto_names()
     bridge_stats = []
-    for j in range(num_algorithms):
+    for j in range(len(algorithms)):
         rate = (win_counts[j] / totalTestDays) * 100
         bridge_stats.append((rate, j))
     bridge_stats.sort(key=lambda x: x[0], reverse=True)
@@ -315,7 +334,7 @@ def get_prediction_consensus(last_row=None, db_name=DB_NAME):
         print(f"Lỗi get_prediction_consensus: {e}")
         return []
 
-def get_high_win_rate_predictions(last_row=None, threshold=None, db_name=DB_NAME):
+def get_high_win_rate_predictions(last_row=None, threshold=None, db_name=DB_NAME, settings=None):
     """
     Lấy dự đoán từ Cầu Đã Lưu CÓ TỶ LỆ CAO (dựa trên cache K2N).
     
@@ -326,9 +345,10 @@ def get_high_win_rate_predictions(last_row=None, threshold=None, db_name=DB_NAME
         list: List of dicts với keys: {'name': str, 'value': str, 'rate': str, 'type': str}
     """
     try:
+        settings = resolve_settings(settings)
         if threshold is None:
-            threshold = getattr(SETTINGS, "HIGH_WIN_THRESHOLD", 47.0)
-        de_min_wins = getattr(SETTINGS, "DE_HIGH_RATE_MIN_WINS_10", 7)
+            threshold = getattr(settings, "HIGH_WIN_THRESHOLD", 47.0)
+        de_min_wins = getattr(settings, "DE_HIGH_RATE_MIN_WINS_10", 7)
         
         predictions = []
         managed_bridges = get_all_managed_bridges(db_name, only_enabled=True)
@@ -431,9 +451,13 @@ def get_pending_k2n_bridges(last_row, prev_row):
         return []
 
 # III. HÀM CHẤM ĐIỂM CỐT LÕI (V7.5 - GOM NHÓM PHONG ĐỘ & RỦI RO)
-def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top_memory_bridges, ai_predictions=None, recent_data=None):
-    """(V7.5) Tính toán, chấm điểm và xếp hạng các cặp số."""
+def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top_memory_bridges, ai_predictions=None, recent_data=None, settings=None):
+    """
+    (V7.5) Tính toán, chấm điểm và xếp hạng các cặp số.
+    settings: SettingsSnapshot dùng cho các trọng số (mặc định: snapshot SETTINGS lúc gọi).
+    """
     try:
+        settings = resolve_settings(settings)
         # Đảm bảo tất cả tham số là list/dict hợp lệ
         if stats is None:
             stats = []
@@ -451,16 +475,16 @@ def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top
             ai_predictions = []
         
         scores = {}
-        K2N_RISK_START_THRESHOLD = getattr(SETTINGS, "K2N_RISK_START_THRESHOLD", 6)
-        K2N_RISK_PENALTY_FIXED = getattr(SETTINGS, "K2N_RISK_PENALTY_PER_FRAME", 1.0)
-        ai_score_weight = getattr(SETTINGS, "AI_SCORE_WEIGHT", 0.2)
+        K2N_RISK_START_THRESHOLD = getattr(settings, "K2N_RISK_START_THRESHOLD", 6)
+        K2N_RISK_PENALTY_FIXED = getattr(settings, "K2N_RISK_PENALTY_PER_FRAME", 1.0)
+        ai_score_weight = getattr(settings, "AI_SCORE_WEIGHT", 0.2)
         loto_prob_map = {}
         if ai_predictions:
             for pred in ai_predictions:
                 loto_prob_map[pred["loto"]] = pred["probability"] / 100.0
         top_hot_lotos = {loto for loto, count, days in stats if count > 0} if stats else set()
         gan_map = {loto: days for loto, days in gan_stats} if gan_stats else {}
-        vote_weight = getattr(SETTINGS, "VOTE_SCORE_WEIGHT", 0.3)
+        vote_weight = getattr(settings, "VOTE_SCORE_WEIGHT", 0.3)
         for pair_key, count, _ in consensus:
             if pair_key not in scores:
                 scores[pair_key] = {"score": 0.0, "reasons": [], "is_gan": False, "gan_days": 0, "gan_loto": "", "sources": 0}
@@ -469,7 +493,7 @@ def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top
             scores[pair_key]["score"] += vote_score
             scores[pair_key]["reasons"].append(f"Vote x{count} (+{vote_score:.1f})")
             scores[pair_key]["sources"] += 1
-        high_win_bonus = getattr(SETTINGS, "HIGH_WIN_SCORE_BONUS", 2.5)
+        high_win_bonus = getattr(settings, "HIGH_WIN_SCORE_BONUS", 2.5)
         
         # ⚡ FIX: Xử lý cả format cũ (có 'stl') và format mới (có 'value')
         # Group values by bridge name để tạo pairs từ format mới
@@ -514,7 +538,7 @@ def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top
                         scores[pair_key]["score"] += high_win_bonus
                         scores[pair_key]["reasons"].append(f"Cao ({rate})")
                         scores[pair_key]["sources"] += 1
-        K2N_RISK_PROGRESSIVE = getattr(SETTINGS, "K2N_RISK_PROGRESSIVE", True)
+        K2N_RISK_PROGRESSIVE = getattr(settings, "K2N_RISK_PROGRESSIVE", True)
         k2n_risks = {}
         for bridge_name, data in pending_k2n.items():
             pair_key = _standardize_pair(data["stl"].split(","))
@@ -552,14 +576,14 @@ def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top
             except ImportError:
                 db_name_param = "xo_so_prizes_all_logic.db"
             managed_bridges = get_all_managed_bridges(db_name=db_name_param)
-            RF_MIN_LOW = getattr(SETTINGS, "RECENT_FORM_MIN_LOW", 3)
-            RF_MIN_MED = getattr(SETTINGS, "RECENT_FORM_MIN_MED", 5)
-            RF_MIN_HIGH = getattr(SETTINGS, "RECENT_FORM_MIN_HIGH", 7)
-            RF_MIN_VERY_HIGH = getattr(SETTINGS, "RECENT_FORM_MIN_VERY_HIGH", 9)
-            RF_BONUS_LOW = getattr(SETTINGS, "RECENT_FORM_BONUS_LOW", 1.0)
-            RF_BONUS_MED = getattr(SETTINGS, "RECENT_FORM_BONUS_MED", 2.0)
-            RF_BONUS_HIGH = getattr(SETTINGS, "RECENT_FORM_BONUS_HIGH", 3.0)
-            RF_BONUS_VERY_HIGH = getattr(SETTINGS, "RECENT_FORM_BONUS_VERY_HIGH", 4.0)
+            RF_MIN_LOW = getattr(settings, "RECENT_FORM_MIN_LOW", 3)
+            RF_MIN_MED = getattr(settings, "RECENT_FORM_MIN_MED", 5)
+            RF_MIN_HIGH = getattr(settings, "RECENT_FORM_MIN_HIGH", 7)
+            RF_MIN_VERY_HIGH = getattr(settings, "RECENT_FORM_MIN_VERY_HIGH", 9)
+            RF_BONUS_LOW = getattr(settings, "RECENT_FORM_BONUS_LOW", 1.0)
+            RF_BONUS_MED = getattr(settings, "RECENT_FORM_BONUS_MED", 2.0)
+            RF_BONUS_HIGH = getattr(settings, "RECENT_FORM_BONUS_HIGH", 3.0)
+            RF_BONUS_VERY_HIGH = getattr(settings, "RECENT_FORM_BONUS_VERY_HIGH", 4.0)
             recent_form_groups = {}
             for bridge in managed_bridges:
                 if not bridge.get("is_enabled"): continue
@@ -700,8 +724,11 @@ def get_top_scored_pairs(stats, consensus, high_win, pending_k2n, gan_stats, top
         return []
 
 # IV. HÀM MÔ PHỎNG LỊCH SỬ
-def get_consensus_simulation(data_slice, last_row):
-    """Bản sao của get_prediction_consensus (chạy N1 trong bộ nhớ)."""
+def get_consensus_simulation(data_slice, last_row, bridges=None):
+    """
+    Bản sao của get_prediction_consensus (chạy N1 trong bộ nhớ).
+    bridges: danh sách Cầu Đã Lưu (đang Bật) đã tải sẵn; None thì đọc từ DB.
+    """
     prediction_sources = {}
     def _standardize_pair(stl_list):
         if not stl_list or len(stl_list) != 2:
@@ -720,7 +747,7 @@ def get_consensus_simulation(data_slice, last_row):
             prediction_sources[pair_key].append(source_name)
         except Exception:
             pass
-    bridges_to_test = get_all_managed_bridges(DB_NAME, only_enabled=True)
+    bridges_to_test = bridges if bridges is not None else get_all_managed_bridges(DB_NAME, only_enabled=True)
     if bridges_to_test:
         last_positions = getAllPositions_V17_Shadow(last_row)
         for bridge in bridges_to_test:
@@ -752,10 +779,14 @@ def get_consensus_simulation(data_slice, last_row):
 
 def get_high_win_simulation(data_slice, last_row, threshold):
     """Bản sao của get_high_win_rate_predictions (chạy K2N trong bộ nhớ)."""
-    high_win_bridges = []
-    cache_list, _ = _parse_k2n_results(BACKTEST_MANAGED_BRIDGES_K2N(data_slice, 2, len(data_slice) + 1, DB_NAME, history=False))
-    cache_list_15, _ = _parse_k2n_results(BACKTEST_15_CAU_K2N_V30_AI_V8(data_slice, 2, len(data_slice) + 1, history=False))
+    cache_list, _ = _parse_k2n_results(BACKTEST_MANAGED_BRIDGES_K2N(data_slice, 2, len(data_slice) + 1, DB_NAME, history=False, as_result=True))
+    cache_list_15, _ = _parse_k2n_results(BACKTEST_15_CAU_K2N_V30_AI_V8(data_slice, 2, len(data_slice) + 1, history=False, as_result=True))
     cache_list.extend(cache_list_15)
+    return _high_win_from_cache(cache_list, threshold)
+
+def _high_win_from_cache(cache_list, threshold):
+    """Lọc các cầu có tỷ lệ K2N >= threshold và dự đoán khung mới (bỏ cầu đang chờ N2)."""
+    high_win_bridges = []
     if not cache_list:
         return []
     for win_rate_text, _, next_prediction_stl, _, _, bridge_name in cache_list:
@@ -770,17 +801,18 @@ def get_high_win_simulation(data_slice, last_row, threshold):
             continue
     return high_win_bridges
 
-def prepare_daily_features(all_data_ai, day_index):
+def prepare_daily_features(all_data_ai, day_index, settings=None):
     """Tính toán tất cả dữ liệu thô (Raw Features) tốn kém cho dashboard một ngày cụ thể."""
     data_slice = all_data_ai[: day_index + 1]
     if len(data_slice) < 2:
         return None
     last_row = data_slice[-1]
-    n_days_stats = getattr(SETTINGS, "STATS_DAYS", 7)
-    n_days_gan = getattr(SETTINGS, "GAN_DAYS", 15)
-    high_win_thresh = getattr(SETTINGS, "HIGH_WIN_THRESHOLD", 47.0)
+    settings = resolve_settings(settings)
+    n_days_stats = getattr(settings, "STATS_DAYS", 7)
+    n_days_gan = getattr(settings, "GAN_DAYS", 15)
+    high_win_thresh = getattr(settings, "HIGH_WIN_THRESHOLD", 47.0)
     stats_n_day = get_loto_stats_last_n_days(data_slice, n=n_days_stats)
-    _, pending_k2n_data = _parse_k2n_results(BACKTEST_15_CAU_K2N_V30_AI_V8(data_slice, 2, len(data_slice) + 1, history=False))
+    _, pending_k2n_data = _parse_k2n_results(BACKTEST_15_CAU_K2N_V30_AI_V8(data_slice, 2, len(data_slice) + 1, history=False, as_result=True))
     consensus = get_consensus_simulation(data_slice, last_row)
     high_win = get_high_win_simulation(data_slice, last_row, threshold=high_win_thresh)
     top_memory_bridges = get_top_memory_bridge_predictions(data_slice, last_row, top_n=5)
@@ -789,21 +821,26 @@ def prepare_daily_features(all_data_ai, day_index):
     return {"stats_n_day": stats_n_day, "consensus": consensus, "high_win": high_win, "gan_stats": gan_stats,
             "pending_k2n": pending_k2n_data, "top_memory": top_memory_bridges, "ai_predictions": ai_predictions, "recent_data": data_slice}
 
-def calculate_score_from_features(features_dict, config_dict):
-    """Inject config_dict params into SETTINGS before calculating scores."""
-    for k, v in config_dict.items():
-        try:
-            setattr(SETTINGS, k, v)
-        except Exception:
-            pass
+def calculate_score_from_features(features_dict, config_dict=None, settings=None):
+    """
+    Chấm điểm từ features đã tính sẵn với cài đặt settings (snapshot, mặc định SETTINGS
+    lúc gọi) + config_dict ghi đè. Không sửa SETTINGS toàn cục, nên các kịch bản có
+    thể chạy song song.
+    """
+    scenario = resolve_settings(settings)
+    if config_dict and hasattr(scenario, "with_overrides"):
+        scenario = scenario.with_overrides(config_dict)
     return get_top_scored_pairs(features_dict["stats_n_day"], features_dict["consensus"], features_dict["high_win"],
             features_dict["pending_k2n"], features_dict["gan_stats"], features_dict["top_memory"],
-            features_dict.get("ai_predictions"), features_dict.get("recent_data"))
+            features_dict.get("ai_predictions"), features_dict.get("recent_data"), settings=scenario)
 
 def get_historical_dashboard_data(all_data_ai, day_index, temp_settings):
     """Hàm "chủ" để mô phỏng Bảng Tổng Hợp tại một ngày trong quá khứ."""
-    features = prepare_daily_features(all_data_ai, day_index)
+    scenario = resolve_settings()
+    if temp_settings and hasattr(scenario, "with_overrides"):
+        scenario = scenario.with_overrides(temp_settings)
+    features = prepare_daily_features(all_data_ai, day_index, settings=scenario)
     if not features:
         return None
-    return calculate_score_from_features(features, temp_settings)
+    return calculate_score_from_features(features, settings=scenario)
 
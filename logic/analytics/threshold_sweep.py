@@ -0,0 +1,266 @@
+"""
+threshold_sweep.py - Quét ngưỡng tỷ lệ (AUTO_ADD / AUTO_PRUNE / HIGH_WIN) chỉ đọc
+
+Tinh chỉnh AUTO_ADD_MIN_RATE trước đây chạy cả hai bộ dò cầu Lô (ghi thẳng vào
+ManagedBridges) rồi với mỗi ngưỡng lại duyệt và đọc lại chuỗi "56.67%";
+HIGH_WIN_THRESHOLD / AUTO_PRUNE_MIN_RATE chạy lại cập nhật Cache K2N trước.
+
+Ở đây phân phối tỷ lệ được tính MỘT lần thành mảng số đã sắp xếp
+(RateDistribution), không ghi gì vào DB:
+- scan_rate_distribution(): tỷ lệ dò của mọi cầu Lô Vị Trí V17 + Bạc Nhớ
+  (cùng công thức TIM_CAU_TOT_NHAT_V16 / TIM_CAU_BAC_NHO_TOT_NHAT, vector hóa
+  trên ma trận STL của k2n_engine)
+- high_win_rate_distribution() / prune_rate_distribution(): tỷ lệ của các cầu
+  đang Bật như sau khi cập nhật Cache K2N (backtest K2N chạy trong bộ nhớ)
+Mỗi ngưỡng trong khoảng quét chỉ là một phép searchsorted; sweep_thresholds()
+trả về số cầu theo từng ngưỡng + histogram + CDF cho cửa sổ Tinh Chỉnh.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ..backtest.k2n_engine import _positions_matrix, _stl_from_digits, loto_presence, memory_stl_matrix
+from ..backtester_core import BACKTEST_15_CAU_K2N_V30_AI_V8, run_managed_bridges_k2n
+from ..backtest.result import BacktestResult
+from ..bridges.bridges_memory import get_27_loto_names
+from ..data_repository import get_all_managed_bridges
+from ..db_manager import DB_NAME
+from ..instrumentation import timed
+
+# Tham số được quét bằng engine này: (phân phối, phép so sánh với ngưỡng)
+SWEEP_AT_LEAST = ">="
+SWEEP_BELOW = "<"
+HISTOGRAM_BIN_WIDTH = 5.0       # Cột histogram 5% (0-100%)
+
+# Loại cầu Đề mà get_high_win_rate_predictions lọc theo phong độ 10 kỳ (không theo ngưỡng %)
+_DE_HIGH_WIN_TYPES = ("DE", "DE_DYNAMIC_K", "DE_POS_SUM")
+
+
+def threshold_range(start, stop, step) -> List[float]:
+    """Các ngưỡng start, start+step, ... <= stop (cùng cách cộng dồn của float_range cũ)."""
+    if step <= 0:
+        return [start]
+    values = []
+    n = start
+    while n < (stop + (step * 0.5)):
+        values.append(n)
+        n += step
+    return values
+
+
+def parse_rate(value) -> Optional[float]:
+    """"56.67%" / 56.67 -> 56.67; None nếu không đọc được ("N/A", rỗng...)."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).replace("%", "").strip()
+    if not text or text == "N/A":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+# =============================================================================
+# PHÂN PHỐI TỶ LỆ
+# =============================================================================
+
+@dataclass(frozen=True)
+class RateDistribution:
+    """Tỷ lệ (%) đã sắp xếp tăng dần (chỉ đọc) + số mục không đọc được tỷ lệ."""
+    rates: np.ndarray
+    skipped: int = 0
+
+    @classmethod
+    def from_values(cls, values) -> "RateDistribution":
+        parsed = [parse_rate(v) for v in values]
+        rates = np.sort(np.array([r for r in parsed if r is not None and np.isfinite(r)], dtype=np.float64))
+        rates.setflags(write=False)
+        return cls(rates=rates, skipped=len(parsed) - len(rates))
+
+    def __len__(self):
+        return len(self.rates)
+
+    def count_at_least(self, thresholds) -> np.ndarray:
+        """Số cầu có tỷ lệ >= từng ngưỡng."""
+        return len(self.rates) - np.searchsorted(self.rates, np.asarray(thresholds, dtype=np.float64), side="left")
+
+    def count_below(self, thresholds) -> np.ndarray:
+        """Số cầu có tỷ lệ < từng ngưỡng."""
+        return np.searchsorted(self.rates, np.asarray(thresholds, dtype=np.float64), side="left")
+
+    def cdf(self, thresholds) -> np.ndarray:
+        """Tỷ lệ phần trăm số cầu có tỷ lệ <= từng ngưỡng (0..1)."""
+        if not len(self.rates):
+            return np.zeros(len(np.atleast_1d(thresholds)))
+        return np.searchsorted(self.rates, np.asarray(thresholds, dtype=np.float64), side="right") / len(self.rates)
+
+    def histogram(self, bin_width: float = HISTOGRAM_BIN_WIDTH):
+        """(mép các cột, số cầu mỗi cột) trên 0..100% (tỷ lệ ngoài khoảng dồn vào cột biên)."""
+        edges = np.arange(0.0, 100.0 + bin_width, bin_width)
+        counts, _ = np.histogram(np.clip(self.rates, edges[0], edges[-1]), bins=edges)
+        return edges, counts
+
+
+@dataclass(frozen=True)
+class ThresholdSweep:
+    """Kết quả quét một tham số: số cầu thỏa (tỷ lệ <comparison> ngưỡng) theo từng ngưỡng."""
+    param_key: str
+    comparison: str
+    thresholds: np.ndarray
+    counts: np.ndarray
+    cdf: np.ndarray
+    hist_edges: np.ndarray
+    hist_counts: np.ndarray
+    distribution: RateDistribution
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "param_key": self.param_key,
+            "comparison": self.comparison,
+            "thresholds": self.thresholds.tolist(),
+            "counts": self.counts.tolist(),
+            "cdf": self.cdf.tolist(),
+            "hist_edges": self.hist_edges.tolist(),
+            "hist_counts": self.hist_counts.tolist(),
+            "total": len(self.distribution),
+            "skipped": self.distribution.skipped,
+        }
+
+    def histogram_lines(self, width: int = 30) -> List[str]:
+        """Histogram dạng chữ cho ô log của cửa sổ Tinh Chỉnh (bỏ các cột trống hai đầu)."""
+        nonzero = np.flatnonzero(self.hist_counts)
+        if not len(nonzero):
+            return []
+        peak = int(self.hist_counts.max())
+        lines = []
+        for k in range(nonzero[0], nonzero[-1] + 1):
+            count = int(self.hist_counts[k])
+            bar = "#" * (int(round(count / peak * width)) if count else 0)
+            lines.append(f"{self.hist_edges[k]:5.1f}-{self.hist_edges[k + 1]:5.1f}% | {count:>6} {bar}")
+        return lines
+
+
+def sweep_thresholds(distribution: RateDistribution, thresholds, comparison: str = SWEEP_AT_LEAST,
+                     param_key: str = "", bin_width: float = HISTOGRAM_BIN_WIDTH) -> ThresholdSweep:
+    """Trả lời mọi ngưỡng cùng lúc bằng searchsorted trên phân phối đã sắp xếp."""
+    values = np.asarray(list(thresholds), dtype=np.float64)
+    if comparison == SWEEP_AT_LEAST:
+        counts = distribution.count_at_least(values)
+    elif comparison == SWEEP_BELOW:
+        counts = distribution.count_below(values)
+    else:
+        raise ValueError(f"Phép so sánh không hỗ trợ: {comparison}")
+    edges, hist = distribution.histogram(bin_width)
+    return ThresholdSweep(
+        param_key=param_key,
+        comparison=comparison,
+        thresholds=values,
+        counts=np.asarray(counts, dtype=np.int64),
+        cdf=distribution.cdf(values),
+        hist_edges=edges,
+        hist_counts=hist,
+        distribution=distribution,
+    )
+
+
+# =============================================================================
+# NGUỒN TỶ LỆ (CHỈ ĐỌC)
+# =============================================================================
+
+def _day_hits(lo1: np.ndarray, lo2: np.ndarray, presence: np.ndarray) -> np.ndarray:
+    """[ngày, cầu] trúng: một trong hai con lô STL về ở kỳ sau (như checkHitSet_V30_K2N)."""
+    hit1 = np.take_along_axis(presence, np.maximum(lo1, 0), axis=1) & (lo1 >= 0)
+    hit2 = np.take_along_axis(presence, np.maximum(lo2, 0), axis=1) & (lo2 >= 0)
+    return hit1 | hit2
+
+
+def _v17_scan_rates(rows, presence: np.ndarray) -> np.ndarray:
+    """Tỷ lệ dò (%) của mọi cặp vị trí V17 (i <= j), theo thứ tự của TIM_CAU_TOT_NHAT_V16."""
+    positions = _positions_matrix(rows[:-1])
+    days, n_positions = positions.shape
+    rates = []
+    for idx1 in range(n_positions):
+        codes = _stl_from_digits(positions[:, idx1:idx1 + 1], positions[:, idx1:])
+        lo1 = np.where(codes >= 0, codes // 100, -1)
+        lo2 = np.where(codes >= 0, codes % 100, -1)
+        wins = _day_hits(lo1, lo2, presence).sum(axis=0)
+        rates.append(wins / days * 100)
+    return np.concatenate(rates) if rates else np.zeros(0)
+
+
+def _memory_scan_rates(rows, presence: np.ndarray) -> np.ndarray:
+    """Tỷ lệ dò (%) của 756 cầu Bạc Nhớ (tổng/hiệu), theo thứ tự của TIM_CAU_BAC_NHO_TOT_NHAT."""
+    n_lotos = len(get_27_loto_names())
+    algorithms = [(i, j, alg) for i in range(n_lotos) for j in range(i, n_lotos) for alg in ("sum", "diff")]
+    matrix = memory_stl_matrix(algorithms, rows[:-1])
+    codes = matrix.codes
+    lo1 = np.where(codes >= 0, codes // 100, -1)
+    lo2 = np.where(codes >= 0, codes % 100, -1)
+    for (i, j), (_, extra_lo1, extra_lo2) in matrix.extras.items():
+        lo1[i, j], lo2[i, j] = extra_lo1, extra_lo2
+    wins = _day_hits(lo1, lo2, presence).sum(axis=0)
+    return wins / len(codes) * 100
+
+
+@timed("tuning.scan_rates")
+def scan_rate_distribution(all_data_ai) -> RateDistribution:
+    """
+    Tỷ lệ dò của mọi cầu Lô Vị Trí V17 + Bạc Nhớ trên toàn bộ lịch sử (không ghi DB).
+    Khác bản cũ: tính cho MỌI cầu, không chỉ các cầu đã vượt AUTO_ADD_MIN_RATE hiện tại.
+    """
+    rows = list(all_data_ai or [])
+    if len(rows) < 2:
+        return RateDistribution.from_values([])
+    presence = loto_presence(rows)[1:]
+    rates = np.sort(np.concatenate([_v17_scan_rates(rows, presence), _memory_scan_rates(rows, presence)]))
+    rates.setflags(write=False)
+    return RateDistribution(rates=rates)
+
+
+def refreshed_enabled_bridges(all_data_ai, db_name=DB_NAME) -> List[Dict[str, Any]]:
+    """
+    Cầu đang Bật như sau khi chạy cập nhật Cache K2N (dự đoán mới; win_rate_text
+    đang N/A được vá bằng tỷ lệ K2N) - backtest chạy trong bộ nhớ, DB giữ nguyên.
+    """
+    bridges = [dict(b) for b in get_all_managed_bridges(db_name, only_enabled=True)]
+    if not bridges or not all_data_ai:
+        return bridges
+    ky_bat_dau = 2
+    ky_ket_thuc = len(all_data_ai) + (ky_bat_dau - 1)
+    cache_rows = []
+    for result in (
+        BACKTEST_15_CAU_K2N_V30_AI_V8(all_data_ai, ky_bat_dau, ky_ket_thuc, history=False, as_result=True),
+        run_managed_bridges_k2n(all_data_ai, ky_bat_dau, ky_ket_thuc, db_name),
+    ):
+        if isinstance(result, BacktestResult):
+            cache_rows.extend(result.to_k2n_cache()[0])
+    fresh = {row[-1]: row for row in cache_rows}
+    for bridge in bridges:
+        row = fresh.get(bridge.get("name"))
+        if row is None:
+            continue
+        bridge["search_rate_text"], bridge["current_streak"], bridge["next_prediction_stl"] = row[0], row[1], row[2]
+        if bridge.get("win_rate_text") in (None, "N/A", ""):
+            bridge["win_rate_text"] = row[0]
+    return bridges
+
+
+def high_win_rate_distribution(bridges) -> RateDistribution:
+    """Tỷ lệ của các cầu Lô có dự đoán hợp lệ (các cầu get_high_win_rate_predictions xét theo ngưỡng)."""
+    values = []
+    for bridge in bridges:
+        if str(bridge.get("type", "")).upper() in _DE_HIGH_WIN_TYPES:
+            continue
+        stl = bridge.get("next_prediction_stl")
+        if not stl or "N2" in stl or "LỖI" in stl or "," not in stl:
+            continue
+        values.append(bridge.get("win_rate_text", "0%"))
+    return RateDistribution.from_values(values)
+
+
+def prune_rate_distribution(bridges) -> RateDistribution:
+    """Tỷ lệ (win_rate_text) của các cầu đang Bật; cầu N/A không bị xét tắt."""
+    return RateDistribution.from_values(b.get("win_rate_text", "100%") for b in bridges)
@@ -0,0 +1,245 @@
+"""
+walk_forward.py - Mô phỏng Bảng Tổng Hợp tiến từng ngày (walk-forward)
+
+prepare_daily_features() dựng lại mọi feature từ all_data_ai[:day_index + 1]
+cho từng ngày mô phỏng (2 backtest K2N, 756 cầu Bạc Nhớ, quét lô gan), nên mô
+phỏng N ngày tốn O(N x lịch sử). WalkForwardSimulator tính ma trận STL cho
+toàn bộ lịch sử một lần rồi tiến từng ngày, chỉ cập nhật phần thay đổi:
+trạng thái K2N (K2NState), số lần trúng của cầu Bạc Nhớ, cửa sổ lô nóng và
+kỳ xuất hiện gần nhất của từng con lô (lô gan).
+
+Feature dict của mỗi ngày giống prepare_daily_features(all_data_ai, day_index);
+riêng gan_stats, các lô gan bằng nhau được xếp theo số lô (bản gốc phụ thuộc
+thứ tự duyệt set).
+"""
+
+from collections import deque
+
+import numpy as np
+
+from ..backtest.k2n_engine import (
+    K2NState,
+    classic_stl_matrix,
+    managed_stl_matrix,
+    memory_stl_matrix,
+    stl_hits,
+)
+from ..backtest.result import (
+    KIND_CLASSIC_K2N,
+    KIND_MANAGED_K2N,
+    RECENT_WINDOW,
+    ROW_DATA_ERROR,
+    ROW_EXCEPTION,
+    ROW_OK,
+    BacktestResult,
+)
+from ..backtester_core import (
+    CLASSIC_K2N_BRIDGE_NAMES,
+    CLASSIC_K2N_HEADERS,
+    _filter_lo_bridges,
+    _k2n_day_status,
+    _next_ky_label,
+)
+from .dashboard_scorer import (
+    DB_NAME,
+    _high_win_from_cache,
+    _is_memory_test_day,
+    _loto_stats_from_lotos,
+    _memory_algorithms,
+    _memory_bridge_predictions,
+    resolve_settings,
+    getAllLoto_V30,
+    get_all_managed_bridges,
+    get_consensus_simulation,
+)
+
+
+class _K2NTrack:
+    """Một backtest K2N (15 cầu cổ điển hoặc Cầu Đã Lưu) chạy tiến từng ngày."""
+
+    __slots__ = ("kind", "headers", "bridge_names", "state", "strict", "stopped",
+                 "total_days", "periods", "row_status", "outcomes", "stl_codes")
+
+    def __init__(self, kind, headers, bridge_names, matrix, strict, abort_row_on_error):
+        self.kind = kind
+        self.headers = headers
+        self.bridge_names = bridge_names
+        self.state = K2NState(matrix, abort_row_on_error)
+        self.strict = strict
+        self.stopped = False
+        self.total_days = 0
+        # Chỉ giữ RECENT_WINDOW kỳ cuối (đủ cho "Phong Độ 10 Kỳ")
+        self.periods = deque(maxlen=RECENT_WINDOW)
+        self.row_status = deque(maxlen=RECENT_WINDOW)
+        self.outcomes = deque(maxlen=RECENT_WINDOW)
+        self.stl_codes = deque(maxlen=RECENT_WINDOW)
+
+    def check_day(self, data, t, day_hits):
+        """Kiểm tra kỳ t với dự đoán từ hàng t - 1 (như _scan_k2n_days)."""
+        if self.stopped:
+            return
+        ok = _k2n_day_status(data[t - 1], data[t], self.strict)
+        if ok is None:
+            # Hàng rỗng: backtest trên mọi lát cắt chứa hàng này đều dừng tại đây
+            self.stopped = True
+            return
+        n = len(self.bridge_names)
+        status = ROW_DATA_ERROR
+        outcomes, stl_codes = np.zeros(n, dtype=np.int8), np.full(n, -1, dtype=np.int16)
+        if ok:
+            outcomes, stl_codes, _, abort = self.state.step(t - 1, day_hits)
+            status = ROW_OK if abort is None else ROW_EXCEPTION
+            self.total_days += 1
+        self.periods.append(data[t][0])
+        self.row_status.append(status)
+        self.outcomes.append(outcomes)
+        self.stl_codes.append(stl_codes)
+
+    def result(self, data, t):
+        """BacktestResult rút gọn (RECENT_WINDOW kỳ cuối) cho lát cắt data[:t + 1]."""
+        n = len(self.bridge_names)
+        result = BacktestResult(
+            kind=self.kind,
+            headers=self.headers,
+            bridge_names=self.bridge_names,
+            periods=list(self.periods),
+            row_status=np.array(self.row_status, dtype=np.int8),
+            outcomes=np.array(self.outcomes, dtype=np.int8).reshape(-1, n),
+            stl_codes=np.array(self.stl_codes, dtype=np.int16).reshape(-1, n),
+            win_counts=self.state.win_counts.copy(),
+            current_streak=self.state.current_streak.copy(),
+            max_lose_streak=self.state.max_lose_streak.copy(),
+            total_days=self.total_days,
+        )
+        result.set_prediction_codes(_next_ky_label(data[t]), *self.state.prediction(t))
+        return result
+
+
+class WalkForwardSimulator:
+    """
+    Mô phỏng Bảng Tổng Hợp tiến từng ngày trên all_data_ai.
+
+    advance() đưa kỳ tiếp theo vào trạng thái; features() trả về feature dict
+    của ngày hiện tại (giống prepare_daily_features). Cách dùng thông thường
+    là iter_features() / iter_daily_features().
+    """
+
+    def __init__(self, all_data_ai, bridges=None, settings=None):
+        self.data = all_data_ai
+        self.day_index = -1
+        settings = resolve_settings(settings)
+        self.stats_days = getattr(settings, "STATS_DAYS", 7)
+        self.gan_days = getattr(settings, "GAN_DAYS", 15)
+        self.high_win_threshold = getattr(settings, "HIGH_WIN_THRESHOLD", 47.0)
+
+        if bridges is None:
+            try:
+                bridges = get_all_managed_bridges(DB_NAME, only_enabled=True)
+            except Exception as e:
+                print(f"Lỗi tải Cầu Đã Lưu cho mô phỏng walk-forward: {e}")
+        self.bridges = bridges or []
+
+        # Tính sẵn một lần cho toàn bộ lịch sử
+        self._lotos = [getAllLoto_V30(row) for row in all_data_ai]
+        self._presence = np.zeros((len(all_data_ai), 100), dtype=bool)
+        for i, lotos in enumerate(self._lotos):
+            self._presence[i, [int(loto) for loto in lotos]] = True
+        self._last_seen = np.full(100, -1, dtype=np.int64)
+
+        classic = classic_stl_matrix(all_data_ai)
+        self._classic = _K2NTrack(KIND_CLASSIC_K2N, CLASSIC_K2N_HEADERS, CLASSIC_K2N_BRIDGE_NAMES,
+                                  classic, strict=True, abort_row_on_error=True)
+        lo_bridges = _filter_lo_bridges(self.bridges)
+        self._managed = None
+        if lo_bridges:
+            names = [b["name"] for b in lo_bridges]
+            self._managed = _K2NTrack(KIND_MANAGED_K2N, ["Kỳ (Cột A)"] + names, names,
+                                      managed_stl_matrix(lo_bridges, all_data_ai, classic=classic),
+                                      strict=False, abort_row_on_error=False)
+
+        self._memory_algorithms = _memory_algorithms()
+        self._memory = memory_stl_matrix(self._memory_algorithms, all_data_ai)
+        self._memory_wins = np.zeros(len(self._memory_algorithms), dtype=np.int64)
+        self._memory_days = 0
+
+    def advance(self):
+        """Đưa kỳ day_index + 1 vào trạng thái (K2N, Bạc Nhớ, lô gan)."""
+        t = self.day_index + 1
+        if t >= len(self.data):
+            raise IndexError("Đã hết dữ liệu để mô phỏng.")
+        data = self.data
+        if t >= 1:
+            day_hits = self._presence[t]
+            self._classic.check_day(data, t, day_hits)
+            if self._managed is not None:
+                self._managed.check_day(data, t, day_hits)
+            if _is_memory_test_day(data[t - 1], data[t]):
+                self._memory_wins += stl_hits(*self._memory.loto_codes(t - 1), day_hits)
+                self._memory_days += 1
+        self._last_seen[self._presence[t]] = t
+        self.day_index = t
+
+    def _gan_stats(self, t):
+        """Lô gan của lát cắt data[:t + 1] (như get_loto_gan_stats)."""
+        n_days = self.gan_days
+        if t + 1 < n_days:
+            return []
+        window = range(t + 1)[-n_days:]
+        window_start = window.start if len(window) else t + 1
+        gan_stats = []
+        for loto in np.flatnonzero(self._last_seen < window_start):
+            last = int(self._last_seen[loto])
+            gan_stats.append((f"{loto:02d}", t - last if last >= 0 else t + 1))
+        gan_stats.sort(key=lambda x: x[1], reverse=True)
+        return gan_stats
+
+    def features(self):
+        """Feature dict của ngày hiện tại; None nếu chưa đủ 2 kỳ."""
+        t = self.day_index
+        if t < 1:
+            return None
+        data_slice = self.data[: t + 1]
+        last_row = data_slice[-1]
+
+        stats_n_day = _loto_stats_from_lotos([self._lotos[i] for i in range(t + 1)[-self.stats_days:]])
+        classic = self._classic.result(self.data, t)
+        cache_list_15, pending_k2n_data = classic.to_k2n_cache()
+        cache_list = []
+        if self._managed is not None:
+            cache_list, _ = self._managed.result(self.data, t).to_k2n_cache()
+        high_win = _high_win_from_cache(cache_list + cache_list_15, self.high_win_threshold)
+
+        top_memory_bridges = []
+        if self._memory_days:
+            top_memory_bridges = _memory_bridge_predictions(
+                self._memory_algorithms, self._memory_wins.tolist(), self._memory_days, last_row, top_n=5)
+
+        return {
+            "stats_n_day": stats_n_day,
+            "consensus": get_consensus_simulation(data_slice, last_row, bridges=self.bridges),
+            "high_win": high_win,
+            "gan_stats": self._gan_stats(t),
+            "pending_k2n": pending_k2n_data,
+            "top_memory": top_memory_bridges,
+            "ai_predictions": None,
+            "recent_data": data_slice,
+        }
+
+    def iter_features(self, start_index=1, end_index=None):
+        """Sinh (day_index, features) cho các ngày start_index..end_index (mặc định đến kỳ cuối)."""
+        if end_index is None:
+            end_index = len(self.data) - 1
+        while self.day_index < end_index:
+            self.advance()
+            if self.day_index >= start_index:
+                yield self.day_index, self.features()
+
+
+def iter_daily_features(all_data_ai, start_index=1, end_index=None, bridges=None, settings=None):
+    """
+    Walk-forward: sinh (day_index, features) cho từng ngày từ start_index đến
+    end_index (bao gồm), tương đương gọi prepare_daily_features(all_data_ai,
+    day_index, settings) cho từng ngày nhưng chỉ duyệt lịch sử một lần.
+    """
+    simulator = WalkForwardSimulator(all_data_ai, bridges=bridges, settings=settings)
+    yield from simulator.iter_features(start_index, end_index)
@@ -1,2 +1,17 @@
 # Backtest modules - Refactored from backtester.py
 
+from .result import (
+    OUTCOME_ERROR,
+    OUTCOME_HIT_N1,
+    OUTCOME_HIT_N2,
+    OUTCOME_MISS_K2N,
+    OUTCOME_MISS_N1,
+    OUTCOME_NO_PRED,
+    OUTCOME_NONE,
+    OUTCOME_OPEN_N2,
+    PENDING_ERROR,
+    PENDING_N1,
+    PENDING_N2,
+    BacktestResult,
+    BacktestResultBuilder,
+)
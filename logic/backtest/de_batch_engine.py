@@ -0,0 +1,273 @@
+"""
+de_batch_engine.py - Backtest Đề cho toàn bộ cầu Đề đã lưu trong một lượt
+
+Cùng kết quả với run_de_bridge_historical_test nhưng tính cho mọi cầu cùng
+lúc: ma trận 214 vị trí của các kỳ nguồn và vector số đề (2 số cuối GĐB) chỉ
+tính một lần; chạm của từng (cầu, số gốc) tra bảng bit 10 chữ số (de_lookup)
+thay vì sinh dàn đề mỗi ngày. Cầu không vector hóa được (thiếu index, index ngoài 214 vị
+trí, cầu scanner) chạy lại bằng run_de_bridge_historical_test.
+
+Ma trận outcomes [ngày, cầu]: DE_WIN / DE_LOSS / DE_PENDING (kỳ chưa có kết
+quả) / DE_SKIP (không đọc được vị trí -> không có dòng kết quả).
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from ..de_backtester_core import (
+    DE_KIND_DYNAMIC,
+    DE_KIND_KILLER,
+    DE_KIND_POS_SUM,
+    DE_KIND_SET,
+    get_bridge_k_offset,
+    get_de_bridge_kind,
+    run_de_bridge_historical_test,
+)
+from ..de_lookup import DIGIT_BITS, touch_set, touches_to_bits
+from ..de_utils import BO_SO_NAMES, NUMBER_TO_BO_ID, de_number_codes
+from .k2n_engine import _positions_matrix
+
+DE_SKIP = -2
+DE_PENDING = -1
+DE_LOSS = 0
+DE_WIN = 1
+
+N_POSITIONS_V17 = 214
+
+
+def _touches_for(kind, base, k_offset):
+    if kind == DE_KIND_DYNAMIC:
+        return touch_set(base, k_offset)
+    if kind in (DE_KIND_POS_SUM, DE_KIND_KILLER):
+        return [base]
+    return [base, (base + 5) % 10]  # CLASSIC
+
+
+def _format_prediction(kind, value, k_offset, has_n2):
+    """Chuỗi dự đoán giống run_de_bridge_historical_test (value = số gốc, hoặc cặp n1n2 với cầu Bộ)."""
+    if kind == DE_KIND_SET:
+        if not has_n2:
+            return "Lỗi: Cầu Bộ thiếu Vị trí 2"
+        return f"Bộ {BO_SO_NAMES[NUMBER_TO_BO_ID[value]]}"
+    touches = _touches_for(kind, value, k_offset)
+    if kind == DE_KIND_KILLER:
+        return f"LOẠI Chạm {touches[0]}"
+    return f"Chạm {','.join(map(str, touches))}"
+
+
+@dataclass
+class DeBridgeSpec:
+    """Cấu hình đã giải mã của một cầu Đề vector hóa được."""
+    kind: str
+    idx1: int
+    idx2: int          # -1 nếu cầu 1 vị trí
+    k_offset: int
+
+
+def prepare_de_bridge(bridge) -> Optional[DeBridgeSpec]:
+    """
+    None nếu cầu phải chạy từng ngày (scanner, mất index, index ngoài ma trận vị trí).
+    Chỉ pos2_idx = None mới là cầu 1 vị trí: pos2_idx = -1 được
+    run_de_bridge_historical_test đọc như vị trí cuối (pos_vals[-1]), nên cũng chạy từng ngày.
+    """
+    if not bridge or bridge.get("is_scanner_result", False):
+        return None
+    try:
+        idx1 = bridge.get("pos1_idx")
+        idx2 = bridge.get("pos2_idx")
+        if idx1 is None:
+            return None
+        idx1 = int(idx1)
+        idx2 = -1 if idx2 is None else int(idx2)
+    except (TypeError, ValueError):
+        return None
+    if bridge.get("pos2_idx") is not None and idx2 < 0:
+        return None
+    if not 0 <= idx1 < N_POSITIONS_V17 or not -1 <= idx2 < N_POSITIONS_V17:
+        return None
+    name = bridge.get("name", "")
+    kind = get_de_bridge_kind(bridge.get("type", "UNKNOWN"), name)
+    return DeBridgeSpec(kind, idx1, idx2, get_bridge_k_offset(bridge))
+
+
+@dataclass
+class DeBatchRun:
+    """Kết quả backtest Đề theo lô cho các kỳ đích rows[start:]."""
+    bridges: List[dict]
+    dates: List[str]                 # Nhãn kỳ như cột 'date' của popup
+    de_codes: np.ndarray             # [ngày] số đề 0..99, -1 = chờ kết quả
+    outcomes: np.ndarray             # [ngày, cầu] DE_WIN / DE_LOSS / DE_PENDING / DE_SKIP
+    values: np.ndarray               # [ngày, cầu] số gốc (cầu Bộ: cặp n1n2)
+    specs: List[Optional[DeBridgeSpec]]
+    fallback: Dict[int, List[dict]] = field(default_factory=dict)
+    failed: Set[int] = field(default_factory=set)
+
+    def _finished(self, j):
+        col = self.outcomes[:, j]
+        return col[(col == DE_WIN) | (col == DE_LOSS)]
+
+    def max_lose_streak(self, j) -> int:
+        """
+        Chuỗi không Ăn dài nhất của cầu j (kỳ chờ tính là không Ăn, như
+        calculate_de_bridge_max_lose_history); -1 nếu cầu lỗi / không có kết quả.
+        """
+        col = self.outcomes[:, j]
+        col = col[col != DE_SKIP]
+        if j in self.failed or len(col) == 0:
+            return -1
+        not_win = np.concatenate(([0], (col != DE_WIN).astype(np.int8), [0]))
+        edges = np.diff(not_win)
+        runs = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+        return int(runs.max()) if len(runs) else 0
+
+    def current_streak(self, j) -> int:
+        """Chuỗi hiện tại: > 0 là số kỳ Ăn liên tiếp, < 0 là số kỳ Gãy liên tiếp."""
+        done = self._finished(j)
+        if len(done) == 0:
+            return 0
+        changed = np.flatnonzero(done != done[-1])
+        streak = len(done) - (changed[-1] + 1 if len(changed) else 0)
+        return int(streak if done[-1] == DE_WIN else -streak)
+
+    def max_lose_streaks(self) -> np.ndarray:
+        return np.array([self.max_lose_streak(j) for j in range(len(self.bridges))], dtype=np.int64)
+
+    def current_streaks(self) -> np.ndarray:
+        return np.array([self.current_streak(j) for j in range(len(self.bridges))], dtype=np.int64)
+
+    def win_counts(self, last_n=None) -> np.ndarray:
+        """Số kỳ Ăn trong `last_n` kỳ đã có kết quả gần nhất (None = toàn bộ)."""
+        return np.array([int(self._finished(j)[-last_n if last_n else 0:].sum())
+                         for j in range(len(self.bridges))], dtype=np.int64)
+
+    def history_log(self, j, days=60) -> List[dict]:
+        """`days` dòng kết quả cuối của cầu j, cùng định dạng run_de_bridge_historical_test."""
+        if j in self.fallback:
+            return self.fallback[j][-days:]
+        spec = self.specs[j]
+        rows = np.flatnonzero(self.outcomes[:, j] != DE_SKIP)[-days:]
+        log = []
+        for d in rows:
+            outcome = self.outcomes[d, j]
+            is_win = outcome == DE_WIN
+            log.append({
+                'date': self.dates[d],
+                'pred': _format_prediction(spec.kind, int(self.values[d, j]), spec.k_offset, spec.idx2 >= 0),
+                'result': f"{self.de_codes[d]:02d}" if self.de_codes[d] >= 0 else "??",
+                'is_win': bool(is_win),
+                'status': "Chờ" if outcome == DE_PENDING else ("Ăn" if is_win else "Gãy"),
+            })
+        return log
+
+    def summary(self, j, log_days=60) -> Dict[str, Any]:
+        """Thống kê một cầu (các khóa như DeBacktesterCore.run_backtest)."""
+        done = self._finished(j)
+        wins = int(done.sum())
+        win_streak = 0
+        best_win = 0
+        for outcome in done:
+            win_streak = win_streak + 1 if outcome == DE_WIN else 0
+            best_win = max(best_win, win_streak)
+        return {
+            "total_days": len(done),
+            "wins": wins,
+            "loss": len(done) - wins,
+            "current_streak": self.current_streak(j),
+            "max_win_streak": best_win,
+            "max_loss_streak": self.max_lose_streak(j),
+            "win_rate": (wins / len(done) * 100) if len(done) else 0,
+            "history_log": self.history_log(j, log_days),
+        }
+
+
+def _evaluate(specs, positions, de_codes):
+    """Tính outcomes / values cho các cầu vector hóa trên cùng ma trận vị trí."""
+    n_days = len(de_codes)
+    if not specs:
+        empty = np.zeros((n_days, 0), dtype=np.int8)
+        return empty, empty.astype(np.int16)
+
+    idx1 = np.array([s.idx1 for s in specs])
+    idx2 = np.array([s.idx2 for s in specs])
+    has_n2 = idx2 >= 0
+    n1 = positions[:, idx1].astype(np.int16)
+    n2 = np.where(has_n2, positions[:, np.maximum(idx2, 0)], 0).astype(np.int16)
+    valid = (n1 >= 0) & (~has_n2 | (n2 >= 0))
+    n1, n2 = np.maximum(n1, 0), np.maximum(n2, 0)
+    base = np.where(has_n2, (n1 + n2) % 10, n1)
+
+    pending = de_codes < 0
+    de = np.maximum(de_codes, 0)
+
+    # Cầu chạm: bảng bit [cầu, số gốc] (de_lookup) -> AND với bit chữ số của số đề
+    touch_bits = np.array(
+        [[touches_to_bits(_touches_for(s.kind, b, s.k_offset)) if s.kind != DE_KIND_SET else 0
+          for b in range(10)] for s in specs],
+        dtype=np.int16,
+    )
+    hit = (touch_bits[np.arange(len(specs))[None, :], base] & DIGIT_BITS[de][:, None]) != 0
+    killer = np.array([s.kind == DE_KIND_KILLER for s in specs])
+    win = hit ^ killer
+
+    # Cầu Bộ: cặp n1n2 cùng bộ với số đề
+    is_set = np.array([s.kind == DE_KIND_SET for s in specs])
+    pair = n1 * 10 + n2
+    set_win = has_n2 & (NUMBER_TO_BO_ID[pair] == NUMBER_TO_BO_ID[de][:, None])
+    win = np.where(is_set, set_win, win)
+    values = np.where(is_set, pair, base).astype(np.int16)
+
+    outcomes = np.where(win, DE_WIN, DE_LOSS)
+    outcomes = np.where(pending[:, None], DE_PENDING, outcomes)
+    outcomes = np.where(valid, outcomes, DE_SKIP).astype(np.int8)
+    return outcomes, values
+
+
+def run_de_batch(bridges, all_data, start=1) -> DeBatchRun:
+    """
+    Backtest mọi cầu Đề trong `bridges` cho các kỳ đích all_data[start:]
+    (dự đoán từ kỳ liền trước).
+    """
+    rows = list(all_data or [])
+    start = max(1, start)
+    n_days = max(0, len(rows) - start)
+    targets = rows[start:]
+    dates = [str(row[0]) if row[0] else f"Ngày {start + d}" for d, row in enumerate(targets)]
+    de_codes = de_number_codes(targets).astype(np.int16)
+
+    specs = [prepare_de_bridge(b) for b in bridges]
+    fast = [j for j, s in enumerate(specs) if s is not None]
+    outcomes = np.full((n_days, len(bridges)), DE_SKIP, dtype=np.int8)
+    values = np.zeros((n_days, len(bridges)), dtype=np.int16)
+
+    if fast and n_days:
+        positions = _positions_matrix(rows[start - 1:-1])
+        outcomes[:, fast], values[:, fast] = _evaluate([specs[j] for j in fast], positions, de_codes)
+
+    run = DeBatchRun(list(bridges), dates, de_codes, outcomes, values, specs)
+
+    # Cầu còn lại: chạy từng ngày và chép kết quả vào cùng ma trận
+    day_of = {date: d for d, date in enumerate(dates)}
+    for j, spec in enumerate(specs):
+        if spec is not None:
+            continue
+        results = run_de_bridge_historical_test(bridges[j], rows[start - 1:], days=n_days)
+        run.fallback[j] = results
+        if not results or "FAIL" in str(results[0].get('status', '')):
+            run.failed.add(j)
+            continue
+        for r in results:
+            d = day_of.get(r.get('date'))
+            if d is not None:
+                status = r.get('status')
+                outcomes[d, j] = DE_PENDING if status == "Chờ" else (DE_WIN if r.get('is_win') else DE_LOSS)
+
+    return run
+
+
+def de_max_lose_streaks(bridges, all_data) -> Dict[Any, int]:
+    """{bridge_id: chuỗi Gãy dài nhất trên toàn lịch sử} (-1 nếu lỗi) cho việc lọc cầu Đề."""
+    run = run_de_batch(bridges, all_data)
+    streaks = run.max_lose_streaks()
+    return {bridge.get("id"): int(streaks[j]) for j, bridge in enumerate(bridges)}
@@ -0,0 +1,550 @@
+"""
+k2n_engine.py - Máy trạng thái K2N chạy theo lô (vector hóa)
+
+Thay vì duyệt từng cầu x từng ngày, engine tiến tất cả cầu cùng lúc mỗi ngày:
+trạng thái khung (in_frame), dự đoán đang chờ, chuỗi thắng/thua và số lần
+trúng đều là mảng numpy. Dự đoán lấy từ ma trận mã STL tính sẵn theo ngày
+(classic_stl_matrix / managed_stl_matrix).
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from ..bridges.bridges_classic import (
+        ALL_15_BRIDGE_FUNCTIONS_V5,
+        BONG_DUONG_V30,
+        classic_stl_codes,
+        getAllLoto_V30,
+        standard_row_digits,
+    )
+except ImportError:
+    ALL_15_BRIDGE_FUNCTIONS_V5 = []
+    BONG_DUONG_V30 = {}
+
+    def getAllLoto_V30(r):
+        return []
+
+    def standard_row_digits(row):
+        return None
+
+    def classic_stl_codes(positions, rows=None):
+        return np.full((len(positions), 15, 2), -1, dtype=np.int16)
+
+try:
+    from ..bridges.bridges_v16 import getAllPositions_V16
+except ImportError:
+    def getAllPositions_V16(r):
+        return [None] * 107
+
+try:
+    from ..bridges.bridges_memory import (
+        calculate_bridge_stl,
+        get_27_loto_names,
+        get_27_loto_positions,
+    )
+except ImportError:
+    def calculate_bridge_stl(loto_str_1, loto_str_2, algorithm_type):
+        return ["00", "00"]
+
+    def get_27_loto_names():
+        return []
+
+    def get_27_loto_positions(r):
+        return []
+
+from .result import (
+    OUTCOME_ERROR,
+    OUTCOME_HIT_N1,
+    OUTCOME_HIT_N2,
+    OUTCOME_MISS_K2N,
+    OUTCOME_NO_PRED,
+    OUTCOME_OPEN_N2,
+    PENDING_ERROR,
+    PENDING_N1,
+    PENDING_N2,
+    encode_stl,
+)
+
+# Cờ dự đoán trong ma trận STL
+PRED_NONE = 0       # Không tính được STL (pred rỗng)
+PRED_OK = 1
+PRED_ERROR = 2      # Ngoại lệ khi tính STL
+
+# Hàm cầu cổ điển khớp với classic_stl_codes (hàm bị thay thế sẽ tính từng hàng)
+_VECTORIZED_CLASSIC = tuple(ALL_15_BRIDGE_FUNCTIONS_V5)
+
+_BONG = np.array([int(BONG_DUONG_V30.get(str(d), str(d))) for d in range(10)], dtype=np.int16)
+
+
+def _loto_code(value) -> int:
+    """Mã 0..99 của một con lô dạng chuỗi 2 chữ số; -1 nếu không thể trúng."""
+    if isinstance(value, str) and len(value) == 2 and value.isdigit():
+        return int(value)
+    return -1
+
+
+# =============================================================================
+# MA TRẬN STL THEO NGÀY
+# =============================================================================
+
+@dataclass
+class StlMatrix:
+    """
+    Dự đoán STL của từng cầu cho từng hàng nguồn (hàng dùng để dự đoán).
+
+    codes[i, j]: mã cặp STL (lo1 * 100 + lo2), -1 nếu không đúng dạng chuẩn.
+    flags[i, j]: PRED_NONE / PRED_OK / PRED_ERROR.
+    extras: cặp STL không chuẩn {(i, j): (text, lo1, lo2)} (hiếm gặp).
+    errors: thông điệp ngoại lệ {(i, j): str}.
+    """
+    codes: np.ndarray
+    flags: np.ndarray
+    extras: Dict[Tuple[int, int], Tuple[str, int, int]] = field(default_factory=dict)
+    errors: Dict[Tuple[int, int], str] = field(default_factory=dict)
+
+    def put(self, i: int, j: int, pred):
+        """Ghi một dự đoán dạng list chuỗi (đường chậm, dùng cho trường hợp lẻ)."""
+        if not pred:
+            self.flags[i, j] = PRED_NONE
+            self.codes[i, j] = -1
+            return
+        self.flags[i, j] = PRED_OK
+        code = encode_stl(pred)
+        self.codes[i, j] = code
+        if code < 0:
+            try:
+                lo1, lo2 = _loto_code(pred[0]), _loto_code(pred[1])
+            except (IndexError, TypeError, KeyError):
+                lo1 = lo2 = -1
+            self.extras[(i, j)] = (",".join(pred), lo1, lo2)
+
+    def put_error(self, i: int, j: int, message: str):
+        self.flags[i, j] = PRED_ERROR
+        self.codes[i, j] = -1
+        self.errors[(i, j)] = message
+
+    def loto_codes(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Mã hai con lô (lo1, lo2) của hàng i cho từng cầu; -1 nếu không thể trúng."""
+        codes = self.codes[i]
+        lo1 = np.where(codes >= 0, codes // 100, -1)
+        lo2 = np.where(codes >= 0, codes % 100, -1)
+        for (r, j), (_, extra_lo1, extra_lo2) in self.extras.items():
+            if r == i:
+                lo1[j], lo2[j] = extra_lo1, extra_lo2
+        return lo1, lo2
+
+    def stl_text(self, i: int, j: int) -> str:
+        code = int(self.codes[i, j])
+        if code >= 0:
+            return f"{code // 100:02d},{code % 100:02d}"
+        extra = self.extras.get((i, j))
+        return extra[0] if extra else ""
+
+
+def _empty_matrix(n_rows: int, n_bridges: int) -> StlMatrix:
+    return StlMatrix(
+        codes=np.full((n_rows, n_bridges), -1, dtype=np.int16),
+        flags=np.zeros((n_rows, n_bridges), dtype=np.int8),
+    )
+
+
+def classic_stl_matrix(rows: List[Any], positions: Optional[np.ndarray] = None) -> StlMatrix:
+    """
+    STL của 15 Cầu Lô cổ điển cho từng hàng nguồn.
+    Hàng đúng chuẩn tính vector hóa từ ma trận vị trí (classic_stl_codes);
+    hàng lỗi/thiếu giải gọi lại hàm từng hàng để giữ nguyên kết quả.
+    positions: ma trận _positions_matrix(rows) nếu đã có sẵn.
+    """
+    matrix = _empty_matrix(len(rows), 15)
+    if not rows:
+        return matrix
+    digits = [standard_row_digits(row) for row in rows]
+    standard = [d is not None for d in digits]
+    if positions is None:
+        # Hàng không chuẩn tính lại từng hàng bên dưới, không cần vị trí
+        positions = _positions_matrix([row if ok else None for row, ok in zip(rows, standard)], digits)
+    pairs = classic_stl_codes(positions)
+    matrix.codes[:] = pairs[:, :, 0] * 100 + pairs[:, :, 1]
+    matrix.flags[:] = PRED_OK
+    row_columns = [j for j in range(15) if j >= len(_VECTORIZED_CLASSIC)
+                   or ALL_15_BRIDGE_FUNCTIONS_V5[j] is not _VECTORIZED_CLASSIC[j]]
+    for i, row in enumerate(rows):
+        for j in (row_columns if standard[i] else range(15)):
+            try:
+                matrix.put(i, j, ALL_15_BRIDGE_FUNCTIONS_V5[j](row))
+            except Exception as e:
+                matrix.put_error(i, j, str(e))
+    return matrix
+
+
+def _positions_matrix(rows: List[Any], digits: Optional[List[Optional[str]]] = None) -> np.ndarray:
+    """
+    Ma trận 214 vị trí V17 (107 gốc + 107 bóng), -1 thay cho None.
+    Hàng đúng chuẩn đọc thẳng chuỗi 107 chữ số (standard_row_digits), hàng
+    khác gọi getAllPositions_V16. Phần bóng tra bảng BONG_DUONG_V30 vector
+    hóa thay vì gọi getAllPositions_V17_Shadow từng hàng.
+    digits: kết quả standard_row_digits(row) của từng hàng nếu đã có sẵn.
+    """
+    if digits is None:
+        digits = [standard_row_digits(row) for row in rows]
+    goc = np.full((len(rows), 107), -1, dtype=np.int8)
+    fast = [i for i, d in enumerate(digits) if d is not None]
+    if fast:
+        text = "".join(digits[i] for i in fast).encode("ascii")
+        goc[fast] = (np.frombuffer(text, dtype=np.uint8).reshape(len(fast), 107) - 48).astype(np.int8)
+    for i, row in enumerate(rows):
+        if digits[i] is None and row:
+            goc[i] = [-1 if digit is None else digit for digit in getAllPositions_V16(row)]
+    bong = np.where(goc >= 0, _BONG[np.maximum(goc, 0)], -1).astype(np.int8)
+    return np.concatenate([goc, bong], axis=1)
+
+
+def _lotos_matrix(rows: List[Any]) -> Tuple[List[List[str]], np.ndarray]:
+    """27 con lô theo vị trí (chuỗi gốc + mã 0..99, -1 nếu không chuẩn)."""
+    lotos = [get_27_loto_positions(row) if row else [] for row in rows]
+    width = max((len(x) for x in lotos), default=0)
+    codes = np.full((len(rows), width), -1, dtype=np.int16)
+    for i, row_lotos in enumerate(lotos):
+        for k, value in enumerate(row_lotos):
+            codes[i, k] = _loto_code(value)
+    return lotos, codes
+
+
+def _stl_from_digits(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """taoSTL_V30_Bong vector hóa: (a, b) -> mã cặp STL; -1 nếu thiếu chữ số."""
+    a16, b16 = a.astype(np.int16), b.astype(np.int16)
+    lo1 = a16 * 10 + b16
+    lo2 = np.where(a16 == b16, _BONG[np.clip(a16, 0, 9)] * 11, b16 * 10 + a16)
+    return np.where((a16 >= 0) & (b16 >= 0), lo1 * 100 + lo2, -1).astype(np.int16)
+
+
+def _stl_from_btl(btl: np.ndarray) -> np.ndarray:
+    """calculate_bridge_stl vector hóa từ lô bạch thủ 0..99 -> mã cặp [lô, lộn]."""
+    tens, units = btl // 10, btl % 10
+    lo2 = np.where(tens == units, _BONG[tens] * 11, units * 10 + tens)
+    return (btl * 100 + lo2).astype(np.int16)
+
+
+def _memory_column(matrix: StlMatrix, j: int, loto_strings: List[List[str]], loto_codes: np.ndarray,
+                   p1: int, p2: int, algorithm: str):
+    """Ghi cột j: cầu Bạc Nhớ (tổng/hiệu hai vị trí lô p1, p2)."""
+    l1, l2 = loto_codes[:, p1], loto_codes[:, p2]
+    btl = (l1 + l2) % 100 if algorithm == "sum" else np.abs(l1 - l2)
+    matrix.codes[:, j] = _stl_from_btl(btl)
+    matrix.flags[:, j] = PRED_OK
+    # Lô không chuẩn: tính lại bằng hàm gốc để giữ đúng kết quả
+    for i in np.flatnonzero((l1 < 0) | (l2 < 0)):
+        if len(loto_strings[i]) > max(p1, p2):
+            matrix.put(int(i), j, calculate_bridge_stl(loto_strings[i][p1], loto_strings[i][p2], algorithm))
+        else:
+            matrix.put(int(i), j, [])
+
+
+def memory_stl_matrix(algorithms: List[Tuple[int, int, str]], rows: List[Any]) -> StlMatrix:
+    """STL của các cầu Bạc Nhớ ngầm [(vị trí 1, vị trí 2, "sum"/"diff")] cho từng hàng."""
+    matrix = _empty_matrix(len(rows), len(algorithms))
+    if not rows:
+        return matrix
+    loto_strings, loto_codes = _lotos_matrix(rows)
+    for j, (p1, p2, algorithm) in enumerate(algorithms):
+        _memory_column(matrix, j, loto_strings, loto_codes, p1, p2, algorithm)
+    return matrix
+
+
+def _resolve_managed(bridge, names: List[str], n_positions: int):
+    """
+    Phân loại cách tính STL của một cầu đã lưu (cùng thứ tự ưu tiên với
+    _managed_bridge_stl): ("fixed", idx) / ("mem", p1, p2, alg) / ("v17", i1, i2)
+    / ("none",) / ("error", message).
+    """
+    bridge_name = bridge.get("name", "")
+    idx1, idx2 = bridge.get("pos1_idx"), bridge.get("pos2_idx")
+
+    if "LO_STL_FIXED" in bridge_name:
+        num_part = bridge_name.split("_")[-1]
+        if num_part.isdigit() and 0 <= int(num_part) - 1 < len(ALL_15_BRIDGE_FUNCTIONS_V5):
+            return ("fixed", int(num_part) - 1)
+        return ("none",)
+
+    if idx1 == -1 and idx2 == -1:
+        for marker, algorithm in (("LO_MEM_SUM", "sum"), ("LO_MEM_DIFF", "diff")):
+            if marker in bridge_name:
+                parts = bridge_name.split("_")
+                if len(parts) >= 2 and parts[-2] in names and parts[-1] in names:
+                    return ("mem", names.index(parts[-2]), names.index(parts[-1]), algorithm)
+                break
+        for pattern, algorithm, marker in ((r'Tổng\((\d+)\+(\d+)\)', "sum", "Tổng("),
+                                           (r'Hiệu\((\d+)-(\d+)\)', "diff", "Hiệu(")):
+            if marker in bridge_name:
+                m = re.search(pattern, bridge_name)
+                if not m:
+                    return ("none",)
+                p1, p2 = int(m.group(1)), int(m.group(2))
+                if p1 >= len(names) or p2 >= len(names):
+                    return ("error", "list index out of range")
+                return ("mem", p1, p2, algorithm)
+        return ("none",)
+
+    if idx1 is not None and idx2 is not None:
+        if not isinstance(idx1, (int, np.integer)) or not isinstance(idx2, (int, np.integer)):
+            return ("error", "list indices must be integers")
+        if not (-n_positions <= idx1 < n_positions and -n_positions <= idx2 < n_positions):
+            return ("error", "list index out of range")
+        return ("v17", int(idx1) % n_positions, int(idx2) % n_positions)
+
+    return ("none",)
+
+
+def managed_stl_matrix(bridges: List[dict], rows: List[Any], classic: Optional[StlMatrix] = None) -> StlMatrix:
+    """
+    STL của các Cầu Lô đã lưu cho từng hàng nguồn.
+    V17 và Bạc Nhớ được tính vector hóa theo cột; LO_STL_FIXED dùng lại
+    ma trận 15 cầu cổ điển.
+    """
+    n_rows = len(rows)
+    matrix = _empty_matrix(n_rows, len(bridges))
+    if n_rows == 0 or not bridges:
+        return matrix
+
+    positions = _positions_matrix(rows)
+    loto_strings, loto_codes = _lotos_matrix(rows)
+    names = list(get_27_loto_names())
+    plans = [_resolve_managed(b, names, positions.shape[1]) for b in bridges]
+
+    if classic is None and any(plan[0] == "fixed" for plan in plans):
+        classic = classic_stl_matrix(rows, positions=positions)
+
+    for j, plan in enumerate(plans):
+        kind = plan[0]
+        if kind == "v17":
+            col = _stl_from_digits(positions[:, plan[1]], positions[:, plan[2]])
+            matrix.codes[:, j] = col
+            matrix.flags[:, j] = np.where(col >= 0, PRED_OK, PRED_NONE)
+        elif kind == "mem":
+            _memory_column(matrix, j, loto_strings, loto_codes, *plan[1:])
+        elif kind == "fixed":
+            src = plan[1]
+            matrix.codes[:, j] = classic.codes[:, src]
+            matrix.flags[:, j] = np.where(classic.flags[:, src] == PRED_OK, PRED_OK, PRED_NONE)
+            for (i, col), extra in classic.extras.items():
+                if col == src:
+                    matrix.extras[(i, j)] = extra
+        elif kind == "error":
+            matrix.flags[:, j] = PRED_ERROR
+        # "none": giữ PRED_NONE
+    return matrix
+
+
+# =============================================================================
+# LOTO THEO NGÀY
+# =============================================================================
+
+def loto_presence(rows: List[Any]) -> np.ndarray:
+    """Ma trận bool [số hàng, 100]: con lô nào về trong từng hàng."""
+    hits = np.zeros((len(rows), 100), dtype=bool)
+    for i, row in enumerate(rows):
+        if row is None:
+            continue
+        for loto in getAllLoto_V30(row):
+            hits[i, int(loto)] = True
+    return hits
+
+
+# =============================================================================
+# ENGINE K2N
+# =============================================================================
+
+@dataclass
+class K2NRun:
+    """Kết quả engine: ma trận ô + mảng trạng thái cuối cùng của từng cầu."""
+    outcomes: np.ndarray
+    stl_codes: np.ndarray
+    stl_extra: Dict[Tuple[int, int], str]
+    row_abort: Dict[int, Tuple[int, int]]
+    win_counts: np.ndarray
+    current_streak: np.ndarray
+    max_lose_streak: np.ndarray
+    in_frame: np.ndarray
+    pending_codes: np.ndarray
+    pending_src: np.ndarray
+
+
+def stl_hits(lo1: np.ndarray, lo2: np.ndarray, day_hits: np.ndarray) -> np.ndarray:
+    """Cầu nào trúng trong ngày: một trong hai con lô (mã 0..99) có về."""
+    return ((lo1 >= 0) & day_hits[np.maximum(lo1, 0)]) | ((lo2 >= 0) & day_hits[np.maximum(lo2, 0)])
+
+
+class K2NState:
+    """
+    Trạng thái K2N của tất cả cầu, tiến từng ngày một bằng step().
+
+    run_k2n dùng lớp này cho cả một đoạn lịch sử; mô phỏng walk-forward
+    (logic/analytics/walk_forward.py) giữ một K2NState và gọi step() mỗi
+    ngày mới thay vì chạy lại backtest từ đầu.
+    """
+
+    __slots__ = (
+        "matrix", "abort_row_on_error", "in_frame", "pending_codes", "pending_lo1", "pending_lo2",
+        "pending_src", "win_counts", "current_streak", "lose_streak", "max_lose_streak",
+        "_cols", "_extras_by_src",
+    )
+
+    def __init__(self, matrix: StlMatrix, abort_row_on_error: bool = False):
+        n = matrix.codes.shape[1]
+        self.matrix = matrix
+        self.abort_row_on_error = abort_row_on_error
+        self.in_frame = np.zeros(n, dtype=bool)
+        self.pending_codes = np.full(n, -1, dtype=np.int16)
+        self.pending_lo1 = np.full(n, -1, dtype=np.int16)
+        self.pending_lo2 = np.full(n, -1, dtype=np.int16)
+        self.pending_src = np.full(n, -1, dtype=np.int64)
+        self.win_counts = np.zeros(n, dtype=np.int32)
+        self.current_streak = np.zeros(n, dtype=np.int32)
+        self.lose_streak = np.zeros(n, dtype=np.int32)
+        self.max_lose_streak = np.zeros(n, dtype=np.int32)
+        self._cols = np.arange(n)
+        self._extras_by_src = {}
+        for (i, j), extra in matrix.extras.items():
+            self._extras_by_src.setdefault(i, []).append((j, extra))
+
+    def step(self, src: int, day_hits: np.ndarray):
+        """
+        Kiểm tra một ngày hợp lệ với dự đoán từ hàng nguồn src.
+
+        Trả về (outcomes, stl_codes, stl_extra, abort): hàng mã kết quả và
+        mã STL của ngày, STL không chuẩn {j: text} và (src, cầu lỗi đầu tiên)
+        nếu hàng bị dừng (abort_row_on_error), ngược lại None.
+        """
+        matrix = self.matrix
+        codes = matrix.codes[src]
+        flags = matrix.flags[src]
+        in_frame = self.in_frame
+        extras_here = self._extras_by_src.get(src, ())
+
+        new_lo1 = np.where(codes >= 0, codes // 100, -1)
+        new_lo2 = np.where(codes >= 0, codes % 100, -1)
+        for j, (_, lo1, lo2) in extras_here:
+            new_lo1[j], new_lo2[j] = lo1, lo2
+
+        fresh = ~in_frame
+        active, abort = None, None
+        if self.abort_row_on_error:
+            failing = np.flatnonzero(fresh & (flags == PRED_ERROR))
+            if failing.size:
+                limit = int(failing[0])
+                abort = (src, limit)
+                active = self._cols < limit
+
+        hit = stl_hits(np.where(in_frame, self.pending_lo1, new_lo1),
+                       np.where(in_frame, self.pending_lo2, new_lo2), day_hits)
+
+        checking_n2 = in_frame if active is None else in_frame & active
+        fresh_ok = fresh & (flags == PRED_OK)
+        if active is not None:
+            fresh_ok &= active
+            fresh &= active
+
+        win = hit & (checking_n2 | fresh_ok)
+        loss = checking_n2 & ~hit
+        opened = fresh_ok & ~hit
+
+        row = np.zeros(len(codes), dtype=np.int8)
+        row[checking_n2 & hit] = OUTCOME_HIT_N2
+        row[loss] = OUTCOME_MISS_K2N
+        row[fresh_ok & hit] = OUTCOME_HIT_N1
+        row[opened] = OUTCOME_OPEN_N2
+        row[fresh & (flags == PRED_NONE)] = OUTCOME_NO_PRED
+        row[fresh & (flags == PRED_ERROR)] = OUTCOME_ERROR
+
+        stl_row = np.where(checking_n2, self.pending_codes, np.where(fresh_ok, codes, -1)).astype(np.int16)
+        stl_extra = {}
+        for j, extra in extras_here:
+            if fresh_ok[j]:
+                stl_extra[j] = extra[0]
+        for j in np.flatnonzero(checking_n2 & (self.pending_codes < 0)):
+            extra = matrix.extras.get((int(self.pending_src[j]), int(j)))
+            if extra:
+                stl_extra[int(j)] = extra[0]
+
+        self.win_counts += win
+        self.current_streak = np.where(win, self.current_streak + 1,
+                                       np.where(loss, 0, self.current_streak)).astype(np.int32)
+        self.lose_streak = np.where(win, 0, np.where(loss, self.lose_streak + 1, self.lose_streak))
+        np.maximum(self.max_lose_streak, self.lose_streak, out=self.max_lose_streak)
+
+        self.in_frame = (in_frame & ~checking_n2) | opened
+        self.pending_codes = np.where(opened, codes, np.where(checking_n2, -1, self.pending_codes)).astype(np.int16)
+        self.pending_lo1 = np.where(opened, new_lo1, self.pending_lo1)
+        self.pending_lo2 = np.where(opened, new_lo2, self.pending_lo2)
+        self.pending_src = np.where(opened, src, self.pending_src)
+        return row, stl_row, stl_extra, abort
+
+    def prediction(self, last: int):
+        """Dự đoán kỳ tới từ hàng cuối `last` (xem pending_prediction)."""
+        return pending_prediction(self.matrix, self.in_frame, self.pending_codes, self.pending_src, last)
+
+
+def pending_prediction(matrix: StlMatrix, in_frame: np.ndarray, pending_codes: np.ndarray,
+                       pending_src: np.ndarray, last: int):
+    """
+    Dự đoán kỳ tới: cầu đang trong khung giữ STL chờ N2, các cầu còn lại
+    lấy STL từ hàng cuối `last`. Trả về (states, codes, extra) theo định
+    dạng BacktestResult.set_prediction_codes.
+    """
+    states = np.where(in_frame, PENDING_N2, np.where(matrix.flags[last] == PRED_OK, PENDING_N1, PENDING_ERROR))
+    codes = np.where(in_frame, pending_codes, matrix.codes[last])
+    extra = {}
+    for j in np.flatnonzero(codes < 0):
+        src = int(pending_src[j]) if in_frame[j] else last
+        if (src, int(j)) in matrix.extras:
+            extra[int(j)] = matrix.extras[(src, int(j))][0]
+    return states, codes, extra
+
+
+def run_k2n(matrix: StlMatrix, src_index: np.ndarray, loto_hits: np.ndarray, valid: np.ndarray,
+            abort_row_on_error: bool = False) -> K2NRun:
+    """
+    Chạy máy trạng thái K2N cho tất cả cầu cùng lúc.
+
+    Args:
+        matrix: ma trận STL theo hàng nguồn.
+        src_index: hàng nguồn (hàng hôm trước) của từng ngày kiểm tra.
+        loto_hits: ma trận bool [ngày, 100] các con lô về trong ngày kiểm tra.
+        valid: ngày hợp lệ (ngày lỗi dữ liệu không làm đổi trạng thái).
+        abort_row_on_error: True (15 cầu cổ điển) - ngoại lệ ở cầu j dừng cả
+            hàng, các cầu sau j giữ nguyên trạng thái; False - chỉ đánh dấu ô lỗi.
+    """
+    n_days = len(src_index)
+    n = matrix.codes.shape[1]
+
+    outcomes = np.zeros((n_days, n), dtype=np.int8)
+    stl_codes = np.full((n_days, n), -1, dtype=np.int16)
+    stl_extra = {}
+    row_abort = {}
+
+    state = K2NState(matrix, abort_row_on_error)
+    for d in range(n_days):
+        if not valid[d]:
+            continue
+        outcomes[d], stl_codes[d], extra, abort = state.step(int(src_index[d]), loto_hits[d])
+        for j, text in extra.items():
+            stl_extra[(d, j)] = text
+        if abort is not None:
+            row_abort[d] = abort
+
+    return K2NRun(
+        outcomes=outcomes,
+        stl_codes=stl_codes,
+        stl_extra=stl_extra,
+        row_abort=row_abort,
+        win_counts=state.win_counts,
+        current_streak=state.current_streak,
+        max_lose_streak=state.max_lose_streak,
+        in_frame=state.in_frame,
+        pending_codes=state.pending_codes,
+        pending_src=state.pending_src,
+    )
@@ -0,0 +1,373 @@
+"""
+result.py - Kết quả backtest dạng số (BacktestResult)
+
+Các hàm backtest K1N/K2N ghi kết quả từng ô vào ma trận int8 thay vì dựng
+bảng chuỗi emoji. Bảng chuỗi (cho ResultsViewer) chỉ được tạo khi gọi
+BacktestResult.to_table(); các luồng chạy nền (cập nhật tỷ lệ, cache K2N,
+dashboard) đọc trực tiếp các mảng tổng hợp.
+"""
+
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# =============================================================================
+# MÃ KẾT QUẢ (int8)
+# =============================================================================
+
+# Mã từng ô trong ma trận outcomes
+OUTCOME_NONE = 0        # Ô trống (hàng lỗi dữ liệu)
+OUTCOME_HIT_N1 = 1      # ✅ Ăn N1
+OUTCOME_HIT_N2 = 2      # ✅ Ăn N2 (khung K2N)
+OUTCOME_MISS_N1 = 3     # ❌ Trượt N1 (K1N)
+OUTCOME_OPEN_N2 = 4     # Trượt N1, mở khung chờ N2 (K2N)
+OUTCOME_MISS_K2N = 5    # ❌ Trượt cả khung K2N
+OUTCOME_NO_PRED = 6     # Không tính được STL ("Lỗi CT" / "Err")
+OUTCOME_ERROR = -1      # Ngoại lệ khi tính ô (thông điệp lưu trong cell_errors)
+
+# Trạng thái từng hàng (kỳ)
+ROW_OK = 0
+ROW_DATA_ERROR = 1      # Hàng thiếu dữ liệu, không tính vào tổng số kỳ
+ROW_EXCEPTION = 2       # Ngoại lệ giữa chừng (thông điệp lưu trong row_errors)
+
+# Trạng thái dự đoán kỳ tới
+PENDING_ERROR = 0
+PENDING_N1 = 1          # Khung mới N1
+PENDING_N2 = 2          # Đang chờ N2
+
+# Loại backtest (quyết định nhãn khi định dạng bảng)
+KIND_CLASSIC_K2N = "CLASSIC_K2N"
+KIND_MANAGED_K1N = "MANAGED_K1N"
+KIND_MANAGED_K2N = "MANAGED_K2N"
+
+HIT_OUTCOMES = (OUTCOME_HIT_N1, OUTCOME_HIT_N2)
+RECENT_WINDOW = 10
+
+
+def encode_stl(pred) -> int:
+    """Mã hóa cặp STL ["12", "21"] thành số 1221; trả -1 nếu không đúng dạng."""
+    try:
+        a, b = pred
+        if len(a) == 2 and len(b) == 2 and a.isdigit() and b.isdigit():
+            return int(a) * 100 + int(b)
+    except (TypeError, ValueError, AttributeError):
+        pass
+    return -1
+
+
+def decode_stl(code: int) -> str:
+    """Giải mã số STL về chuỗi "12,21"."""
+    return f"{code // 100:02d},{code % 100:02d}"
+
+
+# =============================================================================
+# BACKTEST RESULT
+# =============================================================================
+
+@dataclass(**_SLOTS)
+class BacktestResult:
+    """
+    Kết quả một lần chạy backtest (ma trận kỳ x cầu).
+
+    Các hàng của outcomes/stl_codes theo thứ tự thời gian (cũ -> mới).
+    Mảng tổng hợp (win_counts, current_streak, max_lose_streak) được tính
+    ngay trong vòng lặp backtest, không cần phân tích lại chuỗi.
+    """
+    kind: str
+    headers: List[str]
+    bridge_names: List[str]
+    periods: List[Any]
+    row_status: np.ndarray
+    outcomes: np.ndarray
+    stl_codes: np.ndarray
+    win_counts: np.ndarray
+    current_streak: np.ndarray
+    max_lose_streak: np.ndarray
+    total_days: int = 0
+    row_errors: Dict[int, str] = field(default_factory=dict)
+    cell_errors: Dict[Tuple[int, int], str] = field(default_factory=dict)
+    stl_extra: Dict[Tuple[int, int], str] = field(default_factory=dict)
+    next_label: Optional[str] = None
+    pending_state: Optional[np.ndarray] = None
+    pending_codes: Optional[np.ndarray] = None
+    pending_extra: Dict[int, str] = field(default_factory=dict)
+    prediction_error: Optional[str] = None
+
+    @property
+    def num_bridges(self) -> int:
+        return len(self.bridge_names)
+
+    @property
+    def hit_mask(self) -> np.ndarray:
+        """Ma trận bool: ô trúng (N1 hoặc N2) trên các hàng hợp lệ."""
+        valid = (self.row_status == ROW_OK)[:, None]
+        return np.isin(self.outcomes, HIT_OUTCOMES) & valid
+
+    @property
+    def win_rates(self) -> np.ndarray:
+        """Tỷ lệ trúng (%) của từng cầu."""
+        if self.total_days <= 0:
+            return np.zeros(self.num_bridges, dtype=np.float64)
+        return self.win_counts / self.total_days * 100
+
+    def recent_wins(self, window: int = RECENT_WINDOW) -> np.ndarray:
+        """Số kỳ trúng trong `window` kỳ gần nhất (kể cả kỳ lỗi dữ liệu)."""
+        if window <= 0 or len(self.periods) == 0:
+            return np.zeros(self.num_bridges, dtype=np.int32)
+        return self.hit_mask[-window:].sum(axis=0).astype(np.int32)
+
+    def rate_text(self, j: int) -> str:
+        if self.total_days <= 0:
+            return "0.00%"
+        return f"{(int(self.win_counts[j]) / self.total_days) * 100:.2f}%"
+
+    # -------------------------------------------------------------------------
+    # Dự đoán kỳ tới
+    # -------------------------------------------------------------------------
+
+    def _stl_text(self, r: int, j: int) -> str:
+        code = int(self.stl_codes[r, j])
+        return decode_stl(code) if code >= 0 else self.stl_extra.get((r, j), "")
+
+    def pending_stl(self, j: int) -> str:
+        """Chuỗi STL dự đoán kỳ tới của cầu j ("" nếu lỗi)."""
+        if self.pending_state is None or self.pending_state[j] == PENDING_ERROR:
+            return ""
+        code = int(self.pending_codes[j])
+        return decode_stl(code) if code >= 0 else self.pending_extra.get(j, "")
+
+    def _pending_cell(self, j: int) -> str:
+        state = int(self.pending_state[j])
+        if state == PENDING_ERROR:
+            return "LỖI PREDICT" if self.kind == KIND_CLASSIC_K2N else "Lỗi"
+        stl = self.pending_stl(j)
+        if self.kind == KIND_MANAGED_K1N:
+            return stl
+        return f"{stl} (Đang chờ N2)" if state == PENDING_N2 else f"{stl} (Khung mới N1)"
+
+    def to_k2n_cache(self) -> Tuple[List[tuple], Dict[str, dict]]:
+        """
+        Tạo (cache_data_list, pending_k2n_dict) giống parse_k2n_results
+        nhưng đọc trực tiếp từ mảng, không phân tích chuỗi.
+        """
+        cache_data_list = []
+        pending_k2n_dict = {}
+        recent = self.recent_wins()
+        has_prediction = self.pending_state is not None and self.prediction_error is None
+        for j, bridge_name in enumerate(self.bridge_names):
+            streak = int(self.current_streak[j])
+            max_lose = int(self.max_lose_streak[j])
+            if has_prediction:
+                state = int(self.pending_state[j])
+                clean_stl = self._pending_cell(j).split("(")[0].strip()
+            else:
+                state, clean_stl = PENDING_ERROR, ""
+            cache_data_list.append((self.rate_text(j), streak, clean_stl, max_lose, int(recent[j]), bridge_name))
+            if clean_stl:
+                pending_k2n_dict[bridge_name] = {
+                    "stl": clean_stl,
+                    "streak": streak,
+                    "max_lose": max_lose,
+                    "is_n2": state == PENDING_N2,
+                }
+        return cache_data_list, pending_k2n_dict
+
+    def set_prediction(self, next_label: str, states, preds):
+        """Gắn dự đoán kỳ tới: states (PENDING_*) và preds (list STL hoặc None)."""
+        codes, extra = [], {}
+        for j, (state, pred) in enumerate(zip(states, preds)):
+            code = -1 if pred is None or state == PENDING_ERROR else encode_stl(pred)
+            if code < 0 and pred is not None and state != PENDING_ERROR:
+                extra[j] = ",".join(pred)
+            codes.append(code)
+        self.set_prediction_codes(next_label, states, codes, extra)
+
+    def set_prediction_codes(self, next_label: str, states, codes, extra: Optional[Dict[int, str]] = None):
+        """Gắn dự đoán kỳ tới dạng mã: states (PENDING_*), codes (mã STL) và extra (STL không chuẩn)."""
+        n = self.num_bridges
+        self.next_label = next_label
+        self.pending_state = np.asarray(states, dtype=np.int8).reshape(n)
+        self.pending_codes = np.asarray(codes, dtype=np.int16).reshape(n)
+        self.pending_extra = dict(extra or {})
+
+    # -------------------------------------------------------------------------
+    # Định dạng bảng chuỗi (chỉ dùng khi mở ResultsViewer)
+    # -------------------------------------------------------------------------
+
+    def _cell_text(self, r: int, j: int) -> str:
+        outcome = int(self.outcomes[r, j])
+        if outcome == OUTCOME_ERROR:
+            return self.cell_errors.get((r, j), "Err")
+        if outcome == OUTCOME_NO_PRED:
+            return "Lỗi CT" if self.kind == KIND_MANAGED_K1N else "Err"
+        if outcome == OUTCOME_NONE:
+            return ""
+        stl = self._stl_text(r, j)
+        if outcome == OUTCOME_HIT_N1:
+            return f"{stl} ✅ (Ăn N1)"
+        if outcome == OUTCOME_HIT_N2:
+            return f"{stl} ✅ (Ăn N2)"
+        if outcome == OUTCOME_MISS_N1:
+            return f"{stl} ❌ (Trượt N1)"
+        if outcome == OUTCOME_OPEN_N2:
+            return f"{stl} (Trượt N1...)"
+        return f"{stl} ❌ (Trượt K2N)"
+
+    def _history_rows(self) -> List[list]:
+        classic = self.kind == KIND_CLASSIC_K2N
+        n = self.num_bridges
+        hits_per_row = np.isin(self.outcomes, HIT_OUTCOMES).sum(axis=1)
+        rows = []
+        for r, ky in enumerate(self.periods):
+            status = int(self.row_status[r])
+            if status == ROW_DATA_ERROR:
+                rows.append([ky, "Lỗi dữ liệu hàng" if classic else "Lỗi dữ liệu"] + [""] * n)
+            elif status == ROW_EXCEPTION:
+                rows.append([ky, self.row_errors.get(r, "Lỗi")] + [""] * n)
+            else:
+                row = [ky] + [self._cell_text(r, j) for j in range(n)]
+                if classic:
+                    row.append(int(hits_per_row[r]))
+                rows.append(row)
+        rows.reverse()
+        return rows
+
+    def to_table(self, history: bool = True) -> List[list]:
+        """Dựng bảng chuỗi theo đúng định dạng cũ của ResultsViewer."""
+        classic = self.kind == KIND_CLASSIC_K2N
+        n = self.num_bridges
+        results = [list(self.headers)]
+
+        rate_row = ["Tỷ Lệ %"] + [self.rate_text(j) for j in range(n)]
+        if classic:
+            if self.total_days > 0:
+                rate_row.append(f"TB: {(int(self.win_counts.sum()) / self.total_days):.2f}")
+            else:
+                rate_row.append("TB: 0.00")
+        results.append(rate_row)
+
+        if self.kind == KIND_MANAGED_K1N:
+            results.append(["Chuỗi Thắng Max"] + [f"{int(s)}" for s in self.current_streak])
+        else:
+            streak_row = ["Chuỗi Thắng / Thua Max"] + [
+                f"{int(c)} thắng / {int(m)} thua"
+                for c, m in zip(self.current_streak, self.max_lose_streak)
+            ]
+            if classic:
+                streak_row.append("---")
+            results.append(streak_row)
+
+        recent_row = ["Phong Độ 10 Kỳ"] + [f"{int(w)}/10" for w in self.recent_wins()]
+        if classic:
+            recent_row.append("---")
+        results.append(recent_row)
+
+        if self.prediction_error is not None or self.pending_state is None:
+            if classic:
+                results.append(["LỖI DỰ ĐOÁN", self.prediction_error or "Không có dữ liệu hàng cuối."])
+                return results
+            results.append(["Lỗi Prediction"])
+        else:
+            final_row = [self.next_label] + [self._pending_cell(j) for j in range(n)]
+            if classic:
+                open_frames = int((self.pending_state == PENDING_N2).sum())
+                final_row.append(f"{open_frames} khung mở" if open_frames > 0 else "0")
+            results.append(final_row)
+
+        if history:
+            results.extend(self._history_rows())
+        return results
+
+
+# =============================================================================
+# BUILDER
+# =============================================================================
+
+class BacktestResultBuilder:
+    """Ghi kết quả từng kỳ/từng cầu vào mảng cấp phát sẵn trong vòng lặp backtest."""
+
+    __slots__ = ("kind", "headers", "bridge_names", "periods", "row_status", "outcomes", "stl_codes",
+                 "row_errors", "cell_errors", "stl_extra", "win_counts", "current_streak",
+                 "current_lose_streak", "max_lose_streak", "total_days")
+
+    def __init__(self, kind: str, headers: List[str], bridge_names: List[str], max_rows: int):
+        n = len(bridge_names)
+        max_rows = max(int(max_rows), 0)
+        self.kind = kind
+        self.headers = headers
+        self.bridge_names = bridge_names
+        self.periods = []
+        self.row_status = np.zeros(max_rows, dtype=np.int8)
+        self.outcomes = np.zeros((max_rows, n), dtype=np.int8)
+        self.stl_codes = np.full((max_rows, n), -1, dtype=np.int16)
+        self.row_errors = {}
+        self.cell_errors = {}
+        self.stl_extra = {}
+        self.win_counts = np.zeros(n, dtype=np.int32)
+        self.current_streak = np.zeros(n, dtype=np.int32)
+        self.current_lose_streak = np.zeros(n, dtype=np.int32)
+        self.max_lose_streak = np.zeros(n, dtype=np.int32)
+        self.total_days = 0
+
+    def add_row(self, ky, status: int = ROW_OK) -> int:
+        r = len(self.periods)
+        if r >= len(self.row_status):
+            grow = max(r, 16)
+            self.row_status = np.concatenate([self.row_status, np.zeros(grow, dtype=np.int8)])
+            self.outcomes = np.vstack([self.outcomes, np.zeros((grow, self.outcomes.shape[1]), dtype=np.int8)])
+            self.stl_codes = np.vstack([self.stl_codes, np.full((grow, self.stl_codes.shape[1]), -1, dtype=np.int16)])
+        self.periods.append(ky)
+        self.row_status[r] = status
+        if status == ROW_OK:
+            self.total_days += 1
+        return r
+
+    def fail_row(self, r: int, message: str):
+        self.row_status[r] = ROW_EXCEPTION
+        self.row_errors[r] = message
+
+    def set_cell(self, r: int, j: int, outcome: int, pred=None):
+        self.outcomes[r, j] = outcome
+        if pred is not None:
+            code = encode_stl(pred)
+            self.stl_codes[r, j] = code
+            if code < 0:
+                self.stl_extra[(r, j)] = ",".join(pred)
+
+    def set_error(self, r: int, j: int, message: str):
+        self.outcomes[r, j] = OUTCOME_ERROR
+        self.cell_errors[(r, j)] = message
+
+    def record_win(self, j: int):
+        self.win_counts[j] += 1
+        self.current_streak[j] += 1
+        self.current_lose_streak[j] = 0
+
+    def record_loss(self, j: int):
+        self.current_streak[j] = 0
+        self.current_lose_streak[j] += 1
+        if self.current_lose_streak[j] > self.max_lose_streak[j]:
+            self.max_lose_streak[j] = self.current_lose_streak[j]
+
+    def build(self) -> BacktestResult:
+        n_rows = len(self.periods)
+        return BacktestResult(
+            kind=self.kind,
+            headers=self.headers,
+            bridge_names=self.bridge_names,
+            periods=self.periods,
+            row_status=self.row_status[:n_rows].copy(),
+            outcomes=self.outcomes[:n_rows].copy(),
+            stl_codes=self.stl_codes[:n_rows].copy(),
+            win_counts=self.win_counts,
+            current_streak=self.current_streak,
+            max_lose_streak=self.max_lose_streak,
+            total_days=self.total_days,
+            row_errors=self.row_errors,
+            cell_errors=self.cell_errors,
+            stl_extra=self.stl_extra,
+        )
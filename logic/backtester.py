@@ -120,8 +120,7 @@ try:
 except ImportError:
     de_manager = None
 
-# Import refactored modules (parse_k2n_results moved to backtester_core)
-from .backtester_core import parse_k2n_results as _parse_k2n_results
+from .backtest.result import BacktestResult
 
 from .backtester_aggregation import (
     tonghop_top_cau_n1 as TONGHOP_TOP_CAU_N1_V5,
@@ -152,47 +151,29 @@ def run_and_update_all_bridge_rates(all_data_ai, db_name=DB_NAME):
         ky_ket_thuc = len(all_data_ai) + (ky_bat_dau - 1)
 
         # Sử dụng K1N để tính toán chính xác (không có khung 2 ngày)
-        results_k1n = BACKTEST_MANAGED_BRIDGES_K1N(
-            all_data_ai, ky_bat_dau, ky_ket_thuc, db_name, history=False
+        # as_result=True: đọc thẳng mảng số, không dựng/phân tích bảng chuỗi
+        result_k1n = BACKTEST_MANAGED_BRIDGES_K1N(
+            all_data_ai, ky_bat_dau, ky_ket_thuc, db_name, history=False, as_result=True
         )
 
-        if not results_k1n or len(results_k1n) < 4 or "LỖI" in str(results_k1n[0][0]):
-            if not results_k1n:
+        if not isinstance(result_k1n, BacktestResult):
+            if not result_k1n:
                 return 0, "Backtest K1N không trả về kết quả."
-            if "Không có cầu nào" in str(results_k1n[0][1] if len(results_k1n) > 0 else ""):
+            if "Không có cầu nào" in str(result_k1n):
                 return 0, "Không có cầu nào được Bật để cập nhật."
-            return 0, f"Lỗi khi chạy Backtest K1N: {results_k1n[0] if results_k1n else 'Unknown'}"
+            if "Không có cầu Lô" in str(result_k1n):
+                return 0, "Không có cầu nào trong kết quả backtest."
+            return 0, f"Lỗi khi chạy Backtest K1N: {result_k1n[0]}"
 
-        headers = results_k1n[0]
-        rates = results_k1n[1] if len(results_k1n) > 1 else []
-        recent_form = results_k1n[3] if len(results_k1n) > 3 else []  # Hàng "Phong Độ 10 Kỳ"
+        if result_k1n.num_bridges == 0:
+            return 0, "Không có cầu nào trong kết quả backtest."
 
+        recent_wins = result_k1n.recent_wins()
         rate_data_list = []
         recent_win_data_list = []
-        num_bridges = len(headers) - 1
-
-        if num_bridges == 0:
-            return 0, "Không có cầu nào trong kết quả backtest."
-
-        for i in range(1, num_bridges + 1):
-            bridge_name = str(headers[i])
-            win_rate_text = str(rates[i]) if rates and i < len(rates) else "0.00%"
-            rate_data_list.append((win_rate_text, bridge_name))
-            
-            # Parse recent_win_count_10 từ hàng "Phong Độ 10 Kỳ"
-            if recent_form and i < len(recent_form):
-                recent_form_text = str(recent_form[i])
-                try:
-                    if "/" in recent_form_text:
-                        recent_win_count = int(recent_form_text.split("/")[0].strip())
-                    else:
-                        recent_win_count = int(recent_form_text.strip())
-                except (ValueError, IndexError):
-                    recent_win_count = 0
-            else:
-                recent_win_count = 0
-            
-            recent_win_data_list.append((recent_win_count, bridge_name))
+        for j, bridge_name in enumerate(result_k1n.bridge_names):
+            rate_data_list.append((result_k1n.rate_text(j), bridge_name))
+            recent_win_data_list.append((int(recent_wins[j]), bridge_name))
 
         if not rate_data_list:
             return 0, "Không trích xuất được dữ liệu tỷ lệ."
@@ -234,25 +215,25 @@ def run_and_update_all_bridge_K2N_cache(
         ky_bat_dau = 2
         ky_ket_thuc = len(all_data_ai) + (ky_bat_dau - 1)
 
-        # Backtest K2N cổ điển
-        results_k2n_classic = BACKTEST_15_CAU_K2N_V30_AI_V8(
-            all_data_ai, ky_bat_dau, ky_ket_thuc, history=False
+        # Backtest K2N cổ điển (kết quả dạng số, không qua bảng chuỗi)
+        result_classic = BACKTEST_15_CAU_K2N_V30_AI_V8(
+            all_data_ai, ky_bat_dau, ky_ket_thuc, history=False, as_result=True
         )
 
-        if not results_k2n_classic or len(results_k2n_classic) < 5:
+        if not isinstance(result_classic, BacktestResult):
             return {}, 0, "Backtest K2N cổ điển không trả về kết quả đầy đủ."
 
-        cache_classic, pending_classic = _parse_k2n_results(results_k2n_classic)
+        cache_classic, pending_classic = result_classic.to_k2n_cache()
 
         # Backtest K2N managed
-        results_k2n_managed = BACKTEST_MANAGED_BRIDGES_K2N(
-            all_data_ai, ky_bat_dau, ky_ket_thuc, db_name, history=False
+        result_managed = BACKTEST_MANAGED_BRIDGES_K2N(
+            all_data_ai, ky_bat_dau, ky_ket_thuc, db_name, history=False, as_result=True
         )
 
-        if not results_k2n_managed or len(results_k2n_managed) < 5:
+        if not isinstance(result_managed, BacktestResult):
             cache_managed, pending_managed = [], {}
         else:
-            cache_managed, pending_managed = _parse_k2n_results(results_k2n_managed)
+            cache_managed, pending_managed = result_managed.to_k2n_cache()
 
         all_cache_data = cache_classic + cache_managed
         all_pending = {**pending_classic, **pending_managed}
@@ -261,11 +242,20 @@ def run_and_update_all_bridge_K2N_cache(
         if de_manager:
             try:
                 # Update DE bridges (writes directly to DB)
-                count_de, _ = de_manager.update_daily_stats(all_data_ai)
+                count_de, _ = de_manager.update_daily_stats(all_data_ai, db_name)
                 print(f">>> [Backtester] Đã đồng bộ cập nhật {count_de} Cầu Đề.")
             except Exception as e:
                 print(f"Lỗi cập nhật Cầu Đề trong K2N Cache: {e}")
 
+        if write_to_db:
+            try:
+                # Nối kết quả Ăn/Gãy các kỳ mới vào BridgeOutcomes (popup / job đọc lại)
+                from .bridge_outcomes import sync_bridge_outcomes
+                n_bridges, n_rows = sync_bridge_outcomes(all_data_ai, db_name)
+                print(f">>> [Backtester] BridgeOutcomes: {n_rows} kết quả mới cho {n_bridges} cầu.")
+            except Exception as e:
+                print(f"Lỗi cập nhật BridgeOutcomes: {e}")
+
         if not all_cache_data:
             return {}, 0, "Không trích xuất được dữ liệu cache K2N."
 
@@ -282,13 +272,25 @@ def run_and_update_all_bridge_K2N_cache(
         return {}, 0, f"Lỗi nghiêm trọng trong run_and_update_all_bridge_K2N_cache: {e}"
 
 
-def run_backtest_lo_30_days(bridge_config, all_data):
+def _format_lo_result(actual_lotos):
+    """Lấy số loto xuất hiện (format ngắn gọn, tối đa 10 số)."""
+    if not actual_lotos:
+        return ""
+    sorted_lotos = sorted(list(actual_lotos))
+    if len(sorted_lotos) > 10:
+        return ",".join(sorted_lotos[:10]) + "..."
+    return ",".join(sorted_lotos)
+
+
+def run_backtest_lo_30_days(bridge_config, all_data, days=30, db_name=None):
     """
     Chạy backtest 30 ngày gần nhất cho một cầu cụ thể.
     
     Args:
         bridge_config: Dict chứa thông tin cầu từ DB (name, pos1_idx, pos2_idx, ...)
         all_data: Toàn bộ dữ liệu A:I (list các row)
+        days: Số hàng dữ liệu cuối dùng để backtest (mặc định 30)
+        db_name: Nếu có, kỳ nào đã lưu trong BridgeOutcomes thì đọc lại thay vì tính
     
     Returns:
         list: List các dict với format:
@@ -299,8 +301,8 @@ def run_backtest_lo_30_days(bridge_config, all_data):
     if not all_data or len(all_data) < 2:
         return []
     
-    # Lấy 30 ngày gần nhất (hoặc tất cả nếu ít hơn 30)
-    data_slice = all_data[-30:] if len(all_data) >= 30 else all_data
+    # Lấy `days` ngày gần nhất (hoặc tất cả nếu ít hơn)
+    data_slice = all_data[-days:] if len(all_data) >= days else all_data
     results = []
     
     bridge_name = bridge_config.get("name", "")
@@ -310,6 +312,15 @@ def run_backtest_lo_30_days(bridge_config, all_data):
     # Kiểm tra Memory Bridge (pos1_idx == -1 và pos2_idx == -1)
     is_memory_bridge = (pos1_idx == -1 and pos2_idx == -1)
     
+    # Kết quả đã lưu (BridgeOutcomes): {ky: (outcome, prediction)}
+    stored = {}
+    if db_name:
+        try:
+            from .bridge_outcomes import load_bridge_outcomes
+            stored = load_bridge_outcomes(db_name, bridge_config, [row[0] for row in data_slice[1:]])
+        except Exception:
+            stored = {}
+    
     for i in range(len(data_slice) - 1):
         prev_row = data_slice[i]
         actual_row = data_slice[i + 1]
@@ -318,6 +329,19 @@ def run_backtest_lo_30_days(bridge_config, all_data):
             # Lấy ngày từ actual_row (row[0] là kỳ)
             date_str = f"Kỳ {actual_row[0]}" if actual_row[0] else f"Ngày {i+1}"
             
+            saved = stored.get(actual_row[0])
+            if saved is not None:
+                actual_lotos = set(getAllLoto_V30(actual_row))
+                is_win = bool(saved[0])
+                results.append({
+                    'date': date_str,
+                    'pred': saved[1],
+                    'result': _format_lo_result(actual_lotos),
+                    'is_win': is_win,
+                    'status': "Ăn" if is_win else "Gãy"
+                })
+                continue
+            
             # Tính STL dự đoán
             pred_stl = None
             
@@ -372,20 +396,10 @@ def run_backtest_lo_30_days(bridge_config, all_data):
             is_win = "✅" in str(check_result) or "Ăn" in str(check_result)
             status = "Ăn" if is_win else "Gãy"
             
-            # Lấy số loto xuất hiện (format ngắn gọn)
-            if actual_lotos:
-                sorted_lotos = sorted(list(actual_lotos))
-                if len(sorted_lotos) > 10:
-                    result_str = ",".join(sorted_lotos[:10]) + "..."
-                else:
-                    result_str = ",".join(sorted_lotos)
-            else:
-                result_str = ""
-            
             results.append({
                 'date': date_str,
                 'pred': pred_str,
-                'result': result_str,
+                'result': _format_lo_result(actual_lotos),
                 'is_win': is_win,
                 'status': status
             })
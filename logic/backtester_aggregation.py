@@ -5,7 +5,10 @@ Extracted from backtester.py to improve maintainability.
 Contains: Functions for finding and aggregating top-performing bridges.
 """
 
+import numpy as np
+
 from .backtester_scoring import score_by_streak, score_by_rate
+from .backtest.result import BacktestResult
 
 try:
     from .bridges.bridges_classic import ALL_15_BRIDGE_FUNCTIONS_V5
@@ -21,7 +24,7 @@ def tonghop_top_cau_core(
     Core function for aggregating top bridges.
     
     Args:
-        fullBacktestN1Range: Full backtest results
+        fullBacktestN1Range: Full backtest results (bảng chuỗi hoặc BacktestResult)
         lastDataRowForPrediction: Last data row for prediction
         topN: Number of top bridges to return
         scoringFunction: Function to score bridges
@@ -30,7 +33,8 @@ def tonghop_top_cau_core(
         list: Formatted output with top bridge predictions
     """
     try:
-        if not fullBacktestN1Range or len(fullBacktestN1Range) < 2:
+        is_structured = isinstance(fullBacktestN1Range, BacktestResult)
+        if not is_structured and (not fullBacktestN1Range or len(fullBacktestN1Range) < 2):
             return [["LỖI: 'fullBacktestN1Range' không hợp lệ."]]
         if not lastDataRowForPrediction or len(lastDataRowForPrediction) < 10:
             return [["LỖI: 'lastDataRowForPrediction' không hợp lệ."]]
@@ -44,17 +48,24 @@ def tonghop_top_cau_core(
         except (ValueError, TypeError):
             nextKy = f"Kỳ {lastKy} (Next)"
 
-        headers = fullBacktestN1Range[0]
-        dataRows = [
-            row
-            for row in fullBacktestN1Range[1:]
-            if "Tỷ Lệ %" not in str(row[0])
-            and "HOÀN THÀNH" not in str(row[0])
-            and not str(row[0]).startswith("Kỳ")
-            and "(Dự đoán N1)" not in str(row)
-        ]
-
-        numDataRows = len(dataRows)
+        if is_structured:
+            # Kết quả dạng số: đọc thẳng ma trận trúng/trượt, không tìm "✅"
+            headers = fullBacktestN1Range.headers
+            hits = fullBacktestN1Range.hit_mask
+            hit_columns = {j + 1: hits[:, j] for j in range(hits.shape[1])}
+        else:
+            headers = fullBacktestN1Range[0]
+            dataRows = [
+                row
+                for row in fullBacktestN1Range[1:]
+                if "Tỷ Lệ %" not in str(row[0])
+                and "HOÀN THÀNH" not in str(row[0])
+                and not str(row[0]).startswith("Kỳ")
+                and "(Dự đoán N1)" not in str(row)
+            ]
+            hit_columns = None
+
+        numDataRows = hits.shape[0] if is_structured else len(dataRows)
         if numDataRows == 0:
             return [["LỖI: Không tìm thấy dữ liệu backtest hợp lệ."]]
 
@@ -75,16 +86,19 @@ def tonghop_top_cau_core(
             if i >= num_cau_functions:
                 break
             colIdx = bridge["colIndex"]
-            wins, currentStreak = 0, 0
-
-            for k in range(numDataRows):
-                if "✅" in str(dataRows[k][colIdx]):
-                    wins += 1
-            for k in range(numDataRows - 1, -1, -1):
-                if "✅" in str(dataRows[k][colIdx]):
-                    currentStreak += 1
-                else:
-                    break
+            if hit_columns is not None:
+                column = hit_columns[colIdx]
+                wins = int(column.sum())
+                misses = np.flatnonzero(~column)
+                currentStreak = numDataRows - 1 - int(misses[-1]) if misses.size else numDataRows
+            else:
+                column = ["✅" in str(row[colIdx]) for row in dataRows]
+                wins, currentStreak = sum(column), 0
+                for k in range(numDataRows - 1, -1, -1):
+                    if column[k]:
+                        currentStreak += 1
+                    else:
+                        break
 
             winRate = (wins / numDataRows) if numDataRows > 0 else 0
             score = scoringFunction(winRate, currentStreak)
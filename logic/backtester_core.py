@@ -89,10 +89,36 @@ except ImportError:
 
 # Import helper functions from common_utils (refactored)
 from .common_utils import validate_backtest_params as _validate_backtest_params
+from .instrumentation import perf_count, timed
 
 # Import re module for bridge name parsing
 import re
 
+import numpy as np
+
+from .backtest.k2n_engine import (
+    classic_stl_matrix,
+    loto_presence,
+    managed_stl_matrix,
+    pending_prediction,
+    run_k2n,
+)
+from .backtest.result import (
+    KIND_CLASSIC_K2N,
+    KIND_MANAGED_K1N,
+    KIND_MANAGED_K2N,
+    OUTCOME_HIT_N1,
+    OUTCOME_MISS_N1,
+    OUTCOME_NO_PRED,
+    PENDING_ERROR,
+    PENDING_N1,
+    ROW_DATA_ERROR,
+    ROW_EXCEPTION,
+    ROW_OK,
+    BacktestResult,
+    BacktestResultBuilder,
+)
+
 
 # =============================================================================
 # HELPER FUNCTIONS (Moved from backtester_helpers.py)
@@ -102,7 +128,11 @@ def parse_k2n_results(results_data):
     """
     Parse K2N backtest results (Dynamic Row Detection).
     [FIXED] Added robust mapping for LO_STL_FIXED bridges.
+    Nhận BacktestResult thì đọc thẳng từ mảng số (không phân tích chuỗi).
     """
+    if isinstance(results_data, BacktestResult):
+        return results_data.to_k2n_cache()
+
     cache_data_list = []
     pending_k2n_dict = {}
 
@@ -222,177 +252,159 @@ def parse_k2n_results(results_data):
 # BACKTEST FUNCTIONS
 # =============================================================================
 
-def BACKTEST_15_CAU_K2N_V30_AI_V8(
-    toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, history=True
-):
-    # ... (Giữ nguyên logic hàm 15 Cầu K2N) ...
-    allData, finalEndRow, startCheckRow, offset, error = _validate_backtest_params(
-        toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra
-    )
-    if error:
-        return error
-    headers = [
-        "Kỳ (Cột A)",
-        "Cầu 1 (Đề+5)",
-        "Cầu 2 (G6+G7)",
-        "Cầu 3 (GĐB+G1)",
-        "Cầu 4 (GĐB+G1)",
-        "Cầu 5 (G7+G7)",
-        "Cầu 6 (G7+G7)",
-        "Cầu 7 (G5+G7)",
-        "Cầu 8 (G3+G4)",
-        "Cầu 9 (GĐB+G1)",
-        "Cầu 10 (G2+G3)",
-        "Cầu 11 (GĐB+G3)",
-        "Cầu 12 (GĐB+G3)",
-        "Cầu 13 (G7.3+8)",
-        "Cầu 14 (G1+2)",
-        "Cầu 15 (Đề+7)",
-        "Tổng Trúng",
-    ]
-    results = [headers]
-
-    in_frame = [False] * 15
-    prediction_in_frame = [None] * 15
-    current_streak_k2n = [0] * 15
+CLASSIC_K2N_HEADERS = [
+    "Kỳ (Cột A)",
+    "Cầu 1 (Đề+5)",
+    "Cầu 2 (G6+G7)",
+    "Cầu 3 (GĐB+G1)",
+    "Cầu 4 (GĐB+G1)",
+    "Cầu 5 (G7+G7)",
+    "Cầu 6 (G7+G7)",
+    "Cầu 7 (G5+G7)",
+    "Cầu 8 (G3+G4)",
+    "Cầu 9 (GĐB+G1)",
+    "Cầu 10 (G2+G3)",
+    "Cầu 11 (GĐB+G3)",
+    "Cầu 12 (GĐB+G3)",
+    "Cầu 13 (G7.3+8)",
+    "Cầu 14 (G1+2)",
+    "Cầu 15 (Đề+7)",
+    "Tổng Trúng",
+]
+CLASSIC_K2N_BRIDGE_NAMES = [f"LO_STL_FIXED_{i:02d}" for i in range(1, 16)]
+
+
+def _is_hit(check_result, accept_an=False):
+    """Đọc kết quả checkHitSet_V30_K2N (chuỗi ngắn cố định) thành bool."""
+    return "✅" in check_result or (accept_an and "Ăn" in check_result)
+
+
+def _next_ky_label(last_row):
+    try:
+        return f"Kỳ {int(last_row[0]) + 1}"
+    except (ValueError, TypeError):
+        return f"Kỳ {last_row[0]} (Next)"
 
-    current_lose_streak_k2n = [0] * 15
-    max_lose_streak_k2n = [0] * 15
 
-    cau_functions = ALL_15_BRIDGE_FUNCTIONS_V5
+def _k2n_day_status(prevRow, actualRow, strict):
+    """
+    Trạng thái một kỳ kiểm tra K2N: None - hết dữ liệu (dừng quét), True - hợp lệ,
+    False - lỗi dữ liệu. strict=True dùng điều kiện hàng hợp lệ của 15 Cầu cổ điển
+    (bắt buộc có GĐB và G7).
+    """
+    if not actualRow or not actualRow[0] or (strict and str(actualRow[0]).strip() == ""):
+        return None
+    ok = bool(prevRow) and len(actualRow) >= 10
+    if strict:
+        ok = ok and bool(actualRow[2]) and bool(actualRow[9])
+    return ok
 
-    data_rows = []
-    totalTestDays = 0
-    win_counts = [0] * 15
 
+def _scan_k2n_days(allData, startCheckRow, finalEndRow, offset, strict):
+    """
+    Quét các kỳ kiểm tra của backtest K2N.
+    Trả về (periods, valid, src_index, actual_rows), điều kiện từng kỳ theo _k2n_day_status.
+    """
+    periods, valid, src_index, actual_rows = [], [], [], []
     for k in range(startCheckRow, finalEndRow + 1):
         prevRow_idx, actualRow_idx = k - 1 - offset, k - offset
         if actualRow_idx >= len(allData) or prevRow_idx < 0:
             continue
         prevRow, actualRow = allData[prevRow_idx], allData[actualRow_idx]
-        if not actualRow or not actualRow[0] or str(actualRow[0]).strip() == "":
+        ok = _k2n_day_status(prevRow, actualRow, strict)
+        if ok is None:
             break
+        periods.append(actualRow[0] or k)
+        valid.append(ok)
+        src_index.append(prevRow_idx)
+        actual_rows.append(actualRow if ok else None)
+    return periods, np.array(valid, dtype=bool), np.array(src_index, dtype=np.int64), actual_rows
+
+
+def _k2n_source_rows(allData, valid, src_index, last_idx):
+    """Các hàng nguồn cần tính STL (hàng hôm trước của ngày hợp lệ + hàng cuối)."""
+    needed = set(src_index[valid].tolist())
+    if last_idx is not None:
+        needed.add(last_idx)
+    if not needed:
+        return 0, []
+    lo, hi = min(needed), max(needed)
+    return lo, [allData[i] if i in needed else None for i in range(lo, hi + 1)]
+
+
+def _run_k2n_engine(kind, headers, bridge_names, allData, finalEndRow, startCheckRow, offset,
+                    build_matrix, strict, abort_row_on_error):
+    """Chạy engine K2N vector hóa và đóng gói thành BacktestResult."""
+    periods, valid, src_index, actual_rows = _scan_k2n_days(allData, startCheckRow, finalEndRow, offset, strict)
+    last_idx = finalEndRow - offset if 0 <= finalEndRow - offset < len(allData) else None
+    lo, source_rows = _k2n_source_rows(allData, valid, src_index, last_idx)
+    perf_count("days_scanned", int(valid.sum()))
+    perf_count("bridges_evaluated", len(bridge_names))
+
+    matrix = build_matrix(source_rows)
+    run = run_k2n(matrix, src_index - lo, loto_presence(actual_rows), valid, abort_row_on_error)
+
+    row_status = np.where(valid, ROW_OK, ROW_DATA_ERROR).astype(np.int8)
+    row_errors = {}
+    for d, (src, j) in run.row_abort.items():
+        row_status[d] = ROW_EXCEPTION
+        row_errors[d] = f"Lỗi: {matrix.errors.get((src, j), '')}"
+
+    result = BacktestResult(
+        kind=kind,
+        headers=headers,
+        bridge_names=bridge_names,
+        periods=periods,
+        row_status=row_status,
+        outcomes=run.outcomes,
+        stl_codes=run.stl_codes,
+        win_counts=run.win_counts,
+        current_streak=run.current_streak,
+        max_lose_streak=run.max_lose_streak,
+        total_days=int(valid.sum()),
+        row_errors=row_errors,
+        stl_extra=run.stl_extra,
+    )
 
-        if not prevRow or len(actualRow) < 10 or not actualRow[2] or not actualRow[9]:
-            data_rows.append([actualRow[0] or k, "Lỗi dữ liệu hàng"] + [""] * 15)
-            continue
-
-        actualSoKy, actualLotoSet = actualRow[0] or k, set(getAllLoto_V30(actualRow))
-        totalTestDays += 1
-
-        daily_results_row, totalHits = [actualSoKy], 0
-
-        try:
-            for j in range(15):
-                check_result = ""
-                cell_output = ""
-                if in_frame[j]:
-                    pred = prediction_in_frame[j]
-                    check_result = checkHitSet_V30_K2N(pred, actualLotoSet)
-                    if "✅" in check_result:
-                        cell_output = f"{','.join(pred)} ✅ (Ăn N2)"
-                        win_counts[j] += 1
-                        current_streak_k2n[j] += 1
-                        current_lose_streak_k2n[j] = 0
-                    else:
-                        cell_output = f"{','.join(pred)} ❌ (Trượt K2N)"
-                        current_streak_k2n[j] = 0
-                        current_lose_streak_k2n[j] += 1
-                        if current_lose_streak_k2n[j] > max_lose_streak_k2n[j]:
-                            max_lose_streak_k2n[j] = current_lose_streak_k2n[j]
-
-                    in_frame[j], prediction_in_frame[j] = False, None
-                else:
-                    pred = cau_functions[j](prevRow)
-                    check_result = checkHitSet_V30_K2N(pred, actualLotoSet)
-                    if "✅" in check_result:
-                        cell_output = f"{','.join(pred)} ✅ (Ăn N1)"
-                        win_counts[j] += 1
-                        current_streak_k2n[j] += 1
-                        current_lose_streak_k2n[j] = 0
-                    else:
-                        cell_output = f"{','.join(pred)} (Trượt N1...)"
-                        in_frame[j], prediction_in_frame[j] = True, pred
-
-                daily_results_row.append(cell_output)
-                if "✅" in check_result:
-                    totalHits += 1
-
-            daily_results_row.append(totalHits)
-            data_rows.append(daily_results_row)
-
-        except Exception as e:
-            data_rows.append([actualSoKy, f"Lỗi: {e}"] + [""] * 15)
-
-    data_rows.reverse()
-
-    rate_row, total_wins = ["Tỷ Lệ %"], 0
-    if totalTestDays > 0:
-        for count in win_counts:
-            rate = (count / totalTestDays) * 100
-            rate_row.append(f"{rate:.2f}%")
-            total_wins += count
-        rate_row.append(f"TB: {(total_wins / totalTestDays):.2f}")
-    else:
-        for _ in range(15):
-            rate_row.append("0.00%")
-        rate_row.append("TB: 0.00")
-    results.insert(1, rate_row)
-
-    streak_row = ["Chuỗi Thắng / Thua Max"]
-    for i in range(15):
-        streak_row.append(
-            f"{current_streak_k2n[i]} thắng / {max_lose_streak_k2n[i]} thua"
-        )
-    streak_row.append("---")
-    results.insert(2, streak_row)
-
-    recent_win_row = ["Phong Độ 10 Kỳ"]
-    for i in range(15):
-        recent_wins = 0
-        periods_to_check = min(10, len(data_rows))
-        for row_idx in range(periods_to_check):
-            if row_idx < len(data_rows):
-                row = data_rows[row_idx]
-                if i + 1 < len(row):
-                    cell_value = str(row[i + 1])
-                    if "✅" in cell_value:
-                        recent_wins += 1
-        recent_win_row.append(f"{recent_wins}/10")
-    recent_win_row.append("---")
-    results.insert(3, recent_win_row)
+    if last_idx is None:
+        result.prediction_error = "Không có dữ liệu hàng cuối."
+        return result
 
-    try:
-        last_data_row_for_prediction = allData[finalEndRow - offset]
-    except IndexError:
-        results.append(["LỖI DỰ ĐOÁN", "Không có dữ liệu hàng cuối."])
-        return results
+    states, codes, extra = pending_prediction(matrix, run.in_frame, run.pending_codes, run.pending_src, last_idx - lo)
+    result.set_prediction_codes(_next_ky_label(allData[last_idx]), states, codes, extra)
+    return result
 
-    try:
-        ky_int = int(last_data_row_for_prediction[0])
-        finalRowK = f"Kỳ {ky_int + 1}"
-    except (ValueError, TypeError):
-        finalRowK = f"Kỳ {last_data_row_for_prediction[0]} (Next)"
 
-    finalRow, openFrames = [finalRowK], 0
-    for j in range(15):
-        if in_frame[j]:
-            finalRow.append(f"{','.join(prediction_in_frame[j])} (Đang chờ N2)")
-            openFrames += 1
-        else:
-            try:
-                pred = cau_functions[j](last_data_row_for_prediction)
-                finalRow.append(f"{','.join(pred)} (Khung mới N1)")
-            except Exception:
-                finalRow.append("LỖI PREDICT")
-    finalRow.append(f"{openFrames} khung mở" if openFrames > 0 else "0")
+@timed("backtest.classic_k2n")
+def run_15_cau_k2n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra):
+    """
+    Backtest K2N 15 Cầu Lô cổ điển, trả về BacktestResult (dạng số).
+    Trả về list lỗi (định dạng cũ) nếu tham số không hợp lệ.
+    """
+    allData, finalEndRow, startCheckRow, offset, error = _validate_backtest_params(
+        toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra
+    )
+    if error:
+        return error
 
-    results.insert(4, finalRow)
+    return _run_k2n_engine(
+        KIND_CLASSIC_K2N, CLASSIC_K2N_HEADERS, CLASSIC_K2N_BRIDGE_NAMES,
+        allData, finalEndRow, startCheckRow, offset,
+        build_matrix=classic_stl_matrix, strict=True, abort_row_on_error=True,
+    )
 
-    if history:
-        results.extend(data_rows)
 
-    return results
+def BACKTEST_15_CAU_K2N_V30_AI_V8(
+    toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, history=True, as_result=False
+):
+    """
+    Backtest K2N 15 Cầu Lô (bảng chuỗi cho ResultsViewer).
+    as_result=True: trả về BacktestResult, bỏ qua bước định dạng chuỗi.
+    """
+    result = run_15_cau_k2n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra)
+    if as_result or not isinstance(result, BacktestResult):
+        return result
+    return result.to_table(history)
 
 
 def BACKTEST_15_CAU_N1_V31_AI_V8(
@@ -617,42 +629,109 @@ def BACKTEST_MANAGED_BRIDGES_N1(
     return []  # Placeholder (để tránh lỗi import, logic chính ở backtester.py nếu cần)
 
 
-def BACKTEST_MANAGED_BRIDGES_K1N(
-    toan_bo_A_I,
-    ky_bat_dau_kiem_tra,
-    ky_ket_thuc_kiem_tra,
-    db_name=DB_NAME,
-    history=True,
-):
-    """Backtest K1N cho Cầu Đã Lưu (Lô) - Đã tích hợp logic cho LO_STL_FIXED và LO_MEM"""
+def _filter_lo_bridges(bridges):
+    """Lọc bỏ Cầu Đề (DE_*), chỉ giữ Cầu Lô."""
+    filtered_bridges = []
+    for b in bridges:
+        b_name = str(b.get("name", ""))
+        b_type = str(b.get("type", ""))
+        if not b_name.startswith("DE_") and not b_type.startswith("DE"):
+            filtered_bridges.append(b)
+    return filtered_bridges
+
+
+def _managed_bridge_stl(bridge, row, positions, lotos):
+    """
+    Tính STL của một Cầu Lô đã lưu từ một hàng dữ liệu.
+    Hỗ trợ LO_STL_FIXED, LO_MEM (kể cả tên cũ Tổng(..)/Hiệu(..)) và V17 Shadow.
+    Trả về [] nếu không tính được.
+    """
+    bridge_name = bridge.get("name", "")
+    idx1, idx2 = bridge.get("pos1_idx"), bridge.get("pos2_idx")
+    pred = []
+
+    # --- 1. LO_STL_FIXED ---
+    if "LO_STL_FIXED" in bridge_name:
+        try:
+            num_part = bridge_name.split("_")[-1]
+            if num_part.isdigit():
+                idx_func = int(num_part) - 1
+                if 0 <= idx_func < len(ALL_15_BRIDGE_FUNCTIONS_V5):
+                    pred = ALL_15_BRIDGE_FUNCTIONS_V5[idx_func](row)
+        except Exception:
+            pass
+
+    # --- 2. LO_MEM ---
+    elif idx1 == -1 and idx2 == -1:
+        for marker, algorithm in (("LO_MEM_SUM", "sum"), ("LO_MEM_DIFF", "diff")):
+            if marker in bridge_name:
+                parts = bridge_name.split("_")
+                try:
+                    l1, l2 = parts[-2], parts[-1]
+                    names = get_27_loto_names()
+                    if l1 in names and l2 in names:
+                        pred = calculate_bridge_stl(lotos[names.index(l1)], lotos[names.index(l2)], algorithm)
+                except Exception:
+                    pass
+                break
+
+        if not pred:  # Fallback tên cũ
+            if "Tổng(" in bridge_name:
+                m = re.search(r'Tổng\((\d+)\+(\d+)\)', bridge_name)
+                if m: pred = calculate_bridge_stl(lotos[int(m.group(1))], lotos[int(m.group(2))], "sum")
+            elif "Hiệu(" in bridge_name:
+                m = re.search(r'Hiệu\((\d+)-(\d+)\)', bridge_name)
+                if m: pred = calculate_bridge_stl(lotos[int(m.group(1))], lotos[int(m.group(2))], "diff")
+
+    # --- 3. V17 ---
+    elif idx1 is not None and idx2 is not None:
+        a, b = positions[idx1], positions[idx2]
+        if a is not None and b is not None:
+            pred = taoSTL_V30_Bong(a, b)
+
+    return pred
+
+
+def _managed_predictions(bridges_to_test, last_row):
+    """Dự đoán kỳ tới (K1N) cho từng cầu đã lưu: trả về (states, preds)."""
+    last_positions = getAllPositions_V17_Shadow(last_row)
+    last_lotos = get_27_loto_positions(last_row)
+    states, preds = [], []
+    for bridge in bridges_to_test:
+        try:
+            pred = _managed_bridge_stl(bridge, last_row, last_positions, last_lotos)
+        except Exception:
+            pred = []
+        states.append(PENDING_N1 if pred else PENDING_ERROR)
+        preds.append(pred or None)
+    return states, preds
+
+
+def run_managed_bridges_k1n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME):
+    """
+    Backtest K1N cho Cầu Đã Lưu (Lô), trả về BacktestResult (dạng số).
+    Các trường hợp lỗi / không có cầu vẫn trả về list theo định dạng cũ.
+    """
     try:
         # [FIX CRITICAL V8.10] Load ALL bridges (kể cả disabled) để cập nhật K1N
         bridges_to_test = get_all_managed_bridges(db_name, only_enabled=False)
     except Exception as e:
         print(f"Lỗi tải cầu DB: {e}")
         return [["LỖI"]]
-    
+
     if not bridges_to_test:
         return [["Kỳ (Cột A)"], ["Thông báo", "Không có cầu nào được Bật."]]
 
-    # [FILTER] Lọc bỏ Cầu Đề (DE_*)
-    filtered_bridges = []
-    for b in bridges_to_test:
-        b_name = str(b.get("name", ""))
-        b_type = str(b.get("type", ""))
-        if not b_name.startswith("DE_") and not b_type.startswith("DE"):
-            filtered_bridges.append(b)
-    
-    bridges_to_test = filtered_bridges
-    
+    bridges_to_test = _filter_lo_bridges(bridges_to_test)
+
     # [FIX] Trả về cấu trúc chuẩn 5 dòng nếu không có cầu Lô (để tránh lỗi index ở backtester.py)
     if not bridges_to_test:
         print(">>> Không có cầu Lô nào để backtest K1N.")
         return [
-            ["Kỳ (Cột A)"], 
-            ["Tỷ Lệ %"], 
-            ["Chuỗi Thắng / Thua Max"], 
-            ["Phong Độ 10 Kỳ"], 
+            ["Kỳ (Cột A)"],
+            ["Tỷ Lệ %"],
+            ["Chuỗi Thắng / Thua Max"],
+            ["Phong Độ 10 Kỳ"],
             ["Thông báo", "Không có cầu Lô nào được Bật."]
         ]
 
@@ -663,192 +742,75 @@ def BACKTEST_MANAGED_BRIDGES_K1N(
     )
     if error: return error
 
-    num_bridges = len(bridges_to_test)
-    headers = ["Kỳ (Cột A)"]
-    for bridge in bridges_to_test:
-        headers.append(f"{bridge['name']}")
-
-    results = [headers]
-    current_streak = [0] * num_bridges
-    max_lose_streak = [0] * num_bridges
-    win_counts = [0] * num_bridges
-    data_rows = []
-    totalTestDays = 0
+    bridge_names = [f"{bridge['name']}" for bridge in bridges_to_test]
+    builder = BacktestResultBuilder(
+        KIND_MANAGED_K1N, ["Kỳ (Cột A)"] + bridge_names, bridge_names, finalEndRow - startCheckRow + 1
+    )
 
     for k in range(startCheckRow, finalEndRow + 1):
         prevRow_idx, actualRow_idx = k - 1 - offset, k - offset
         if actualRow_idx >= len(allData) or prevRow_idx < 0: continue
         prevRow, actualRow = allData[prevRow_idx], allData[actualRow_idx]
         if not actualRow or not actualRow[0]: break
-        if not prevRow or len(actualRow) < 10: 
-            data_rows.append([actualRow[0] or k, "Lỗi dữ liệu"] + [""] * num_bridges)
+        if not prevRow or len(actualRow) < 10:
+            builder.add_row(actualRow[0] or k, ROW_DATA_ERROR)
             continue
 
         actualSoKy, actualLotoSet = actualRow[0] or k, set(getAllLoto_V30(actualRow))
         prevPositions = getAllPositions_V17_Shadow(prevRow)
         prevLotos = get_27_loto_positions(prevRow)
-        totalTestDays += 1
-        daily_row = [actualSoKy]
+        r = builder.add_row(actualSoKy)
 
         for j, bridge in enumerate(bridges_to_test):
             try:
-                bridge_name = bridge.get("name", "")
-                idx1, idx2 = bridge.get("pos1_idx"), bridge.get("pos2_idx")
-                pred = []
-
-                # --- 1. LO_STL_FIXED ---
-                if "LO_STL_FIXED" in bridge_name:
-                    try:
-                        num_part = bridge_name.split("_")[-1]
-                        if num_part.isdigit():
-                            idx_func = int(num_part) - 1
-                            if 0 <= idx_func < len(ALL_15_BRIDGE_FUNCTIONS_V5):
-                                pred = ALL_15_BRIDGE_FUNCTIONS_V5[idx_func](prevRow)
-                    except: pass
-                
-                # --- 2. LO_MEM ---
-                elif idx1 == -1 and idx2 == -1:
-                    if "LO_MEM_SUM" in bridge_name:
-                        parts = bridge_name.split("_")
-                        try:
-                            l1, l2 = parts[-2], parts[-1]
-                            names = get_27_loto_names()
-                            if l1 in names and l2 in names:
-                                pred = calculate_bridge_stl(prevLotos[names.index(l1)], prevLotos[names.index(l2)], "sum")
-                        except: pass
-                    elif "LO_MEM_DIFF" in bridge_name:
-                        parts = bridge_name.split("_")
-                        try:
-                            l1, l2 = parts[-2], parts[-1]
-                            names = get_27_loto_names()
-                            if l1 in names and l2 in names:
-                                pred = calculate_bridge_stl(prevLotos[names.index(l1)], prevLotos[names.index(l2)], "diff")
-                        except: pass
-                    
-                    if not pred: # Fallback old names
-                        if "Tổng(" in bridge_name:
-                            m = re.search(r'Tổng\((\d+)\+(\d+)\)', bridge_name)
-                            if m: pred = calculate_bridge_stl(prevLotos[int(m.group(1))], prevLotos[int(m.group(2))], "sum")
-                        elif "Hiệu(" in bridge_name:
-                            m = re.search(r'Hiệu\((\d+)-(\d+)\)', bridge_name)
-                            if m: pred = calculate_bridge_stl(prevLotos[int(m.group(1))], prevLotos[int(m.group(2))], "diff")
-
-                # --- 3. V17 ---
-                elif idx1 is not None and idx2 is not None:
-                    a, b = prevPositions[idx1], prevPositions[idx2]
-                    if a is not None and b is not None:
-                        pred = taoSTL_V30_Bong(a, b)
-
+                pred = _managed_bridge_stl(bridge, prevRow, prevPositions, prevLotos)
                 if not pred:
-                    daily_row.append("Lỗi CT"); continue
+                    builder.set_cell(r, j, OUTCOME_NO_PRED); continue
 
-                check_result = checkHitSet_V30_K2N(pred, actualLotoSet)
-                cell_output = ""
-
-                if "✅" in check_result or "Ăn" in check_result:
-                    cell_output = f"{','.join(pred)} ✅ (Ăn N1)"
-                    win_counts[j] += 1
-                    current_streak[j] += 1
+                if _is_hit(checkHitSet_V30_K2N(pred, actualLotoSet), accept_an=True):
+                    builder.set_cell(r, j, OUTCOME_HIT_N1, pred)
+                    builder.record_win(j)
                 else:
-                    cell_output = f"{','.join(pred)} ❌ (Trượt N1)"
-                    current_streak[j] = 0
-                    
-                daily_row.append(cell_output)
+                    builder.set_cell(r, j, OUTCOME_MISS_N1, pred)
+                    builder.record_loss(j)
+            except Exception as e: builder.set_error(r, j, f"Err: {e}")
 
-            except Exception as e: daily_row.append(f"Err: {e}")
-
-        data_rows.append(daily_row)
-
-    data_rows.reverse()
-
-    # Rate Row
-    rate_row = ["Tỷ Lệ %"]
-    if totalTestDays > 0:
-        for count in win_counts:
-            rate_row.append(f"{(count / totalTestDays) * 100:.2f}%")
-    else:
-        rate_row.extend(["0.00%"] * num_bridges)
-    results.insert(1, rate_row)
-
-    # Streak Row
-    streak_row = ["Chuỗi Thắng Max"]
-    for i in range(num_bridges):
-        streak_row.append(f"{current_streak[i]}")
-    results.insert(2, streak_row)
-
-    # Recent Form
-    recent_win_row = ["Phong Độ 10 Kỳ"]
-    for i in range(num_bridges):
-        recent_wins = 0
-        periods = min(10, len(data_rows))
-        for r_idx in range(periods):
-            cell = str(data_rows[r_idx][i+1])
-            if "Ăn" in cell: recent_wins += 1
-        recent_win_row.append(f"{recent_wins}/10")
-    results.insert(3, recent_win_row)
+    result = builder.build()
 
     # Prediction
     try:
         last_row = allData[finalEndRow - offset]
-        finalRow = [f"Kỳ {int(last_row[0])+1}" if str(last_row[0]).isdigit() else "Next"]
-        last_positions = getAllPositions_V17_Shadow(last_row)
-        last_lotos = get_27_loto_positions(last_row)
-
-        for j, bridge in enumerate(bridges_to_test):
-            bridge_name = bridge.get("name", "")
-            idx1, idx2 = bridge.get("pos1_idx"), bridge.get("pos2_idx")
-            pred = []
+        next_label = f"Kỳ {int(last_row[0])+1}" if str(last_row[0]).isdigit() else "Next"
+        states, preds = _managed_predictions(bridges_to_test, last_row)
+        result.set_prediction(next_label, states, preds)
+    except Exception as e:
+        result.prediction_error = str(e)
+    return result
 
-            # 1. FIXED
-            if "LO_STL_FIXED" in bridge_name:
-                try:
-                    num = int(bridge_name.split("_")[-1]) - 1
-                    pred = ALL_15_BRIDGE_FUNCTIONS_V5[num](last_row)
-                except: pass
-            
-            # 2. MEMORY
-            elif idx1 == -1 and idx2 == -1:
-                if "LO_MEM_SUM" in bridge_name:
-                    p = bridge_name.split("_")
-                    try: 
-                        names = get_27_loto_names()
-                        pred = calculate_bridge_stl(last_lotos[names.index(p[-2])], last_lotos[names.index(p[-1])], "sum")
-                    except: pass
-                elif "LO_MEM_DIFF" in bridge_name:
-                    p = bridge_name.split("_")
-                    try:
-                        names = get_27_loto_names()
-                        pred = calculate_bridge_stl(last_lotos[names.index(p[-2])], last_lotos[names.index(p[-1])], "diff")
-                    except: pass
-                
-                # Fallback
-                if not pred:
-                    if "Tổng(" in bridge_name:
-                        m = re.search(r'Tổng\((\d+)\+(\d+)\)', bridge_name)
-                        if m: pred = calculate_bridge_stl(last_lotos[int(m.group(1))], last_lotos[int(m.group(2))], "sum")
-                    elif "Hiệu(" in bridge_name:
-                        m = re.search(r'Hiệu\((\d+)-(\d+)\)', bridge_name)
-                        if m: pred = calculate_bridge_stl(last_lotos[int(m.group(1))], last_lotos[int(m.group(2))], "diff")
-
-            # 3. V17
-            elif idx1 is not None and idx2 is not None:
-                a, b = last_positions[idx1], last_positions[idx2]
-                if a is not None and b is not None: pred = taoSTL_V30_Bong(a, b)
-
-            finalRow.append(f"{','.join(pred)}" if pred else "Lỗi")
-        
-        results.insert(4, finalRow)
-    except: results.append(["Lỗi Prediction"])
-
-    if history: results.extend(data_rows)
-    return results
 
-def BACKTEST_MANAGED_BRIDGES_K2N(
-    toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME, history=True
+def BACKTEST_MANAGED_BRIDGES_K1N(
+    toan_bo_A_I,
+    ky_bat_dau_kiem_tra,
+    ky_ket_thuc_kiem_tra,
+    db_name=DB_NAME,
+    history=True,
+    as_result=False,
 ):
     """
-    Backtest K2N Managed Bridges.
-    [FIXED] Fixed NameError 'loto_names' -> 'names'.
+    Backtest K1N cho Cầu Đã Lưu (Lô) - Đã tích hợp logic cho LO_STL_FIXED và LO_MEM.
+    as_result=True: trả về BacktestResult, bỏ qua bước định dạng chuỗi.
+    """
+    result = run_managed_bridges_k1n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name)
+    if as_result or not isinstance(result, BacktestResult):
+        return result
+    return result.to_table(history)
+
+
+@timed("backtest.managed_k2n")
+def run_managed_bridges_k2n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME):
+    """
+    Backtest K2N cho Cầu Đã Lưu (Lô, đang Bật), trả về BacktestResult (dạng số).
+    Trả về [] hoặc list lỗi (định dạng cũ) nếu không chạy được.
     """
     try:
         bridges_to_test = get_all_managed_bridges(db_name, only_enabled=True)
@@ -857,15 +819,7 @@ def BACKTEST_MANAGED_BRIDGES_K2N(
     if not bridges_to_test:
         return []
 
-    # [FILTER] Lọc bỏ Cầu Đề (DE_*)
-    filtered_bridges = []
-    for b in bridges_to_test:
-        b_name = str(b.get("name", ""))
-        b_type = str(b.get("type", ""))
-        if not b_name.startswith("DE_") and not b_type.startswith("DE"):
-            filtered_bridges.append(b)
-    
-    bridges_to_test = filtered_bridges
+    bridges_to_test = _filter_lo_bridges(bridges_to_test)
     if not bridges_to_test: return []
 
     allData, finalEndRow, startCheckRow, offset, error = _validate_backtest_params(
@@ -873,216 +827,27 @@ def BACKTEST_MANAGED_BRIDGES_K2N(
     )
     if error: return error
 
-    num_bridges = len(bridges_to_test)
-    headers = ["Kỳ (Cột A)"] + [b['name'] for b in bridges_to_test]
-    results = [headers]
-
-    in_frame = [False] * num_bridges
-    prediction_in_frame = [None] * num_bridges
-    current_streak_k2n = [0] * num_bridges
-    max_lose_streak_k2n = [0] * num_bridges
-    current_lose_streak_k2n = [0] * num_bridges
-    win_counts = [0] * num_bridges
-    data_rows = []
-    totalTestDays = 0
-
-    for k in range(startCheckRow, finalEndRow + 1):
-        prevRow_idx, actualRow_idx = k - 1 - offset, k - offset
-        if actualRow_idx >= len(allData) or prevRow_idx < 0: continue
-        prevRow, actualRow = allData[prevRow_idx], allData[actualRow_idx]
-        if not actualRow or not actualRow[0]: break
-        if not prevRow or len(actualRow) < 10: 
-            data_rows.append([actualRow[0] or k, "Lỗi dữ liệu"] + [""] * num_bridges)
-            continue
-
-        actualSoKy, actualLotoSet = actualRow[0] or k, set(getAllLoto_V30(actualRow))
-        prevPositions = getAllPositions_V17_Shadow(prevRow)
-        prevLotos = get_27_loto_positions(prevRow)
-        totalTestDays += 1
-        daily_row = [actualSoKy]
-
-        for j, bridge in enumerate(bridges_to_test):
-            try:
-                cell_output = ""
-                # --- CHECK IN FRAME (N2) ---
-                if in_frame[j]:
-                    pred = prediction_in_frame[j]
-                    check_result = checkHitSet_V30_K2N(pred, actualLotoSet)
-                    if "✅" in check_result or "Ăn" in check_result:
-                        cell_output = f"{','.join(pred)} ✅ (Ăn N2)"
-                        win_counts[j] += 1; current_streak_k2n[j] += 1; current_lose_streak_k2n[j] = 0
-                    else:
-                        cell_output = f"{','.join(pred)} ❌ (Trượt K2N)"
-                        current_streak_k2n[j] = 0; current_lose_streak_k2n[j] += 1
-                        if current_lose_streak_k2n[j] > max_lose_streak_k2n[j]: max_lose_streak_k2n[j] = current_lose_streak_k2n[j]
-                    in_frame[j], prediction_in_frame[j] = False, None
-                
-                # --- NEW PREDICTION (N1) ---
-                else:
-                    idx1, idx2 = bridge["pos1_idx"], bridge["pos2_idx"]
-                    pred = []
-                    bridge_name = bridge.get("name", "")
-
-                    # 1. FIXED
-                    if "LO_STL_FIXED" in bridge_name:
-                        try:
-                            num = int(bridge_name.split("_")[-1]) - 1
-                            pred = ALL_15_BRIDGE_FUNCTIONS_V5[num](prevRow)
-                        except: pass
-                    
-                    # 2. MEMORY
-                    elif idx1 == -1 and idx2 == -1:
-                        if "LO_MEM_SUM" in bridge_name:
-                            parts = bridge_name.split("_")
-                            try:
-                                l1, l2 = parts[-2], parts[-1]
-                                names = get_27_loto_names()
-                                if l1 in names and l2 in names:
-                                    # [FIXED] Use names.index
-                                    p1, p2 = names.index(l1), names.index(l2)
-                                    loto1, loto2 = prevLotos[p1], prevLotos[p2]
-                                    pred = calculate_bridge_stl(loto1, loto2, "sum")
-                            except: pass
-                        elif "LO_MEM_DIFF" in bridge_name:
-                            parts = bridge_name.split("_")
-                            try:
-                                l1, l2 = parts[-2], parts[-1]
-                                names = get_27_loto_names()
-                                if l1 in names and l2 in names:
-                                    # [FIXED] Use names.index
-                                    p1, p2 = names.index(l1), names.index(l2)
-                                    loto1, loto2 = prevLotos[p1], prevLotos[p2]
-                                    pred = calculate_bridge_stl(loto1, loto2, "diff")
-                            except: pass
-                        
-                        if not pred: # Fallback
-                            if "Tổng(" in bridge_name:
-                                m = re.search(r'Tổng\((\d+)\+(\d+)\)', bridge_name)
-                                if m: pred = calculate_bridge_stl(prevLotos[int(m.group(1))], prevLotos[int(m.group(2))], "sum")
-                            elif "Hiệu(" in bridge_name:
-                                m = re.search(r'Hiệu\((\d+)-(\d+)\)', bridge_name)
-                                if m: pred = calculate_bridge_stl(prevLotos[int(m.group(1))], prevLotos[int(m.group(2))], "diff")
-
-                    # 3. V17
-                    elif idx1 is not None and idx2 is not None:
-                        a, b = prevPositions[idx1], prevPositions[idx2]
-                        if a is not None and b is not None:
-                            pred = taoSTL_V30_Bong(a, b)
-                    
-                    if not pred:
-                        daily_row.append("Err"); continue
-
-                    check_result = checkHitSet_V30_K2N(pred, actualLotoSet)
-                    if "✅" in check_result or "Ăn" in check_result:
-                        cell_output = f"{','.join(pred)} ✅ (Ăn N1)"
-                        win_counts[j] += 1; current_streak_k2n[j] += 1; current_lose_streak_k2n[j] = 0
-                    else:
-                        cell_output = f"{','.join(pred)} (Trượt N1...)"
-                        in_frame[j], prediction_in_frame[j] = True, pred
-                
-                daily_row.append(cell_output)
-            except: daily_row.append("Err")
-        data_rows.append(daily_row)
-
-    data_rows.reverse()
-    
-    rate_row = ["Tỷ Lệ %"]
-    if totalTestDays > 0:
-        for c in win_counts: rate_row.append(f"{(c / totalTestDays) * 100:.2f}%")
-    else: rate_row.extend(["0.00%"] * num_bridges)
-    results.insert(1, rate_row)
-
-    streak_row = ["Chuỗi Thắng / Thua Max"]
-    for i in range(num_bridges): streak_row.append(f"{current_streak_k2n[i]} thắng / {max_lose_streak_k2n[i]} thua")
-    results.insert(2, streak_row)
-    results.insert(3, ["Phong Độ 10 Kỳ"] + ["---"] * num_bridges)
+    bridge_names = [b['name'] for b in bridges_to_test]
+    return _run_k2n_engine(
+        KIND_MANAGED_K2N, ["Kỳ (Cột A)"] + bridge_names, bridge_names,
+        allData, finalEndRow, startCheckRow, offset,
+        build_matrix=lambda rows: managed_stl_matrix(bridges_to_test, rows),
+        strict=False, abort_row_on_error=False,
+    )
 
-    # Prediction
-    try:
-        last_row = allData[finalEndRow - offset]
-        try:
-            ky_int = int(last_row[0])
-            finalRowK = f"Kỳ {ky_int + 1}"
-        except (ValueError, TypeError):
-            finalRowK = f"Kỳ {last_row[0]} (Next)"
-        
-        finalRow = [finalRowK]
-        last_positions = getAllPositions_V17_Shadow(last_row)
-        last_lotos = get_27_loto_positions(last_row)
 
-        for j, bridge in enumerate(bridges_to_test):
-            if in_frame[j]:
-                finalRow.append(f"{','.join(prediction_in_frame[j])} (Đang chờ N2)")
-            else:
-                idx1, idx2 = bridge["pos1_idx"], bridge["pos2_idx"]
-                pred = []
-                bridge_name = bridge.get("name", "")
-
-                # 1. FIXED
-                if "LO_STL_FIXED" in bridge_name:
-                    try:
-                        num = int(bridge_name.split("_")[-1]) - 1
-                        pred = ALL_15_BRIDGE_FUNCTIONS_V5[num](last_row)
-                    except: pass
-                
-                # 2. MEMORY
-                elif idx1 == -1 and idx2 == -1:
-                    if "LO_MEM_SUM" in bridge_name:
-                        parts = bridge_name.split("_")
-                        try:
-                            l1, l2 = parts[-2], parts[-1]
-                            names = get_27_loto_names()
-                            if l1 in names and l2 in names:
-                                pred = calculate_bridge_stl(
-                                    last_lotos[names.index(l1)],
-                                    last_lotos[names.index(l2)],
-                                    "sum",
-                                )
-                        except: pass
-                    elif "LO_MEM_DIFF" in bridge_name:
-                        parts = bridge_name.split("_")
-                        try:
-                            l1, l2 = parts[-2], parts[-1]
-                            names = get_27_loto_names()
-                            if l1 in names and l2 in names:
-                                pred = calculate_bridge_stl(
-                                    last_lotos[names.index(l1)],
-                                    last_lotos[names.index(l2)],
-                                    "diff",
-                                )
-                        except: pass
-                    
-                    if not pred:
-                        if "Tổng(" in bridge_name:
-                            m = re.search(r'Tổng\((\d+)\+(\d+)\)', bridge_name)
-                            if m:
-                                pred = calculate_bridge_stl(
-                                    last_lotos[int(m.group(1))],
-                                    last_lotos[int(m.group(2))],
-                                    "sum",
-                                )
-                        elif "Hiệu(" in bridge_name:
-                            m = re.search(r'Hiệu\((\d+)-(\d+)\)', bridge_name)
-                            if m:
-                                pred = calculate_bridge_stl(
-                                    last_lotos[int(m.group(1))],
-                                    last_lotos[int(m.group(2))],
-                                    "diff",
-                                )
-                else:
-                    a, b = last_positions[idx1], last_positions[idx2]
-                    if a is not None and b is not None:
-                        pred = taoSTL_V30_Bong(a, b)
-                
-                finalRow.append(f"{','.join(pred)} (Khung mới N1)" if pred else "Lỗi")
-        
-        results.insert(4, finalRow)
-    except:
-        results.append(["Lỗi Prediction"])
+def BACKTEST_MANAGED_BRIDGES_K2N(
+    toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME, history=True, as_result=False
+):
+    """
+    Backtest K2N Managed Bridges.
+    as_result=True: trả về BacktestResult, bỏ qua bước định dạng chuỗi.
+    """
+    result = run_managed_bridges_k2n(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name)
+    if as_result or not isinstance(result, BacktestResult):
+        return result
+    return result.to_table(history)
 
-    if history:
-        results.extend(data_rows)
-    return results
 
 def BACKTEST_MEMORY_BRIDGES(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra):
     return []
\ No newline at end of file
@@ -6,10 +6,10 @@ Handles importing bridge candidates with policy-based filtering and bulk DB oper
 """
 
 import time
-from typing import List, Dict, Optional, Callable, Any
+from typing import List, Dict, Optional, Callable, Any, Iterable, Iterator, Tuple, Union
 
 try:
-    from logic.models import Candidate, ImportConfig, ScanResult
+    from logic.models import Candidate, CandidateBatch, ImportConfig, ScanResult
     from logic.db_manager import bulk_upsert_managed_bridges, get_all_managed_bridge_names, DB_NAME
     from logic.common_utils import normalize_bridge_name
     from logic.constants import DEFAULT_SETTINGS
@@ -73,18 +73,18 @@ class BridgeImporter:
     
     def filter_candidates(
         self, 
-        candidates: List[Candidate],
+        candidates: Union[List[Candidate], CandidateBatch],
         progress_callback: Optional[Callable[[str, int, int], None]] = None
-    ) -> Dict[str, List[Candidate]]:
+    ) -> Dict[str, Union[List[Candidate], CandidateBatch]]:
         """
         Filter candidates based on policy and thresholds.
         
         Args:
-            candidates: List of bridge candidates
+            candidates: List of bridge candidates or a CandidateBatch
             progress_callback: Optional callback(message, current, total)
             
         Returns:
-            Dict with keys:
+            Dict with keys (CandidateBatch values when given a batch):
                 - 'accepted': Candidates that pass policy
                 - 'rejected': Candidates that fail policy
                 - 'duplicates': Candidates already in DB
@@ -92,6 +92,9 @@ class BridgeImporter:
         if self.existing_names is None:
             self.refresh_existing_names()
         
+        if isinstance(candidates, CandidateBatch):
+            return self._filter_batch(candidates, progress_callback)
+        
         result = {
             'accepted': [],
             'rejected': [],
@@ -121,9 +124,32 @@ class BridgeImporter:
         
         return result
     
+    def _filter_batch(
+        self,
+        batch: CandidateBatch,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> Dict[str, CandidateBatch]:
+        """Vectorized filter_candidates() for a CandidateBatch."""
+        duplicate_mask = batch.name_mask(self.existing_names)
+        passed_mask = self.config.threshold_mask(batch)
+        
+        result = {
+            'accepted': batch.take(~duplicate_mask & passed_mask),
+            'rejected': batch.take(~duplicate_mask & ~passed_mask),
+            'duplicates': batch.take(duplicate_mask)
+        }
+        
+        if progress_callback:
+            progress_callback(f"Filtered {len(batch)} candidates", len(batch), len(batch))
+        
+        print(f"[INFO] Filter result: {len(result['accepted'])} accepted, "
+              f"{len(result['rejected'])} rejected, {len(result['duplicates'])} duplicates")
+        
+        return result
+    
     def import_candidates(
         self,
-        candidates: List[Candidate],
+        candidates: Union[List[Candidate], CandidateBatch],
         progress_callback: Optional[Callable[[str, int, int], None]] = None,
         preview_only: bool = False
     ) -> Dict[str, Any]:
@@ -131,7 +157,7 @@ class BridgeImporter:
         Import bridge candidates to database.
         
         Args:
-            candidates: List of bridge candidates to import
+            candidates: List of bridge candidates (or a CandidateBatch) to import
             progress_callback: Optional callback for progress updates
             preview_only: If True, skip DB write (preview mode)
             
@@ -176,8 +202,29 @@ class BridgeImporter:
             return result
         
         # Prepare bridges for bulk upsert
+        bridges_to_import = self._prepare_bridge_dicts(accepted)
+        
+        # Bulk import to DB
+        if bridges_to_import:
+            print(f"[INFO] Bulk importing {len(bridges_to_import)} bridges...")
+            result['imported'], result['errors'] = self._bulk_write(bridges_to_import)
+            print(f"[INFO] Import complete: {result['imported']} imported, {result['errors']} errors")
+        
+        result['duration'] = time.time() - start_time
+        return result
+    
+    def _prepare_bridge_dicts(self, candidates: Union[List[Candidate], CandidateBatch]) -> List[Dict[str, Any]]:
+        """Convert accepted candidates to DB dicts with config defaults applied."""
+        if isinstance(candidates, CandidateBatch):
+            if self.config.auto_approve:
+                return candidates.to_dicts(is_pending=0, is_enabled=1)
+            return candidates.to_dicts(
+                is_pending=1 if self.config.default_is_pending else 0,
+                is_enabled=1 if self.config.default_is_enabled else 0
+            )
+        
         bridges_to_import = []
-        for candidate in accepted:
+        for candidate in candidates:
             bridge_dict = candidate.to_dict()
             
             # Apply config defaults
@@ -189,40 +236,181 @@ class BridgeImporter:
                 bridge_dict['is_enabled'] = 1 if self.config.default_is_enabled else 0
             
             bridges_to_import.append(bridge_dict)
+        return bridges_to_import
+    
+    def _bulk_write(self, bridges_to_import: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """Bulk upsert prepared bridge dicts. Returns (imported, errors)."""
+        try:
+            db_stats = bulk_upsert_managed_bridges(
+                bridges_to_import,
+                db_name=self.db_name,
+                transactional=True
+            )
+            return db_stats['added'] + db_stats['updated'], db_stats['errors']
+        except Exception as e:
+            print(f"[ERROR] Bulk import failed: {e}")
+            return 0, len(bridges_to_import)
+    
+    def preview_import_stream(
+        self,
+        batches: Iterable[Union[List[Candidate], Tuple[str, List[Candidate]]]],
+        quota_per_strategy: Optional[Dict[str, int]] = None,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Filter a stream of candidate batches without writing to database.
         
-        # Bulk import to DB
-        if bridges_to_import:
-            print(f"[INFO] Bulk importing {len(bridges_to_import)} bridges...")
+        Policy and de-duplication are applied per batch as it arrives. Names
+        accepted earlier in the stream count as duplicates for later batches.
+        
+        Args:
+            batches: Iterable of candidate lists, or (strategy, candidates) tuples
+                     as produced by DeBridgeScanner.iter_candidate_batches
+            quota_per_strategy: Optional max accepted per strategy (keyed by
+                     candidate.reason). Extra candidates are reported as
+                     'over_quota'. Once every listed strategy is full the
+                     stream is cut off and the upstream iterator is closed.
+            progress_callback: Optional callback(message, current, total)
             
-            try:
-                db_stats = bulk_upsert_managed_bridges(
-                    bridges_to_import,
-                    db_name=self.db_name,
-                    transactional=True
-                )
+        Yields:
+            Per-batch dict with keys:
+                - 'strategy': Strategy of the batch (None for plain lists)
+                - 'accepted', 'rejected', 'duplicates', 'over_quota': Candidate lists
+                - 'totals': Running counts for the whole stream
+                - 'cut_off': True on the last batch if the quota stopped the stream
+        """
+        if self.existing_names is None:
+            self.refresh_existing_names()
+        
+        seen = set(self.existing_names)
+        quota = dict(quota_per_strategy or {})
+        accepted_by_strategy: Dict[str, int] = {}
+        totals = {'batches': 0, 'candidates': 0, 'accepted': 0,
+                  'rejected': 0, 'duplicates': 0, 'over_quota': 0}
+        
+        iterator = iter(batches)
+        try:
+            for item in iterator:
+                if isinstance(item, tuple):
+                    strategy, candidates = item
+                else:
+                    strategy, candidates = None, item
+                
+                batch = {'strategy': strategy, 'accepted': [], 'rejected': [],
+                         'duplicates': [], 'over_quota': [], 'cut_off': False}
                 
-                result['imported'] = db_stats['added'] + db_stats['updated']
-                result['errors'] = db_stats['errors']
+                for candidate in candidates:
+                    if candidate.normalized_name in seen:
+                        batch['duplicates'].append(candidate)
+                        continue
+                    
+                    if not self.config.meets_threshold(candidate):
+                        batch['rejected'].append(candidate)
+                        continue
+                    
+                    key = candidate.reason
+                    if key in quota and accepted_by_strategy.get(key, 0) >= quota[key]:
+                        batch['over_quota'].append(candidate)
+                        continue
+                    
+                    seen.add(candidate.normalized_name)
+                    accepted_by_strategy[key] = accepted_by_strategy.get(key, 0) + 1
+                    batch['accepted'].append(candidate)
                 
-                print(f"[INFO] Import complete: {result['imported']} imported, {result['errors']} errors")
+                totals['batches'] += 1
+                totals['candidates'] += len(candidates)
+                for field in ('accepted', 'rejected', 'duplicates', 'over_quota'):
+                    totals[field] += len(batch[field])
+                batch['totals'] = dict(totals)
                 
-            except Exception as e:
-                print(f"[ERROR] Bulk import failed: {e}")
-                result['errors'] = len(bridges_to_import)
+                if progress_callback:
+                    progress_callback(
+                        f"Filtered batch {totals['batches']} ({strategy or 'mixed'})",
+                        totals['accepted'], totals['candidates']
+                    )
+                
+                quota_full = bool(quota) and all(
+                    accepted_by_strategy.get(k, 0) >= v for k, v in quota.items()
+                )
+                if quota_full:
+                    batch['cut_off'] = True
+                    print(f"[INFO] Quota reached after {totals['batches']} batches - stopping scan stream")
+                    yield batch
+                    return
+                
+                yield batch
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+    
+    def import_candidate_stream(
+        self,
+        batches: Iterable[Union[List[Candidate], Tuple[str, List[Candidate]]]],
+        quota_per_strategy: Optional[Dict[str, int]] = None,
+        progress_callback: Optional[Callable[[str, int, int], None]] = None,
+        preview_only: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Import a stream of candidate batches, writing accepted ones per batch.
+        
+        Args:
+            batches: Iterable of candidate lists or (strategy, candidates) tuples
+            quota_per_strategy: Optional max accepted per strategy (see preview_import_stream)
+            progress_callback: Optional callback for progress updates
+            preview_only: If True, skip DB write (preview mode)
+            
+        Returns:
+            Dict with the same keys as import_candidates plus 'over_quota' and 'cut_off'
+        """
+        start_time = time.time()
+        write = not (preview_only or self.config.preview_only)
+        
+        result = {
+            'imported': 0,
+            'rejected': 0,
+            'duplicates': 0,
+            'over_quota': 0,
+            'errors': 0,
+            'accepted_list': [],
+            'rejected_list': [],
+            'duplicate_list': [],
+            'cut_off': False,
+            'duration': 0.0
+        }
+        
+        for batch in self.preview_import_stream(batches, quota_per_strategy, progress_callback):
+            result['accepted_list'].extend(batch['accepted'])
+            result['rejected_list'].extend(batch['rejected'])
+            result['duplicate_list'].extend(batch['duplicates'])
+            result['over_quota'] += len(batch['over_quota'])
+            result['cut_off'] = batch['cut_off']
+            
+            if write and batch['accepted']:
+                imported, errors = self._bulk_write(self._prepare_bridge_dicts(batch['accepted']))
+                result['imported'] += imported
+                result['errors'] += errors
+        
+        result['rejected'] = len(result['rejected_list'])
+        result['duplicates'] = len(result['duplicate_list'])
+        
+        print(f"[INFO] Stream import: {len(result['accepted_list'])} accepted, "
+              f"{result['rejected']} rejected, {result['duplicates']} duplicates, "
+              f"{result['over_quota']} over quota, {result['imported']} imported")
         
         result['duration'] = time.time() - start_time
         return result
     
     def preview_import(
         self,
-        candidates: List[Candidate],
+        candidates: Union[List[Candidate], CandidateBatch],
         progress_callback: Optional[Callable[[str, int, int], None]] = None
     ) -> Dict[str, Any]:
         """
         Preview import without writing to database.
         
         Args:
-            candidates: List of bridge candidates
+            candidates: List of bridge candidates or a CandidateBatch
             progress_callback: Optional callback for progress updates
             
         Returns:
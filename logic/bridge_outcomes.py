@@ -0,0 +1,508 @@
+# Tên file: logic/bridge_outcomes.py
+"""
+bridge_outcomes.py - Lịch sử Ăn/Gãy từng kỳ của từng cầu (bảng BridgeOutcomes)
+
+Mỗi dòng: (bridge_id, ky, outcome, prediction) - outcome 1 = Ăn, 0 = Gãy,
+prediction là MÃ SỐ NGUYÊN của chuỗi dự đoán popup backtest ("12-21",
+"Chạm 3,8", "LOẠI Chạm 4", "Bộ 12"...): 3 bit thấp là loại dự đoán, phần còn
+lại là giá trị (cặp STL, dãy chạm, id bộ). encode_prediction() /
+decode_prediction() chuyển qua lại; chuỗi không mã hóa được lưu PRED_NONE (-1)
+và popup tự tính lại kỳ đó. Kỳ chờ kết quả / lỗi / thiếu vị trí không được lưu.
+Bảng WITHOUT ROWID với khóa (bridge_id, ky) nên truy vấn "N kỳ cuối của một
+cầu" đi thẳng theo khóa chính.
+
+- sync_bridge_outcomes(): nối thêm các kỳ mới (tăng dần theo MAX(ky) từng cầu),
+  chỉ giữ BRIDGE_OUTCOMES_MAX_DAYS kỳ cuối. Cầu Lô theo vị trí tính vector
+  hóa trên ma trận 214 vị trí; Cầu Đề dùng backtest lô (de_batch_engine).
+- load_bridge_outcomes() / fetch_outcome_window() / load_window_metrics():
+  đọc lại cho popup backtest, job hiệu suất Đề và các chỉ số cửa sổ.
+
+Chữ ký cầu (loại, tên, vị trí) lưu trong BridgeOutcomeMeta: cầu bị sửa vị trí
+hoặc id bị dùng lại cho cầu khác thì lịch sử cũ bị bỏ và tính lại. Meta cũng giữ
+kỳ cuối đã đồng bộ (last_ky), nên cầu không sinh dòng kết quả nào (VD cầu STL cố
+định, cầu Bạc Nhớ không đọc được tên) không bị tính lại cả cửa sổ mỗi lần. Bảng kiểu cũ
+(prediction TEXT) được xóa và đồng bộ lại từ đầu.
+"""
+
+import re
+import sqlite3
+
+try:
+    from .config_manager import SETTINGS
+except ImportError:
+    SETTINGS = None
+
+try:
+    from .db_manager import DB_NAME
+except ImportError:
+    DB_NAME = "data/xo_so_prizes_all_logic.db"
+
+try:
+    from .instrumentation import perf_count, timed
+except ImportError:
+    def perf_count(name, n=1):
+        pass
+
+    def timed(name):
+        return lambda func: func
+
+OUTCOME_LOSS = 0
+OUTCOME_WIN = 1
+
+N_POSITIONS_V17 = 214
+
+BRIDGE_OUTCOMES_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS BridgeOutcomes (
+        bridge_id INTEGER NOT NULL,
+        ky INTEGER NOT NULL,
+        outcome INTEGER NOT NULL,
+        prediction INTEGER NOT NULL,
+        PRIMARY KEY (bridge_id, ky)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_bridge_outcomes_ky ON BridgeOutcomes(ky)",
+    """CREATE TABLE IF NOT EXISTS BridgeOutcomeMeta (
+        bridge_id INTEGER PRIMARY KEY,
+        signature TEXT NOT NULL,
+        last_ky INTEGER
+    )""",
+]
+
+
+def _setting(key, default):
+    if SETTINGS is None:
+        return default
+    return getattr(SETTINGS, key, default)
+
+
+def ensure_bridge_outcomes_tables(conn):
+    cursor = conn.cursor()
+    columns = {row[1]: row[2] for row in cursor.execute("PRAGMA table_info(BridgeOutcomes)")}
+    if columns.get("prediction", "INTEGER").upper() != "INTEGER":
+        # Bảng cũ lưu chuỗi dự đoán: chỉ là cache, xóa để đồng bộ lại với mã số
+        cursor.execute("DROP TABLE BridgeOutcomes")
+        cursor.execute("DROP TABLE IF EXISTS BridgeOutcomeMeta")
+    for sql in BRIDGE_OUTCOMES_SCHEMA:
+        cursor.execute(sql)
+    if not any(row[1] == "last_ky" for row in cursor.execute("PRAGMA table_info(BridgeOutcomeMeta)")):
+        cursor.execute("ALTER TABLE BridgeOutcomeMeta ADD COLUMN last_ky INTEGER")
+    conn.commit()
+
+
+def bridge_signature(bridge):
+    """Chuỗi nhận diện cấu hình cầu; đổi chữ ký = lịch sử cũ không còn đúng."""
+    return "|".join(str(bridge.get(key)) for key in ("type", "name", "pos1_idx", "pos2_idx"))
+
+
+def is_de_bridge(bridge):
+    return str(bridge.get("type") or "").upper().startswith("DE_") or "DE_" in str(bridge.get("name") or "")
+
+
+def _ky_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_row_after(row_kys, ky):
+    """Chỉ số hàng đầu tiên có kỳ lớn hơn `ky` (lịch sử xếp tăng dần theo kỳ)."""
+    for i in range(len(row_kys) - 1, -1, -1):
+        if row_kys[i] is not None and row_kys[i] <= ky:
+            return i + 1
+    return 0
+
+
+def _bridge_id(bridge):
+    bridge_id = bridge.get("id") if bridge else None
+    return bridge_id if isinstance(bridge_id, int) else None
+
+
+# ===================================================================================
+# MÃ DỰ ĐOÁN
+# ===================================================================================
+
+PRED_NONE = -1          # Không có / không mã hóa được
+PRED_LO_PAIR = 1        # "12-21"      giá trị = 12 * 100 + 21
+PRED_TOUCHES = 2        # "Chạm 3,8"   giá trị = dãy chữ số cơ số 11 (chữ số + 1), giữ thứ tự
+PRED_KILLER = 3         # "LOẠI Chạm 4"
+PRED_SET = 4            # "Bộ 12"      giá trị = id bộ (BO_SO_NAMES)
+PRED_SET_UNKNOWN = 5    # "Bộ ?? (12)"
+PRED_SET_NO_POS2 = 6    # Cầu Bộ thiếu vị trí 2
+_KIND_BITS = 3
+_MAX_TOUCHES = 10
+
+_SET_NO_POS2_TEXT = "Lỗi: Cầu Bộ thiếu Vị trí 2"
+_LO_PAIR_RE = re.compile(r"(\d\d)-(\d\d)")
+_TOUCHES_RE = re.compile(r"Chạm (\d(?:,\d)*)")
+_KILLER_RE = re.compile(r"LOẠI Chạm (\d)")
+_SET_UNKNOWN_RE = re.compile(r"Bộ \?\? \((\d\d)\)")
+
+
+def _bo_names():
+    from .de_utils import BO_SO_NAMES
+    return BO_SO_NAMES
+
+
+def _pack(kind, value):
+    return (value << _KIND_BITS) | kind
+
+
+def encode_prediction(text):
+    """Mã số nguyên của chuỗi dự đoán popup (PRED_NONE nếu rỗng / không nhận dạng được)."""
+    if not text:
+        return PRED_NONE
+    text = str(text)
+    m = _LO_PAIR_RE.fullmatch(text)
+    if m:
+        return _pack(PRED_LO_PAIR, int(m.group(1)) * 100 + int(m.group(2)))
+    m = _TOUCHES_RE.fullmatch(text)
+    if m:
+        digits = m.group(1).split(",")
+        if len(digits) > _MAX_TOUCHES:
+            return PRED_NONE
+        value = 0
+        for d in digits:
+            value = value * 11 + int(d) + 1
+        return _pack(PRED_TOUCHES, value)
+    m = _KILLER_RE.fullmatch(text)
+    if m:
+        return _pack(PRED_KILLER, int(m.group(1)))
+    m = _SET_UNKNOWN_RE.fullmatch(text)
+    if m:
+        return _pack(PRED_SET_UNKNOWN, int(m.group(1)))
+    if text == _SET_NO_POS2_TEXT:
+        return _pack(PRED_SET_NO_POS2, 0)
+    if text.startswith("Bộ ") and text[3:] in _bo_names():
+        return _pack(PRED_SET, _bo_names().index(text[3:]))
+    return PRED_NONE
+
+
+def decode_prediction(code):
+    """Chuỗi dự đoán của mã (None với PRED_NONE / mã lạ)."""
+    if code is None or code < 0:
+        return None
+    kind, value = code & ((1 << _KIND_BITS) - 1), code >> _KIND_BITS
+    if kind == PRED_LO_PAIR:
+        return f"{value // 100:02d}-{value % 100:02d}"
+    if kind == PRED_TOUCHES:
+        digits = []
+        while value:
+            value, d = divmod(value, 11)
+            digits.append(str(d - 1))
+        return f"Chạm {','.join(reversed(digits))}"
+    if kind == PRED_KILLER:
+        return f"LOẠI Chạm {value}"
+    if kind == PRED_SET:
+        names = _bo_names()
+        return f"Bộ {names[value]}" if value < len(names) else None
+    if kind == PRED_SET_UNKNOWN:
+        return f"Bộ ?? ({value:02d})"
+    if kind == PRED_SET_NO_POS2:
+        return _SET_NO_POS2_TEXT
+    return None
+
+
+# ===================================================================================
+# TÍNH KẾT QUẢ
+# ===================================================================================
+
+def _lo_position_outcomes(bridges, rows, first_target):
+    """
+    Cầu Lô theo vị trí V17 (0 <= idx < 214) cho các kỳ rows[first_target:],
+    dự đoán từ kỳ liền trước - cùng kết quả với run_backtest_lo_30_days.
+    Trả về {bridge_id: [(ky, outcome, mã dự đoán)]}.
+    """
+    import numpy as np
+    from .backtest.k2n_engine import _positions_matrix, _stl_from_digits, loto_presence
+
+    first_target = max(1, first_target)
+    if not bridges or first_target >= len(rows):
+        return {}
+
+    positions = _positions_matrix(rows[first_target - 1:-1])
+    hits = loto_presence(rows[first_target:])
+    kys = [_ky_int(row[0]) for row in rows[first_target:]]
+    i1 = np.array([b["pos1_idx"] for b in bridges])
+    i2 = np.array([b["pos2_idx"] for b in bridges])
+
+    codes = _stl_from_digits(positions[:, i1], positions[:, i2]).astype(np.int32)  # (ngày, cầu)
+    valid = codes >= 0
+    lo1, lo2 = np.where(valid, codes // 100, 0), np.where(valid, codes % 100, 0)
+    day = np.arange(len(kys))[:, None]
+    wins = hits[day, lo1] | hits[day, lo2]
+    pred_codes = (np.where(valid, codes, 0).astype(np.int64) << _KIND_BITS) | PRED_LO_PAIR
+
+    out = {}
+    for j, bridge in enumerate(bridges):
+        items = []
+        for d in np.flatnonzero(valid[:, j]):
+            if kys[d] is None:
+                continue
+            items.append((kys[d], int(wins[d, j]), int(pred_codes[d, j])))
+        out[bridge["id"]] = items
+    return out
+
+
+def _results_to_outcomes(results, parse_ky):
+    items = []
+    for r in results:
+        if r.get("status") not in ("Ăn", "Gãy"):
+            continue  # Kỳ chờ / lỗi
+        ky = parse_ky(r.get("date"))
+        if ky is not None:
+            items.append((ky, OUTCOME_WIN if r.get("is_win") else OUTCOME_LOSS, encode_prediction(r.get("pred"))))
+    return items
+
+
+def compute_bridge_outcomes(bridge, rows, first_target):
+    """Kết quả từng kỳ rows[first_target:] của một cầu (đường chậm, từng ngày)."""
+    first_target = max(1, first_target)
+    days = len(rows) - first_target
+    if days <= 0:
+        return []
+    if is_de_bridge(bridge):
+        from .de_backtester_core import run_de_bridge_historical_test
+        results = run_de_bridge_historical_test(bridge, rows, days=days)
+        return _results_to_outcomes(results, _ky_int)
+
+    from .backtester import run_backtest_lo_30_days
+    results = run_backtest_lo_30_days(bridge, rows[first_target - 1:], days=days + 1)
+    return _results_to_outcomes(results, lambda date: _ky_int(str(date).replace("Kỳ ", "")))
+
+
+def _de_batch_outcomes(bridges, rows, first_target):
+    """Cầu Đề: backtest lô một lượt cho các kỳ rows[first_target:]."""
+    from .backtest.de_batch_engine import run_de_batch
+
+    run = run_de_batch(bridges, rows, start=first_target)
+    return {
+        bridge["id"]: _results_to_outcomes(run.history_log(j, days=len(rows)), _ky_int)
+        for j, bridge in enumerate(bridges)
+    }
+
+
+def _is_position_lo_bridge(bridge):
+    if is_de_bridge(bridge):
+        return False
+    p1, p2 = bridge.get("pos1_idx"), bridge.get("pos2_idx")
+    return (isinstance(p1, int) and isinstance(p2, int)
+            and 0 <= p1 < N_POSITIONS_V17 and 0 <= p2 < N_POSITIONS_V17)
+
+
+# ===================================================================================
+# GHI / ĐỒNG BỘ
+# ===================================================================================
+
+def record_outcomes(conn, bridge_id, items):
+    """Upsert [(ky, outcome, mã dự đoán)] của một cầu (không commit)."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO BridgeOutcomes (bridge_id, ky, outcome, prediction) VALUES (?, ?, ?, ?)",
+        [(bridge_id, ky, outcome, pred) for ky, outcome, pred in items],
+    )
+
+
+def purge_bridge_outcomes(conn, bridge_ids=None, ky=None):
+    """Xóa lịch sử theo cầu hoặc theo kỳ (khi xóa cầu / xóa kỳ). Bỏ qua nếu chưa có bảng."""
+    try:
+        if bridge_ids:
+            params = [(int(b),) for b in bridge_ids]
+            conn.executemany("DELETE FROM BridgeOutcomes WHERE bridge_id = ?", params)
+            conn.executemany("DELETE FROM BridgeOutcomeMeta WHERE bridge_id = ?", params)
+        if ky is not None:
+            ky = _ky_int(ky)
+            conn.execute("DELETE FROM BridgeOutcomes WHERE ky = ?", (ky,))
+            if ky is not None:  # Kỳ bị xóa rồi nạp lại phải được tính lại
+                conn.execute("UPDATE BridgeOutcomeMeta SET last_ky = ? WHERE last_ky >= ?", (ky - 1, ky))
+    except sqlite3.OperationalError:
+        pass
+
+
+@timed("outcomes.sync")
+def sync_bridge_outcomes(all_data, db_name=DB_NAME, bridges=None, max_days=None):
+    """
+    Nối thêm kết quả các kỳ mới cho mọi cầu đã lưu (hoặc danh sách `bridges`).
+
+    Chỉ tính các kỳ sau kỳ cuối đã đồng bộ của từng cầu (MAX(ky) đã lưu hoặc
+    BridgeOutcomeMeta.last_ky), trong phạm vi `max_days` kỳ cuối (mặc định
+    BRIDGE_OUTCOMES_MAX_DAYS); dòng cũ hơn cửa sổ bị xóa.
+    Returns: (số cầu được cập nhật, số dòng ghi thêm)
+    """
+    if not all_data or len(all_data) < 2:
+        return 0, 0
+    if max_days is None:
+        max_days = int(_setting("BRIDGE_OUTCOMES_MAX_DAYS", 365))
+    full_sync = bridges is None
+    if full_sync:
+        from .data_repository import get_all_managed_bridges
+        bridges = get_all_managed_bridges(db_name)
+    bridges = [b for b in bridges if _bridge_id(b) is not None]
+
+    rows = list(all_data)
+    window_start = max(1, len(rows) - max_days)
+    row_kys = [_ky_int(row[0]) for row in rows]
+    from .de_utils import get_gdb_last_2
+    # Kỳ cuối đã có kết quả: kỳ chờ phía sau vẫn được tính lại khi có GĐB
+    synced_ky = next((k for row, k in zip(reversed(rows), reversed(row_kys))
+                      if k is not None and get_gdb_last_2(row) is not None), None)
+
+    conn = sqlite3.connect(db_name)
+    try:
+        ensure_bridge_outcomes_tables(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT bridge_id, MAX(ky) FROM BridgeOutcomes GROUP BY bridge_id")
+        last_ky = dict(cursor.fetchall())
+        cursor.execute("SELECT bridge_id, signature, last_ky FROM BridgeOutcomeMeta")
+        meta = cursor.fetchall()
+        signatures = {bridge_id: signature for bridge_id, signature, _ in meta}
+        for bridge_id, _, meta_ky in meta:
+            if meta_ky is not None and meta_ky > last_ky.get(bridge_id, meta_ky - 1):
+                last_ky[bridge_id] = meta_ky
+
+        # Cầu đổi cấu hình (hoặc đã bị xóa khi đồng bộ toàn bộ): bỏ lịch sử cũ
+        changed = [b["id"] for b in bridges
+                   if b["id"] in signatures and signatures[b["id"]] != bridge_signature(b)]
+        if full_sync:
+            alive = {b["id"] for b in bridges}
+            changed += [bridge_id for bridge_id in set(signatures) | set(last_ky) if bridge_id not in alive]
+        purge_bridge_outcomes(conn, bridge_ids=changed)
+        for bridge_id in changed:
+            last_ky.pop(bridge_id, None)
+
+        # Nhóm các cầu theo kỳ bắt đầu cần tính
+        by_start = {}
+        for bridge in bridges:
+            start = window_start
+            if bridge["id"] in last_ky:
+                start = max(start, _first_row_after(row_kys, last_ky[bridge["id"]]))
+            if start < len(rows):
+                by_start.setdefault(start, []).append(bridge)
+
+        written = 0
+        for start, group in by_start.items():
+            fast = [b for b in group if _is_position_lo_bridge(b)]
+            computed = _lo_position_outcomes(fast, rows, start)
+            de_group = [b for b in group if is_de_bridge(b)]
+            if de_group:
+                computed.update(_de_batch_outcomes(de_group, rows, start))
+            for bridge in group:
+                if bridge["id"] not in computed:
+                    computed[bridge["id"]] = compute_bridge_outcomes(bridge, rows, start)
+            for bridge_id, items in computed.items():
+                record_outcomes(conn, bridge_id, items)
+                written += len(items)
+
+        evaluated = {b["id"] for group in by_start.values() for b in group}
+        conn.executemany(
+            "INSERT OR REPLACE INTO BridgeOutcomeMeta (bridge_id, signature, last_ky) VALUES (?, ?, ?)",
+            [(b["id"], bridge_signature(b), synced_ky if b["id"] in evaluated else last_ky.get(b["id"], synced_ky))
+             for b in bridges],
+        )
+        oldest = _ky_int(rows[window_start][0])
+        if oldest is not None:
+            conn.execute("DELETE FROM BridgeOutcomes WHERE ky < ?", (oldest,))
+        conn.commit()
+
+        updated = sum(len(group) for group in by_start.values())
+        perf_count("bridges_evaluated", updated)
+        perf_count("rows_written", written)
+        return updated, written
+    finally:
+        conn.close()
+
+
+# ===================================================================================
+# ĐỌC
+# ===================================================================================
+
+def load_bridge_outcomes(db_name, bridge, kys=None):
+    """
+    {ky: (outcome, chuỗi dự đoán)} đã lưu của một cầu (lọc theo `kys` nếu có).
+    Kỳ có mã PRED_NONE bị bỏ qua để popup tự tính lại.
+    Trả về {} nếu chưa có bảng, cầu không có id hoặc chữ ký không khớp.
+    """
+    bridge_id = _bridge_id(bridge)
+    if bridge_id is None or not db_name:
+        return {}
+    conn = None
+    try:
+        conn = sqlite3.connect(db_name)
+        cursor = conn.cursor()
+        cursor.execute("SELECT signature FROM BridgeOutcomeMeta WHERE bridge_id = ?", (bridge_id,))
+        row = cursor.fetchone()
+        if not row or row[0] != bridge_signature(bridge):
+            return {}
+        sql = "SELECT ky, outcome, prediction FROM BridgeOutcomes WHERE bridge_id = ?"
+        params = [bridge_id]
+        kys = [k for k in (_ky_int(k) for k in kys or []) if k is not None] if kys is not None else None
+        if kys is not None:
+            if not kys:
+                return {}
+            sql += " AND ky BETWEEN ? AND ?"
+            params += [min(kys), max(kys)]
+        cursor.execute(sql, params)
+        stored = {}
+        for ky, outcome, code in cursor.fetchall():
+            pred = decode_prediction(code)
+            if pred is not None:
+                stored[ky] = (outcome, pred)
+        return stored
+    except sqlite3.Error:
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+
+def fetch_outcome_window(conn, bridge_id, last_n):
+    """N kỳ cuối của một cầu, cũ -> mới: [(ky, outcome, chuỗi dự đoán hoặc None)]."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT ky, outcome, prediction FROM BridgeOutcomes WHERE bridge_id = ? ORDER BY ky DESC LIMIT ?",
+        (bridge_id, int(last_n)),
+    )
+    return [(ky, outcome, decode_prediction(code)) for ky, outcome, code in reversed(cursor.fetchall())]
+
+
+def load_window_metrics(db_name, last_n=30):
+    """
+    Chỉ số cửa sổ N kỳ cuối cho mọi cầu có lịch sử (một truy vấn ROW_NUMBER):
+    {bridge_id: {"wins", "total", "win_rate", "current_streak"}}
+    current_streak > 0 là chuỗi Ăn, < 0 là chuỗi Gãy tính từ kỳ mới nhất.
+    """
+    conn = None
+    try:
+        conn = sqlite3.connect(db_name)
+        cursor = conn.cursor()
+        cursor.execute(
+            """SELECT bridge_id, outcome FROM (
+                   SELECT bridge_id, ky, outcome,
+                          ROW_NUMBER() OVER (PARTITION BY bridge_id ORDER BY ky DESC) AS rn
+                   FROM BridgeOutcomes
+               ) WHERE rn <= ? ORDER BY bridge_id, ky DESC""",
+            (int(last_n),),
+        )
+        rows = cursor.fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        if conn:
+            conn.close()
+
+    recent = {}
+    for bridge_id, outcome in rows:
+        recent.setdefault(bridge_id, []).append(outcome)  # mới -> cũ
+
+    metrics = {}
+    for bridge_id, outcomes in recent.items():
+        first = outcomes[0]
+        streak = 0
+        while streak < len(outcomes) and outcomes[streak] == first:
+            streak += 1
+        wins = sum(outcomes)
+        metrics[bridge_id] = {
+            "wins": wins,
+            "total": len(outcomes),
+            "win_rate": round(wins / len(outcomes) * 100, 2),
+            "current_streak": streak if first == OUTCOME_WIN else -streak,
+        }
+    return metrics
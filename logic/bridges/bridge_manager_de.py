@@ -42,6 +42,13 @@ def _ensure_db_columns(cursor):
             
         if "next_prediction_stl" not in columns:
             cursor.execute("ALTER TABLE ManagedBridges ADD COLUMN next_prediction_stl TEXT DEFAULT ''")
+
+        # Vòng kết quả 10 kỳ của cầu Đề ('1' = Ăn, cũ -> mới) và kỳ cuối đã ghi vào vòng
+        if "recent_ring_10" not in columns:
+            cursor.execute("ALTER TABLE ManagedBridges ADD COLUMN recent_ring_10 TEXT DEFAULT ''")
+        
+        if "recent_ring_ky" not in columns:
+            cursor.execute("ALTER TABLE ManagedBridges ADD COLUMN recent_ring_ky TEXT DEFAULT ''")
             
     except Exception as e:
         print(f"Lỗi Self-Healing DB: {e}")
@@ -57,22 +64,41 @@ class DeBridgeManager:
     def __init__(self):
         self.max_health = 3
         self.lookback_window = 10
+        self._parsed_cache = {}
+
+    def update_daily_stats(self, all_data_ai, db_name=None):
+        """
+        Cập nhật Hồ Sơ Phong Độ cầu Đề cho kỳ mới nhất.
 
-    def update_daily_stats(self, all_data_ai):
+        Mỗi cầu giữ vòng kết quả 10 kỳ gần nhất (recent_ring_10, '1' = Ăn) và kỳ
+        cuối đã ghi vào vòng (recent_ring_ky): kỳ mới liền kề chỉ đẩy thêm một kết
+        quả, không chạy lại 10 kỳ. Vị trí kỳ hôm nay / hôm qua tính một lần cho
+        mọi cầu; vòng bị lệch (cầu mới, bật lại, thiếu kỳ) mới dựng lại từ 10 kỳ.
+        Kỳ chờ kết quả (GĐB chưa có) không được đưa vào vòng: vòng dừng ở kỳ trước
+        và nhận kết quả thật khi kỳ đó được cập nhật lại.
+        """
         if not all_data_ai or len(all_data_ai) < self.lookback_window + 2: return 0, []
         
         print(">>> [DE MANAGER] Cập nhật Hồ Sơ Phong Độ...")
         last_row = all_data_ai[-1]; prev_row = all_data_ai[-2]
+        today_ky, prev_ky = str(last_row[0]), str(prev_row[0])
         gdb_today = get_gdb_last_2(last_row)
+        is_pending = gdb_today is None
+        ring_end_ky = prev_ky if is_pending else today_ky   # Kỳ cuối có kết quả được ghi vào vòng
+        ring_rows = all_data_ai[:-1] if is_pending else all_data_ai
         pos_today = getAllPositions_V17_Shadow(last_row)
+        pos_prev = getAllPositions_V17_Shadow(prev_row)
+        recent_days = None  # [(gdb, vị trí kỳ trước)] của 10 kỳ cuối, chỉ tính khi cần dựng lại vòng
         
-        conn = sqlite3.connect(DB_NAME)
+        conn = sqlite3.connect(db_name or DB_NAME)
         cursor = conn.cursor()
 
         try:
             _ensure_db_columns(cursor)
             conn.commit()
-            cursor.execute("SELECT id, name, type, current_streak, recent_win_count_10, description FROM ManagedBridges WHERE is_enabled=1 AND (type LIKE 'DE_%' OR type LIKE 'CAU_DE%')")
+            cursor.execute("""
+                SELECT id, name, type, current_streak, recent_win_count_10, description, recent_ring_10, recent_ring_ky
+                FROM ManagedBridges WHERE is_enabled=1 AND (type LIKE 'DE_%' OR type LIKE 'CAU_DE%')""")
             active_bridges = cursor.fetchall()
         except sqlite3.OperationalError as e:
             print(f"Lỗi Đọc DB: {e}")
@@ -81,20 +107,17 @@ class DeBridgeManager:
         
         updated_count = 0
         active_list_ui = []
+        updates = []
         
-        for br_id, name, b_type, streak, hp_db, desc in active_bridges:
+        for br_id, name, b_type, streak, hp_db, desc, ring, ring_ky in active_bridges:
             try:
-                # PARSER V2.1: Phân tích ID Cầu
-                parsed_info = self._parse_bridge_id_v2(name, b_type)
-                if not parsed_info:
-                    parsed_info = self._parse_bridge_id_legacy(name)
-                
+                # PARSER V2.1: Phân tích ID Cầu (nhớ kết quả theo tên)
+                parsed_info = self._parse_bridge_cached(name, b_type)
                 if not parsed_info: continue 
 
                 idx1, idx2, k_offset, mode = parsed_info
 
                 # 1. Tính kết quả (Streak)
-                pos_prev = getAllPositions_V17_Shadow(prev_row)
                 dan_today = self._calculate_dan_logic(pos_prev, idx1, idx2, k_offset, mode, return_string=False)
                 
                 is_win = (gdb_today in dan_today) if (gdb_today and dan_today) else False
@@ -103,23 +126,18 @@ class DeBridgeManager:
                 new_streak = streak + 1 if is_win else 0
                 new_hp = self.max_health if is_win else current_hp - 1
                 
-                # 2. Backtest 10 kỳ
-                wins_10 = 0
-                recent_data = all_data_ai[-11:] if len(all_data_ai) >= 11 else all_data_ai
-                
-                for i in range(min(10, len(recent_data) - 1)):
-                    idx_today = len(recent_data) - 1 - i
-                    idx_prev = idx_today - 1
-                    if idx_prev < 0: break
-                    
-                    row_today_k = recent_data[idx_today]
-                    row_prev_k = recent_data[idx_prev]
-                    g_today = get_gdb_last_2(row_today_k)
-                    if not g_today: continue
-                    p_prev = getAllPositions_V17_Shadow(row_prev_k)
-                    d_prev = self._calculate_dan_logic(p_prev, idx1, idx2, k_offset, mode, return_string=False)
-                    if g_today in d_prev:
-                        wins_10 += 1
+                # 2. Vòng kết quả 10 kỳ
+                ring = ring or ""
+                if not is_pending and len(ring) == self.lookback_window and ring_ky == prev_ky:
+                    ring = ring[1:] + ("1" if is_win else "0")
+                elif not (len(ring) == self.lookback_window and ring_ky == ring_end_ky):
+                    if recent_days is None:
+                        recent_days = self._recent_days(ring_rows)
+                    ring = "".join(
+                        "1" if (g and g in self._calculate_dan_logic(p, idx1, idx2, k_offset, mode, return_string=False)) else "0"
+                        for g, p in recent_days
+                    )
+                wins_10 = ring.count("1")
 
                 # Tính Search Rate
                 search_rate_val = (wins_10 / 10.0) * 100
@@ -134,15 +152,12 @@ class DeBridgeManager:
                 if is_enabled:
                     pred_display = self._calculate_dan_logic(pos_today, idx1, idx2, k_offset, mode, return_string=True, display_mode=True)
                 
-                # 5. Cập nhật DB
+                # 5. Gom cập nhật DB (ghi một lượt)
                 new_desc = desc.split(".")[0] if desc and "." in desc else (desc or name)
                 new_desc += f". HP:{new_hp}/{self.max_health} | Win10:{wins_10}"
                 
-                cursor.execute("""
-                    UPDATE ManagedBridges 
-                    SET current_streak=?, recent_win_count_10=?, is_enabled=?, next_prediction_stl=?, description=?, search_rate_text=? 
-                    WHERE id=?""", 
-                    (new_streak, wins_10, is_enabled, pred_display, new_desc, new_search_rate, br_id))
+                updates.append((new_streak, wins_10, is_enabled, pred_display, new_desc, new_search_rate,
+                                ring, ring_end_ky, br_id))
                 
                 if is_enabled:
                     active_list_ui.append({
@@ -162,10 +177,33 @@ class DeBridgeManager:
             except Exception as e: 
                 # print(f"Lỗi xử lý cầu {name}: {e}")
                 continue
-                
+        
+        cursor.executemany("""
+            UPDATE ManagedBridges 
+            SET current_streak=?, recent_win_count_10=?, is_enabled=?, next_prediction_stl=?, description=?, search_rate_text=?,
+                recent_ring_10=?, recent_ring_ky=?
+            WHERE id=?""", updates)
         conn.commit(); conn.close()
         return updated_count, sorted(active_list_ui, key=lambda x: x['rank_score'], reverse=True)
 
+    def _recent_days(self, all_data_ai):
+        """(GĐB kỳ đích, vị trí kỳ liền trước) của `lookback_window` kỳ cuối, cũ -> mới."""
+        recent_data = all_data_ai[-(self.lookback_window + 1):]
+        days = []
+        for i in range(1, len(recent_data)):
+            days.append((get_gdb_last_2(recent_data[i]), getAllPositions_V17_Shadow(recent_data[i - 1])))
+        return days
+
+    def _parse_bridge_cached(self, name, b_type):
+        """Kết quả phân tích tên cầu chỉ phụ thuộc (tên, loại) -> nhớ lại giữa các lần cập nhật."""
+        key = (name, b_type)
+        if key not in self._parsed_cache:
+            parsed_info = self._parse_bridge_id_v2(name, b_type)
+            if not parsed_info:
+                parsed_info = self._parse_bridge_id_legacy(name)
+            self._parsed_cache[key] = parsed_info
+        return self._parsed_cache[key]
+
     def _parse_bridge_id_v2(self, name, b_type):
         """
         [FIXED] Parser hỗ trợ cả tên cũ và tên mới (dấu chấm/ngoặc).
@@ -2,6 +2,8 @@
 #
 # (NỘI DUNG THAY THẾ TOÀN BỘ - SỬA E741)
 #
+import numpy as np
+
 # ===================================================================================
 # I. CẤU HÌNH VÀ HÀM HỖ TRỢ CỐT LÕI (V25)
 # ===================================================================================
@@ -246,6 +248,112 @@ ALL_15_BRIDGE_FUNCTIONS_V5 = [
     getCau15_DE_P7_V30_V5,
 ]
 
+# ===================================================================================
+# III. 15 CẦU CỔ ĐIỂN VECTOR HÓA (TOÀN BỘ LỊCH SỬ MỘT LẦN)
+# ===================================================================================
+
+# Với hàng đúng chuẩn, mỗi cầu chỉ lấy 2 chữ số tại vị trí cố định trong 107
+# vị trí V16 (getAllPositions_V16) rồi cộng thêm một hằng số:
+# (vị trí chữ số a, vị trí chữ số b, số cộng thêm), theo thứ tự ALL_15_BRIDGE_FUNCTIONS_V5.
+CLASSIC_POSITION_PLAN = (
+    (3, 4, 5),      # Cầu 1: Đề + 5
+    (98, 106, 0),   # Cầu 2: G6.3 cuối + G7.4 cuối
+    (4, 9, 0),      # Cầu 3: GĐB cuối + G1 cuối
+    (3, 9, 0),      # Cầu 4: GĐB hàng chục + G1 cuối
+    (99, 106, 0),   # Cầu 5: G7.1 đầu + G7.4 cuối
+    (102, 103, 0),  # Cầu 6: G7.2 cuối + G7.3 đầu
+    (66, 99, 0),    # Cầu 7: G5.1 đầu + G7.1 đầu
+    (20, 50, 0),    # Cầu 8: G3.1 đầu + G4.1 đầu
+    (0, 5, 0),      # Cầu 9: GĐB đầu + G1 đầu
+    (16, 34, 0),    # Cầu 10: G2.2[1] + G3.3 cuối
+    (1, 29, 0),     # Cầu 11: GĐB[1] + G3.2 cuối
+    (4, 32, 0),     # Cầu 12: GĐB cuối + G3.3[2]
+    (103, 104, 8),  # Cầu 13: G7.3 + 8
+    (8, 9, 2),      # Cầu 14: G1 + 2
+    (3, 4, 7),      # Cầu 15: Đề + 7
+)
+
+# Bố cục hàng chuẩn: (cột, số lượng số, số chữ số mỗi số) từ GĐB đến G7
+_STANDARD_PRIZE_LAYOUT = (
+    (2, 1, 5), (3, 1, 5), (4, 2, 5), (5, 6, 5),
+    (6, 4, 4), (7, 6, 4), (8, 3, 3), (9, 4, 2),
+)
+
+_PLAN = np.array(CLASSIC_POSITION_PLAN, dtype=np.int16)
+_BONG_ARRAY = np.array([int(BONG_DUONG_V30[str(d)]) for d in range(10)], dtype=np.int16)
+
+
+def standard_row_digits(row):
+    """
+    Chuỗi 107 chữ số GĐB..G7 nối liền nếu hàng đúng chuẩn (đủ giải, đúng số
+    lượng và số chữ số - khi đó trùng với getAllPositions_V16); None nếu không.
+    """
+    try:
+        digits = []
+        for col, count, width in _STANDARD_PRIZE_LAYOUT:
+            parts = str(row[col]).split(",")
+            if len(parts) != count:
+                return None
+            for part in parts:
+                part = part.strip()
+                if len(part) != width:
+                    return None
+                digits.append(part)
+        digits = "".join(digits)
+        return digits if digits.isascii() and digits.isdigit() else None
+    except (IndexError, TypeError):
+        return None
+
+
+def is_standard_row(row):
+    """Hàng đúng chuẩn: 15 cầu tính được trực tiếp từ ma trận vị trí."""
+    return standard_row_digits(row) is not None
+
+
+def _stl_loto_code(value):
+    """Mã 0..99 của một con lô trong cặp STL; -1 nếu không phải 2 chữ số."""
+    if isinstance(value, str) and len(value) == 2 and value.isascii() and value.isdigit():
+        return int(value)
+    return -1
+
+
+def classic_stl_codes(positions, rows=None):
+    """
+    STL của 15 cầu cổ điển cho mọi hàng trong một lần gọi.
+
+    positions: ma trận vị trí [số hàng, >= 107] (107 vị trí V16, có thể kèm
+    107 vị trí bóng phía sau), -1 thay cho None.
+    rows: các hàng gốc tương ứng; hàng không đúng chuẩn (is_standard_row)
+    được tính lại bằng hàm từng hàng để kết quả giống hệt
+    ALL_15_BRIDGE_FUNCTIONS_V5. Bỏ qua rows thì coi mọi hàng là chuẩn.
+
+    Trả về mảng int16 [số hàng, 15, 2]: mã hai con lô của cặp STL,
+    -1 nếu con lô không phải 2 chữ số.
+    """
+    positions = np.asarray(positions)
+    n_rows = positions.shape[0]
+    codes = np.full((n_rows, 15, 2), -1, dtype=np.int16)
+    if n_rows == 0:
+        return codes
+
+    a = positions[:, _PLAN[:, 0]].astype(np.int16)
+    b = positions[:, _PLAN[:, 1]].astype(np.int16)
+    valid = (a >= 0) & (b >= 0)
+    a = np.where(valid, (a + _PLAN[:, 2]) % 10, 0)
+    b = np.where(valid, (b + _PLAN[:, 2]) % 10, 0)
+    codes[:, :, 0] = np.where(valid, a * 10 + b, -1)
+    codes[:, :, 1] = np.where(valid, np.where(a == b, _BONG_ARRAY[a] * 11, b * 10 + a), -1)
+
+    if rows is not None:
+        for i, row in enumerate(rows):
+            if is_standard_row(row):
+                continue
+            for j, bridge_func in enumerate(ALL_15_BRIDGE_FUNCTIONS_V5):
+                pred = bridge_func(row)
+                codes[i, j] = (_stl_loto_code(pred[0]), _stl_loto_code(pred[1]))
+    return codes
+
+
 # --- Hàm Thống Kê Loto ---
 # (Hàm này được analytics.py sử dụng, nhưng nó phụ thuộc nhiều vào
 # getAllLoto_V30, vì vậy để nó ở đây là hợp lý)
@@ -4,9 +4,12 @@
 # Feature: Ưu tiên DE_SET, cấu hình filter/quota từng loại, MVC pattern.
 
 import sqlite3
+import heapq
 import logging
-from collections import Counter
-from typing import List, Dict, Any, Optional, Tuple, Set
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterator
+
+import numpy as np
 
 # Fallback imports
 try:
@@ -17,12 +20,19 @@ try:
         get_gdb_last_2, check_cham, get_touches_by_offset, 
         generate_dan_de_from_touches, get_set_name_of_number, BO_SO_DE
     )
+    from logic.de_lookup import gdb_code, touch_bits, touch_hits
     from logic.models import Candidate
     from logic.common_utils import normalize_bridge_name
 except ImportError:
     DB_NAME = "lottery.db"
     pass 
 
+try:
+    from logic.instrumentation import perf_count, timed
+except ImportError:
+    def perf_count(name, n=1): pass
+    def timed(name): return lambda func: func
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -78,6 +88,56 @@ STRATEGY_CONFIG = {
     }
 }
 
+# Thứ tự ưu tiên khi gộp/stream kết quả (DE_SET trước)
+STRATEGY_ORDER = ["DE_SET", "DE_PASCAL", "DE_MEMORY", "DE_DYNAMIC_K", "DE_POS_SUM", "DE_KILLER"]
+
+def _wins_10_of(win_rate) -> int:
+    """Số kỳ thắng / 10 suy từ tỷ lệ thắng (%), 0 nếu không đọc được."""
+    try:
+        return int((float(win_rate) / 100.0) * 10)
+    except (ValueError, TypeError, OverflowError):
+        return 0
+
+
+def _wins_10(rates: np.ndarray) -> np.ndarray:
+    """_wins_10_of cho cả mảng tỷ lệ (NaN / vô cực -> 0)."""
+    wins = np.trunc((rates / 100.0) * 10)
+    return np.where(np.isfinite(wins), wins, 0.0)
+
+
+def _top_k_stable(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Chỉ số `k` điểm cao nhất, cùng thứ tự với sort giảm dần ổn định rồi cắt [:k]
+    (bằng điểm thì giữ thứ tự gốc). Dùng partition nên O(n) + O(k log k).
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.zeros(0, dtype=np.intp)
+    if n > k:
+        kth = np.partition(scores, n - k)[n - k]     # Điểm thứ k lớn nhất
+        idx = np.flatnonzero(scores >= kth)          # Kể cả các cầu bằng điểm, giữ thứ tự gốc
+    else:
+        idx = np.arange(n)
+    return idx[np.argsort(-scores[idx], kind="stable")][:k]
+
+
+@lru_cache(maxsize=None)
+def _pascal_coefficients(length: int) -> np.ndarray:
+    """
+    Hệ số nhị thức mod 10 để rút gọn Pascal `length` chữ số về 2 chữ số.
+    Trả về ma trận (2, length): hàng 0 sinh chữ số trái, hàng 1 sinh chữ số phải,
+    nên mỗi lần rút gọn chỉ là một phép nhân vô hướng mod 10.
+    """
+    row = [1]
+    for _ in range(length - 2):
+        row = [1] + [(row[i] + row[i + 1]) % 10 for i in range(len(row) - 1)] + [1]
+    coeffs = np.zeros((2, length), dtype=np.int64)
+    coeffs[0, :length - 1] = row
+    coeffs[1, 1:] = row
+    coeffs.setflags(write=False)
+    return coeffs
+
+
 class DeBridgeScanner:
     """
     Bộ quét cầu Đề tự động (Automated DE Bridge Scanner)
@@ -99,6 +159,7 @@ class DeBridgeScanner:
         
         # Cấu hình Killer & Memory
         self.min_killer_streak = 12 
+        self.killer_top_k = 15
         self.min_memory_confidence = 60.0 
 
         # Cứu Cầu
@@ -158,6 +219,7 @@ class DeBridgeScanner:
     #         "total_days": total_days
     #     }
 
+    @timed("scanner.de")
     def scan_all(
         self, 
         all_data_ai: List[List[str]], 
@@ -181,84 +243,100 @@ class DeBridgeScanner:
 
         logger.info(f"[DE SCANNER V11.4] Starting multi-strategy scan with quotas...")
         
-        # 1. Determine which strategies to run
-        active_strategies = self._get_active_strategies(scan_options)
-        logger.info(f"[DE SCANNER] Active strategies: {list(active_strategies.keys())}")
-        
-        # 2. [OPTIMIZATION] Preprocess data to integer matrix
-        data_matrix = self._preprocess_data(all_data_ai)
-        
-        # 3. Scan each strategy separately and apply filters
-        strategy_results = {}
-        
-        if active_strategies.get("DE_DYNAMIC_K", False):
-            raw_bridges = self._scan_dynamic_offset(all_data_ai, data_matrix)
-            strategy_results["DE_DYNAMIC_K"] = self._process_strategy_results(
-                raw_bridges, "DE_DYNAMIC_K"
-            )
-            logger.info(f"[DE SCANNER] DE_DYNAMIC_K: {len(raw_bridges)} found, {len(strategy_results['DE_DYNAMIC_K'])} after filter")
-        
-        if active_strategies.get("DE_POS_SUM", False):
-            raw_bridges = self._scan_algorithm_sum(all_data_ai, data_matrix)
-            strategy_results["DE_POS_SUM"] = self._process_strategy_results(
-                raw_bridges, "DE_POS_SUM"
-            )
-            logger.info(f"[DE SCANNER] DE_POS_SUM: {len(raw_bridges)} found, {len(strategy_results['DE_POS_SUM'])} after filter")
-        
-        if active_strategies.get("DE_SET", False):
-            raw_bridges = self._scan_set_bridges(all_data_ai, data_matrix)
-            strategy_results["DE_SET"] = self._process_strategy_results(
-                raw_bridges, "DE_SET"
-            )
-            logger.info(f"[DE SCANNER] DE_SET: {len(raw_bridges)} found, {len(strategy_results['DE_SET'])} after filter")
+        stats: Dict[str, Any] = {}
+        candidates = []
+        for _, batch in self.iter_candidate_batches(all_data_ai, db_name, scan_options, stats):
+            candidates.extend(batch)
         
-        if active_strategies.get("DE_PASCAL", False):
-            raw_bridges = self._scan_pascal_topology(all_data_ai)
-            strategy_results["DE_PASCAL"] = self._process_strategy_results(
-                raw_bridges, "DE_PASCAL"
-            )
-            logger.info(f"[DE SCANNER] DE_PASCAL: {len(raw_bridges)} found, {len(strategy_results['DE_PASCAL'])} after filter")
+        meta = {
+            'found_total': stats['found_total'],
+            'excluded_existing': stats['excluded_existing'],
+            'returned_count': stats['returned_count'],
+            'by_strategy': stats['by_strategy']
+        }
         
-        if active_strategies.get("DE_MEMORY", False):
-            raw_bridges = self._scan_memory_pattern(all_data_ai)
-            strategy_results["DE_MEMORY"] = self._process_strategy_results(
-                raw_bridges, "DE_MEMORY"
-            )
-            logger.info(f"[DE SCANNER] DE_MEMORY: {len(raw_bridges)} found, {len(strategy_results['DE_MEMORY'])} after filter")
+        perf_count("days_scanned", len(all_data_ai))
+        perf_count("candidates_found", meta['found_total'])
+        logger.info(f"[DE SCANNER] Final: {meta['found_total']} found, {meta['excluded_existing']} existing, {len(candidates)} returned")
+        return candidates, meta
+
+    def iter_candidate_batches(
+        self,
+        all_data_ai: List[List[str]],
+        db_name: str = DB_NAME,
+        scan_options: Optional[Dict[str, bool]] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Tuple[str, List[Candidate]]]:
+        """
+        [V11.5] Stream kết quả quét: yield (strategy_type, candidates) ngay khi từng
+        chiến lược quét xong, theo STRATEGY_ORDER. Người gọi có thể dừng sớm bất cứ lúc nào.
         
-        if active_strategies.get("DE_KILLER", False):
-            raw_bridges = self._scan_killer_bridges(all_data_ai, data_matrix)
-            strategy_results["DE_KILLER"] = self._process_strategy_results(
-                raw_bridges, "DE_KILLER"
-            )
-            logger.info(f"[DE SCANNER] DE_KILLER: {len(raw_bridges)} found, {len(strategy_results['DE_KILLER'])} after filter")
+        Args:
+            all_data_ai: Historical lottery data
+            db_name: Database path (read-only)
+            scan_options: Dict of bridge types to scan (None = enabled_by_default)
+            stats: Optional dict updated in place with found_total, excluded_existing,
+                   returned_count and by_strategy as the stream flows
+        """
+        if stats is None:
+            stats = {}
+        stats.update({'found_total': 0, 'excluded_existing': 0, 'returned_count': 0, 'by_strategy': {}})
         
-        # 4. Merge results (DE_SET first for priority)
-        found_bridges = []
-        for strategy_type in ["DE_SET", "DE_PASCAL", "DE_MEMORY", "DE_DYNAMIC_K", "DE_POS_SUM", "DE_KILLER"]:
-            if strategy_type in strategy_results:
-                found_bridges.extend(strategy_results[strategy_type])
+        if not self._validate_input_data(all_data_ai):
+            return
         
-        found_total = len(found_bridges)
-        logger.info(f"[DE SCANNER] Total bridges after strategy filtering: {found_total}")
+        # 1. Determine which strategies to run
+        active_strategies = self._get_active_strategies(scan_options)
+        logger.info(f"[DE SCANNER] Active strategies: {list(active_strategies.keys())}")
         
-        # 5. Load existing names and rates cache (SINGLE DB CALL EACH)
+        # 2. Load existing names and rates cache (SINGLE DB CALL EACH)
         existing_names = get_all_managed_bridge_names(db_name)
         rates_cache = load_rates_cache(db_name)
         
-        # 6. Convert to candidates with rates and exclude existing
-        candidates = self._convert_to_candidates(found_bridges, existing_names, rates_cache)
-        excluded_count = found_total - len(candidates)
-        
-        meta = {
-            'found_total': found_total,
-            'excluded_existing': excluded_count,
-            'returned_count': len(candidates),
-            'by_strategy': {k: len(v) for k, v in strategy_results.items()}
-        }
+        # 3. [OPTIMIZATION] Integer matrix, built lazily for strategies that need it
+        data_matrix = None
         
-        logger.info(f"[DE SCANNER] Final: {found_total} found, {excluded_count} existing, {len(candidates)} returned")
-        return candidates, meta
+        for strategy_type in STRATEGY_ORDER:
+            if not active_strategies.get(strategy_type, False):
+                continue
+            
+            if data_matrix is None and strategy_type not in ("DE_PASCAL", "DE_MEMORY"):
+                data_matrix = self._preprocess_data(all_data_ai)
+            
+            raw_bridges = self._run_strategy(strategy_type, all_data_ai, data_matrix)
+            processed = self._process_strategy_results(raw_bridges, strategy_type)
+            logger.info(f"[DE SCANNER] {strategy_type}: {len(raw_bridges)} found, {len(processed)} after filter")
+            
+            # 4. Convert to candidates with rates and exclude existing
+            candidates = self._convert_to_candidates(processed, existing_names, rates_cache)
+            
+            stats['by_strategy'][strategy_type] = len(processed)
+            stats['found_total'] += len(processed)
+            stats['returned_count'] += len(candidates)
+            stats['excluded_existing'] = stats['found_total'] - stats['returned_count']
+            
+            yield strategy_type, candidates
+
+    def _run_strategy(
+        self,
+        strategy_type: str,
+        all_data_ai: List[List[str]],
+        data_matrix: Optional[List[List[Optional[int]]]]
+    ) -> List[Dict[str, Any]]:
+        if strategy_type == "DE_DYNAMIC_K":
+            return self._scan_dynamic_offset(all_data_ai, data_matrix)
+        if strategy_type == "DE_POS_SUM":
+            return self._scan_algorithm_sum(all_data_ai, data_matrix)
+        if strategy_type == "DE_SET":
+            return self._scan_set_bridges(all_data_ai, data_matrix)
+        if strategy_type == "DE_PASCAL":
+            return self._scan_pascal_topology(all_data_ai)
+        if strategy_type == "DE_MEMORY":
+            return self._scan_memory_pattern(all_data_ai)
+        if strategy_type == "DE_KILLER":
+            return self._scan_killer_bridges(all_data_ai, data_matrix)
+        logger.warning(f"Unknown strategy type: {strategy_type}")
+        return []
     
     def _get_active_strategies(self, scan_options: Optional[Dict[str, bool]]) -> Dict[str, bool]:
         """
@@ -300,36 +378,24 @@ class DeBridgeScanner:
         
         config = self.strategy_config[strategy_type]
         
-        # 1. Filter by thresholds
-        filtered = []
-        for bridge in bridges:
-            win_rate = bridge.get('win_rate', 0.0)
-            streak = bridge.get('streak', 0)
-            
-            # Apply min thresholds
-            if win_rate >= config["min_win_rate"] and streak >= config["min_streak"]:
-                filtered.append(bridge)
-        
-        # 2. Sort with strategy-specific weighting
-        streak_weight = config["streak_weight"]
-        for bridge in filtered:
-            streak = bridge.get('streak', 0)
-            try:
-                wr = float(bridge.get('win_rate', 0))
-                wins_10 = int((wr / 100.0) * 10)
-            except (ValueError, TypeError):
-                wins_10 = 0
-            
-            # Apply strategy-specific streak weight
-            bridge['strategy_score'] = (streak * streak_weight) + (wins_10 * 1.0)
+        # 1. Filter by thresholds (vectorized)
+        streaks = np.array([bridge.get('streak', 0) for bridge in bridges], dtype=np.float64)
+        raw_rates = [bridge.get('win_rate', 0.0) for bridge in bridges]
+        rates = np.array(raw_rates, dtype=np.float64) if raw_rates else np.zeros(0)
+        keep = np.flatnonzero((rates >= config["min_win_rate"]) & (streaks >= config["min_streak"]))
         
-        filtered.sort(key=lambda x: x.get('strategy_score', 0), reverse=True)
+        # 2. Score with strategy-specific weighting: streak * weight + wins in last 10
+        scores = streaks[keep] * config["streak_weight"] + _wins_10(rates[keep])
         
         # 3. Apply quota limit
         quota = config["quota"]
-        limited = filtered[:quota]
+        limited = []
+        for i in _top_k_stable(scores, quota):
+            bridge = bridges[keep[i]]
+            bridge['strategy_score'] = float(scores[i])
+            limited.append(bridge)
         
-        logger.info(f"[{strategy_type}] Filter: {len(bridges)} -> {len(filtered)} -> {len(limited)} (quota={quota})")
+        logger.info(f"[{strategy_type}] Filter: {len(bridges)} -> {len(keep)} -> {len(limited)} (quota={quota})")
         
         return limited
 
@@ -360,13 +426,8 @@ class DeBridgeScanner:
 
     def _rank_bridges(self, bridges: List[Dict[str, Any]]) -> None:
         for b in bridges:
-            streak = b.get('streak', 0)
-            try:
-                wr = float(b.get('win_rate', 0))
-                wins_10 = int((wr / 100.0) * 10)
-            except (ValueError, TypeError):
-                wins_10 = 0
-            b['ranking_score'] = self._calculate_ranking_score(streak, wins_10, b.get('type', ''))
+            wins_10 = _wins_10_of(b.get('win_rate', 0))
+            b['ranking_score'] = self._calculate_ranking_score(b.get('streak', 0), wins_10, b.get('type', ''))
         bridges.sort(key=lambda x: x['ranking_score'], reverse=True)
     
     def _convert_to_candidates(
@@ -412,11 +473,7 @@ class DeBridgeScanner:
             kind = 'set' if bridge_type == 'DE_SET' else 'single'
             
             # Calculate win_count_10 from win_rate
-            try:
-                wr = float(b.get('win_rate', 0))
-                win_count_10 = int((wr / 100.0) * 10)
-            except (ValueError, TypeError):
-                win_count_10 = 0
+            win_count_10 = _wins_10_of(b.get('win_rate', 0))
             
             # Create Candidate object
             candidate = Candidate(
@@ -474,8 +531,7 @@ class DeBridgeScanner:
                 if v1 is None or (idx2 is not None and v2 is None): continue
                 
                 if mode == "DYNAMIC":
-                    touches = get_touches_by_offset((v1 + v2) % 10, k_param)
-                    is_win = check_cham(gdb, touches)
+                    is_win = touch_hits(gdb_code(gdb), touch_bits((v1 + v2) % 10, k_param))
                 elif mode == "DE_POS_SUM":
                     pred = (v1 + v2) % 10
                     is_win = check_cham(gdb, [pred])
@@ -505,34 +561,28 @@ class DeBridgeScanner:
 
         last_row = all_data_ai[-1]
 
+        # Cặp (kỳ k -> kỳ k+1) trong cửa sổ khai phá, GDB kỳ sau tính 1 lần cho mọi trigger
+        n_pairs = max(len(mining_data) - 2, 0)
+        next_tails = self._gdb_tail_array(mining_data[1:n_pairs + 1])
+
         for col_idx, trigger_code, trigger_name in triggers:
             current_signal = self._get_signal_value(last_row, col_idx, trigger_code)
             if current_signal is None: continue
 
-            matching_next_days_gdb = []
-            
-            for k in range(len(mining_data) - 2):
-                row_k = mining_data[k]
-                hist_signal = self._get_signal_value(row_k, col_idx, trigger_code)
-                
-                if hist_signal == current_signal:
-                    row_next = mining_data[k+1]
-                    gdb_next = get_gdb_last_2(row_next)
-                    if gdb_next:
-                        matching_next_days_gdb.append(gdb_next)
-
-            if len(matching_next_days_gdb) < 5: continue
-
-            touch_counts = Counter()
-            for gdb in matching_next_days_gdb:
-                if len(gdb) == 2:
-                    touch_counts[int(gdb[0])] += 1
-                    touch_counts[int(gdb[1])] += 1
-            
-            total_matches = len(matching_next_days_gdb)
-            if total_matches == 0: continue
+            signals = np.array(
+                [self._signal_code(row, col_idx, trigger_code) for row in mining_data[:n_pairs]],
+                dtype=np.int64
+            )
+            touch_hist, match_counts, first_seen = self._touch_histograms(signals, next_tails)
+
+            total_matches = int(match_counts[current_signal])
+            if total_matches < 5: continue
             
-            best_touch, count = touch_counts.most_common(1)[0]
+            counts = touch_hist[current_signal]
+            count = int(counts.max())
+            # Hòa điểm: giữ chạm xuất hiện sớm nhất (giống Counter.most_common)
+            tied = np.flatnonzero(counts == count)
+            best_touch = int(tied[np.argmin(first_seen[current_signal, tied])])
             confidence = (count / total_matches) * 100
 
             if confidence >= self.min_memory_confidence:
@@ -550,6 +600,41 @@ class DeBridgeScanner:
                 })
         return results
 
+    @staticmethod
+    def _touch_histograms(signals: np.ndarray, next_tails: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gom nhóm 1 lượt cho mọi giá trị tín hiệu (0-9).
+        Trả về: (touch_hist[signal, touch], match_counts[signal], first_seen[signal, touch])
+        first_seen là vị trí xuất hiện đầu tiên của chạm, dùng để phá hòa.
+        """
+        valid = (signals >= 0) & (next_tails >= 0)
+        sig = signals[valid]
+        d0 = next_tails[valid] // 10
+        d1 = next_tails[valid] % 10
+
+        match_counts = np.bincount(sig, minlength=10)
+        touch_hist = (
+            np.bincount(sig * 10 + d0, minlength=100) + np.bincount(sig * 10 + d1, minlength=100)
+        ).reshape(10, 10)
+
+        order = np.arange(len(sig), dtype=np.int64) * 2
+        first_seen = np.full(100, np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_seen, sig * 10 + d0, order)
+        np.minimum.at(first_seen, sig * 10 + d1, order + 1)
+        return touch_hist, match_counts, first_seen.reshape(10, 10)
+
+    def _gdb_tail_array(self, rows: List[List[str]]) -> np.ndarray:
+        """2 số cuối GĐB của từng kỳ dạng int (0-99), -1 nếu thiếu dữ liệu."""
+        tails = []
+        for row in rows:
+            gdb = get_gdb_last_2(row)
+            tails.append(int(gdb) if gdb else -1)
+        return np.array(tails, dtype=np.int64)
+
+    def _signal_code(self, row: List[str], col_idx: int, code: str) -> int:
+        signal = self._get_signal_value(row, col_idx, code)
+        return -1 if signal is None else signal
+
     def _get_signal_value(self, row: List[str], col_idx: int, code: str) -> Optional[int]:
         try:
             val_str = self._clean_str(row[col_idx])
@@ -568,59 +653,104 @@ class DeBridgeScanner:
     # MODULE 2: CẦU LOẠI (KILLER) - OPTIMIZED SCAN
     # =========================================================================
 
+    def scan_killers(self, all_data_ai: List[List[str]]) -> List[Dict[str, Any]]:
+        """
+        Quét riêng Cầu Loại (READ-ONLY), chỉ dùng scan_depth + 1 kỳ cuối.
+        Đủ nhanh để chạy mỗi lần làm mới Dashboard.
+        """
+        if not all_data_ai or len(all_data_ai) < 2:
+            return []
+        window = all_data_ai[-(self.scan_depth + 1):]
+        return self._scan_killer_bridges(window, self._preprocess_data(window))
+
     def _scan_killer_bridges(self, all_data_ai: List[List[str]], data_matrix: List[List[Optional[int]]]) -> List[Dict[str, Any]]:
         results = []
         try:
             limit_pos = 117
             scan_end_idx = len(all_data_ai)
-            
-            for i in range(limit_pos):
-                for j in range(i, limit_pos):
-                    killer_streak = 0
-                    # Quét ngược từ gần nhất về quá khứ
-                    for k in range(scan_end_idx - 1, 0, -1):
-                        if scan_end_idx - k > self.scan_depth: break
-                        
-                        gdb = get_gdb_last_2(all_data_ai[k])
-                        row_prev_vals = data_matrix[k-1]
-                        
-                        v1, v2 = row_prev_vals[i], row_prev_vals[j]
-                        if not gdb or v1 is None or v2 is None: break
-                        
-                        pred_touch = (v1 + v2) % 10
-                        has_touch = check_cham(gdb, [pred_touch])
-                        
-                        # Cầu loại cần "KHÔNG chạm", nếu có chạm là GÃY
-                        if not has_touch: 
-                            killer_streak += 1
-                        else: 
-                            break # STRICT BREAK
-
-                    if killer_streak >= self.min_killer_streak:
-                        curr_vals = data_matrix[-1]
-                        v1, v2 = curr_vals[i], curr_vals[j]
-                        
-                        if v1 is not None and v2 is not None:
-                            next_killer_touch = (v1 + v2) % 10
-                            p1_n = getPositionName_V17_Shadow(i).replace('[', '.').replace(']', '')
-                            p2_n = getPositionName_V17_Shadow(j).replace('[', '.').replace(']', '')
-                            
-                            results.append({
-                                "name": f"DE_KILLER_{p1_n}_{p2_n}",
-                                "type": "DE_KILLER",
-                                "streak": killer_streak,
-                                "predicted_value": f"LOẠI CHẠM {next_killer_touch}",
-                                "full_dan": "",
-                                "win_rate": 0,
-                                "display_desc": f"LOẠI Chạm {next_killer_touch} (Thông {killer_streak} kỳ). Từ: {p1_n}+{p2_n}",
-                                "pos1_idx": i,
-                                "pos2_idx": j
-                            })
+            n_days = min(self.scan_depth, scan_end_idx - 1)
+            if n_days <= 0:
+                return results
+
+            # Quét ngược từ gần nhất về quá khứ: kỳ k dùng vị trí của kỳ k-1
+            day_indices = range(scan_end_idx - 1, scan_end_idx - 1 - n_days, -1)
+            tails = self._gdb_tail_array([all_data_ai[k] for k in day_indices])
+            prev_pos = self._positions_array([data_matrix[k - 1] for k in day_indices], limit_pos)
+
+            pos1, pos2, streaks = self._killer_streaks(prev_pos, tails)
+
+            curr = self._positions_array([data_matrix[-1]], limit_pos)[0]
+            eligible = (streaks >= self.min_killer_streak) & (curr[pos1] >= 0) & (curr[pos2] >= 0)
+            pos1, pos2, streaks = pos1[eligible].tolist(), pos2[eligible].tolist(), streaks[eligible].tolist()
+
+            # Top-k theo streak (ổn định theo thứ tự cặp), chỉ dựng dict cho cặp lọt top
+            top = heapq.nlargest(self.killer_top_k, range(len(streaks)), key=streaks.__getitem__)
+
+            for t in top:
+                i, j, killer_streak = pos1[t], pos2[t], streaks[t]
+                next_killer_touch = (int(curr[i]) + int(curr[j])) % 10
+                p1_n = getPositionName_V17_Shadow(i).replace('[', '.').replace(']', '')
+                p2_n = getPositionName_V17_Shadow(j).replace('[', '.').replace(']', '')
+                
+                results.append({
+                    "name": f"DE_KILLER_{p1_n}_{p2_n}",
+                    "type": "DE_KILLER",
+                    "streak": killer_streak,
+                    "predicted_value": f"LOẠI CHẠM {next_killer_touch}",
+                    "full_dan": "",
+                    "numbers": generate_dan_de_from_touches([next_killer_touch]),
+                    "win_rate": 0,
+                    "display_desc": f"LOẠI Chạm {next_killer_touch} (Thông {killer_streak} kỳ). Từ: {p1_n}+{p2_n}",
+                    "pos1_idx": i,
+                    "pos2_idx": j
+                })
         except Exception as e:
             print(f">>> [ERROR] Lỗi quét Cầu Loại: {e}")
         
-        results.sort(key=lambda x: x['streak'], reverse=True)
-        return results[:15]
+        return results
+
+    def _killer_streaks(self, prev_pos: np.ndarray, tails: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Chuỗi "không chạm" liên tiếp (Mới -> Cũ) cho mọi cặp (i <= j).
+        Giai đoạn 1 xét min_killer_streak kỳ đầu cho toàn bộ cặp; chỉ cặp còn sống
+        mới được xét tiếp ở giai đoạn 2 (cặp gãy sớm không thể lọt ngưỡng).
+        Trả về: (pos1, pos2, streaks) theo thứ tự cặp (i, j) tăng dần.
+        """
+        n_days, n_pos = prev_pos.shape
+        pos1, pos2 = np.triu_indices(n_pos)
+        head = min(max(self.min_killer_streak, 0), n_days)
+
+        alive = self._killer_no_touch(prev_pos[:head], tails[:head], pos1, pos2).all(axis=0)
+        pos1, pos2 = pos1[alive], pos2[alive]
+
+        no_touch = self._killer_no_touch(prev_pos[head:], tails[head:], pos1, pos2)
+        return pos1, pos2, head + self._leading_run_lengths(no_touch)
+
+    @staticmethod
+    def _killer_no_touch(positions: np.ndarray, tails: np.ndarray, pos1: np.ndarray, pos2: np.ndarray) -> np.ndarray:
+        """Ma trận bool (days, pairs): True nếu chạm (v1 + v2) % 10 KHÔNG về trong GĐB."""
+        v1 = positions[:, pos1]
+        v2 = positions[:, pos2]
+        pred_touch = (v1 + v2) % 10
+        gdb = tails[:, None]
+        return (
+            (v1 >= 0) & (v2 >= 0) & (gdb >= 0)
+            & (pred_touch != gdb // 10) & (pred_touch != gdb % 10)
+        )
+
+    @staticmethod
+    def _leading_run_lengths(flags: np.ndarray) -> np.ndarray:
+        """Độ dài chuỗi True đầu tiên theo trục 0 (tìm False đầu tiên bằng argmin)."""
+        if flags.shape[0] == 0:
+            return np.zeros(flags.shape[1:], dtype=np.int64)
+        return np.where(flags.all(axis=0), flags.shape[0], np.argmin(flags, axis=0))
+
+    def _positions_array(self, rows: List[List[Optional[int]]], limit_pos: int) -> np.ndarray:
+        """Chuyển hàng vị trí V17 sang mảng int16 (rows, limit_pos); None -> -1."""
+        return np.array(
+            [[-1 if v is None else v for v in row[:limit_pos]] for row in rows],
+            dtype=np.int16
+        ).reshape(len(rows), limit_pos)
 
     # =========================================================================
     # MODULE 3: CẦU PASCAL
@@ -635,67 +765,39 @@ class DeBridgeScanner:
             {"name": "GDB_G1", "cols": [2, 3]}
         ]
 
+        # Vị trí p ứng với kỳ scan_data[p + 1]: GĐB hôm nay, input lấy từ kỳ trước
+        tails = self._gdb_tail_array(scan_data[1:])
+        has_gdb = tails >= 0
+
         for src in sources:
+            pairs = self._compute_pascal_reduction_batch(
+                [self._pascal_input_digits(row, src["cols"]) for row in scan_data[:-1]]
+            )
+            usable = has_gdb & (pairs[:, 0] >= 0)
+            wins = usable & (
+                (tails == pairs[:, 0] * 10 + pairs[:, 1]) | (tails == pairs[:, 1] * 10 + pairs[:, 0])
+            )
+
             # 1. Quét tìm cầu tiềm năng (Strict Streak)
             consecutive_streak = 0
             wins_10 = 0
+            n_days = len(tails)
+            has_gdb_list, usable_list, wins_list = has_gdb.tolist(), usable.tolist(), wins.tolist()
             
-            for k in range(len(scan_data) - 1, 0, -1):
-                row_curr = scan_data[k]
-                row_prev = scan_data[k-1]
-                gdb = get_gdb_last_2(row_curr)
-                if not gdb: break
-                
-                input_digits = []
-                valid_input = True
-                for col_idx in src["cols"]:
-                    val_str = self._clean_str(row_prev[col_idx])
-                    if not val_str: valid_input = False; break
-                    input_digits.extend([int(d) for d in val_str])
+            for pos in range(n_days - 1, -1, -1):
+                if not has_gdb_list[pos]: break
+                if not usable_list[pos]: continue
                 
-                if not valid_input or len(input_digits) < 2: continue
-                
-                final_pair = self._compute_pascal_reduction(input_digits)
-                if final_pair is None: continue
-                
-                pred_val = f"{final_pair[0]}{final_pair[1]}"
-                rev_val = f"{final_pair[1]}{final_pair[0]}"
-                is_win = (gdb == pred_val or gdb == rev_val)
-                days_ago = len(scan_data) - 1 - k
-                
-                if is_win:
+                days_ago = n_days - 1 - pos
+                if wins_list[pos]:
                     if consecutive_streak == days_ago: consecutive_streak += 1
                     if days_ago < self.history_check_len: wins_10 += 1
                 else:
                     if consecutive_streak > 0: break # STRICT BREAK
             
             if consecutive_streak >= self.min_streak or wins_10 >= self.rescue_wins_10:
-                # 2. Thu thập kết quả và dùng Helper để tính Metrics
-                results_bool = [] # Mới -> Cũ
-                
-                for k in range(len(scan_data) - 1, 0, -1):
-                    row_curr = scan_data[k]
-                    row_prev = scan_data[k-1]
-                    gdb = get_gdb_last_2(row_curr)
-                    if not gdb: continue
-                    
-                    input_digits = []
-                    valid_input = True
-                    for col_idx in src["cols"]:
-                        val_str = self._clean_str(row_prev[col_idx])
-                        if not val_str: valid_input = False; break
-                        input_digits.extend([int(d) for d in val_str])
-                    
-                    if not valid_input or len(input_digits) < 2: continue
-                    final_pair = self._compute_pascal_reduction(input_digits)
-                    if final_pair is None: continue
-                    
-                    pred_val = f"{final_pair[0]}{final_pair[1]}"
-                    rev_val = f"{final_pair[1]}{final_pair[0]}"
-                    is_win = (gdb == pred_val or gdb == rev_val)
-                    results_bool.append(is_win)
-
-                # Sử dụng Helper Function
+                # 2. Thu thập kết quả (Mới -> Cũ) và dùng Helper để tính Metrics
+                results_bool = wins[usable][::-1].tolist()
                 metrics = calculate_strict_performance(results_bool)
 
                 last_row = all_data_ai[-1]
@@ -719,17 +821,36 @@ class DeBridgeScanner:
                     })
         return results
 
+    def _pascal_input_digits(self, row: List[str], cols: List[int]) -> Optional[List[int]]:
+        digits = []
+        for col_idx in cols:
+            val_str = self._clean_str(row[col_idx])
+            if not val_str: return None
+            digits.extend(int(d) for d in val_str)
+        return digits
+
     def _compute_pascal_reduction(self, digits: List[int]) -> Optional[Tuple[int, int]]:
-        current_layer = digits
-        while len(current_layer) > 2:
-            next_layer = []
-            for i in range(len(current_layer) - 1):
-                sum_val = (current_layer[i] + current_layer[i+1]) % 10
-                next_layer.append(sum_val)
-            current_layer = next_layer
-        if len(current_layer) == 2:
-            return (current_layer[0], current_layer[1])
-        return None
+        if len(digits) < 2:
+            return None
+        left, right = _pascal_coefficients(len(digits)) @ np.asarray(digits, dtype=np.int64) % 10
+        return (int(left), int(right))
+
+    def _compute_pascal_reduction_batch(self, digit_rows: List[Optional[List[int]]]) -> np.ndarray:
+        """
+        Rút gọn Pascal cho nhiều kỳ cùng lúc.
+        Các hàng cùng độ dài được gom thành mảng (days, digits) và nhân với vector hệ số.
+        Trả về mảng (len(digit_rows), 2); hàng không hợp lệ mang giá trị -1.
+        """
+        pairs = np.full((len(digit_rows), 2), -1, dtype=np.int64)
+        rows_by_length: Dict[int, List[int]] = {}
+        for idx, digits in enumerate(digit_rows):
+            if digits is not None and len(digits) >= 2:
+                rows_by_length.setdefault(len(digits), []).append(idx)
+
+        for length, indices in rows_by_length.items():
+            block = np.array([digit_rows[i] for i in indices], dtype=np.int64)
+            pairs[indices] = block @ _pascal_coefficients(length).T % 10
+        return pairs
 
     # =========================================================================
     # MODULE 4: DYNAMIC & SUM (CLASSIC) - OPTIMIZED SCAN
@@ -768,9 +889,7 @@ class DeBridgeScanner:
                     if d1 is None or d2 is None: 
                         valid_history = False; break
                     
-                    base_sum = (d1 + d2) % 10
-                    touches = get_touches_by_offset(base_sum, k)
-                    if check_cham(gdb_today, touches): total_wins_check += 1
+                    if touch_hits(gdb_code(gdb_today), touch_bits((d1 + d2) % 10, k)): total_wins_check += 1
                 
                 if not valid_history: continue
                 
@@ -789,9 +908,7 @@ class DeBridgeScanner:
                             d1, d2 = row_prev_vals[idx1], row_prev_vals[idx2]
                             if d1 is None or d2 is None: continue
                             
-                            base_sum = (d1 + d2) % 10
-                            touches = get_touches_by_offset(base_sum, k)
-                            results_bool.append(check_cham(gdb_today, touches))
+                            results_bool.append(touch_hits(gdb_code(gdb_today), touch_bits((d1 + d2) % 10, k)))
 
                         # Sử dụng Helper Function
                         metrics = calculate_strict_performance(results_bool)
@@ -980,4 +1097,8 @@ def run_de_scanner(data, db_name=DB_NAME):
     """
     V11.2 K1N-Primary: Returns (candidates, meta) instead of (count, bridges).
     """
-    return DeBridgeScanner().scan_all(data, db_name)
\ No newline at end of file
+    return DeBridgeScanner().scan_all(data, db_name)
+
+def run_de_killer_scan(data):
+    """Quét nhanh Cầu Loại (READ-ONLY), trả về list dict top killer theo streak."""
+    return DeBridgeScanner().scan_killers(data)
\ No newline at end of file
@@ -6,7 +6,7 @@
 import os
 import sqlite3
 import sys
-from typing import Dict, List, Tuple, Set, Any
+from typing import Dict, List, Tuple, Set, Any, Iterator, Optional
 
 # =========================================================================
 # PATH FIX
@@ -23,14 +23,16 @@ except Exception:
 # IMPORTS
 # =========================================================================
 try:
-    from logic.config_manager import SETTINGS
+    from logic.config_manager import SETTINGS, resolve_settings
 except ImportError:
     SETTINGS = type("obj", (object,), {"AUTO_ADD_MIN_RATE": 50.0, "AUTO_PRUNE_MIN_RATE": 40.0})
+    def resolve_settings(settings=None): return settings if settings is not None else SETTINGS
 
 try:
     from logic.data_repository import get_all_managed_bridges
     from logic.db_manager import (
-        DB_NAME, get_all_managed_bridge_names, load_rates_cache
+        DB_NAME, get_all_managed_bridge_names, load_rates_cache,
+        upsert_managed_bridges_batch, update_bridge_k2n_cache_batch, upsert_bridge_rows
     )
     from logic.models import Candidate
     from logic.common_utils import normalize_bridge_name
@@ -39,8 +41,16 @@ except ImportError:
     def get_all_managed_bridge_names(*args, **kwargs): return set()
     def load_rates_cache(*args, **kwargs): return {}
     def get_all_managed_bridges(*args, **kwargs): return []
+    def upsert_managed_bridges_batch(*args, **kwargs): return {'added': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
+    def update_bridge_k2n_cache_batch(*args, **kwargs): return False, "DB unavailable"
     def normalize_bridge_name(name): return str(name).lower().strip()
 
+try:
+    from logic.instrumentation import perf_count, timed
+except ImportError:
+    def perf_count(name, n=1): pass
+    def timed(name): return lambda func: func
+
 try:
     from logic.bridges.bridges_classic import (
         checkHitSet_V30_K2N, getAllLoto_V30,
@@ -101,6 +111,14 @@ def _ensure_core_db_columns(cursor):
         pass
 
 
+def _to_upsert_dicts(bridges_to_upsert) -> List[Dict[str, Any]]:
+    """Chuyển tuple (name, desc, rate, db, idx1, idx2, data) sang dict cho upsert_managed_bridges_batch."""
+    return [
+        {**data_dict, "name": n, "description": d, "win_rate_text": r, "pos1_idx": i1, "pos2_idx": i2}
+        for n, d, r, _db, i1, i2, data_dict in bridges_to_upsert
+    ]
+
+
 def _get_existing_bridges_map(db_name) -> Dict:
     """Helper: Lấy toàn bộ cầu hiện có để tra cứu K1N cũ."""
     try:
@@ -114,7 +132,8 @@ def _get_existing_bridges_map(db_name) -> Dict:
 # ===================================================================================
 # I. HÀM DÒ CẦU V17 SHADOW (FIXED: FORCE UPDATE OLD BRIDGES)
 # ===================================================================================
-def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME):
+@timed("scanner.lo_v17")
+def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME, settings=None):
     """
     Dò tìm các cầu Lô Vị Trí (V17 Shadow) tốt nhất.
     
@@ -123,6 +142,7 @@ def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra,
         ky_bat_dau_kiem_tra: Kỳ bắt đầu kiểm tra
         ky_ket_thuc_kiem_tra: Kỳ kết thúc kiểm tra
         db_name: Đường dẫn database
+        settings: SettingsSnapshot (AUTO_ADD_MIN_RATE), mặc định SETTINGS lúc gọi
         
     Returns:
         List of results with bridge information
@@ -164,8 +184,10 @@ def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra,
             "prevPositions": getAllPositions_V17_Shadow(allData[prevRow_idx]),
             "actualLotoSet": set(getAllLoto_V30(allData[actualRow_idx])),
         })
+    perf_count("days_scanned", len(processedData))
+    perf_count("bridges_evaluated", len(algorithms))
 
-    AUTO_ADD_MIN_RATE = SETTINGS.AUTO_ADD_MIN_RATE
+    AUTO_ADD_MIN_RATE = resolve_settings(settings).AUTO_ADD_MIN_RATE
     bridges_to_upsert = []
     bridges_to_cache = []
 
@@ -242,7 +264,7 @@ def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra,
     if bridges_to_upsert:
         print(f"Dò cầu V17: Đang cập nhật {len(bridges_to_upsert)} cầu (bao gồm cầu cũ)...")
         try:
-            [upsert_managed_bridge(n, d, r, db, i1, i2, data_dict) for n, d, r, db, i1, i2, data_dict in bridges_to_upsert]
+            upsert_managed_bridges_batch(_to_upsert_dicts(bridges_to_upsert), db_name)
             update_bridge_k2n_cache_batch(bridges_to_cache, db_name)
             conn = sqlite3.connect(db_name)
             conn.execute("UPDATE ManagedBridges SET type='LO_POS' WHERE name LIKE 'LO_POS_%'")
@@ -257,7 +279,8 @@ def TIM_CAU_TOT_NHAT_V16(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra,
 # ===================================================================================
 # II. HÀM DÒ CẦU BẠC NHỚ (FIXED: FORCE UPDATE OLD BRIDGES)
 # ===================================================================================
-def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME):
+@timed("scanner.lo_memory")
+def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name=DB_NAME, settings=None):
     """
     Dò tìm các cầu Bạc Nhớ tốt nhất.
     
@@ -266,6 +289,7 @@ def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_
         ky_bat_dau_kiem_tra: Kỳ bắt đầu kiểm tra
         ky_ket_thuc_kiem_tra: Kỳ kết thúc kiểm tra
         db_name: Đường dẫn database
+        settings: SettingsSnapshot (AUTO_ADD_MIN_RATE), mặc định SETTINGS lúc gọi
         
     Returns:
         List of results with bridge information
@@ -292,7 +316,7 @@ def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_
             "actualLotoSet": set(getAllLoto_V30(allData[actualRow_idx])),
         })
 
-    AUTO_ADD_MIN_RATE = SETTINGS.AUTO_ADD_MIN_RATE
+    AUTO_ADD_MIN_RATE = resolve_settings(settings).AUTO_ADD_MIN_RATE
     bridges_to_upsert = []
     bridges_to_cache = []
     results = [["STT", "Cầu (Bạc Nhớ)", "Vị Trí", "Tỷ Lệ K2N", "Chuỗi"]]
@@ -307,6 +331,8 @@ def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_
             std_diff = f"LO_MEM_DIFF_{loto_names[i]}_{loto_names[j]}"
             desc_diff = f"Bạc Nhớ: Hiệu(|{loto_names[i]} - {loto_names[j]}|)"
             algorithms.append((i, j, "diff", std_diff, desc_diff))
+    perf_count("days_scanned", len(processedData))
+    perf_count("bridges_evaluated", len(algorithms))
 
     for idx1, idx2, alg_type, std_id, desc in algorithms:
         win_count, current_streak, max_streak = 0, 0, 0
@@ -362,7 +388,7 @@ def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_
     if bridges_to_upsert:
         print(f"Dò Bạc Nhớ: Đang cập nhật {len(bridges_to_upsert)} cầu (bao gồm cầu cũ)...")
         try:
-            [upsert_managed_bridge(n, d, r, db, i1, i2, data_dict) for n, d, r, db, i1, i2, data_dict in bridges_to_upsert]
+            upsert_managed_bridges_batch(_to_upsert_dicts(bridges_to_upsert), db_name)
             update_bridge_k2n_cache_batch(bridges_to_cache, db_name)
             conn = sqlite3.connect(db_name)
             conn.execute("UPDATE ManagedBridges SET type='LO_MEM' WHERE name LIKE 'LO_MEM_%'")
@@ -377,6 +403,12 @@ def TIM_CAU_BAC_NHO_TOT_NHAT(toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_
 # ===================================================================================
 # III. HÀM CẬP NHẬT CẦU CỐ ĐỊNH
 # ===================================================================================
+FIXED_BRIDGE_COLUMNS = (
+    "name", "description", "win_rate_text", "search_rate_text",
+    "current_streak", "next_prediction_stl", "is_enabled", "type",
+)
+
+
 def update_fixed_lo_bridges(all_data_ai, db_name):
     """
     Cập nhật 15 cầu Lô Cố Định (Fixed Bridges).
@@ -395,11 +427,7 @@ def update_fixed_lo_bridges(all_data_ai, db_name):
     check_days = 10 
     scan_data = all_data_ai[- (check_days + 5):]
     
-    updated_count = 0
-    
-    conn = sqlite3.connect(db_name)
-    cursor = conn.cursor()
-    _ensure_core_db_columns(cursor)
+    rows = []
     
     for bridge_id, info in LO_BRIDGE_MAP.items():
         func = info["func"]
@@ -435,27 +463,20 @@ def update_fixed_lo_bridges(all_data_ai, db_name):
         full_desc = f"{desc}. Phong độ {wins}/{check_days}."
         rate_str = f"{win_rate:.0f}%"
         
-        try:
-            cursor.execute("SELECT count(*) FROM ManagedBridges WHERE name=?", (bridge_id,))
-            exists = cursor.fetchone()[0] > 0
-            
-            if not exists:
-                cursor.execute("""
-                    INSERT INTO ManagedBridges (name, description, win_rate_text, search_rate_text, current_streak, next_prediction_stl, is_enabled, type)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (bridge_id, full_desc, rate_str, rate_str, current_streak, pred_val, 1 if win_rate>=40 else 0, 'LO_STL_FIXED'))
-            else:
-                cursor.execute("""
-                    UPDATE ManagedBridges 
-                    SET description=?, win_rate_text=?, search_rate_text=?, current_streak=?, next_prediction_stl=?, is_enabled=?, type='LO_STL_FIXED'
-                    WHERE name=?
-                """, (full_desc, rate_str, rate_str, current_streak, pred_val, 1 if win_rate>=40 else 0, bridge_id))
-            updated_count += 1
-        except Exception as e: 
-            print(f"Lỗi update Fixed Bridge {bridge_id}: {e}")
-            
-    conn.commit()
-    conn.close()
+        rows.append((bridge_id, full_desc, rate_str, rate_str, current_streak, pred_val, 1 if win_rate>=40 else 0, 'LO_STL_FIXED'))
+    
+    conn = sqlite3.connect(db_name)
+    try:
+        _ensure_core_db_columns(conn.cursor())
+        upsert_bridge_rows(conn, FIXED_BRIDGE_COLUMNS, rows)
+        conn.commit()
+        updated_count = len(rows)
+    except Exception as e:
+        print(f"Lỗi update Fixed Bridges: {e}")
+        conn.rollback()
+        updated_count = 0
+    finally:
+        conn.close()
     return updated_count
 
 
@@ -463,11 +484,17 @@ def update_fixed_lo_bridges(all_data_ai, db_name):
 # V. K1N-PRIMARY REFACTORED WRAPPERS (V11.2)
 # ===================================================================================
 
+# Số candidate tối đa mỗi batch khi stream kết quả quét Lô
+LO_STREAM_BATCH_SIZE = 500
+
+
+@timed("scanner.lo_candidates")
 def scan_lo_bridges_v17(
     toan_bo_A_I, 
     ky_bat_dau_kiem_tra, 
     ky_ket_thuc_kiem_tra, 
-    db_name=DB_NAME
+    db_name=DB_NAME,
+    settings=None
 ) -> Tuple[List[Candidate], Dict[str, Any]]:
     """
     V11.2 K1N-Primary: Scan LO V17 bridges and return Candidate objects (READ-ONLY).
@@ -479,6 +506,7 @@ def scan_lo_bridges_v17(
         ky_bat_dau_kiem_tra: Start period for checking
         ky_ket_thuc_kiem_tra: End period for checking
         db_name: Database path (for reading existing bridges only)
+        settings: SettingsSnapshot for AUTO_ADD_MIN_RATE (default: SETTINGS at call time)
         
     Returns:
         Tuple of (candidates: List[Candidate], meta: Dict):
@@ -487,6 +515,56 @@ def scan_lo_bridges_v17(
     """
     print(">>> [LO SCANNER V11.2] Scanning V17 bridges (K1N-Primary Read-Only)...")
     
+    stats: Dict[str, Any] = {}
+    candidates = []
+    for batch in iter_lo_candidate_batches(
+        toan_bo_A_I, ky_bat_dau_kiem_tra, ky_ket_thuc_kiem_tra, db_name, stats=stats, settings=settings
+    ):
+        candidates.extend(batch)
+    
+    meta = {
+        'found_total': stats['found_total'],
+        'excluded_existing': stats['excluded_existing'],
+        'returned_count': stats['returned_count']
+    }
+    
+    perf_count("candidates_found", meta['found_total'])
+    print(f">>> [LO SCANNER] Kết quả V17: {meta['found_total']} tìm thấy, {meta['excluded_existing']} đã tồn tại, {len(candidates)} trả về.")
+    return candidates, meta
+
+
+def iter_lo_candidate_batches(
+    toan_bo_A_I,
+    ky_bat_dau_kiem_tra,
+    ky_ket_thuc_kiem_tra,
+    db_name=DB_NAME,
+    batch_size: int = LO_STREAM_BATCH_SIZE,
+    stats: Optional[Dict[str, Any]] = None,
+    settings=None
+) -> Iterator[List[Candidate]]:
+    """
+    V11.5: Stream LO V17 candidates (READ-ONLY) in batches of up to batch_size.
+    
+    Pairs are evaluated lazily, so a consumer that stops iterating (e.g. once its
+    quota is reached) also stops the scan.
+    
+    Args:
+        toan_bo_A_I: Historical lottery data
+        ky_bat_dau_kiem_tra: Start period for checking
+        ky_ket_thuc_kiem_tra: End period for checking
+        db_name: Database path (for reading existing bridges only)
+        batch_size: Maximum number of bridges converted per yielded batch
+        stats: Optional dict updated in place with 'found_total',
+               'excluded_existing' and 'returned_count'
+        settings: SettingsSnapshot for AUTO_ADD_MIN_RATE (default: SETTINGS at call time)
+        
+    Yields:
+        Lists of Candidate objects (existing bridges excluded)
+    """
+    if stats is None:
+        stats = {}
+    stats.update({'found_total': 0, 'excluded_existing': 0, 'returned_count': 0})
+    
     # Get data from original scanner
     allData = toan_bo_A_I
     finalEndRow = ky_ket_thuc_kiem_tra
@@ -497,21 +575,16 @@ def scan_lo_bridges_v17(
     try:
         last_positions = getAllPositions_V17_Shadow(last_row_real)
     except:
-        return [], {'found_total': 0, 'excluded_existing': 0, 'returned_count': 0}
+        return
     
     try:
         positions_shadow = getAllPositions_V17_Shadow(allData[0])
         num_positions_shadow = len(positions_shadow)
     except:
-        return [], {'found_total': 0, 'excluded_existing': 0, 'returned_count': 0}
+        return
     
     if num_positions_shadow == 0:
-        return [], {'found_total': 0, 'excluded_existing': 0, 'returned_count': 0}
-    
-    algorithms = []
-    for i in range(num_positions_shadow):
-        for j in range(i, num_positions_shadow):
-            algorithms.append((i, j))
+        return
     
     processedData = []
     for k in range(startCheckRow, finalEndRow + 1):
@@ -523,73 +596,73 @@ def scan_lo_bridges_v17(
             "actualLotoSet": set(getAllLoto_V30(allData[actualRow_idx])),
         })
     
-    AUTO_ADD_MIN_RATE = SETTINGS.AUTO_ADD_MIN_RATE
-    bridge_dicts = []
-    
-    for idx1, idx2 in algorithms:
-        pos1_name = getPositionName_V17_Shadow(idx1)
-        pos2_name = getPositionName_V17_Shadow(idx2)
-        safe_p1 = _sanitize_name_v2(pos1_name)
-        safe_p2 = _sanitize_name_v2(pos2_name)
-        std_id = f"LO_POS_{safe_p1}_{safe_p2}"
-        
-        win_count, current_streak, max_streak = 0, 0, 0
-        for dayData in processedData:
-            a, b = dayData["prevPositions"][idx1], dayData["prevPositions"][idx2]
-            if a is None or b is None:
-                current_streak = 0
-                continue
-            
-            if "✅" in checkHitSet_V30_K2N(taoSTL_V30_Bong(a, b), dayData["actualLotoSet"]):
-                win_count += 1
-                current_streak += 1
-            else:
-                current_streak = 0
-            max_streak = max(max_streak, current_streak)
-        
-        totalTestDays = len(processedData)
-        if totalTestDays > 0:
-            scan_rate = (win_count / totalTestDays) * 100
-            
-            # Only include if meets threshold
-            if scan_rate >= AUTO_ADD_MIN_RATE:
-                a_pred, b_pred = last_positions[idx1], last_positions[idx2]
-                if a_pred is not None and b_pred is not None:
-                    next_pred_str = calculate_bridge_stl(a_pred, b_pred)
-                else:
-                    next_pred_str = "N/A"
-                
-                bridge_dicts.append({
-                    'name': std_id,
-                    'type': 'LO_POS',
-                    'description': f"Vị trí: {pos1_name} + {pos2_name}",
-                    'win_rate': scan_rate,
-                    'streak': current_streak,
-                    'predicted_value': next_pred_str,
-                    'pos1_idx': idx1,
-                    'pos2_idx': idx2,
-                    'win_count_10': win_count if totalTestDays <= 10 else int((scan_rate / 100.0) * 10)
-                })
-    
-    found_total = len(bridge_dicts)
-    
     # Load existing names and rates cache (SINGLE DB CALL EACH)
     print(f">>> [LO SCANNER] Loading existing bridges and rates cache...")
     existing_names = get_all_managed_bridge_names(db_name)
     rates_cache = load_rates_cache(db_name)
     
-    # Convert to Candidates with rates and exclude existing
-    candidates = _convert_lo_bridges_to_candidates(bridge_dicts, existing_names, rates_cache)
-    excluded_count = found_total - len(candidates)
+    AUTO_ADD_MIN_RATE = resolve_settings(settings).AUTO_ADD_MIN_RATE
+    bridge_dicts = []
     
-    meta = {
-        'found_total': found_total,
-        'excluded_existing': excluded_count,
-        'returned_count': len(candidates)
-    }
+    def _flush():
+        candidates = _convert_lo_bridges_to_candidates(bridge_dicts, existing_names, rates_cache)
+        stats['found_total'] += len(bridge_dicts)
+        stats['returned_count'] += len(candidates)
+        stats['excluded_existing'] = stats['found_total'] - stats['returned_count']
+        bridge_dicts.clear()
+        return candidates
     
-    print(f">>> [LO SCANNER] Kết quả V17: {found_total} tìm thấy, {excluded_count} đã tồn tại, {len(candidates)} trả về.")
-    return candidates, meta
+    for idx1 in range(num_positions_shadow):
+        for idx2 in range(idx1, num_positions_shadow):
+            pos1_name = getPositionName_V17_Shadow(idx1)
+            pos2_name = getPositionName_V17_Shadow(idx2)
+            safe_p1 = _sanitize_name_v2(pos1_name)
+            safe_p2 = _sanitize_name_v2(pos2_name)
+            std_id = f"LO_POS_{safe_p1}_{safe_p2}"
+            
+            win_count, current_streak, max_streak = 0, 0, 0
+            for dayData in processedData:
+                a, b = dayData["prevPositions"][idx1], dayData["prevPositions"][idx2]
+                if a is None or b is None:
+                    current_streak = 0
+                    continue
+                
+                if "✅" in checkHitSet_V30_K2N(taoSTL_V30_Bong(a, b), dayData["actualLotoSet"]):
+                    win_count += 1
+                    current_streak += 1
+                else:
+                    current_streak = 0
+                max_streak = max(max_streak, current_streak)
+            
+            totalTestDays = len(processedData)
+            if totalTestDays > 0:
+                scan_rate = (win_count / totalTestDays) * 100
+                
+                # Only include if meets threshold
+                if scan_rate >= AUTO_ADD_MIN_RATE:
+                    a_pred, b_pred = last_positions[idx1], last_positions[idx2]
+                    if a_pred is not None and b_pred is not None:
+                        next_pred_str = calculate_bridge_stl(a_pred, b_pred)
+                    else:
+                        next_pred_str = "N/A"
+                    
+                    bridge_dicts.append({
+                        'name': std_id,
+                        'type': 'LO_POS',
+                        'description': f"Vị trí: {pos1_name} + {pos2_name}",
+                        'win_rate': scan_rate,
+                        'streak': current_streak,
+                        'predicted_value': next_pred_str,
+                        'pos1_idx': idx1,
+                        'pos2_idx': idx2,
+                        'win_count_10': win_count if totalTestDays <= 10 else int((scan_rate / 100.0) * 10)
+                    })
+                    
+                    if len(bridge_dicts) >= batch_size:
+                        yield _flush()
+    
+    if bridge_dicts:
+        yield _flush()
 
 
 def _convert_lo_bridges_to_candidates(
@@ -10,6 +10,7 @@ V11.2: Enhanced with retry decorator and timestamp helpers for K1N-primary flow.
 
 import re
 import time
+import unicodedata
 import functools
 import sqlite3
 from datetime import datetime
@@ -287,6 +288,10 @@ def clean_stl_string(stl_text: str) -> str:
 # STRING UTILITIES
 # =============================================================================
 
+# Max distinct raw bridge names whose normalized form is memoized
+NORMALIZED_NAME_CACHE_SIZE = 1 << 17
+
+
 def normalize_bridge_name(name: str) -> str:
     """
     Normalize bridge name for comparison and storage.
@@ -296,6 +301,9 @@ def normalize_bridge_name(name: str) -> str:
     - Removes special characters and Vietnamese diacritics
     - Normalizes to ASCII-safe form
 
+    Results are memoized per raw name (the same bridge names are normalized
+    again on every scan), so repeated calls are a dict lookup.
+
     Args:
         name: Bridge name to normalize
 
@@ -310,10 +318,12 @@ def normalize_bridge_name(name: str) -> str:
     """
     if not name:
         return ""
+    return _normalize_bridge_name_cached(name if isinstance(name, str) else str(name))
 
-    import unicodedata
-    
-    name = str(name).strip().lower()
+
+@functools.lru_cache(maxsize=NORMALIZED_NAME_CACHE_SIZE)
+def _normalize_bridge_name_cached(name: str) -> str:
+    name = name.strip().lower()
     
     # Vietnamese character mapping to ASCII
     vietnamese_map = {
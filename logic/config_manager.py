@@ -1,8 +1,10 @@
 # Tên file: git1/logic/config_manager.py
+import copy
 import json
 import os
 import threading
 import traceback
+import zlib
 
 # Import nguồn chân lý (Source of Truth)
 try:
@@ -39,6 +41,105 @@ except ImportError:
 
 CONFIG_FILE = "config.json"
 
+
+def _freeze(value):
+    """Dạng băm được của một giá trị cài đặt (dict/list lồng nhau -> tuple)."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+class SettingsSnapshot:
+    """
+    Bản chụp cài đặt BẤT BIẾN và băm được (SETTINGS.snapshot()).
+
+    Đọc như SETTINGS: snapshot.HIGH_WIN_THRESHOLD, snapshot.get(key, default),
+    getattr(snapshot, key, default). Kịch bản "what-if" tạo bản mới bằng
+    snapshot.with_overrides(KEY=value) thay vì setattr lên SETTINGS toàn cục,
+    nên nhiều kịch bản chạy song song không giẫm lên nhau. hash(snapshot) /
+    snapshot.fingerprint dùng được làm khóa cache.
+    """
+
+    __slots__ = ("_values", "_frozen", "_hash")
+
+    def __init__(self, values=None):
+        values = copy.deepcopy(dict(values or {}))
+        frozen = _freeze(values)
+        object.__setattr__(self, "_values", values)
+        object.__setattr__(self, "_frozen", frozen)
+        object.__setattr__(self, "_hash", hash(frozen))
+
+    def __getattr__(self, name):
+        try:
+            value = self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+    def __setattr__(self, name, value):
+        raise AttributeError("SettingsSnapshot là bất biến, dùng with_overrides()")
+
+    def __delattr__(self, name):
+        raise AttributeError("SettingsSnapshot là bất biến, dùng with_overrides()")
+
+    def __reduce__(self):
+        return (SettingsSnapshot, (self._values,))
+
+    def __eq__(self, other):
+        return isinstance(other, SettingsSnapshot) and self._frozen == other._frozen
+
+    def __hash__(self):
+        return self._hash
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __repr__(self):
+        return f"<SettingsSnapshot {self.fingerprint} ({len(self._values)} keys)>"
+
+    def get(self, key, default=None):
+        value = self._values.get(key, default)
+        return copy.deepcopy(value) if isinstance(value, (dict, list, set)) else value
+
+    def get_all_settings(self):
+        return copy.deepcopy(self._values)
+
+    def snapshot(self):
+        return self
+
+    def with_overrides(self, overrides=None, **kwargs):
+        """Bản chụp mới với một số giá trị thay đổi (bản hiện tại giữ nguyên)."""
+        changes = dict(overrides or {}, **kwargs)
+        if all(k in self._values and self._values[k] == v for k, v in changes.items()):
+            return self
+        values = dict(self._values)
+        values.update(changes)
+        return SettingsSnapshot(values)
+
+    @property
+    def fingerprint(self):
+        """CRC ổn định giữa các tiến trình (khác hash() của str) - khóa cache lưu DB."""
+        text = json.dumps(self._values, sort_keys=True, default=str)
+        return f"{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+def _live_settings(obj):
+    """Cài đặt đang dùng: dict settings + thuộc tính VIẾT HOA được gán trực tiếp (SETTINGS.X = ...)."""
+    values = dict(obj.settings)
+    for name, value in vars(obj).items():
+        if name.isupper():
+            values[name] = value
+    return values
+
+
 class ConfigManager:
     _instance = None
     _lock = threading.Lock()
@@ -117,6 +218,10 @@ class ConfigManager:
     def get_all_settings(self):
         return self.settings.copy()
 
+    def snapshot(self):
+        """SettingsSnapshot bất biến của cài đặt hiện tại (truyền cho scorer/scanner thay vì đọc SETTINGS)."""
+        return SettingsSnapshot(_live_settings(self))
+
     def update_setting(self, key, value):
         """Cập nhật một cài đặt (chưa lưu file)."""
         try:
@@ -174,6 +279,9 @@ except Exception as e:
         
         def get_all_settings(self):
             return self.settings
+
+        def snapshot(self):
+            return SettingsSnapshot(_live_settings(self))
             
         def update_setting(self, key, value):
             return False, "Chế độ Fallback (Không thể lưu)"
@@ -187,5 +295,13 @@ except Exception as e:
     SETTINGS = FallbackSettings()
     print("-> Đã kích hoạt chế độ Fallback Settings (Sử dụng Default).")
 
+
+def resolve_settings(settings=None):
+    """settings nếu được truyền (snapshot), ngược lại snapshot của SETTINGS toàn cục lúc gọi."""
+    if settings is not None:
+        return settings
+    return SETTINGS.snapshot() if hasattr(SETTINGS, "snapshot") else SETTINGS
+
+
 # Backward compatibility alias
 AppSettings = ConfigManager
\ No newline at end of file
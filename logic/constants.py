@@ -73,6 +73,15 @@ DEFAULT_SETTINGS = {
     "K2N_CACHE_LO_ENABLED": True,      # Enable K2N cache refresh for LO bridges
     "K2N_CACHE_DE_ENABLED": True,      # Enable K2N cache refresh for DE bridges
     
+    # Đo hiệu năng theo stage (logic/instrumentation.py)
+    "PERF_LOG_ENABLED": True,          # Ghi thời gian từng stage vào perf_log + logs/perf_log.json
+    "PERF_PROFILE_MODE": "off",        # 'off' / 'cprofile' / 'tracemalloc' cho stage ngoài cùng
+    "PERF_LOG_JSON_MAX": 500,          # Số bản ghi giữ lại trong file JSON cuộn
+    "PERF_LOG_MIN_SECONDS": 0.05,      # Bỏ qua tác vụ ngắn hơn ngưỡng này (giây)
+
+    # Lịch sử Ăn/Gãy từng kỳ của cầu (logic/bridge_outcomes.py)
+    "BRIDGE_OUTCOMES_MAX_DAYS": 365,   # Số kỳ cuối giữ trong bảng BridgeOutcomes
+
     # Manager Rate Mode
     "MANAGER_RATE_MODE": "K1N",        # Backtest mode for bridge rate calculation (K1N/K2N)
     
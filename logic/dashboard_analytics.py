@@ -251,7 +251,7 @@ def _determine_de_dyn_visibility(bridge, enable_threshold_raw, disable_threshold
     
 #     return filtered_bridges
 
-def get_cau_dong_for_tab_soi_cau_de(db_name=None, threshold_thong=None):
+def get_cau_dong_for_tab_soi_cau_de(db_name=None, threshold_thong=None, verbose=True):
     """
     Simplified visibility: only apply DE_KILLER exclusion. All other bridges
     (including DE_*, non-DE, dynamic variants, etc.) will be returned as-is,
@@ -260,6 +260,7 @@ def get_cau_dong_for_tab_soi_cau_de(db_name=None, threshold_thong=None):
     Args:
         db_name: Đường dẫn database (None = mặc định)
         threshold_thong: Legacy parameter (kept for compatibility, not used)
+        verbose: False = không in log từng cầu bị lọc / tổng kết (snapshot Đề)
 
     Returns:
         List[Dict]: Danh sách các bridge dict đã lọc
@@ -288,7 +289,8 @@ def get_cau_dong_for_tab_soi_cau_de(db_name=None, threshold_thong=None):
         if bridge_type == "DE_KILLER":
             filtered_count["DE_KILLER"] += 1
             # Keep a debug print for visibility
-            print(f"  [FILTERED] DE_KILLER: {bridge_name}")
+            if verbose:
+                print(f"  [FILTERED] DE_KILLER: {bridge_name}")
             continue
 
         # No other filtering: include the bridge
@@ -301,10 +303,11 @@ def get_cau_dong_for_tab_soi_cau_de(db_name=None, threshold_thong=None):
         filtered_bridges.append(bridge)
 
     # Summary log
-    print(f"\n[get_cau_dong_for_tab_soi_cau_de] Summary:")
-    print(f"  - Total from DB: {len(all_bridges)}")
-    print(f"  - Filtered DE_KILLER: {filtered_count['DE_KILLER']}")
-    print(f"  - Final result: {len(filtered_bridges)}")
+    if verbose:
+        print(f"\n[get_cau_dong_for_tab_soi_cau_de] Summary:")
+        print(f"  - Total from DB: {len(all_bridges)}")
+        print(f"  - Filtered DE_KILLER: {filtered_count['DE_KILLER']}")
+        print(f"  - Final result: {len(filtered_bridges)}")
 
     return filtered_bridges
 
@@ -6,6 +6,19 @@ import os
 import time
 from typing import List, Dict, Set, Optional, Tuple, Any
 
+try:
+    from .instrumentation import perf_count, timed
+except ImportError:
+    def perf_count(name, n=1): pass
+    def timed(name): return lambda func: func
+
+try:
+    from .common_utils import normalize_bridge_name
+except ImportError:
+    # Fallback: simple normalization
+    def normalize_bridge_name(name):
+        return str(name).strip().lower() if name else ""
+
 # --- CẤU HÌNH ĐƯỜNG DẪN DB TUYỆT ĐỐI ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)
@@ -92,7 +105,9 @@ def setup_database(db_name=DB_NAME):
         ("k2n_rate_lo", "REAL DEFAULT 0.0"),
         ("k2n_rate_de", "REAL DEFAULT 0.0"),
         ("is_pending", "INTEGER DEFAULT 1"),
-        ("imported_at", "TEXT DEFAULT (datetime('now','localtime'))")
+        ("imported_at", "TEXT DEFAULT (datetime('now','localtime'))"),
+        # Tên chuẩn hóa (normalize_bridge_name) lưu sẵn để kiểm tra trùng không phải tính lại
+        ("normalized_name", "TEXT")
     ]
     
     for col_name, col_type in columns_to_add:
@@ -105,6 +120,10 @@ def setup_database(db_name=DB_NAME):
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_results_ky ON results_A_I(ky)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_dulieu_masoky ON DuLieu_AI(MaSoKy)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_bridges_enabled ON ManagedBridges(is_enabled)")
+    backfill_normalized_names(conn)
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bridges_normalized_name ON ManagedBridges(normalized_name)"
+    )
 
     conn.commit()
     return conn, cursor
@@ -150,8 +169,17 @@ def delete_ky_from_db(ky, db_name=DB_NAME):
         cursor = conn.cursor()
         cursor.execute("DELETE FROM results_A_I WHERE ky = ?", (ky,))
         c1 = cursor.rowcount
+        cursor.execute("SELECT MaSoKy FROM DuLieu_AI WHERE Col_A_Ky = ?", (ky,))
+        ma_so_ky = [r[0] for r in cursor.fetchall()]
         cursor.execute("DELETE FROM DuLieu_AI WHERE Col_A_Ky = ?", (ky,))
         c2 = cursor.rowcount
+        try:
+            # Kết quả cầu đã lưu cho kỳ này không còn đúng
+            from .bridge_outcomes import purge_bridge_outcomes
+            for ma in ma_so_ky:
+                purge_bridge_outcomes(conn, ky=ma)
+        except ImportError:
+            pass
         conn.commit()
         return True, f"Đã xóa kỳ {ky} ({c1+c2} bản ghi)"
     except Exception as e:
@@ -291,94 +319,245 @@ def toggle_pin_bridge(bridge_name, db_name=DB_NAME):
     finally:
         if conn: conn.close()
 
-def _upsert_managed_bridge_impl(conn, bridge_dict, db_name=DB_NAME):
+# --- UPSERT ENGINE (V11.5): INSERT ... ON CONFLICT(name) DO UPDATE, executemany theo lô ---
+UPSERT_CHUNK_SIZE = 2000
+
+# Cột ghi khi upsert cầu từ scanner (ngữ nghĩa "merge": giữ giá trị cũ nếu input rỗng)
+_MERGE_COLUMNS = (
+    "name", "description", "win_rate_text", "pos1_idx", "pos2_idx", "type", "is_enabled",
+    "search_rate_text", "search_period", "max_lose_streak_k2n", "recent_win_count_10",
+)
+_MERGE_UPDATE_SQL = """
+    description=excluded.description,
+    type=excluded.type,
+    is_enabled=excluded.is_enabled,
+    pos1_idx=COALESCE(excluded.pos1_idx, pos1_idx),
+    pos2_idx=COALESCE(excluded.pos2_idx, pos2_idx),
+    win_rate_text=CASE WHEN excluded.win_rate_text != 'N/A' THEN excluded.win_rate_text ELSE win_rate_text END,
+    search_rate_text=CASE WHEN excluded.search_rate_text != '0.00%' THEN excluded.search_rate_text ELSE search_rate_text END,
+    search_period=CASE WHEN excluded.search_period > 0 THEN excluded.search_period ELSE search_period END,
+    max_lose_streak_k2n=CASE WHEN excluded.max_lose_streak_k2n > 0 THEN excluded.max_lose_streak_k2n ELSE max_lose_streak_k2n END,
+    recent_win_count_10=CASE WHEN excluded.recent_win_count_10 > 0 THEN excluded.recent_win_count_10 ELSE recent_win_count_10 END
+"""
+# Self-Healing: Win Rate đang N/A mà Search Rate đã có dữ liệu -> dùng Search Rate
+_HEAL_WIN_RATE_SQL = """
+    UPDATE ManagedBridges SET win_rate_text = search_rate_text
+    WHERE name = ? AND (win_rate_text IS NULL OR win_rate_text = 'N/A')
+      AND search_rate_text IS NOT NULL AND search_rate_text NOT IN ('', '0.00%')
+"""
+
+
+# --- TÊN CHUẨN HÓA: ManagedBridges.normalized_name (UNIQUE, NULL = tên trùng với cầu khác) ---
+
+_normalized_column_cache = {}   # {(file CSDL, schema_version): có cột normalized_name}
+_OWNER_LOOKUP_CHUNK = 500       # Số tham số mỗi câu IN (dưới giới hạn 999 của SQLite cũ)
+
+
+def _has_normalized_column(conn):
+    """Bảng có cột normalized_name? Chỉ đọc PRAGMA table_info một lần cho mỗi CSDL + phiên bản schema."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2] or f":memory:{id(conn)}"
+    key = (path, conn.execute("PRAGMA schema_version").fetchone()[0])
+    cached = _normalized_column_cache.get(key)
+    if cached is None:
+        cached = any(row[1] == "normalized_name" for row in conn.execute("PRAGMA table_info(ManagedBridges)"))
+        if len(_normalized_column_cache) > 64:
+            _normalized_column_cache.clear()
+        _normalized_column_cache[key] = cached
+    return cached
+
+
+def _normalized_name_owners(conn, norms=None):
+    """{normalized_name: name} của các cầu đang giữ tên chuẩn hóa (chỉ các khóa `norms` nếu có)."""
+    if norms is None:
+        return dict(conn.execute(
+            "SELECT normalized_name, name FROM ManagedBridges WHERE normalized_name IS NOT NULL"
+        ).fetchall())
+    norms = [n for n in set(norms) if n]
+    owners = {}
+    for start in range(0, len(norms), _OWNER_LOOKUP_CHUNK):
+        chunk = norms[start:start + _OWNER_LOOKUP_CHUNK]
+        owners.update(conn.execute(
+            f"SELECT normalized_name, name FROM ManagedBridges WHERE normalized_name IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall())
+    return owners
+
+
+def _claim_normalized_name(owners, name):
     """
-    Implementation của upsert_managed_bridge.
-    Internal function - nên gọi qua wrapper upsert_managed_bridge().
+    Giá trị normalized_name lưu cho cầu `name`: None nếu một cầu khác (cùng tên
+    chuẩn hóa, khác cách viết) đã giữ khóa đó - cột vẫn UNIQUE, cầu trùng
+    được đọc lại bằng normalize_bridge_name như trước.
     """
+    norm = normalize_bridge_name(name)
+    if not norm:
+        return None
+    return norm if owners.setdefault(norm, name) == name else None
+
+
+def backfill_normalized_names(conn):
+    """Điền normalized_name cho các cầu cũ còn NULL (không commit). Trả về số cầu được điền."""
+    try:
+        rows = conn.execute(
+            "SELECT id, name FROM ManagedBridges WHERE normalized_name IS NULL AND name IS NOT NULL ORDER BY id"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return 0  # Bảng cũ chưa có cột
+    if not rows:
+        return 0
+    owners = _normalized_name_owners(conn)
+    updates = []
+    for bridge_id, name in rows:
+        norm = _claim_normalized_name(owners, name)
+        if norm is not None:
+            updates.append((norm, bridge_id))
+    conn.executemany("UPDATE ManagedBridges SET normalized_name = ? WHERE id = ?", updates)
+    return len(updates)
+
+
+def _select_bridge_names(cursor, extra_columns=""):
+    """Hàng (name, normalized_name, *extra_columns); DB cũ chưa có cột thì normalized_name = None."""
+    try:
+        cursor.execute(f"SELECT name, normalized_name{extra_columns} FROM ManagedBridges")
+    except sqlite3.OperationalError:
+        cursor.execute(f"SELECT name, NULL{extra_columns} FROM ManagedBridges")
+    return cursor.fetchall()
+
+
+def upsert_bridge_rows(conn, columns, rows, update_sql=None, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Engine upsert chung cho ManagedBridges (không commit - caller quản lý transaction).
+    
+    Args:
+        conn: Kết nối sqlite3
+        columns: Tên cột theo thứ tự giá trị trong mỗi row (phải có 'name')
+        rows: List tuple giá trị
+        update_sql: Mệnh đề SET cho DO UPDATE (mặc định: ghi đè mọi cột bằng excluded.*)
+        chunk_size: Số row mỗi lần executemany
+        
+    Returns:
+        (added, updated) - tính từ total_changes và số dòng trước/sau
+    """
+    columns = tuple(columns)
+    if "normalized_name" not in columns and _has_normalized_column(conn):
+        # Tên chuẩn hóa được ghi cùng câu INSERT (không tốn thêm lượt UPDATE)
+        name_idx = columns.index("name")
+        owners = _normalized_name_owners(conn, (normalize_bridge_name(row[name_idx]) for row in rows))
+        rows = [tuple(row) + (_claim_normalized_name(owners, row[name_idx]),) for row in rows]
+        columns += ("normalized_name",)
+        if update_sql is not None:
+            update_sql = f"{update_sql.rstrip()},\n    normalized_name=excluded.normalized_name"
+    if update_sql is None:
+        update_sql = ", ".join(f"{col}=excluded.{col}" for col in columns if col != "name")
+    sql = (
+        f"INSERT INTO ManagedBridges ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(name) DO UPDATE SET {update_sql}"
+    )
     cursor = conn.cursor()
+    rows_before = cursor.execute("SELECT COUNT(*) FROM ManagedBridges").fetchone()[0]
+    changes_before = conn.total_changes
+    
+    for start in range(0, len(rows), chunk_size):
+        cursor.executemany(sql, rows[start:start + chunk_size])
     
-    # Normalize key names
+    changes = conn.total_changes - changes_before
+    added = cursor.execute("SELECT COUNT(*) FROM ManagedBridges").fetchone()[0] - rows_before
+    return added, changes - added
+
+
+def _merge_row(bridge_dict):
+    """Chuẩn hóa dict cầu (nhiều kiểu key) thành row theo _MERGE_COLUMNS. None nếu thiếu tên."""
     name = bridge_dict.get('name') or bridge_dict.get('ten') or bridge_dict.get('bridge_name')
     if not name:
+        return None
+    return (
+        name,
+        bridge_dict.get('description') or bridge_dict.get('mo_ta', ''),
+        bridge_dict.get('win_rate_text') or bridge_dict.get('win_rate') or bridge_dict.get('ty_le', 'N/A'),
+        bridge_dict.get('pos1_idx'),
+        bridge_dict.get('pos2_idx'),
+        bridge_dict.get('type') or bridge_dict.get('loai', 'UNKNOWN'),
+        bridge_dict.get('is_enabled', 1),
+        bridge_dict.get('search_rate_text', '0.00%'),
+        bridge_dict.get('search_period', 0),
+        bridge_dict.get('max_lose_streak', 0),
+        bridge_dict.get('recent_win_count_10', 0),
+    )
+
+
+def _merge_upsert(conn, bridge_dicts, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Upsert "merge" (V8.5: bảo vệ Search Rate / Win Rate) cho nhiều cầu trên một kết nối.
+    
+    Returns:
+        Dict với 'added', 'updated', 'skipped'
+    """
+    rows = []
+    to_heal = []
+    skipped = 0
+    for bridge_dict in bridge_dicts:
+        row = _merge_row(bridge_dict)
+        if row is None:
+            skipped += 1
+            continue
+        rows.append(row)
+        if row[2] == 'N/A':
+            to_heal.append((row[0],))
+    
+    added, updated = upsert_bridge_rows(conn, _MERGE_COLUMNS, rows, _MERGE_UPDATE_SQL, chunk_size)
+    if to_heal:
+        conn.executemany(_HEAL_WIN_RATE_SQL, to_heal)
+    return {'added': added, 'updated': updated, 'skipped': skipped}
+
+
+def _upsert_managed_bridge_impl(conn, bridge_dict, db_name=DB_NAME):
+    """
+    Implementation của upsert_managed_bridge.
+    Internal function - nên gọi qua wrapper upsert_managed_bridge().
+    """
+    row = _merge_row(bridge_dict)
+    if row is None:
         raise ValueError("Bridge name is required")
     
-    description = bridge_dict.get('description') or bridge_dict.get('mo_ta', '')
-    win_rate_text = bridge_dict.get('win_rate_text') or bridge_dict.get('win_rate') or bridge_dict.get('ty_le', 'N/A')
-    pos1_idx = bridge_dict.get('pos1_idx')
-    pos2_idx = bridge_dict.get('pos2_idx')
-    bridge_type = bridge_dict.get('type') or bridge_dict.get('loai', 'UNKNOWN')
-    is_enabled = bridge_dict.get('is_enabled', 1)
-    search_rate_text = bridge_dict.get('search_rate_text', '0.00%')
-    search_period = bridge_dict.get('search_period', 0)
-    max_lose_streak = bridge_dict.get('max_lose_streak', 0)
-    recent_win_count_10 = bridge_dict.get('recent_win_count_10', 0)
+    name = row[0]
+    stats = _merge_upsert(conn, [bridge_dict])
+    if stats['added']:
+        return True, f"Đã thêm cầu mới '{name}'."
+    return True, f"Đã CẬP NHẬT cầu '{name}'."
+
+
+@timed("db.upsert_managed_bridges_batch")
+def upsert_managed_bridges_batch(bridge_dicts, db_name=DB_NAME, chunk_size=UPSERT_CHUNK_SIZE):
+    """
+    Upsert nhiều cầu trong MỘT transaction (cùng ngữ nghĩa với upsert_managed_bridge).
     
-    # Kiểm tra tồn tại
-    cursor.execute("SELECT * FROM ManagedBridges WHERE name = ?", (name,))
-    existing_row = cursor.fetchone()
+    Dùng cho các đường ghi của scanner thay vì gọi upsert_managed_bridge từng cầu.
     
-    if existing_row:
-        cursor.execute("PRAGMA table_info(ManagedBridges)")
-        col_names = [c[1] for c in cursor.fetchall()]
-        existing_data = dict(zip(col_names, existing_row))
-    else:
-        existing_data = None
-
-    if not existing_data:
-        # INSERT MỚI
-        # Mặc định: Nếu có search_rate thì dùng nó cho cả win_rate để tránh N/A ban đầu
-        if win_rate_text == 'N/A' and search_rate_text != '0.00%':
-            win_rate_text = search_rate_text
-
-        sql_insert = """
-        INSERT INTO ManagedBridges (
-            name, pos1_idx, pos2_idx, is_enabled, win_rate_text, max_lose_streak_k2n, recent_win_count_10, 
-            search_rate_text, search_period, description, type
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """
-        values = (
-            name, pos1_idx, pos2_idx, is_enabled,
-            win_rate_text, max_lose_streak, recent_win_count_10,
-            search_rate_text, search_period, description, bridge_type
-        )
-        cursor.execute(sql_insert, values)
-        success_msg = f"Đã thêm cầu mới '{name}'."
-    else:
-        # UPDATE
-        # Logic: Chỉ cập nhật search_rate nếu có input mới
-        # Giữ nguyên các trường nếu input không có
-        new_search_rate = search_rate_text if search_rate_text != '0.00%' else existing_data.get('search_rate_text')
-        new_win_rate = win_rate_text if win_rate_text != 'N/A' else existing_data.get('win_rate_text')
-        
-        # Self-Healing: Nếu Win Rate cũ là N/A mà Search Rate mới có dữ liệu -> Update Win Rate luôn
-        if (not new_win_rate or new_win_rate == 'N/A') and (new_search_rate and new_search_rate != '0.00%'):
-            new_win_rate = new_search_rate
-
-        sql_update = """
-        UPDATE ManagedBridges SET 
-            pos1_idx=?, pos2_idx=?, is_enabled=?, win_rate_text=?, 
-            max_lose_streak_k2n=?, recent_win_count_10=?, description=?,
-            search_rate_text=?, search_period=?, type=?
-        WHERE name=?
-        """
-        values_update = (
-            pos1_idx if pos1_idx is not None else existing_data.get('pos1_idx'),
-            pos2_idx if pos2_idx is not None else existing_data.get('pos2_idx'),
-            is_enabled,
-            new_win_rate,
-            max_lose_streak if max_lose_streak > 0 else existing_data.get('max_lose_streak_k2n'),
-            recent_win_count_10 if recent_win_count_10 > 0 else existing_data.get('recent_win_count_10'),
-            description,
-            new_search_rate,
-            search_period if search_period > 0 else existing_data.get('search_period'),
-            bridge_type,
-            name
-        )
-        cursor.execute(sql_update, values_update)
-        success_msg = f"Đã CẬP NHẬT cầu '{name}'."
-
-    return True, success_msg
+    Args:
+        bridge_dicts: List dict cầu (key như upsert_managed_bridge: name, description,
+                      win_rate_text, pos1_idx, pos2_idx, type, search_rate_text, ...)
+        db_name: Đường dẫn database
+        chunk_size: Số row mỗi lần executemany
+        
+    Returns:
+        Dict với 'added', 'updated', 'skipped', 'errors'
+    """
+    perf_count("db_rows_written", len(bridge_dicts or []))
+    conn = None
+    try:
+        conn = sqlite3.connect(db_name, timeout=10.0)
+        stats = _merge_upsert(conn, bridge_dicts, chunk_size)
+        conn.commit()
+        stats['errors'] = 0
+        return stats
+    except Exception as e:
+        print(f"[ERROR] upsert_managed_bridges_batch: {e}")
+        if conn:
+            conn.rollback()
+        return {'added': 0, 'updated': 0, 'skipped': 0, 'errors': len(bridge_dicts)}
+    finally:
+        if conn: conn.close()
 
 
 def upsert_managed_bridge(bridge_name=None, description=None, win_rate=None, db_name=DB_NAME, pos1_idx=None, pos2_idx=None, bridge_data=None, **kwargs):
@@ -431,11 +610,13 @@ def upsert_managed_bridge(bridge_name=None, description=None, win_rate=None, db_
         if conn: conn.close()
 
 
+@timed("db.update_bridge_k2n_cache_batch")
 def update_bridge_k2n_cache_batch(cache_data_list, db_name=DB_NAME):
     """
     [FIXED V8.5] Cập nhật Cache K2N.
     FEATURE: Tự động "vá" (Self-Heal) win_rate_text nếu nó đang là N/A.
     """
+    perf_count("db_rows_written", len(cache_data_list or []))
     updated_count = 0
     conn = None
     try:
@@ -484,10 +665,12 @@ def update_bridge_k2n_cache_batch(cache_data_list, db_name=DB_NAME):
     finally:
         if conn: conn.close()
 
+@timed("db.update_bridge_win_rate_batch")
 def update_bridge_win_rate_batch(rate_data_list, db_name=DB_NAME):
     """
     Cập nhật K1N (Thực tế).
     """
+    perf_count("db_rows_written", len(rate_data_list or []))
     updated_count = 0
     conn = None
     try:
@@ -503,7 +686,9 @@ def update_bridge_win_rate_batch(rate_data_list, db_name=DB_NAME):
     finally:
         if conn: conn.close()
 
+@timed("db.update_bridge_recent_win_count_batch")
 def update_bridge_recent_win_count_batch(recent_win_data_list, db_name=DB_NAME):
+    perf_count("db_rows_written", len(recent_win_data_list or []))
     updated_count = 0
     conn = None
     try:
@@ -545,19 +730,10 @@ def get_all_managed_bridge_names(db_name: str = DB_NAME) -> Set[str]:
     conn = None
     try:
         conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM ManagedBridges")
-        rows = cursor.fetchall()
+        rows = _select_bridge_names(conn.cursor())
         
-        # Import normalize function
-        try:
-            from logic.common_utils import normalize_bridge_name
-        except ImportError:
-            # Fallback: simple normalization
-            def normalize_bridge_name(name):
-                return str(name).strip().lower()
-        
-        return {normalize_bridge_name(row[0]) for row in rows if row[0]}
+        # Tên chuẩn hóa lưu sẵn; cầu chưa có (DB cũ / tên trùng) thì chuẩn hóa lại (có cache)
+        return {row[1] or normalize_bridge_name(row[0]) for row in rows if row[0]}
     except Exception as e:
         print(f"[ERROR] get_all_managed_bridge_names: {e}")
         return set()
@@ -591,22 +767,9 @@ def load_rates_cache(db_name: str = DB_NAME) -> Dict[str, Dict[str, float]]:
     conn = None
     try:
         conn = sqlite3.connect(db_name)
-        cursor = conn.cursor()
         
         # Load all bridges with their rates
-        cursor.execute("""
-            SELECT name, k1n_rate_lo, k1n_rate_de, k2n_rate_lo, k2n_rate_de
-            FROM ManagedBridges
-        """)
-        rows = cursor.fetchall()
-        
-        # Import normalize function
-        try:
-            from logic.common_utils import normalize_bridge_name
-        except ImportError:
-            # Fallback: simple normalization
-            def normalize_bridge_name(name):
-                return str(name).strip().lower()
+        rows = _select_bridge_names(conn.cursor(), ", k1n_rate_lo, k1n_rate_de, k2n_rate_lo, k2n_rate_de")
         
         # Build cache dictionary
         cache = {}
@@ -614,14 +777,13 @@ def load_rates_cache(db_name: str = DB_NAME) -> Dict[str, Dict[str, float]]:
             if not row[0]:
                 continue
                 
-            name = row[0]
-            normalized = normalize_bridge_name(name)
+            normalized = row[1] or normalize_bridge_name(row[0])
             
             cache[normalized] = {
-                'k1n_rate_lo': row[1] if row[1] is not None else 0.0,
-                'k1n_rate_de': row[2] if row[2] is not None else 0.0,
-                'k2n_rate_lo': row[3] if row[3] is not None else 0.0,
-                'k2n_rate_de': row[4] if row[4] is not None else 0.0,
+                'k1n_rate_lo': row[2] if row[2] is not None else 0.0,
+                'k1n_rate_de': row[3] if row[3] is not None else 0.0,
+                'k2n_rate_lo': row[4] if row[4] is not None else 0.0,
+                'k2n_rate_de': row[5] if row[5] is not None else 0.0,
             }
         
         return cache
@@ -633,6 +795,15 @@ def load_rates_cache(db_name: str = DB_NAME) -> Dict[str, Dict[str, float]]:
             conn.close()
 
 
+_BULK_COLUMNS = (
+    "name", "description", "type", "k1n_rate_lo", "k1n_rate_de",
+    "k2n_rate_lo", "k2n_rate_de", "is_pending", "is_enabled",
+    "pos1_idx", "pos2_idx", "win_rate_text", "search_rate_text",
+    "current_streak", "next_prediction_stl",
+)
+
+
+@timed("db.bulk_upsert_managed_bridges")
 def bulk_upsert_managed_bridges(
     bridges: List[Dict[str, Any]], 
     db_name: str = DB_NAME,
@@ -641,11 +812,12 @@ def bulk_upsert_managed_bridges(
     """
     Bulk upsert managed bridges with atomic transaction support.
     
-    Performs efficient INSERT/UPDATE operations using executemany.
+    Uses the shared upsert engine (INSERT ... ON CONFLICT(name) DO UPDATE with
+    chunked executemany); every listed field overwrites the stored value.
     Includes retry logic for sqlite3.OperationalError (database locked).
     
     Args:
-        bridges: List of bridge dictionaries with keys:
+        bridges: List of bridge dictionaries (or a models.CandidateBatch) with keys:
             - name (required): Bridge name
             - description: Bridge description
             - type: Bridge type (LO_*, DE_*)
@@ -672,8 +844,13 @@ def bulk_upsert_managed_bridges(
         >>> result = bulk_upsert_managed_bridges(bridges)
         >>> print(f"Added: {result['added']}, Updated: {result['updated']}")
     """
+    perf_count("db_rows_written", len(bridges or []))
     stats = {'added': 0, 'updated': 0, 'skipped': 0, 'errors': 0}
     
+    # Chấp nhận CandidateBatch (dạng cột) bên cạnh list dict
+    if hasattr(bridges, 'to_dicts'):
+        bridges = bridges.to_dicts()
+    
     if not bridges:
         return stats
     
@@ -684,88 +861,35 @@ def bulk_upsert_managed_bridges(
     for attempt in range(max_retries):
         try:
             conn = sqlite3.connect(db_name, timeout=10.0)
-            cursor = conn.cursor()
-            
-            # Get existing bridges for duplicate check
-            cursor.execute("SELECT name FROM ManagedBridges")
-            existing_names = {row[0].strip().lower() for row in cursor.fetchall()}
-            
-            # Prepare batch operations
-            to_insert = []
-            to_update = []
             
+            rows = []
             for bridge in bridges:
                 name = bridge.get('name')
                 if not name:
                     stats['skipped'] += 1
                     continue
                 
-                # Check if exists
-                is_existing = name.strip().lower() in existing_names
-                
                 # Prepare values (with defaults)
-                description = bridge.get('description', '')
-                bridge_type = bridge.get('type', 'UNKNOWN')
-                k1n_rate_lo = bridge.get('k1n_rate_lo', 0.0)
-                k1n_rate_de = bridge.get('k1n_rate_de', 0.0)
-                k2n_rate_lo = bridge.get('k2n_rate_lo', 0.0)
-                k2n_rate_de = bridge.get('k2n_rate_de', 0.0)
-                is_pending = bridge.get('is_pending', 1)
-                is_enabled = bridge.get('is_enabled', 0)  # Default disabled for new bridges
-                pos1_idx = bridge.get('pos1_idx')
-                pos2_idx = bridge.get('pos2_idx')
-                win_rate_text = bridge.get('win_rate_text', 'N/A')
-                search_rate_text = bridge.get('search_rate_text', '0.00%')
-                current_streak = bridge.get('current_streak', 0)
-                next_prediction_stl = bridge.get('next_prediction_stl', 'N/A')
-                
-                if is_existing:
-                    # UPDATE
-                    to_update.append((
-                        description, bridge_type, k1n_rate_lo, k1n_rate_de,
-                        k2n_rate_lo, k2n_rate_de, is_pending, is_enabled,
-                        pos1_idx, pos2_idx, win_rate_text, search_rate_text,
-                        current_streak, next_prediction_stl,
-                        name  # WHERE clause
-                    ))
-                else:
-                    # INSERT
-                    to_insert.append((
-                        name, description, bridge_type, k1n_rate_lo, k1n_rate_de,
-                        k2n_rate_lo, k2n_rate_de, is_pending, is_enabled,
-                        pos1_idx, pos2_idx, win_rate_text, search_rate_text,
-                        current_streak, next_prediction_stl
-                    ))
-            
-            # Execute batch INSERT
-            if to_insert:
-                sql_insert = """
-                INSERT INTO ManagedBridges (
-                    name, description, type, k1n_rate_lo, k1n_rate_de,
-                    k2n_rate_lo, k2n_rate_de, is_pending, is_enabled,
-                    pos1_idx, pos2_idx, win_rate_text, search_rate_text,
-                    current_streak, next_prediction_stl
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """
-                cursor.executemany(sql_insert, to_insert)
-                # Note: cursor.rowcount with executemany is unreliable in SQLite
-                # Use actual count from prepared list
-                stats['added'] = len(to_insert)
+                rows.append((
+                    name,
+                    bridge.get('description', ''),
+                    bridge.get('type', 'UNKNOWN'),
+                    bridge.get('k1n_rate_lo', 0.0),
+                    bridge.get('k1n_rate_de', 0.0),
+                    bridge.get('k2n_rate_lo', 0.0),
+                    bridge.get('k2n_rate_de', 0.0),
+                    bridge.get('is_pending', 1),
+                    bridge.get('is_enabled', 0),  # Default disabled for new bridges
+                    bridge.get('pos1_idx'),
+                    bridge.get('pos2_idx'),
+                    bridge.get('win_rate_text', 'N/A'),
+                    bridge.get('search_rate_text', '0.00%'),
+                    bridge.get('current_streak', 0),
+                    bridge.get('next_prediction_stl', 'N/A'),
+                ))
             
-            # Execute batch UPDATE
-            if to_update:
-                sql_update = """
-                UPDATE ManagedBridges SET
-                    description=?, type=?, k1n_rate_lo=?, k1n_rate_de=?,
-                    k2n_rate_lo=?, k2n_rate_de=?, is_pending=?, is_enabled=?,
-                    pos1_idx=?, pos2_idx=?, win_rate_text=?, search_rate_text=?,
-                    current_streak=?, next_prediction_stl=?
-                WHERE name=?
-                """
-                cursor.executemany(sql_update, to_update)
-                # Note: cursor.rowcount with executemany is unreliable in SQLite
-                # Use actual count from prepared list
-                stats['updated'] = len(to_update)
+            # INSERT ... ON CONFLICT(name) DO UPDATE - chunked executemany, one transaction
+            stats['added'], stats['updated'] = upsert_bridge_rows(conn, _BULK_COLUMNS, rows)
             
             # Commit transaction
             if transactional:
@@ -806,6 +930,7 @@ def bulk_upsert_managed_bridges(
     return stats
 
 
+@timed("db.update_managed_bridges_batch")
 def update_managed_bridges_batch(
     updates: List[Dict[str, Any]],
     db_name: str = DB_NAME
@@ -827,6 +952,7 @@ def update_managed_bridges_batch(
         ... ]
         >>> result = update_managed_bridges_batch(updates)
     """
+    perf_count("db_rows_written", len(updates or []))
     stats = {'updated': 0, 'skipped': 0, 'errors': 0}
     
     if not updates:
@@ -888,6 +1014,7 @@ def update_managed_bridges_batch(
             conn.close()
 
 
+@timed("db.delete_managed_bridges_batch")
 def delete_managed_bridges_batch(
     names: List[str],
     db_name: str = DB_NAME
@@ -906,6 +1033,7 @@ def delete_managed_bridges_batch(
         >>> result = delete_managed_bridges_batch(['Bridge-01', 'Bridge-02'])
         >>> print(f"Deleted: {result['deleted']}")
     """
+    perf_count("db_rows_written", len(names or []))
     stats = {'deleted': 0, 'errors': 0}
     
     if not names:
@@ -2,17 +2,34 @@
 # (PHIÊN BẢN V3.9.19 - FIX: LINK TO DE_UTILS SOURCE OF TRUTH)
 
 from collections import Counter
+from dataclasses import dataclass
 from itertools import combinations
 from typing import List, Tuple, Optional, Dict, Any
 import re
 
+import numpy as np
+
 # --- IMPORT NGUỒN CHUẨN (SOURCE OF TRUTH) ---
 try:
-    from logic.de_utils import BO_SO_DE, get_gdb_last_2 as utils_get_gdb
+    from logic.de_utils import (
+        BO_SO_DE, BO_SO_NAMES, bo_frequency, bo_last_index, cham_last_index, de_bo_ids,
+        de_number_codes, get_gdb_last_2 as utils_get_gdb,
+    )
 except ImportError:
     # Fallback chỉ dùng khi chạy độc lập test (không khuyến khích)
     BO_SO_DE = {}
+    BO_SO_NAMES = []
     def utils_get_gdb(r): return "00"
+    def de_number_codes(rows): return np.full(len(rows), -1, dtype=np.int16)
+    def de_bo_ids(de_codes): return np.full(len(de_codes), -1, dtype=np.int64)
+    def bo_frequency(de_codes): return np.zeros(0, dtype=np.int64)
+    def bo_last_index(de_codes): return np.zeros(0, dtype=np.int64)
+    def cham_last_index(de_codes): return np.full(10, -1, dtype=np.int64)
+
+try:
+    from logic.de_history import DeHistoryView, get_de_history_view
+except ImportError:
+    from de_history import DeHistoryView, get_de_history_view
 
 # --- CHUYỂN ĐỔI DỮ LIỆU ---
 # Analytics cần tính toán số học (int), trong khi de_utils lưu string.
@@ -57,7 +74,49 @@ def normalize_value(v):
     except:
         return None
 
-def compute_touch_metrics(touches, all_data, window_n=30, require_consecutive_end_n=None):
+def de_touch_day_masks(rows):
+    """
+    Mặt nạ 10 bit các chữ số Đề (2 số cuối GĐB) của từng kỳ: bit d bật khi
+    chữ số d xuất hiện. Kỳ không đọc được Đề có mặt nạ 0 (không chạm nào trúng).
+    """
+    masks = np.zeros(len(rows), dtype=np.uint16)
+    for i, row in enumerate(rows):
+        de = local_get_gdb_last_2(row)
+        if not de: continue
+        try: masks[i] = (1 << int(de[0])) | (1 << int(de[1]))
+        except: pass
+    return masks
+
+def touch_mask(touches):
+    """Mặt nạ 10 bit của một tổ hợp chạm (chữ số ngoài 0..9 bị bỏ qua)."""
+    mask = 0
+    for t in touches:
+        t = int(t)
+        if 0 <= t <= 9: mask |= 1 << t
+    return mask
+
+def touch_hit_matrix(day_masks, combo_masks):
+    """
+    Tính đồng thời cho mọi tổ hợp chạm trên cửa sổ kỳ bằng phép AND bit.
+
+    Returns:
+        (hits, total_count, max_consecutive, consecutive_at_end): hits là ma trận
+        bool [tổ hợp, kỳ]; các mảng còn lại theo từng tổ hợp.
+    """
+    day_masks = np.asarray(day_masks, dtype=np.uint16)
+    combo_masks = np.asarray(combo_masks, dtype=np.uint16).reshape(-1)
+    hits = (combo_masks[:, None] & day_masks[None, :]) != 0
+    n_combos, window = hits.shape
+    if window == 0:
+        zeros = np.zeros(n_combos, dtype=np.int64)
+        return hits, zeros, zeros.copy(), zeros.copy()
+    # Độ dài chuỗi trúng liên tiếp tại từng kỳ: đếm tích lũy trừ mốc lần trượt gần nhất
+    running = np.cumsum(hits, axis=1)
+    reset = np.maximum.accumulate(np.where(hits, 0, running), axis=1)
+    streaks = running - reset
+    return hits, running[:, -1], streaks.max(axis=1), streaks[:, -1]
+
+def compute_touch_metrics(touches, all_data, window_n=30, require_consecutive_end_n=None, day_masks=None):
     """
     Compute comprehensive touch metrics for a touch combination.
     
@@ -67,6 +126,7 @@ def compute_touch_metrics(touches, all_data, window_n=30, require_consecutive_en
         window_n: window size for analysis
         require_consecutive_end_n: minimum consecutive matches at end required for "chạm thông"
                                    (defaults to CHAM_THONG_MIN_CONSEC from settings, or 8)
+        day_masks: optional precomputed de_touch_day_masks() of the window rows
     
     Returns:
         dict with keys:
@@ -99,31 +159,17 @@ def compute_touch_metrics(touches, all_data, window_n=30, require_consecutive_en
             'window': 0
         }
     
-    # Ensure touches is a set of ints
-    touch_set = set(int(t) if isinstance(t, str) else t for t in touches)
-    
     # Get last N rows
     last_rows = all_data[-window_n:] if len(all_data) >= window_n else all_data[:]
+    if day_masks is None:
+        day_masks = de_touch_day_masks(last_rows)
+    hits, total, max_consec, at_end = touch_hit_matrix(day_masks, [touch_mask(touches)])
+    return _touch_metrics_dict(last_rows, window_n, require_consecutive_end_n,
+                               hits[0], int(total[0]), int(max_consec[0]), int(at_end[0]))
+
+def _touch_metrics_dict(last_rows, window_n, require_consecutive_end_n, hits, total_count, max_consecutive, consecutive_at_end):
     actual_window = len(last_rows)
-    
-    # Compute metrics
-    total_count = 0
-    occur_kys = []
-    max_consecutive = 0
-    current_streak = 0
-    
-    for row in last_rows:
-        de = local_get_gdb_last_2(row)
-        if de and check_cham(de, touch_set):
-            total_count += 1
-            occur_kys.append(str(row[0]) if row else "?")
-            current_streak += 1
-            max_consecutive = max(max_consecutive, current_streak)
-        else:
-            current_streak = 0
-    
-    # consecutive_at_end is the streak at the very end of the window
-    consecutive_at_end = current_streak
+    occur_kys = [str(last_rows[i][0]) if last_rows[i] else "?" for i in np.flatnonzero(hits)]
     
     # covers_last_n is True iff touch appears in EVERY row of the window
     covers_last_n = (total_count == actual_window) and (actual_window == window_n)
@@ -149,55 +195,177 @@ def compute_touch_metrics(touches, all_data, window_n=30, require_consecutive_en
 # LOGIC THỐNG KÊ & TÍNH ĐIỂM (UPDATED)
 # =============================================================================
 
+def _counts_in_first_seen_order(events, names=None):
+    """Đếm tần suất (bincount) nhưng giữ thứ tự khóa theo lần xuất hiện đầu tiên như Counter."""
+    events = np.asarray(events, dtype=np.int64)
+    if events.size == 0: return {}
+    counts = np.bincount(events)
+    keys, first = np.unique(events, return_index=True)
+    keys = keys[np.argsort(first, kind="stable")]
+    return {(names[k] if names is not None else int(k)): int(counts[k]) for k in keys}
+
 def analyze_market_trends(all_data_ai, n_days=30):
     if not all_data_ai: return {}, {}, {}, {}, {}, {}
-    recent_data = all_data_ai[-n_days:] if len(all_data_ai) > n_days else all_data_ai
-    
-    freq_cham, freq_tong, freq_bo = Counter(), Counter(), Counter()
-    
+    # Mảng số đề (-1: kỳ lỗi) của đoạn cuối lịch sử (lấy từ view dùng chung); nới
+    # rộng dần cho đến khi mọi chạm/bộ đã về ít nhất một lần (hoặc hết dữ liệu) để tính gan
+    all_codes = get_de_history_view(all_data_ai).de_codes
+    total_len = len(all_codes)
+    recent_len = len(range(total_len)[-n_days:]) if total_len > n_days else total_len
+    tail = min(total_len, max(recent_len, 64))
+    while True:
+        codes = all_codes[total_len - tail:]
+        last_cham, last_bo = cham_last_index(codes), bo_last_index(codes)
+        if tail >= total_len or ((last_cham >= 0).all() and (last_bo >= 0).all()): break
+        tail = min(total_len, tail * 4)
+    recent = codes[len(codes) - recent_len:]
+    recent = recent[recent >= 0]
+    n1, n2 = recent // 10, recent % 10
+
     # Tần suất (Short-term)
-    for row in recent_data:
-        de = local_get_gdb_last_2(row)
-        if de:
-            try:
-                n_val = int(de)
-                n1, n2 = int(de[0]), int(de[1])
-                tong = (n1 + n2) % 10
-                freq_cham[n1] += 1
-                if n1 != n2: freq_cham[n2] += 1
-                freq_tong[tong] += 1
-                for bo_name, bo_list in BO_SO_DICT.items():
-                    if n_val in bo_list: freq_bo[bo_name] += 1; break
-            except: continue
-
-    # Gan (Long-term)
-    total_len = len(all_data_ai)
-    gan_cham = {i: total_len for i in range(10)}
-    gan_bo = {bo: total_len for bo in BO_SO_DICT.keys()}
-    found_cham, found_bo = set(), set()
-    
-    for i, row in enumerate(reversed(all_data_ai)):
-        de = local_get_gdb_last_2(row)
-        if de:
-            try:
-                n_val = int(de)
-                n1, n2 = int(de[0]), int(de[1])
-                if n1 not in found_cham: gan_cham[n1] = i; found_cham.add(n1)
-                if n2 not in found_cham: gan_cham[n2] = i; found_cham.add(n2)
-                for bo_name, bo_list in BO_SO_DICT.items():
-                    if bo_name not in found_bo and n_val in bo_list:
-                        gan_bo[bo_name] = i; found_bo.add(bo_name); break
-            except: pass
-        if len(found_cham) == 10 and len(found_bo) == len(BO_SO_DICT): break
+    cham_events = np.stack([n1, np.where(n1 != n2, n2, -1)], axis=1).ravel()
+    bo_events = de_bo_ids(recent)
+    freq_cham = _counts_in_first_seen_order(cham_events[cham_events >= 0])
+    freq_tong = _counts_in_first_seen_order((n1 + n2) % 10)
+    freq_bo = _counts_in_first_seen_order(bo_events[bo_events >= 0], BO_SO_NAMES)
+
+    # Gan (Long-term): số kỳ tính từ lần về gần nhất
+    gan_cham = {i: (tail - 1 - int(last_cham[i]) if last_cham[i] >= 0 else total_len) for i in range(10)}
+    gan_bo = {bo: (tail - 1 - int(last_bo[k]) if last_bo[k] >= 0 else total_len) for k, bo in enumerate(BO_SO_NAMES)}
 
     return {
-        "freq_cham": dict(freq_cham), "freq_tong": dict(freq_tong), "freq_bo": dict(freq_bo),
+        "freq_cham": freq_cham, "freq_tong": freq_tong, "freq_bo": freq_bo,
         "gan_cham": gan_cham, "gan_tong": {}, "gan_bo": gan_bo
     }
 
 # Tên file: code6/logic/de_analytics.py
 # (PHIÊN BẢN V4.0 - ANTI-INFLATION: PHÂN TẦNG ĐIỂM SỐ)
 
+# Hệ số phân tầng V4 (xem calculate_number_scores)
+DE_TIER_MAX_COUNT = 12          # Cầu <= 12 số: Tier 1
+DE_TIER_HIGH_CONSTANT = 40.0    # Tier 1 (Bộ, Kép, Dàn ít số)
+DE_TIER_LOW_CONSTANT = 3.0      # Tier 2 (Chạm, Tổng, Dàn nhiều số)
+DE_STREAK_BONUS = 0.15          # Thưởng phong độ mỗi kỳ streak
+
+_DE_NUMBER_INDEX = {f"{i:02d}": i for i in range(100)}
+
+
+def _bridge_target_numbers(bridge):
+    """
+    Tập số mục tiêu (chuỗi) của một cầu Đề.
+    Ưu tiên list 'numbers' từ Scanner; cầu cũ thì phân tích predicted_value
+    (Bộ / Chạm / dàn số liệt kê).
+    """
+    val = str(bridge.get('predicted_value', ''))
+    b_type = str(bridge.get('type', '')).upper()
+    target_numbers = set()
+
+    if 'numbers' in bridge and isinstance(bridge['numbers'], list):
+        target_numbers.update(bridge['numbers'])
+    elif 'BO' in b_type or 'SET' in b_type or 'Bộ' in val:
+        for bo_key, bo_nums in BO_SO_DICT.items():
+            if bo_key in val or f"Bộ {bo_key}" in val:
+                target_numbers.update([f"{n:02d}" for n in bo_nums])
+    elif 'CHAM' in val or 'Chạm' in val or ',' in val:
+        parts = [int(v) for v in val.replace("Chạm", "").replace("Loại", "").split(',') if v.strip().isdigit()]
+        if parts:
+            if 'CHAM' in val or 'Chạm' in val or 'DYNAMIC' in b_type or 'KILLER' in b_type:
+                for p in parts:
+                    for i in range(10):
+                        target_numbers.add(f"{p}{i}"); target_numbers.add(f"{i}{p}")
+            else:
+                target_numbers.update([f"{p:02d}" for p in parts])
+    return target_numbers
+
+
+@dataclass
+class DeBridgeMatrix:
+    """
+    Cầu Đề đã biên dịch: mỗi cầu là một mặt nạ 100 số (00-99).
+
+    masks[i, n]: số n thuộc tập mục tiêu của cầu i.
+    counts[i]: số lượng phần tử của tập mục tiêu (kể cả phần tử ngoài 00-99,
+        giữ đúng mật độ như cách tính cũ).
+    streaks[i]: phong độ của cầu; killers[i]: cầu Loại (trừ điểm).
+
+    Biên dịch một lần rồi dùng lại cho nhiều bộ tham số (weights/scores).
+    """
+    masks: np.ndarray
+    counts: np.ndarray
+    streaks: np.ndarray
+    killers: np.ndarray
+
+    def __len__(self):
+        return len(self.counts)
+
+    def weights(self, tier_max_count=DE_TIER_MAX_COUNT, tier_high=DE_TIER_HIGH_CONSTANT,
+                tier_low=DE_TIER_LOW_CONSTANT, streak_bonus=DE_STREAK_BONUS):
+        """Trọng số có dấu của từng cầu (âm với cầu Loại)."""
+        counts = np.maximum(self.counts, 1).astype(np.float64)
+        density_weight = np.where(self.counts <= tier_max_count, tier_high, tier_low) / counts
+        abs_score = density_weight * (1.0 + (self.streaks * streak_bonus))
+        abs_score = np.where(self.counts > 0, abs_score, 0.0)
+        return np.where(self.killers, -abs_score, abs_score)
+
+    def scores(self, base_scores, weights=None):
+        """
+        Điểm 100 số = điểm nền + tổng có trọng số các mặt nạ (một phép rút gọn
+        cầu x 100). Cộng lần lượt theo thứ tự cầu như cách tính cũ.
+        """
+        if weights is None:
+            weights = self.weights()
+        contributions = np.empty((len(self) + 1, 100), dtype=np.float64)
+        contributions[0] = base_scores
+        np.multiply(weights[:, None], self.masks, out=contributions[1:])
+        return contributions.sum(axis=0)
+
+    def bridge_counts(self):
+        """Số cầu (không tính cầu Loại) chứa từng số."""
+        return (self.masks & ~self.killers[:, None]).sum(axis=0)
+
+
+def compile_de_bridges(bridges):
+    """Biên dịch danh sách cầu Đề thành DeBridgeMatrix (bỏ qua cầu lỗi dữ liệu)."""
+    mask_rows, mask_cols, counts, streaks, killers = [], [], [], [], []
+    for bridge in bridges or []:
+        try:
+            streak = float(bridge.get('streak', 0))
+            target_numbers = _bridge_target_numbers(bridge)
+            val = str(bridge.get('predicted_value', ''))
+            b_type = str(bridge.get('type', '')).upper()
+        except Exception:
+            continue
+        cols = [_DE_NUMBER_INDEX[n] for n in target_numbers if n in _DE_NUMBER_INDEX]
+        mask_rows.extend([len(counts)] * len(cols))
+        mask_cols.extend(cols)
+        counts.append(len(target_numbers))
+        streaks.append(streak)
+        killers.append('KILLER' in b_type or 'LOẠI' in val.upper())
+    masks = np.zeros((len(counts), 100), dtype=bool)
+    masks[mask_rows, mask_cols] = True
+    return DeBridgeMatrix(
+        masks=masks,
+        counts=np.array(counts, dtype=np.int64),
+        streaks=np.array(streaks, dtype=np.float64),
+        killers=np.array(killers, dtype=bool),
+    )
+
+
+def _market_base_scores(market_stats):
+    """Điểm nền của 100 số: 10 + tần suất chạm, trừ điểm chạm gan lâu (> 20 kỳ)."""
+    scores = np.full(100, 10.0)
+    freq_cham = market_stats.get('freq_cham', {}) if market_stats else {}
+    gan_cham = market_stats.get('gan_cham', {}) if market_stats else {}
+    for i in range(100):
+        try:
+            n1, n2 = divmod(i, 10)
+            f_score = (freq_cham.get(n1, 0) + freq_cham.get(n2, 0)) * 0.5
+            scores[i] += f_score
+            g_max = max(gan_cham.get(n1, 0), gan_cham.get(n2, 0))
+            if g_max > 20: scores[i] -= (g_max - 20) * 0.2
+        except: pass
+    return scores
+
+
 def calculate_number_scores(bridges, market_stats=None):
     """
     Tính điểm số học [OPTIMIZED V4 - ANTI-INFLATION]:
@@ -205,98 +373,25 @@ def calculate_number_scores(bridges, market_stats=None):
     
     Cơ chế Phân Tầng:
     - Tier 1 (<= 12 số): Hệ số chuẩn 40.0 (Ưu tiên cực cao cho Bộ/Kép).
-    - Tier 2 (> 12 số):  Hệ số chuẩn 5.0 (Dìm điểm cực mạnh cho Chạm/Tổng).
-    => Tỷ lệ chênh lệch: 1 Cầu Bộ = 20 Cầu Chạm (thay vì 2.5 như trước).
+    - Tier 2 (> 12 số):  Hệ số chuẩn 3.0 (Dìm điểm cực mạnh cho Chạm/Tổng).
+    Điểm mỗi cầu = hệ số / số lượng số x (1 + streak x 0.15); cầu Loại (KILLER)
+    mang trọng số âm.
+
+    bridges: list dict cầu hoặc DeBridgeMatrix đã biên dịch (dùng lại khi
+    chạy nhiều bộ tham số).
     """
-    scores = {f"{i:02d}": 10.0 for i in range(100)}
-    bridge_count_per_num = Counter() 
-    
     try:
-        # --- 1. CỘNG ĐIỂM THỐNG KÊ (Giữ nguyên) ---
-        freq_cham = market_stats.get('freq_cham', {}) if market_stats else {}
-        gan_cham = market_stats.get('gan_cham', {}) if market_stats else {}
-        
-        for s in scores:
-            try:
-                n1, n2 = int(s[0]), int(s[1])
-                f_score = (freq_cham.get(n1, 0) + freq_cham.get(n2, 0)) * 0.5
-                scores[s] += f_score
-                g_max = max(gan_cham.get(n1, 0), gan_cham.get(n2, 0))
-                if g_max > 20: scores[s] -= (g_max - 20) * 0.2
-            except: pass
-
-        # --- 2. TÍNH ĐIỂM CẦU (LOGIC PHÂN TẦNG V4) ---
-        if bridges:
-            for bridge in bridges:
-                try:
-                    streak = float(bridge.get('streak', 0))
-                    val = str(bridge.get('predicted_value', ''))
-                    b_type = str(bridge.get('type', '')).upper()
-                    
-                    # A. XÁC ĐỊNH SỐ LƯỢNG SỐ (Target Numbers)
-                    target_numbers = set()
-                    
-                    # Ưu tiên lấy list số trực tiếp từ Scanner
-                    if 'numbers' in bridge and isinstance(bridge['numbers'], list):
-                        target_numbers.update(bridge['numbers'])
-                    else:
-                        # Fallback parsing (cho các cầu cũ chưa update scanner)
-                        if 'BO' in b_type or 'SET' in b_type or 'Bộ' in val:
-                            for bo_key, bo_nums in BO_SO_DICT.items():
-                                if bo_key in val or f"Bộ {bo_key}" in val:
-                                    target_numbers.update([f"{n:02d}" for n in bo_nums])
-                        elif 'CHAM' in val or 'Chạm' in val or ',' in val:
-                            parts = [int(v) for v in val.replace("Chạm","").replace("Loại","").split(',') if v.strip().isdigit()]
-                            if parts:
-                                if 'CHAM' in val or 'Chạm' in val or 'DYNAMIC' in b_type or 'KILLER' in b_type:
-                                    for p in parts:
-                                        for i in range(10):
-                                            target_numbers.add(f"{p}{i}"); target_numbers.add(f"{i}{p}")
-                                else:
-                                    target_numbers.update([f"{p:02d}" for p in parts])
-
-                    # B. TÍNH ĐIỂM PHÂN TẦNG (TIERED SCORING - V4)
-                    count = len(target_numbers)
-                    if count > 0:
-                        # --- [V4 CHANGE START] ---
-                        # Phân loại giai cấp cầu
-                        if count <= 12: 
-                            # Giai cấp Thượng Lưu (Bộ, Kép, Dàn ít số)
-                            # Thưởng rất lớn để bứt phá
-                            BASE_CONSTANT = 40.0 
-                        else:
-                            # Giai cấp Bình Dân (Chạm, Tổng, Dàn nhiều số)
-                            # Phạt nặng để giảm nhiễu (Noise Reduction)
-                            BASE_CONSTANT = 3.0
-                            
-                        density_weight = BASE_CONSTANT / float(count)
-                        # --- [V4 CHANGE END] ---
-                        
-                        # Hệ số Phong độ (Streak Bonus)
-                        # Tăng nhẹ bonus streak để ưu tiên cầu bền bỉ
-                        streak_bonus = 1.0 + (streak * 0.15) 
-                        
-                        abs_score = density_weight * streak_bonus
-                        
-                        # C. ÁP DỤNG (THƯỞNG HOẶC PHẠT)
-                        is_killer = 'KILLER' in b_type or 'LOẠI' in val.upper()
-                        
-                        for num_str in target_numbers:
-                            if num_str in scores:
-                                if is_killer:
-                                    # Cầu Killer loại ít số (tự tin cao) sẽ trừ điểm cực nặng
-                                    scores[num_str] -= abs_score
-                                else:
-                                    scores[num_str] += abs_score
-                                    bridge_count_per_num[num_str] += 1
-
-                except Exception: continue
-
+        matrix = bridges if isinstance(bridges, DeBridgeMatrix) else compile_de_bridges(bridges)
+        scores = matrix.scores(_market_base_scores(market_stats))
+        bridge_counts = matrix.bridge_counts()
     except Exception as e:
         print(f"Scoring Error: {e}")
+        scores, bridge_counts = _market_base_scores(None), np.zeros(100, dtype=np.int64)
 
     # Trả về list tuple đã sort: [('88', 15.5, '3 cầu'), ('89', 14.2, '2 cầu')...]
-    return sorted([(k, v, f"{bridge_count_per_num[k]} cầu") for k, v in scores.items()], key=lambda x: x[1], reverse=True)
+    return sorted([(f"{i:02d}", score, f"{int(count)} cầu")
+                   for i, (score, count) in enumerate(zip(scores.tolist(), bridge_counts.tolist()))],
+                  key=lambda x: x[1], reverse=True)
 
 
 def build_dan65_with_bo_priority(all_scores, freq_bo, gan_bo, vip_numbers=None, focus_numbers=None, top_sets_count=None, dan_size=None, min_per_top_set=None):
@@ -472,7 +567,7 @@ def build_dan65_with_bo_priority(all_scores, freq_bo, gan_bo, vip_numbers=None,
         return sorted([x[0] for x in all_scores[:dan_size]]), {}, []
 
     
-def calculate_top_touch_combinations(all_data, num_touches=4, days=15, market_stats=None, filter_cham_thong_only=False):
+def calculate_top_touch_combinations(all_data, num_touches=4, days=15, market_stats=None, filter_cham_thong_only=False, top_digit_count=8):
     """
     Calculate top touch combinations with comprehensive metrics.
     Now returns covers_last_n, covers_last_n_at_end, total_count, max_consecutive, and rate_percent.
@@ -483,6 +578,7 @@ def calculate_top_touch_combinations(all_data, num_touches=4, days=15, market_st
         days: deprecated, uses window_n from settings instead
         market_stats: optional market statistics
         filter_cham_thong_only: if True, only return combinations with covers_last_n_at_end=True
+        top_digit_count: combinations are built from the N most frequent digits (10 = every digit)
     """
     if not all_data: return []
     try:
@@ -497,25 +593,31 @@ def calculate_top_touch_combinations(all_data, num_touches=4, days=15, market_st
         
         # Use window_n instead of days for consistent analysis
         recent = all_data[-window_n:]
+        day_masks = de_touch_day_masks(recent)
         res = []
         freq = Counter()
         for row in recent:
             de = local_get_gdb_last_2(row)
             if de: freq[int(de[0])] += 1; freq[int(de[1])] += 1
         
-        top_digits = [k for k,v in freq.most_common(8)] 
+        top_digits = [k for k,v in freq.most_common(top_digit_count)] 
         if len(top_digits) < num_touches: top_digits = list(range(10))
 
+        combos = []
         seen_combos = set()
         for i in combinations(top_digits, num_touches):
             combo = tuple(sorted(list(i)))
             if combo in seen_combos: continue
             seen_combos.add(combo)
-            
+            combos.append(combo)
+        if not combos: return []
+
+        # Mọi tổ hợp được tính cùng lúc trên mặt nạ bit của cửa sổ
+        hits, totals, max_consecs, at_ends = touch_hit_matrix(day_masks, [touch_mask(c) for c in combos])
+        for k, combo in enumerate(combos):
             t_list = list(combo)
-            
-            # Use new comprehensive metrics function with consecutive_end requirement
-            metrics = compute_touch_metrics(t_list, all_data, window_n, require_consecutive_end_n)
+            metrics = _touch_metrics_dict(recent, window_n, require_consecutive_end_n, hits[k],
+                                          int(totals[k]), int(max_consecs[k]), int(at_ends[k]))
             
             # Apply filter for "chạm thông" if requested
             if filter_cham_thong_only and not metrics.get('covers_last_n_at_end', False):
@@ -543,69 +645,47 @@ def calculate_top_touch_combinations(all_data, num_touches=4, days=15, market_st
 # =============================================================================
 # MATRIX V3.9.19 (SMART SET SELECTION - CONSISTENT DATA)
 # =============================================================================
-def _ai_rows_to_dataframe(all_data_ai):
-    try:
-        import pandas as pd
-        cols = ["Ky", "Ngay", "Giai_Dac_Biet", "Giai_1", "Giai_2", "Giai_3", "Giai_4", "Giai_5", "Giai_6", "Giai_7"]
-        df = pd.DataFrame(all_data_ai, columns=cols[:len(all_data_ai[0])] if all_data_ai else None)
-        if "Giai_Dac_Biet" in df.columns: df["De"] = df["Giai_Dac_Biet"]
-        return df, "OK"
-    except Exception as e: return None, str(e)
-
-def analyze_independent_factors(df):
+def _frame_history_view(df):
+    """View Đề từ DataFrame cũ (cột 'De'); None nếu không có cột."""
+    if df is None or "De" not in df.columns: return None
+    return DeHistoryView.from_gdb_values(df["De"].tolist())
+
+def _most_common_digits(digits, k):
+    """Như Counter(digits).most_common(k): nhiều nhất trước, hòa thì theo lần xuất hiện đầu."""
+    counts = _counts_in_first_seen_order(digits)
+    return [d for d, _ in sorted(counts.items(), key=lambda kv: kv[1], reverse=True)[:k]]
+
+def analyze_independent_factors(view):
     """
-    Phân tích các yếu tố độc lập.
+    Phân tích các yếu tố độc lập trên DeHistoryView (hoặc DataFrame cũ có cột 'De').
     [V3.9.19] Sử dụng BO_SO_DICT chuẩn từ de_utils.
     """
-    if df is None or df.empty: return [], [], []
+    if hasattr(view, "columns"): view = _frame_history_view(view)
+    if view is None: return [0,1,2,3], [4,5,6,7], ["00"]
+    if len(view) == 0: return [], [], []
     
-    # 1. Trend Chạm
-    try:
-        de_vals = []
-        for x in df.tail(15)['De']:
-            s = str(x)
-            d = "".join(filter(str.isdigit, s))
-            if d: de_vals.append(int(d))
-        c = Counter([x%10 for x in de_vals])
-        ct = [k for k,v in c.most_common(4)]
-    except: ct = [0,1,2,3]
+    # 1. Trend Chạm: chữ số cuối GĐB 15 kỳ gần nhất
+    try: ct = _most_common_digits(view.recent_last2(15) % 10, 4)
+    except Exception: ct = [0,1,2,3]
     
     # 2. Cầu Vị Trí
     try:
-        last_str = str(df.iloc[-1]['De'])
-        d = "".join(filter(str.isdigit, last_str))
-        last = int(d) if d else 0
+        last = view.last_value()
         t = (last//10 + last%10)%10
         ctl = list(set([t, (t+5)%10, (t+1)%10, (t-1)%10]))
-    except: ctl = [4,5,6,7]
+    except Exception: ctl = [4,5,6,7]
     
-    # 3. [SMART LOGIC] CHỌN BỘ - Dùng BO_SO_DICT chuẩn
+    # 3. [SMART LOGIC] CHỌN BỘ - Dùng bảng tra ngược bộ số chuẩn (de_utils)
     try:
-        recent_de = []
-        for x in df.tail(30)['De']:
-            s = str(x).strip()
-            digits = "".join(filter(str.isdigit, s))
-            if len(digits) >= 2: recent_de.append(digits[-2:])
-            elif len(digits) == 1: recent_de.append(digits.zfill(2))
-        
-        bo_stats = {b: {'f': 0, 'last_idx': -1} for b in BO_SO_DICT.keys()}
-        
-        for idx, val_str in enumerate(recent_de):
-            try:
-                val = int(val_str)
-                for b_name, b_list in BO_SO_DICT.items():
-                    if val in b_list:
-                        bo_stats[b_name]['f'] += 1
-                        bo_stats[b_name]['last_idx'] = idx
-                        break
-            except: continue
+        codes = view.recent_last2(30)
+        bo_freq, bo_last = bo_frequency(codes), bo_last_index(codes)
             
         scored_bo = []
-        total_len = len(recent_de)
+        total_len = len(codes)
         
-        for b_name, stats in bo_stats.items():
-            freq = stats['f']
-            gan = (total_len - 1 - stats['last_idx']) if stats['last_idx'] != -1 else 30
+        for k, b_name in enumerate(BO_SO_NAMES):
+            freq = int(bo_freq[k])
+            gan = (total_len - 1 - int(bo_last[k])) if bo_last[k] != -1 else 30
             
             # Hệ số Tần suất = 1.5
             score = (freq * 1.5) - (gan * 0.5)
@@ -625,12 +705,12 @@ def analyze_independent_factors(df):
     
     return ct, ctl, bo
 
-def run_intersection_matrix_analysis(all_data_ai_or_df):
-    df = None
-    if hasattr(all_data_ai_or_df, "columns"): df = all_data_ai_or_df
-    else: df, _ = _ai_rows_to_dataframe(all_data_ai_or_df)
+def run_intersection_matrix_analysis(all_data_ai_or_view):
+    """all_data_ai_or_view: hàng A:I, DeHistoryView dùng chung, hoặc DataFrame cũ có cột 'De'."""
+    view = all_data_ai_or_view
+    if not hasattr(view, "columns"): view = get_de_history_view(view)
     
-    cham_thong, cham_ti_le, bo_chon = analyze_independent_factors(df)
+    cham_thong, cham_ti_le, bo_chon = analyze_independent_factors(view)
     
     bang_diem = {i: 0 for i in range(100)}
     ghi_chu = {i: [] for i in range(100)}
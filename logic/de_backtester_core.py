@@ -7,10 +7,10 @@ import traceback
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from logic.de_lookup import dan_mask, gdb_code, hits
 from logic.de_utils import (
     get_gdb_last_2, 
     get_touches_by_offset, 
-    generate_dan_de_from_touches,
     check_cham,
     # [NEW] Import logic bộ
     get_set_name_of_number,
@@ -138,8 +138,7 @@ class DeBacktesterCore:
 
                 if mode == 'DYNAMIC':
                     touches = get_touches_by_offset(base_sum, k, logic_type="TONG")
-                    dan_de = generate_dan_de_from_touches(touches)
-                    is_win = gdb_today in dan_de
+                    is_win = hits(gdb_code(gdb_today), dan_mask(base_sum, k))
                     desc = f"{desc_base}%{k} -> Chạm {touches}"
                 else:
                     # CLASSIC: Chạm (Gốc + Bóng)
@@ -212,10 +211,51 @@ def _restore_brackets_format(pos_name):
     
     return pos_name
 
-def run_de_bridge_historical_test(bridge_config, all_data, days=30):
+DE_KIND_SET = "SET"
+DE_KIND_DYNAMIC = "DYNAMIC"
+DE_KIND_POS_SUM = "POS_SUM"
+DE_KIND_KILLER = "KILLER"
+DE_KIND_CLASSIC = "CLASSIC"
+
+
+def get_de_bridge_kind(bridge_type, bridge_name, is_scanner=False):
+    """Logic chấm điểm của cầu Đề (thứ tự ưu tiên: Bộ -> Động -> Tổng -> Loại -> Classic)."""
+    if bridge_type == "DE_SET" or "DE_SET_" in bridge_name or (is_scanner and "Bộ" in bridge_name):
+        return DE_KIND_SET
+    if bridge_type == "DE_DYNAMIC_K" or "DE_DYN_" in bridge_name or is_scanner:
+        return DE_KIND_DYNAMIC
+    if bridge_type == "DE_POS_SUM" or "DE_POS_" in bridge_name:
+        return DE_KIND_POS_SUM
+    if bridge_type == "DE_KILLER" or "DE_KILLER_" in bridge_name:
+        return DE_KIND_KILLER
+    return DE_KIND_CLASSIC
+
+
+def get_bridge_k_offset(bridge_config):
+    """
+    Độ lệch K của cầu Động. Cầu tải từ DB không có trường k_offset
+    thì lấy từ tên (…_K4, …_K4_EXTRA -> 4).
+    """
+    k_offset = bridge_config.get("k_offset", 0)
+    bridge_name = bridge_config.get("name", "")
+    if k_offset == 0 and "_K" in bridge_name:
+        try:
+            k_str = bridge_name.split("_K")[-1]
+            if k_str and k_str[0].isdigit():
+                import re
+                match = re.match(r'^(\d+)', k_str)
+                if match:
+                    k_offset = int(match.group(1))
+        except (ValueError, IndexError, AttributeError):
+            pass  # Giữ k_offset = 0
+    return k_offset
+
+
+def run_de_bridge_historical_test(bridge_config, all_data, days=30, db_name=None):
     """
     Chạy backtest lịch sử (Phiên bản Fix Sync Dashboard & Pending State).
     Ưu tiên cấu hình Index từ DB để đồng bộ kết quả với Bảng Cầu Động.
+    db_name: nếu có, kỳ nào đã lưu trong BridgeOutcomes thì đọc lại thay vì tính.
     """
     try:
         # 1. Validation Input
@@ -245,25 +285,7 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
         
         pos1_name = bridge_config.get("pos1_name")
         pos2_name = bridge_config.get("pos2_name")
-        k_offset = bridge_config.get("k_offset", 0)
-        
-        # [FIX] Extract k_offset from bridge name if not provided in config
-        # This handles bridges loaded from DB that don't have k_offset field
-        if k_offset == 0 and "_K" in bridge_name:
-            try:
-                parts = bridge_name.split("_K")
-                if len(parts) > 1:
-                    k_str = parts[-1]
-                    # Handle cases like "K4" or just "4"
-                    # Only take the numeric part (handles "K4_EXTRA" → "4")
-                    if k_str and k_str[0].isdigit():
-                        # Extract leading digits only
-                        import re
-                        match = re.match(r'^(\d+)', k_str)
-                        if match:
-                            k_offset = int(match.group(1))
-            except (ValueError, IndexError, AttributeError):
-                pass  # Keep default k_offset = 0
+        k_offset = get_bridge_k_offset(bridge_config)
         
         # 4. Mapping Vị Trí (Index) - Logic Đồng Bộ Dashboard
         # Khởi tạo Backtester helper chỉ để dùng các hàm tiện ích nếu cần
@@ -307,6 +329,18 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
             if idx1 is None and not is_scanner:
                 return [{'date': 'LỖI', 'pred': 'N/A', 'result': 'N/A', 'is_win': False, 'status': f'FAIL: Mất vị trí 1 ({pos1_name})'}]
 
+        # Kết quả đã lưu (BridgeOutcomes): {ky: (outcome, prediction)}
+        stored = {}
+        if db_name:
+            try:
+                from logic.bridge_outcomes import load_bridge_outcomes
+                stored = load_bridge_outcomes(db_name, bridge_config, [row[0] for row in all_data[start_index:]])
+            except Exception:
+                stored = {}
+
+        # Logic: Bộ -> Động -> Tổng -> Loại -> Classic
+        kind = get_de_bridge_kind(bridge_type, bridge_name, is_scanner)
+
         # 5. VÒNG LẶP BACKTEST CHÍNH
         for i in range(start_index, min(start_index + actual_days + 1, total_len)):
             try:
@@ -325,6 +359,17 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
                     is_pending_day = True
                     gdb_today = "??"
 
+                saved = None if is_pending_day else stored.get(row_today[0])
+                if saved is not None:
+                    results.append({
+                        'date': date_str,
+                        'pred': saved[1],
+                        'result': gdb_today,
+                        'is_win': bool(saved[0]),
+                        'status': "Ăn" if saved[0] else "Gãy"
+                    })
+                    continue
+
                 # --- LẤY SỐ TẠI VỊ TRÍ (HỢP NHẤT LOGIC) ---
                 n1, n2 = 0, 0
                 has_n2 = True 
@@ -371,8 +416,7 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
                 is_win = False
                 pred_str = ""
                 
-                # Logic: Bộ -> Động -> Tổng -> Classic
-                if bridge_type == "DE_SET" or "DE_SET_" in bridge_name or (is_scanner and "Bộ" in bridge_name):
+                if kind == DE_KIND_SET:
                     if has_n2:
                         pair_val = f"{n1}{n2}"
                         set_name = get_set_name_of_number(pair_val)
@@ -389,19 +433,18 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
                     else:
                         pred_str = "Lỗi: Cầu Bộ thiếu Vị trí 2"
                 
-                elif bridge_type == "DE_DYNAMIC_K" or "DE_DYN_" in bridge_name or is_scanner:
+                elif kind == DE_KIND_DYNAMIC:
                     base_sum = (n1 + n2) % 10 if has_n2 else n1
                     touches = get_touches_by_offset(base_sum, k_offset, logic_type="TONG")
-                    dan_de = generate_dan_de_from_touches(touches)
                     
                     if is_pending_day:
                         is_win = False
                     else:
-                        is_win = gdb_today in dan_de
+                        is_win = hits(gdb_code(gdb_today), dan_mask(base_sum, k_offset))
                         
                     pred_str = f"Chạm {','.join(map(str, touches))}"
                 
-                elif bridge_type == "DE_POS_SUM" or "DE_POS_" in bridge_name:
+                elif kind == DE_KIND_POS_SUM:
                     base_sum = (n1 + n2) % 10 if has_n2 else n1
                     if is_pending_day:
                         is_win = False
@@ -409,7 +452,7 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
                         is_win = check_cham(gdb_today, [base_sum])
                     pred_str = f"Chạm {base_sum}"
                 
-                elif bridge_type == "DE_KILLER" or "DE_KILLER_" in bridge_name:
+                elif kind == DE_KIND_KILLER:
                     # KILLER logic: Predict which touch to ELIMINATE (not appear)
                     killer_touch = (n1 + n2) % 10 if has_n2 else n1
                     if is_pending_day:
@@ -457,11 +500,11 @@ def run_de_bridge_historical_test(bridge_config, all_data, days=30):
     except Exception as e:
         return [{'date': 'LỖI', 'pred': 'N/A', 'result': 'N/A', 'is_win': False, 'status': f'CRASH: {str(e)}'}]
 
-def calculate_de_bridge_max_lose_history(bridge_config, all_data):
+def calculate_de_bridge_max_lose_history(bridge_config, all_data, db_name=None):
     """Wrapper cho tính max lose (Giữ nguyên)"""
     if not bridge_config or not all_data: return -1
     try:
-        results = run_de_bridge_historical_test(bridge_config, all_data, days=len(all_data))
+        results = run_de_bridge_historical_test(bridge_config, all_data, days=len(all_data), db_name=db_name)
         if not results or "FAIL" in str(results[0].get('status', '')): return -1
         
         max_lose = 0
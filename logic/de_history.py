@@ -0,0 +1,121 @@
+# Tên file: logic/de_history.py
+"""
+de_history.py - Lịch sử Đề dạng mảng, dựng một lần cho mỗi phiên bản dữ liệu
+
+Các phân tích Đề (ma trận giao thoa, xu hướng chạm/bộ, Tab Soi Cầu Đề) trước
+đây tự dựng DataFrame / đọc lại chuỗi GĐB từ all_data_ai. DeHistoryView gom
+các cột cần thiết thành mảng numpy chỉ đọc:
+- gdb: chuỗi GĐB gốc của từng kỳ
+- n_digits: số chữ số của GĐB (0 = kỳ lỗi)
+- last2: 2 chữ số cuối của GĐB (GĐB 1 chữ số -> chính chữ số đó), -1 nếu kỳ lỗi
+- de_codes: số đề như get_gdb_last_2 / de_number_codes (cần >= 2 chữ số), -1 nếu lỗi
+- head / tail: chữ số đầu / đuôi của số đề (-1 nếu lỗi)
+- bo_ids: id bộ của số đề (-1 nếu lỗi)
+
+get_de_history_view(all_data_ai) giữ view của vài danh sách kỳ gần nhất, nên
+mọi nơi dùng cùng all_data_ai nhận chung một view (không sao chép lịch sử).
+"""
+
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from logic.de_utils import de_bo_ids
+except ImportError:
+    from de_utils import de_bo_ids
+
+
+def _readonly(array):
+    array.setflags(write=False)
+    return array
+
+
+@dataclass(frozen=True, eq=False)
+class DeHistoryView:
+    """Các cột Đề của lịch sử (theo thứ tự kỳ), xem mô tả module."""
+    gdb: Tuple[str, ...]
+    n_digits: np.ndarray
+    last2: np.ndarray
+    de_codes: np.ndarray
+    head: np.ndarray
+    tail: np.ndarray
+    bo_ids: np.ndarray
+
+    @classmethod
+    def from_gdb_values(cls, values):
+        """Dựng view từ dãy giá trị GĐB (chuỗi / số / None)."""
+        gdb = tuple("" if v is None else str(v) for v in values)
+        n_digits = np.zeros(len(gdb), dtype=np.int8)
+        last2 = np.full(len(gdb), -1, dtype=np.int16)
+        for i, text in enumerate(gdb):
+            digits = "".join(filter(str.isdigit, text))
+            try:
+                last2[i] = int(digits[-2:]) if digits else -1
+                n_digits[i] = min(len(digits), 127)
+            except ValueError:
+                pass  # Chữ số unicode (VD "²") -> coi như kỳ lỗi
+        de_codes = np.where(n_digits >= 2, last2, -1).astype(np.int16)
+        valid = de_codes >= 0
+        return cls(
+            gdb=gdb,
+            n_digits=_readonly(n_digits),
+            last2=_readonly(last2),
+            de_codes=_readonly(de_codes),
+            head=_readonly(np.where(valid, de_codes // 10, -1).astype(np.int8)),
+            tail=_readonly(np.where(valid, de_codes % 10, -1).astype(np.int8)),
+            bo_ids=_readonly(de_bo_ids(de_codes).astype(np.int8)),
+        )
+
+    @classmethod
+    def from_rows(cls, all_data_ai):
+        """all_data_ai: hàng A:I (cột 2 là GĐB)."""
+        return cls.from_gdb_values(row[2] if row is not None and len(row) > 2 else None for row in all_data_ai)
+
+    def __len__(self):
+        return len(self.gdb)
+
+    def recent_last2(self, n):
+        """2 số cuối GĐB của `n` kỳ gần nhất, bỏ kỳ không có chữ số (như vòng df.tail(n)['De'])."""
+        window = self.last2[-n:] if n > 0 else self.last2[:0]
+        return window[window >= 0]
+
+    def last_value(self):
+        """2 số cuối GĐB kỳ gần nhất (0 nếu không đọc được)."""
+        return int(self.last2[-1]) if len(self) and self.last2[-1] >= 0 else 0
+
+
+MAX_CACHED_VIEWS = 4     # Lịch sử đầy đủ + các lát cắt (VD: giới hạn DATA_LIMIT_DASHBOARD)
+
+_cache_lock = threading.Lock()
+_cache = OrderedDict()   # {id(rows): (rows, khóa, view)} - giữ rows để id() không bị tái sử dụng
+
+
+def _row_key(rows):
+    last = rows[-1] if len(rows) else ()
+    crc = zlib.crc32("|".join(str(v) for v in last).encode("utf-8"))
+    return len(rows), crc
+
+
+def get_de_history_view(all_data_ai):
+    """View dùng chung cho danh sách kỳ `all_data_ai` (dựng lại khi danh sách / số kỳ / kỳ cuối đổi)."""
+    if isinstance(all_data_ai, DeHistoryView):
+        return all_data_ai
+    rows = all_data_ai if all_data_ai is not None else []
+    key = _row_key(rows)
+    with _cache_lock:
+        entry = _cache.get(id(rows))
+        if entry is not None and entry[0] is rows and entry[1] == key:
+            _cache.move_to_end(id(rows))
+            return entry[2]
+    view = DeHistoryView.from_rows(rows)
+    with _cache_lock:
+        _cache[id(rows)] = (rows, key, view)
+        _cache.move_to_end(id(rows))
+        while len(_cache) > MAX_CACHED_VIEWS:
+            _cache.popitem(last=False)
+    return view
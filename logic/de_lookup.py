@@ -0,0 +1,140 @@
+# Tên file: logic/de_lookup.py
+"""
+de_lookup.py - Bảng tra dàn đề tính sẵn (chạm, tổng, độ lệch K)
+
+Dàn đề chỉ phụ thuộc tập chạm (10 chữ số -> 1024 tập), nên mọi dàn được tính
+một lần khi import:
+- DAN_MASK_BY_BITS[bits]: mặt nạ 100 số (bool) của tập chạm `bits`
+  (bit d bật = có chạm d); DAN_LIST_BY_BITS[bits]: dàn dạng ("03", "13", ...).
+- TOUCHES / TOUCH_BITS / DAN_MASKS / DAN_LISTS theo [logic, số gốc 0-9, K 0-9]
+  cho get_touches_by_offset (logic "TONG" = 4 chạm biến thiên, khác = 2 chạm).
+- DIGIT_BITS[số đề]: bit các chữ số của số đề -> "số đề dính chạm" là một
+  phép AND: touch_hits(), chạy được trên mảng numpy.
+- hits(gdb_code, mask): số đề (mã 0..99, -1 = chưa có) có nằm trong dàn.
+
+Các bảng chỉ đọc (setflags write=False) vì được dùng chung giữa các engine Đề.
+"""
+
+import operator
+
+import numpy as np
+
+LOGIC_TONG = "TONG"
+LOGIC_VITRI = "VITRI"
+LOGIC_TYPES = (LOGIC_TONG, LOGIC_VITRI)
+
+_NUMBERS = np.arange(100)
+
+
+def _logic_id(logic_type):
+    # get_touches_by_offset: mọi logic khác "TONG" đều là logic vị trí
+    return 0 if logic_type == LOGIC_TONG else 1
+
+
+def _offset_touches(base_val, k, logic_id):
+    """Công thức gốc của get_touches_by_offset."""
+    touches = set()
+    if logic_id == 0:
+        # (Gốc + K) và (Gốc + K + 1), kèm bóng
+        v1 = (base_val + k) % 10
+        v2 = (base_val + k + 1) % 10
+        touches.update([v1, (v1 + 5) % 10, v2, (v2 + 5) % 10])
+    else:
+        v = (base_val + k) % 10
+        touches.update([v, (v + 5) % 10])
+    return sorted(touches)
+
+
+def touches_to_bits(touches):
+    """Tập chạm -> số 10 bit (giữ đúng ngữ nghĩa `chữ số in touches`)."""
+    return sum(1 << d for d in range(10) if d in touches)
+
+
+def _readonly(array):
+    array.setflags(write=False)
+    return array
+
+
+# --- Bảng theo tập chạm (1024 tập) ---
+DIGIT_BITS = _readonly(((1 << (_NUMBERS // 10)) | (1 << (_NUMBERS % 10))).astype(np.int16))
+DAN_MASK_BY_BITS = _readonly((np.arange(1024)[:, None] & DIGIT_BITS[None, :]) != 0)
+# Dựng bằng int Python (nhanh hơn ~5 lần so với np.flatnonzero từng dòng, tính lúc import)
+_NUMBER_STRS = tuple(f"{n:02d}" for n in range(100))
+_DIGIT_BITS_PY = DIGIT_BITS.tolist()
+DAN_LIST_BY_BITS = tuple(
+    tuple(_NUMBER_STRS[n] for n in range(100) if _DIGIT_BITS_PY[n] & bits)
+    for bits in range(1024)
+)
+
+# --- Bảng theo (logic, số gốc, K) ---
+TOUCHES = tuple(
+    tuple(tuple(tuple(_offset_touches(base, k, lid)) for k in range(10)) for base in range(10))
+    for lid in range(len(LOGIC_TYPES))
+)
+TOUCH_BITS = _readonly(np.array(
+    [[[touches_to_bits(TOUCHES[lid][base][k]) for k in range(10)] for base in range(10)]
+     for lid in range(len(LOGIC_TYPES))],
+    dtype=np.int16,
+))
+DAN_MASKS = _readonly(DAN_MASK_BY_BITS[TOUCH_BITS])
+DAN_LISTS = tuple(
+    tuple(tuple(DAN_LIST_BY_BITS[TOUCH_BITS[lid, base, k]] for k in range(10)) for base in range(10))
+    for lid in range(len(LOGIC_TYPES))
+)
+
+
+def touch_set(base_val, k, logic_type=LOGIC_TONG):
+    """Tuple chạm đã sắp xếp cho (số gốc, K, logic)."""
+    lid = _logic_id(logic_type)
+    try:
+        return TOUCHES[lid][operator.index(base_val) % 10][operator.index(k) % 10]
+    except TypeError:
+        return tuple(_offset_touches(base_val, k, lid))  # Số gốc không phải số nguyên
+
+
+def touch_bits(base_val, k, logic_type=LOGIC_TONG):
+    return int(TOUCH_BITS[_logic_id(logic_type), base_val % 10, k % 10])
+
+
+def dan_mask(base_val, k, logic_type=LOGIC_TONG):
+    """Mặt nạ 100 số (bool, chỉ đọc) của dàn (số gốc, K, logic)."""
+    return DAN_MASKS[_logic_id(logic_type), base_val % 10, k % 10]
+
+
+def dan_list(base_val, k, logic_type=LOGIC_TONG):
+    return DAN_LISTS[_logic_id(logic_type)][base_val % 10][k % 10]
+
+
+def dan_of_touches(touches):
+    """Dàn ("xx", ...) của một danh sách chạm bất kỳ."""
+    return DAN_LIST_BY_BITS[touches_to_bits(touches)]
+
+
+def gdb_code(value):
+    """Số đề "37" / 37 -> 37; -1 nếu rỗng / không đọc được."""
+    try:
+        code = int(value)
+    except (TypeError, ValueError):
+        return -1
+    return code if 0 <= code <= 99 else -1
+
+
+def hits(gdb_codes, mask):
+    """
+    Số đề có nằm trong dàn không. gdb_codes: mã 0..99 (-1 = chưa có kết quả),
+    số hoặc mảng; mask: mặt nạ [..., 100] (một dàn, hoặc một dàn cho mỗi phần tử).
+    """
+    codes = np.asarray(gdb_codes)
+    mask = np.asarray(mask, dtype=bool)
+    shape = np.broadcast_shapes(codes.shape, mask.shape[:-1])
+    idx = np.broadcast_to(np.clip(codes, 0, 99), shape)
+    result = np.take_along_axis(np.broadcast_to(mask, shape + (100,)), idx[..., None], axis=-1)[..., 0]
+    result = result & (np.broadcast_to(codes, shape) >= 0)
+    return bool(result) if result.ndim == 0 else result
+
+
+def touch_hits(gdb_codes, bits):
+    """Số đề có dính tập chạm `bits` (10 bit) không - như check_cham, chạy được trên mảng."""
+    codes = np.asarray(gdb_codes)
+    result = ((DIGIT_BITS[np.clip(codes, 0, 99)] & np.asarray(bits)) != 0) & (codes >= 0)
+    return bool(result) if result.ndim == 0 else result
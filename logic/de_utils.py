@@ -3,6 +3,13 @@
 
 import datetime
 
+import numpy as np
+
+try:
+    from logic.de_lookup import DAN_LIST_BY_BITS, touch_set, touches_to_bits
+except ImportError:
+    from de_lookup import DAN_LIST_BY_BITS, touch_set, touches_to_bits
+
 # --- 1. ĐỊNH NGHĨA DỮ LIỆU CƠ BẢN ---
 # Các bộ số đề cơ bản (Mapping từ Tên Bộ -> Danh sách số)
 # ⚡ FIX: Đã rà soát và chuẩn hóa lại toàn bộ 15 bộ số
@@ -38,6 +45,25 @@ else:
 # Bóng dương: 0->5, 1->6...
 BONG_DUONG_MAP = {0: 5, 1: 6, 2: 7, 3: 8, 4: 9, 5: 0, 6: 1, 7: 2, 8: 3, 9: 4}
 
+# --- 1b. BẢNG TRA NGƯỢC (SỐ -> BỘ / CHẠM / TỔNG) ---
+# Tính sẵn một lần: tra bộ của một số là O(1) thay vì duyệt 15 bộ.
+BO_SO_NAMES = list(BO_SO_DE.keys())                 # id bộ -> tên bộ
+BO_NAME_BY_NUMBER = {}                              # "05" -> "00"
+NUMBER_TO_BO_ID = np.full(100, -1, dtype=np.int8)   # 5 -> id bộ "00"
+BO_MASKS = np.zeros((len(BO_SO_NAMES), 100), dtype=bool)
+for _bo_id, _bo_name in enumerate(BO_SO_NAMES):
+    for _num in BO_SO_DE[_bo_name]:
+        BO_MASKS[_bo_id, int(_num)] = True
+        if _num not in BO_NAME_BY_NUMBER:
+            BO_NAME_BY_NUMBER[_num] = _bo_name
+            NUMBER_TO_BO_ID[int(_num)] = _bo_id
+
+_DE_NUMBERS = np.arange(100)
+_DE_DIGITS = np.arange(10)[:, None]
+# CHAM_MASKS[d]: các số có chữ số d; TONG_MASKS[t]: các số có tổng (mod 10) = t
+CHAM_MASKS = (_DE_NUMBERS[None, :] // 10 == _DE_DIGITS) | (_DE_NUMBERS[None, :] % 10 == _DE_DIGITS)
+TONG_MASKS = ((_DE_NUMBERS // 10 + _DE_NUMBERS % 10) % 10)[None, :] == _DE_DIGITS
+
 # --- 2. CÔNG CỤ XỬ LÝ SỐ ---
 
 def get_gdb_last_2(row_data):
@@ -75,10 +101,7 @@ def check_tong(so_de_str, tong_list):
 
 def get_bo_name_by_pair(n1, n2):
     """(V77) Tìm tên bộ số từ 2 số bất kỳ (ghép lại)."""
-    pair_str = f"{n1}{n2}"
-    for bo_name, nums in BO_SO_DE.items():
-        if pair_str in nums: return bo_name
-    return None
+    return BO_NAME_BY_NUMBER.get(f"{n1}{n2}")
 
 def get_set_name_of_number(number_str):
     """
@@ -99,29 +122,16 @@ def get_set_name_of_number(number_str):
     if len(number_str) > 2:
         number_str = number_str[-2:]
     
-    # Tìm trong BO_SO_DE
-    for bo_name, nums in BO_SO_DE.items():
-        if number_str in nums:
-            return bo_name
-    
-    return None
+    # Tra bảng ngược của BO_SO_DE
+    return BO_NAME_BY_NUMBER.get(number_str)
 
 def get_touches_by_offset(base_val, k, logic_type="TONG"):
     """
     (V77) Sinh 4 chạm dựa trên số gốc và độ lệch K.
     logic_type: "TONG" (Biến thiên) hoặc "VITRI" (Cố định).
+    Tra bảng tính sẵn trong de_lookup (trả về list mới, người gọi được sửa).
     """
-    touches = set()
-    if logic_type == "TONG":
-        # Công thức: (Gốc + K) và (Gốc + K + 1)
-        v1 = (base_val + k) % 10
-        v2 = (base_val + k + 1) % 10
-        touches.update([v1, (v1+5)%10, v2, (v2+5)%10])
-    else:
-        # Logic Vị trí: Lấy thẳng giá trị + bóng
-        v = (base_val + k) % 10
-        touches.update([v, (v+5)%10])
-    return sorted(list(touches))
+    return list(touch_set(base_val, k, logic_type))
 
 def get_4_touches_smart(numbers_list):
     """
@@ -142,15 +152,11 @@ def generate_dan_de_from_touches(touch_list, bo_filter_seeds=None):
     """
     (Giữ nguyên Logic cũ) Tạo dàn đề từ list chạm và lọc bằng Bộ (Set).
     """
-    full_dan = set()
-    for i in range(100):
-        s = f"{i:02d}"
-        d1, d2 = int(s[0]), int(s[1])
-        if d1 in touch_list or d2 in touch_list:
-            full_dan.add(s)
-            
+    # Dàn của tập chạm tra bảng (de_lookup.DAN_LIST_BY_BITS), đã sắp xếp
+    dan_sorted = DAN_LIST_BY_BITS[touches_to_bits(touch_list)]
     if not bo_filter_seeds:
-        return sorted(list(full_dan))
+        return list(dan_sorted)
+    full_dan = set(dan_sorted)
         
     valid_bo_nums = set()
     seeds = [n % 10 for n in bo_filter_seeds]
@@ -162,10 +168,9 @@ def generate_dan_de_from_touches(touch_list, bo_filter_seeds=None):
             pairs_formed.add(p1)
 
     for pair in pairs_formed:
-        for bo_name, bo_values in BO_SO_DE.items():
-            if pair in bo_values:
-                valid_bo_nums.update(bo_values)
-                break
+        bo_name = BO_NAME_BY_NUMBER.get(pair)
+        if bo_name:
+            valid_bo_nums.update(BO_SO_DE[bo_name])
     
     if not valid_bo_nums:
         return sorted(list(full_dan))
@@ -173,6 +178,45 @@ def generate_dan_de_from_touches(touch_list, bo_filter_seeds=None):
     final_dan = full_dan.intersection(valid_bo_nums)
     return sorted(list(final_dan))
 
+# --- 3b. THỐNG KÊ THEO MẢNG SỐ ĐỀ ---
+
+def de_number_codes(rows):
+    """Mảng số đề (0..99) của từng kỳ; -1 nếu kỳ không đọc được GĐB."""
+    codes = np.full(len(rows), -1, dtype=np.int16)
+    for i, row in enumerate(rows):
+        de = get_gdb_last_2(row)
+        if de:
+            try: codes[i] = int(de)
+            except ValueError: pass
+    return codes
+
+def de_bo_ids(de_codes):
+    """Id bộ của từng kỳ (-1 nếu kỳ lỗi hoặc số không thuộc bộ nào)."""
+    de_codes = np.asarray(de_codes)
+    return np.where(de_codes >= 0, NUMBER_TO_BO_ID[np.clip(de_codes, 0, 99)], -1)
+
+def bo_frequency(de_codes):
+    """Số lần về của từng bộ (theo id) trong mảng số đề."""
+    ids = de_bo_ids(de_codes)
+    return np.bincount(ids[ids >= 0], minlength=len(BO_SO_NAMES))
+
+def bo_last_index(de_codes):
+    """Vị trí kỳ về gần nhất của từng bộ (theo id); -1 nếu chưa về."""
+    ids = de_bo_ids(de_codes)
+    last = np.full(len(BO_SO_NAMES), -1, dtype=np.int64)
+    valid = ids >= 0
+    np.maximum.at(last, ids[valid], np.flatnonzero(valid))
+    return last
+
+def cham_last_index(de_codes):
+    """Vị trí kỳ về gần nhất của từng chạm 0..9; -1 nếu chưa về."""
+    de_codes = np.asarray(de_codes)
+    valid = np.flatnonzero(de_codes >= 0)
+    last = np.full(10, -1, dtype=np.int64)
+    np.maximum.at(last, de_codes[valid] // 10, valid)
+    np.maximum.at(last, de_codes[valid] % 10, valid)
+    return last
+
 # --- 4. ADAPTER ---
 def convert_data_for_de_backtest(all_data_ai):
     de_data = []
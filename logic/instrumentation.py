@@ -0,0 +1,358 @@
+# Tên file: logic/instrumentation.py
+"""
+instrumentation.py - Đo thời gian theo giai đoạn (stage) cho các tác vụ nặng
+
+- perf_stage("ten.stage") (context manager) và @timed("ten.stage") (decorator)
+  đo thời gian một giai đoạn; các stage lồng nhau ghi lại stage cha.
+- perf_count("bridges_evaluated", n) cộng bộ đếm vào stage đang chạy gần nhất
+  (không có stage nào thì bỏ qua), nên code sâu bên dưới (ghi DB, vòng quét)
+  không cần biết ai đang đo.
+- PERF_PROFILE_MODE = "cprofile" / "tracemalloc" bật cProfile hoặc đo bộ nhớ
+  đỉnh cho stage ngoài cùng.
+
+Bản ghi được gom trong bộ nhớ và ghi một lần khi stage ngoài cùng kết thúc:
+vào bảng perf_log (SQLite) và file JSON cuộn (chỉ giữ PERF_LOG_JSON_MAX bản
+ghi cuối), bỏ qua nếu stage ngoài cùng ngắn hơn PERF_LOG_MIN_SECONDS.
+Tắt bằng PERF_LOG_ENABLED = False.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sqlite3
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+try:
+    from .config_manager import SETTINGS
+except ImportError:
+    SETTINGS = None
+
+# Đường dẫn tuyệt đối theo thư mục dự án (như DB_NAME), không phụ thuộc thư mục đang chạy
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PERF_JSON_FILE = os.path.join(PROJECT_ROOT, "logs", "perf_log.json")
+
+PROFILE_OFF = "off"
+PROFILE_CPROFILE = "cprofile"
+PROFILE_TRACEMALLOC = "tracemalloc"
+
+PROFILE_TOP_N = 25
+
+PERF_LOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS perf_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    parent TEXT,
+    duration_s REAL NOT NULL,
+    status TEXT DEFAULT 'ok',
+    counters TEXT,
+    peak_mb REAL,
+    profile TEXT
+)"""
+
+
+def _default_db():
+    # Import muộn: db_manager cũng dùng module này (tránh import vòng)
+    try:
+        from .db_manager import DB_NAME
+        return DB_NAME
+    except ImportError:
+        return "data/xo_so_prizes_all_logic.db"
+
+
+def _setting(key, default):
+    if SETTINGS is None:
+        return default
+    return getattr(SETTINGS, key, default)
+
+
+class StageRecord:
+    """Một lần chạy stage: thời gian, bộ đếm và kết quả profile (nếu có)."""
+
+    __slots__ = ("stage", "parent", "started_at", "duration_s", "status", "counters",
+                 "peak_mb", "profile", "_start")
+
+    def __init__(self, stage, parent=None):
+        self.stage = stage
+        self.parent = parent
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.duration_s = 0.0
+        self.status = "ok"
+        self.counters = {}
+        self.peak_mb = None
+        self.profile = None
+        self._start = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        return {
+            "started_at": self.started_at,
+            "stage": self.stage,
+            "parent": self.parent,
+            "duration_s": round(self.duration_s, 6),
+            "status": self.status,
+            "counters": dict(self.counters),
+            "peak_mb": self.peak_mb,
+            "profile": self.profile,
+        }
+
+
+class PerfRecorder:
+    """
+    Giữ stack stage theo từng thread và ghi bản ghi ra perf_log + JSON.
+    db_path / json_path = None: dùng DB_NAME của db_manager / PERF_JSON_FILE lúc ghi.
+    """
+
+    def __init__(self, db_path=None, json_path=None):
+        self.db_path = db_path
+        self.json_path = json_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    # --- Stack theo thread ---
+    def _state(self):
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack, local.pending = [], []
+        return local
+
+    def current(self):
+        stack = self._state().stack
+        return stack[-1] if stack else None
+
+    # --- Đo ---
+    def enabled(self):
+        return bool(_setting("PERF_LOG_ENABLED", True))
+
+    def stage(self, name):
+        return _StageContext(self, name)
+
+    def _enter(self, name):
+        state = self._state()
+        parent = state.stack[-1].stage if state.stack else None
+        record = StageRecord(name, parent)
+        profiler, traced = None, False
+        if not state.stack:
+            mode = str(_setting("PERF_PROFILE_MODE", PROFILE_OFF)).lower()
+            if mode == PROFILE_CPROFILE:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:  # Đã có profiler khác đang chạy
+                    profiler = None
+            elif mode == PROFILE_TRACEMALLOC and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                traced = True
+        state.stack.append(record)
+        record._start = time.perf_counter()
+        return record, profiler, traced
+
+    def _exit(self, record, profiler, traced, failed):
+        record.duration_s = time.perf_counter() - record._start
+        if failed:
+            record.status = "error"
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+            record.profile = out.getvalue()
+        if traced:
+            record.peak_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 3)
+            tracemalloc.stop()
+
+        state = self._state()
+        if state.stack and state.stack[-1] is record:
+            state.stack.pop()
+        state.pending.append(record.to_dict())
+        if not state.stack:
+            pending, state.pending = state.pending, []
+            # Tác vụ ngắn (gọi lặp nhiều lần) không đáng ghi xuống đĩa
+            if record.duration_s >= float(_setting("PERF_LOG_MIN_SECONDS", 0.05)) or record.status != "ok":
+                self.write(pending)
+
+    # --- Ghi ---
+    def write(self, records):
+        """Ghi bản ghi vào perf_log và file JSON cuộn (lỗi ghi không làm hỏng tác vụ)."""
+        if not records:
+            return
+        with self._write_lock:
+            try:
+                write_perf_records(self.db_path or _default_db(), records)
+            except Exception as e:
+                print(f"[Perf] Lỗi ghi perf_log: {e}")
+            try:
+                self._append_json(records)
+            except Exception as e:
+                print(f"[Perf] Lỗi ghi file JSON hiệu năng: {e}")
+
+    def _append_json(self, records):
+        path = self.json_path or PERF_JSON_FILE
+        keep = int(_setting("PERF_LOG_JSON_MAX", 500))
+        history = []
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    history = json.load(f)
+            except (OSError, ValueError):
+                history = []
+        # File JSON chỉ giữ bản tóm tắt (profile đầy đủ nằm trong perf_log)
+        history.extend(dict(r, profile=None) for r in records)
+        history = history[-keep:] if keep > 0 else []
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(history, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+
+
+class _StageContext:
+    __slots__ = ("recorder", "name", "_state")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self._state = None
+
+    def __enter__(self):
+        if not self.recorder.enabled():
+            return _NULL_RECORD
+        self._state = self.recorder._enter(self.name)
+        return self._state[0]
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._state is not None:
+            self.recorder._exit(*self._state, failed=exc_type is not None)
+            self._state = None
+        return False
+
+
+class _NullRecord:
+    """Stage giả khi tắt đo: count() không làm gì."""
+
+    def count(self, name, n=1):
+        pass
+
+
+_NULL_RECORD = _NullRecord()
+
+_recorder = PerfRecorder()
+
+
+def get_recorder():
+    """PerfRecorder dùng chung của ứng dụng."""
+    return _recorder
+
+
+def perf_stage(name):
+    """Context manager đo một stage: `with perf_stage("dashboard.k2n_cache") as st: ...`."""
+    return _recorder.stage(name)
+
+
+def timed(name):
+    """Decorator: đo toàn bộ hàm như một stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _recorder.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def perf_count(name, n=1):
+    """Cộng bộ đếm vào stage đang chạy (nếu có)."""
+    record = _recorder.current()
+    if record is not None:
+        record.count(name, n)
+
+
+# ===================================================================================
+# BẢNG perf_log
+# ===================================================================================
+
+def ensure_perf_log_table(conn):
+    conn.execute(PERF_LOG_SCHEMA)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_perf_log_stage ON perf_log(stage, started_at)")
+
+
+def write_perf_records(db_path, records):
+    """Ghi danh sách bản ghi (dict của StageRecord) vào perf_log trong một transaction."""
+    conn = sqlite3.connect(db_path)
+    try:
+        ensure_perf_log_table(conn)
+        conn.executemany(
+            """INSERT INTO perf_log (started_at, stage, parent, duration_s, status, counters, peak_mb, profile)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            [(r["started_at"], r["stage"], r["parent"], r["duration_s"], r["status"],
+              json.dumps(r["counters"], ensure_ascii=False) if r["counters"] else None,
+              r["peak_mb"], r["profile"]) for r in records],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_perf_records(db_path=None, since_days=None, stage=None, limit=None):
+    """Đọc bản ghi perf_log (mới nhất trước). since_days: chỉ lấy N ngày gần nhất."""
+    conn = sqlite3.connect(db_path or _default_db())
+    try:
+        ensure_perf_log_table(conn)
+        query = "SELECT started_at, stage, parent, duration_s, status, counters, peak_mb, profile FROM perf_log"
+        where, params = [], []
+        if since_days is not None:
+            where.append("started_at >= ?")
+            params.append((datetime.now() - timedelta(days=since_days)).isoformat(timespec="seconds"))
+        if stage is not None:
+            where.append("stage = ?")
+            params.append(stage)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY started_at DESC, id DESC"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    return [
+        {"started_at": r[0], "stage": r[1], "parent": r[2], "duration_s": r[3], "status": r[4],
+         "counters": json.loads(r[5]) if r[5] else {}, "peak_mb": r[6], "profile": r[7]}
+        for r in rows
+    ]
+
+
+def summarize_stages(records):
+    """
+    Gom bản ghi theo stage, xếp theo tổng thời gian giảm dần:
+    [{stage, runs, total_s, avg_s, max_s, last_s, last_at, errors, counters}].
+    records phải theo thứ tự mới nhất trước (như load_perf_records).
+    """
+    summary = {}
+    for r in records:
+        item = summary.get(r["stage"])
+        if item is None:
+            item = summary[r["stage"]] = {
+                "stage": r["stage"], "runs": 0, "total_s": 0.0, "max_s": 0.0,
+                "last_s": r["duration_s"], "last_at": r["started_at"], "errors": 0, "counters": {},
+            }
+        item["runs"] += 1
+        item["total_s"] += r["duration_s"]
+        item["max_s"] = max(item["max_s"], r["duration_s"])
+        if r["status"] != "ok":
+            item["errors"] += 1
+        for name, value in (r.get("counters") or {}).items():
+            item["counters"][name] = item["counters"].get(name, 0) + value
+    result = list(summary.values())
+    for item in result:
+        item["avg_s"] = item["total_s"] / item["runs"]
+    result.sort(key=lambda x: x["total_s"], reverse=True)
+    return result
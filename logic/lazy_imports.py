@@ -0,0 +1,196 @@
+# Tên file: logic/lazy_imports.py
+"""
+lazy_imports.py - Nạp muộn các thư viện nặng + báo cáo chi phí import lúc khởi động
+
+- lazy_import("xgboost") trả về proxy module: thư viện chỉ thực sự được import ở
+  lần đầu truy cập thuộc tính (xgb.XGBClassifier, joblib.load...), nên
+  pandas / xgboost / sklearn / matplotlib không làm chậm lúc mở cửa sổ Tk.
+  Lần nạp đầu được đo như stage "import.<tên>" (perf_log) và ghi vào
+  lazy_import_costs().
+- measure_import_costs(["main_app"]) chạy một tiến trình Python mới với
+  `-X importtime`, trả về chi phí import (riêng / cộng dồn) của từng module;
+  format_import_report() in bảng top module chậm nhất và các thư viện nặng
+  đã bị nạp (xem scripts/startup_import_report.py).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    from .instrumentation import perf_stage
+except ImportError:
+    import contextlib
+    def perf_stage(name): return contextlib.nullcontext()
+
+# Thư viện không được nạp lúc khởi động (chỉ nạp khi dùng tới tính năng cần chúng)
+HEAVY_MODULES = ("pandas", "xgboost", "sklearn", "matplotlib", "scipy", "joblib")
+STARTUP_MODULES = ("main_app",)   # Điểm vào của ứng dụng Tk
+
+_proxies = {}
+_costs = {}                 # {tên module: giây nạp lần đầu}
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Proxy của một module: import ở lần đầu truy cập thuộc tính."""
+
+    __slots__ = ("_lazy_name", "_lazy_module", "_lazy_lock")
+
+    def __init__(self, name):
+        object.__setattr__(self, "_lazy_name", name)
+        object.__setattr__(self, "_lazy_module", None)
+        object.__setattr__(self, "_lazy_lock", threading.Lock())
+
+    def _load(self):
+        module = self._lazy_module
+        if module is not None:
+            return module
+        with self._lazy_lock:
+            if self._lazy_module is None:
+                name = self._lazy_name
+                already = name in sys.modules
+                start = time.perf_counter()
+                with perf_stage(f"import.{name}"):
+                    module = importlib.import_module(name)
+                if not already:
+                    with _lock:
+                        _costs[name] = time.perf_counter() - start
+                object.__setattr__(self, "_lazy_module", module)
+            return self._lazy_module
+
+    @property
+    def is_loaded(self):
+        return self._lazy_module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._lazy_module is not None else "not loaded"
+        return f"<LazyModule {self._lazy_name!r} ({state})>"
+
+
+def lazy_import(name):
+    """Proxy dùng chung cho module `name` (import thật ở lần truy cập đầu tiên)."""
+    with _lock:
+        proxy = _proxies.get(name)
+        if proxy is None:
+            proxy = _proxies[name] = LazyModule(name)
+    return proxy
+
+
+def lazy_import_costs():
+    """{module: giây} của các module đã được nạp muộn trong tiến trình này."""
+    with _lock:
+        return dict(_costs)
+
+
+def loaded_heavy_modules(modules=None):
+    """Các thư viện nặng đã có trong sys.modules (modules=None: tiến trình hiện tại)."""
+    names = sys.modules if modules is None else modules
+    return [m for m in HEAVY_MODULES if m in names]
+
+
+# ===================================================================================
+# BÁO CÁO CHI PHÍ IMPORT LÚC KHỞI ĐỘNG
+# ===================================================================================
+
+def parse_importtime(text):
+    """
+    Đọc output `python -X importtime`: danh sách
+    {module, self_s, cumulative_s, depth} theo thứ tự module được nạp xong.
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # Dòng tiêu đề
+        name = parts[2].rstrip()
+        entries.append({
+            "module": name.strip(),
+            "self_s": self_us / 1e6,
+            "cumulative_s": cumulative_us / 1e6,
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return entries
+
+
+def measure_import_costs(modules, python=None, cwd=None, timeout=300):
+    """Import `modules` trong một tiến trình Python mới (-X importtime) và trả về parse_importtime()."""
+    cwd = cwd or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (cwd, env.get("PYTHONPATH")) if p)
+    code = "; ".join(f"import {m}" for m in modules)
+    proc = subprocess.run(
+        [python or sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout,
+    )
+    entries = parse_importtime(proc.stderr)
+    if proc.returncode != 0 and not entries:
+        raise RuntimeError(f"Import lỗi: {proc.stderr.strip()[-500:]}")
+    return entries
+
+
+def format_import_report(entries, top=25, roots=None):
+    """
+    Bảng chi phí import: tổng thời gian, các module tự viết / thư viện chậm nhất
+    (theo thời gian riêng + cộng dồn) và danh sách thư viện nặng đã bị nạp.
+    roots: module gốc được import (để tính tổng), mặc định các module độ sâu 0.
+    """
+    top_level = [e for e in entries if e["depth"] == 0 and (roots is None or e["module"] in roots)]
+    total = sum(e["cumulative_s"] for e in top_level)
+    lines = [f"Tổng thời gian import: {total:.3f}s ({len(entries)} module)", ""]
+    lines.append(f"{'Module':<50} {'Riêng (s)':>10} {'Cộng dồn (s)':>13}")
+    for e in sorted(entries, key=lambda x: x["cumulative_s"], reverse=True)[:top]:
+        lines.append(f"{'  ' * min(e['depth'], 6)}{e['module']:<{50 - 2 * min(e['depth'], 6)}} "
+                     f"{e['self_s']:>10.3f} {e['cumulative_s']:>13.3f}")
+    heavy = {}
+    for e in entries:
+        root = e["module"].split(".")[0]
+        if root in HEAVY_MODULES and e["module"] == root:
+            heavy[root] = e["cumulative_s"]
+    lines.append("")
+    if heavy:
+        loaded = ", ".join(f"{m} ({s:.3f}s)" for m, s in sorted(heavy.items(), key=lambda x: -x[1]))
+        lines.append(f"Thư viện nặng bị nạp lúc khởi động: {loaded}")
+    else:
+        lines.append("Không có thư viện nặng nào bị nạp lúc khởi động.")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Báo cáo chi phí import lúc khởi động ứng dụng.")
+    parser.add_argument("--modules", default=",".join(STARTUP_MODULES),
+                        help="Các module gốc cần import, cách nhau dấu phẩy (mặc định: main_app)")
+    parser.add_argument("--top", type=int, default=25, help="Số module chậm nhất hiển thị")
+    parser.add_argument("--json", dest="json_path", default=None, help="Ghi toàn bộ số liệu ra file JSON")
+    parser.add_argument("--fail-on-heavy", action="store_true",
+                        help=f"Thoát mã 1 nếu có thư viện nặng bị nạp ({', '.join(HEAVY_MODULES)})")
+    args = parser.parse_args(argv)
+
+    roots = [m.strip() for m in args.modules.split(",") if m.strip()]
+    entries = measure_import_costs(roots)
+    print(format_import_report(entries, top=args.top, roots=roots))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"modules": roots, "entries": entries}, f, ensure_ascii=False, indent=1)
+    heavy = loaded_heavy_modules({e["module"] for e in entries})
+    return 1 if args.fail_on_heavy and heavy else 0
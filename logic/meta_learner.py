@@ -17,11 +17,18 @@ than either AI or manual scoring alone.
 """
 
 import os
-import joblib
 import numpy as np
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import cross_val_score
+
+# sklearn / joblib chỉ được nạp khi tạo hoặc nạp Meta-Learner
+try:
+    from .lazy_imports import lazy_import
+except ImportError:
+    from lazy_imports import lazy_import
+
+joblib = lazy_import("joblib")
+sk_linear_model = lazy_import("sklearn.linear_model")
+sk_model_selection = lazy_import("sklearn.model_selection")
+sk_preprocessing = lazy_import("sklearn.preprocessing")
 
 # Model file paths
 META_MODEL_PATH = "logic/ml_model_files/meta_learner.joblib"
@@ -35,14 +42,14 @@ class MetaLearner:
     """
 
     def __init__(self):
-        self.model = LogisticRegression(
+        self.model = sk_linear_model.LogisticRegression(
             penalty='l2',
             C=1.0,
             class_weight='balanced',
             random_state=42,
             max_iter=1000
         )
-        self.scaler = StandardScaler()
+        self.scaler = sk_preprocessing.StandardScaler()
         self.is_trained = False
 
     def prepare_meta_features(self, ai_prob, manual_score, confidence,
@@ -119,7 +126,7 @@ class MetaLearner:
             self.is_trained = True
 
             # Calculate cross-validation scores
-            cv_scores = cross_val_score(self.model, X_scaled, y, cv=5, scoring='f1')
+            cv_scores = sk_model_selection.cross_val_score(self.model, X_scaled, y, cv=5, scoring='f1')
             training_score = self.model.score(X_scaled, y)
 
             metrics = {
@@ -5,11 +5,23 @@
 import os
 import traceback
 
-import joblib
 import numpy as np
-import xgboost as xgb
-from sklearn.model_selection import train_test_split, GridSearchCV, cross_val_score
-from sklearn.preprocessing import StandardScaler
+
+try:
+    from .instrumentation import timed
+except ImportError:
+    def timed(name): return lambda func: func
+
+# Thư viện nặng (xgboost kéo theo sklearn, pandas): chỉ nạp khi train / dự đoán
+try:
+    from .lazy_imports import lazy_import
+except ImportError:
+    from lazy_imports import lazy_import
+
+joblib = lazy_import("joblib")
+xgb = lazy_import("xgboost")
+sk_model_selection = lazy_import("sklearn.model_selection")
+sk_preprocessing = lazy_import("sklearn.preprocessing")
 
 # --- CẤU HÌNH ĐƯỜNG DẪN TUYỆT ĐỐI ---
 # Lấy thư mục hiện tại của file này (thư mục logic)
@@ -249,7 +261,7 @@ def _tune_hyperparameters(X_train, y_train, scale_pos_weight):
     )
     
     # GridSearchCV with 3-fold cross-validation
-    grid_search = GridSearchCV(
+    grid_search = sk_model_selection.GridSearchCV(
         estimator=base_model,
         param_grid=param_grid,
         cv=3,
@@ -266,6 +278,7 @@ def _tune_hyperparameters(X_train, y_train, scale_pos_weight):
     return grid_search.best_params_
 
 
+@timed("ai.train")
 def train_ai_model(all_data_ai, daily_bridge_predictions_map, use_hyperparameter_tuning=False):
     """
     (V7.0) API: Huấn luyện, chuẩn hóa (scale), và lưu mô hình AI.
@@ -286,11 +299,11 @@ def train_ai_model(all_data_ai, daily_bridge_predictions_map, use_hyperparameter
 
         # 2. Chuẩn hóa (Scaling)
         print("... (AI Train) Đang chuẩn hóa (StandardScaler)...")
-        scaler = StandardScaler()
+        scaler = sk_preprocessing.StandardScaler()
         X_scaled = scaler.fit_transform(X)
 
         # 3. Phân chia Train/Test
-        X_train, X_test, y_train, y_test = train_test_split(
+        X_train, X_test, y_train, y_test = sk_model_selection.train_test_split(
             X_scaled, y, test_size=0.2, random_state=42, stratify=y
         )
 
@@ -337,7 +350,7 @@ def train_ai_model(all_data_ai, daily_bridge_predictions_map, use_hyperparameter
         
         # (Phase 3: Model Optimization) Cross-validation score
         print("... (Phase 3) Đang tính Cross-Validation score...")
-        cv_scores = cross_val_score(model, X_scaled, y, cv=5, scoring='accuracy')
+        cv_scores = sk_model_selection.cross_val_score(model, X_scaled, y, cv=5, scoring='accuracy')
         print(f"... (Phase 3) CV Accuracy: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
 
         # 5. (Phase 3: Model Optimization) Extract and save feature importance
@@ -5,17 +5,23 @@ Data models for K1N-primary detection flow.
 Defines dataclasses for bridge candidates, scan results, and import configurations.
 """
 
+import sys
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Union
 from datetime import datetime
 
+import numpy as np
+
+# __slots__ for dataclasses requires Python 3.10+; older interpreters fall back to __dict__
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
 
 def _get_current_timestamp() -> str:
     """Factory function for default timestamp (proper default factory)."""
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class Candidate:
     """
     Represents a bridge candidate detected by scanner.
@@ -111,6 +117,201 @@ class Candidate:
         }
 
 
+class CandidateBatch:
+    """
+    Columnar (struct-of-arrays) container for many bridge candidates.
+    
+    Holds the same information as a list of Candidate objects, but rates,
+    streaks and position indices live in parallel numpy arrays so large
+    scans can be filtered and ranked without per-object overhead.
+    
+    Attributes:
+        names, normalized_names, stls, reasons, descriptions, detected_at: Parallel string lists
+        is_lo: True for LO candidates, False for DE
+        is_set: True for kind == 'set'
+        k1n_lo, k1n_de, k2n_lo, k2n_de: Rate arrays (0-100)
+        streak, win_count_10: Integer arrays
+        pos1_idx, pos2_idx: Position indices (POS_MISSING = None; -1 is a real index, e.g. LO memory bridges)
+        rate_missing: Missing-rate flags
+        win_rate, ranking_score: Scan win rate / ranking score (from Candidate.metadata)
+        extras: Remaining metadata per candidate (None when empty)
+    
+    Example:
+        >>> batch = CandidateBatch.from_candidates(candidates)
+        >>> best = batch.filter(config).sort_by_score()
+        >>> best[0]  # -> Candidate
+    """
+    
+    _STR_COLUMNS = ('names', 'normalized_names', 'stls', 'reasons', 'descriptions', 'detected_at', 'extras')
+    _ARRAY_COLUMNS = ('is_lo', 'is_set', 'k1n_lo', 'k1n_de', 'k2n_lo', 'k2n_de', 'streak',
+                      'win_count_10', 'pos1_idx', 'pos2_idx', 'rate_missing', 'win_rate', 'ranking_score')
+    _METADATA_COLUMNS = ('win_rate', 'ranking_score')
+    POS_MISSING = int(np.iinfo(np.int16).min)
+    
+    __slots__ = _STR_COLUMNS + _ARRAY_COLUMNS
+    
+    def __init__(self, **columns):
+        """
+        Build a batch from columns. Prefer CandidateBatch.from_candidates().
+        
+        Args:
+            **columns: Every name in _STR_COLUMNS and _ARRAY_COLUMNS
+        """
+        for key in self._STR_COLUMNS:
+            setattr(self, key, list(columns[key]))
+        for key in self._ARRAY_COLUMNS:
+            setattr(self, key, np.asarray(columns[key]))
+    
+    @classmethod
+    def from_candidates(cls, candidates: Iterable[Candidate]) -> "CandidateBatch":
+        """Pack Candidate objects into columns."""
+        candidates = list(candidates)
+        n = len(candidates)
+        
+        def col(getter, dtype):
+            return np.fromiter((getter(c) for c in candidates), dtype=dtype, count=n)
+        
+        def extras(c):
+            rest = {k: v for k, v in (c.metadata or {}).items() if k not in cls._METADATA_COLUMNS}
+            return rest or None
+        
+        return cls(
+            names=[c.name for c in candidates],
+            normalized_names=[c.normalized_name for c in candidates],
+            stls=[c.stl for c in candidates],
+            reasons=[c.reason for c in candidates],
+            descriptions=[c.description for c in candidates],
+            detected_at=[c.detected_at for c in candidates],
+            extras=[extras(c) for c in candidates],
+            is_lo=col(lambda c: c.type == 'lo', bool),
+            is_set=col(lambda c: c.kind == 'set', bool),
+            k1n_lo=col(lambda c: c.k1n_lo, np.float64),
+            k1n_de=col(lambda c: c.k1n_de, np.float64),
+            k2n_lo=col(lambda c: c.k2n_lo, np.float64),
+            k2n_de=col(lambda c: c.k2n_de, np.float64),
+            streak=col(lambda c: c.streak, np.int32),
+            win_count_10=col(lambda c: c.win_count_10, np.int16),
+            pos1_idx=col(lambda c: cls.POS_MISSING if c.pos1_idx is None else c.pos1_idx, np.int16),
+            pos2_idx=col(lambda c: cls.POS_MISSING if c.pos2_idx is None else c.pos2_idx, np.int16),
+            rate_missing=col(lambda c: c.rate_missing, bool),
+            win_rate=col(lambda c: float((c.metadata or {}).get('win_rate', 0.0) or 0.0), np.float64),
+            ranking_score=col(lambda c: float((c.metadata or {}).get('ranking_score', 0.0) or 0.0), np.float64),
+        )
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def __iter__(self) -> Iterator[Candidate]:
+        for i in range(len(self)):
+            yield self._row(i)
+    
+    def __getitem__(self, key: Union[int, slice, np.ndarray, List[int]]) -> Union[Candidate, "CandidateBatch"]:
+        """Integer -> Candidate; slice / index array / boolean mask -> CandidateBatch."""
+        if isinstance(key, (int, np.integer)):
+            return self._row(int(key) % len(self) if key < 0 else int(key))
+        if isinstance(key, slice):
+            key = np.arange(len(self))[key]
+        return self.take(key)
+    
+    def take(self, indices) -> "CandidateBatch":
+        """Return a new batch with the selected rows (indices or boolean mask)."""
+        indices = np.asarray(indices)
+        if indices.dtype == bool:
+            indices = np.flatnonzero(indices)
+        rows = indices.tolist()
+        columns = {key: [getattr(self, key)[i] for i in rows] for key in self._STR_COLUMNS}
+        columns.update({key: getattr(self, key)[indices] for key in self._ARRAY_COLUMNS})
+        return CandidateBatch(**columns)
+    
+    def _row(self, i: int) -> Candidate:
+        metadata = {'win_rate': float(self.win_rate[i]), 'ranking_score': float(self.ranking_score[i])}
+        if self.extras[i]:
+            metadata.update(self.extras[i])
+        pos1, pos2 = int(self.pos1_idx[i]), int(self.pos2_idx[i])
+        return Candidate(
+            name=self.names[i],
+            normalized_name=self.normalized_names[i],
+            type='lo' if self.is_lo[i] else 'de',
+            kind='set' if self.is_set[i] else 'single',
+            k1n_lo=float(self.k1n_lo[i]),
+            k1n_de=float(self.k1n_de[i]),
+            k2n_lo=float(self.k2n_lo[i]),
+            k2n_de=float(self.k2n_de[i]),
+            stl=self.stls[i],
+            reason=self.reasons[i],
+            detected_at=self.detected_at[i],
+            pos1_idx=None if pos1 == self.POS_MISSING else pos1,
+            pos2_idx=None if pos2 == self.POS_MISSING else pos2,
+            description=self.descriptions[i],
+            streak=int(self.streak[i]),
+            win_count_10=int(self.win_count_10[i]),
+            rate_missing=bool(self.rate_missing[i]),
+            metadata=metadata,
+        )
+    
+    def to_candidates(self) -> List[Candidate]:
+        """Unpack into a list of Candidate objects."""
+        return list(self)
+    
+    def primary_rate(self, policy_type: str = "k1n") -> np.ndarray:
+        """Vectorized Candidate.get_primary_rate()."""
+        if policy_type == "k1n":
+            return np.where(self.is_lo, self.k1n_lo, self.k1n_de)
+        return np.where(self.is_lo, self.k2n_lo, self.k2n_de)
+    
+    def filter(self, config: "ImportConfig") -> "CandidateBatch":
+        """Keep only rows that pass config thresholds (vectorized meets_threshold)."""
+        return self.take(config.threshold_mask(self))
+    
+    def exclude_names(self, names) -> "CandidateBatch":
+        """Drop rows whose normalized name is in names."""
+        return self.take(self.name_mask(names, invert=True))
+    
+    def name_mask(self, names, invert: bool = False) -> np.ndarray:
+        """Boolean mask of rows whose normalized name is (or is not) in names."""
+        mask = np.fromiter((n in names for n in self.normalized_names), dtype=bool, count=len(self))
+        return ~mask if invert else mask
+    
+    def sort_by_score(self, descending: bool = True) -> "CandidateBatch":
+        """Stable sort by ranking_score, ties broken by primary K1N rate."""
+        score, rate = self.ranking_score, self.primary_rate("k1n")
+        if descending:
+            score, rate = -score, -rate
+        return self.take(np.lexsort((rate, score)))
+    
+    def to_dicts(self, is_pending: int = 1, is_enabled: int = 0) -> List[Dict[str, Any]]:
+        """Build DB dicts (same keys as Candidate.to_dict) without materializing Candidates."""
+        k1n = self.primary_rate("k1n").tolist()
+        k2n = self.primary_rate("k2n").tolist()
+        k1n_lo, k1n_de = self.k1n_lo.tolist(), self.k1n_de.tolist()
+        k2n_lo, k2n_de = self.k2n_lo.tolist(), self.k2n_de.tolist()
+        is_lo, is_set = self.is_lo.tolist(), self.is_set.tolist()
+        pos1, pos2 = self.pos1_idx.tolist(), self.pos2_idx.tolist()
+        streak, wins = self.streak.tolist(), self.win_count_10.tolist()
+        
+        return [
+            {
+                'name': self.names[i],
+                'description': self.descriptions[i],
+                'type': f"{'LO' if is_lo[i] else 'DE'}_{'SET' if is_set[i] else 'SINGLE'}",
+                'k1n_rate_lo': k1n_lo[i],
+                'k1n_rate_de': k1n_de[i],
+                'k2n_rate_lo': k2n_lo[i],
+                'k2n_rate_de': k2n_de[i],
+                'pos1_idx': None if pos1[i] == self.POS_MISSING else pos1[i],
+                'pos2_idx': None if pos2[i] == self.POS_MISSING else pos2[i],
+                'win_rate_text': f"{k1n[i]:.1f}%",
+                'search_rate_text': f"{k2n[i]:.1f}%",
+                'current_streak': streak[i],
+                'next_prediction_stl': self.stls[i],
+                'recent_win_count_10': wins[i],
+                'is_pending': is_pending,
+                'is_enabled': is_enabled,
+            }
+            for i in range(len(self))
+        ]
+
+
 @dataclass
 class ScanResult:
     """
@@ -206,3 +407,32 @@ class ImportConfig:
             return k1n_rate >= threshold_k1n and k2n_rate >= threshold_k2n
         
         return False
+    
+    def threshold_mask(self, batch: CandidateBatch) -> np.ndarray:
+        """
+        Vectorized meets_threshold() over a CandidateBatch.
+        
+        Args:
+            batch: Candidates in columnar form
+            
+        Returns:
+            Boolean array, True where the candidate meets the threshold
+        """
+        k1n_rate = batch.primary_rate("k1n")
+        k2n_rate = batch.primary_rate("k2n")
+        threshold_k1n = np.where(batch.is_lo, self.threshold_k1n_lo, self.threshold_k1n_de)
+        threshold_k2n = np.where(batch.is_lo, self.threshold_k2n_lo, self.threshold_k2n_de)
+        
+        if self.policy_type == "k1n_primary":
+            mask = k1n_rate >= threshold_k1n
+            if self.fallback_to_k2n:
+                mask |= (k1n_rate == 0.0) & (k2n_rate >= threshold_k2n)
+            return mask
+        
+        elif self.policy_type == "k2n_primary":
+            return k2n_rate >= threshold_k2n
+        
+        elif self.policy_type == "combined":
+            return (k1n_rate >= threshold_k1n) & (k2n_rate >= threshold_k2n)
+        
+        return np.zeros(len(batch), dtype=bool)
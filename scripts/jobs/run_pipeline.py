@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Job: Headless pipeline (nightly)
+
+Runs the heavy tasks without the Tk UI, loading the draw history once:
+  append -> scan_lo / scan_de -> backtest -> prune -> train -> dashboard
+                                                  `-> de_dashboard
+
+Each finished step writes a checkpoint (PipelineCheckpoints table). With
+--resume, steps that already succeeded on the same history are skipped, so
+a crashed nightly run can be restarted cheaply. The precomputed dashboard is
+stored in PipelineResults and picked up by the app on the first dashboard run;
+the DE tab snapshot (de_dashboard) is read directly when the DE tab refreshes.
+
+Usage:
+  # Full nightly run, appending new draws from a file
+  python scripts/jobs/run_pipeline.py --input new_draws.txt
+
+  # Resume after a failure (--jobs overlaps only steps that do not write the DB)
+  python scripts/jobs/run_pipeline.py --jobs 2 --resume
+
+  # Only some steps
+  python scripts/jobs/run_pipeline.py --steps backtest,dashboard
+  python scripts/jobs/run_pipeline.py --skip train
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from services.pipeline_service import main  # noqa: E402
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -111,32 +111,22 @@ def get_bridge_history(conn, bridge, window_kys):
     """
     Get bridge win/loss history for the last N periods.
     
-    TODO: Adapt to your actual history table structure.
-    Expected columns: ky (period), result (1=win, 0=loss)
+    Reads the BridgeOutcomes table (filled by logic.bridge_outcomes during the
+    K2N cache refresh / pipeline backtest step).
     
     Returns:
-        list of dicts with 'ky' and 'result' keys
+        list of dicts with 'ky' and 'result' keys (1=win, 0=loss), oldest first
     """
     cursor = conn.cursor()
-    
-    # TODO: Replace with actual history table query
-    # For now, use a safe fallback that checks for common table names
-    possible_tables = ['bridge_history', 'bridge_results', 'DuLieu_AI', 'results_A_I']
-    
-    for table_name in possible_tables:
-        cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-        if cursor.fetchone():
-            print(f"  [INFO] Using table: {table_name}")
-            # TODO: Implement actual query based on your schema
-            # This is a placeholder - adapt to your schema
-            break
-    else:
-        print(f"  [WARNING] No history table found for bridge {bridge.get('name', '?')}")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='BridgeOutcomes'")
+    if not cursor.fetchone():
+        print(f"  [WARNING] No BridgeOutcomes table - run the backtest step first ({bridge.get('name', '?')})")
         return []
     
-    # Placeholder - return empty for now
-    # TODO: Implement actual history query
-    return []
+    from logic.bridge_outcomes import fetch_outcome_window
+    
+    history = fetch_outcome_window(conn, bridge.get("id"), window_kys)
+    return [{"ky": ky, "result": outcome} for ky, outcome, _ in history]
 
 
 def compute_metrics(bridge, history, config):
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Startup import-cost report
+
+Imports the app entry module in a fresh interpreter (python -X importtime)
+and prints the slowest modules plus any heavy library (pandas, xgboost,
+sklearn, matplotlib, scipy, joblib) that got loaded before the window opens.
+Those libraries are meant to load lazily (logic/lazy_imports.py).
+
+Usage:
+  python scripts/startup_import_report.py
+  python scripts/startup_import_report.py --modules main_app,lottery_service --top 40
+  python scripts/startup_import_report.py --json startup_imports.json --fail-on-heavy
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from logic.lazy_imports import main  # noqa: E402
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -64,7 +64,7 @@ def verify_data(result, expect_lo, expect_de):
     
     # 2. Kiểm tra Dữ liệu Đề
     has_de_data = False
-    if result.get('df_de') is not None and not result.get('df_de').empty:
+    if result.get('de_history') is not None and len(result.get('de_history')) > 0:
         has_de_data = True
         
     # Đánh giá
@@ -3,9 +3,15 @@
 
 import itertools
 import json
-import pandas as pd
 import traceback
 
+try:
+    from logic.instrumentation import perf_stage, timed
+except ImportError:
+    import contextlib
+    def perf_stage(name): return contextlib.nullcontext()
+    def timed(name): return lambda func: func
+
 class AnalysisService:
     """Service phân tích và backtest"""
     
@@ -238,6 +244,7 @@ class AnalysisService:
             self._log(error_msg)
             return False, error_msg
     
+    @timed("dashboard.prepare")
     def prepare_dashboard_data(self, all_data_ai, data_limit=None, lo_mode=True, de_mode=True):
         """
         Chuẩn bị dữ liệu dashboard (phân tích toàn diện) theo chế độ (On-Demand).
@@ -300,7 +307,7 @@ class AnalysisService:
         "top_scores": [],
         "top_memory_bridges": [],
         "ai_predictions": [],
-        "df_de": None
+        "de_history": None
         }
 
         # =======================================================================
@@ -311,84 +318,91 @@ class AnalysisService:
 
             # 1. Thống kê
             self._log(f"... (1/6) Đang thống kê Loto Về Nhiều ({n_days_stats} ngày)...")
-            try:
-                stats_n_day = self.get_loto_stats_last_n_days(all_data_ai, n=n_days_stats) or []
-                self._log(f"... (Stats) Đã tính được {len(stats_n_day)} loto hot")
-                result["stats_n_day"] = stats_n_day
-            except Exception as e:
-                self._log(f"Lỗi thống kê Loto: {e}")
-                result["stats_n_day"] = []
+            with perf_stage("dashboard.stats"):
+                try:
+                    stats_n_day = self.get_loto_stats_last_n_days(all_data_ai, n=n_days_stats) or []
+                    self._log(f"... (Stats) Đã tính được {len(stats_n_day)} loto hot")
+                    result["stats_n_day"] = stats_n_day
+                except Exception as e:
+                    self._log(f"Lỗi thống kê Loto: {e}")
+                    result["stats_n_day"] = []
 
             # 2. K2N Cache
             self._log("... (2/6) Đang chạy hàm Cập nhật K2N Cache...")
-            try:
-                pending_k2n_data, _, cache_message = self.run_and_update_all_bridge_K2N_cache(all_data_ai, self.db_name)
-                result["pending_k2n_data"] = pending_k2n_data or {}
-                self._log(f"... (Cache K2N) {cache_message}")
-            except Exception as e:
-                self._log(f"Lỗi Cache K2N: {e}")
-                result["pending_k2n_data"] = {}
+            with perf_stage("dashboard.k2n_cache"):
+                try:
+                    pending_k2n_data, _, cache_message = self.run_and_update_all_bridge_K2N_cache(all_data_ai, self.db_name)
+                    result["pending_k2n_data"] = pending_k2n_data or {}
+                    self._log(f"... (Cache K2N) {cache_message}")
+                except Exception as e:
+                    self._log(f"Lỗi Cache K2N: {e}")
+                    result["pending_k2n_data"] = {}
 
             # 3. K1N Rates
             self._log("... (2.5/6) Đang cập nhật Tỷ Lệ và Phong Độ 10 Kỳ từ K1N...")
-            try:
-                count, rate_message = self.run_and_update_all_bridge_rates(all_data_ai, self.db_name)
-                self._log(f"... (K1N Rates) {rate_message}")
-            except Exception as e:
-                self._log(f"Lỗi cập nhật K1N Rates: {e}")
+            with perf_stage("dashboard.k1n_rates"):
+                try:
+                    count, rate_message = self.run_and_update_all_bridge_rates(all_data_ai, self.db_name)
+                    self._log(f"... (K1N Rates) {rate_message}")
+                except Exception as e:
+                    self._log(f"Lỗi cập nhật K1N Rates: {e}")
 
             # 4. Consensus & High Win
             self._log("... (3/6) Đang đọc Consensus và Cầu Tỷ lệ Cao từ cache...")
-            try:
-                consensus = self.get_prediction_consensus(last_row=last_row, db_name=self.db_name) or []
-                result["consensus"] = consensus
-                self._log(f"... (Consensus) Đã đọc được {len(consensus)} cặp có vote")
-            except Exception: 
-                result["consensus"] = []
+            with perf_stage("dashboard.consensus"):
+                try:
+                    consensus = self.get_prediction_consensus(last_row=last_row, db_name=self.db_name) or []
+                    result["consensus"] = consensus
+                    self._log(f"... (Consensus) Đã đọc được {len(consensus)} cặp có vote")
+                except Exception: 
+                    result["consensus"] = []
             
-            try:
-                high_win = self.get_high_win_rate_predictions(threshold=high_win_thresh) or []
-                result["high_win"] = high_win
-            except Exception: 
-                result["high_win"] = []
+                try:
+                    high_win = self.get_high_win_rate_predictions(threshold=high_win_thresh) or []
+                    result["high_win"] = high_win
+                except Exception: 
+                    result["high_win"] = []
 
             # 5. Gan stats
             self._log(f"... (4/6) Đang tìm Lô Gan (trên {n_days_gan} kỳ)...")
-            try:
-                gan_stats = self.get_loto_gan_stats(all_data_ai, n_days=n_days_gan) or []
-                result["gan_stats"] = gan_stats
-            except Exception: 
-                result["gan_stats"] = []
+            with perf_stage("dashboard.gan"):
+                try:
+                    gan_stats = self.get_loto_gan_stats(all_data_ai, n_days=n_days_gan) or []
+                    result["gan_stats"] = gan_stats
+                except Exception: 
+                    result["gan_stats"] = []
 
             # 6. AI predictions
             self._log("... (5/6) Đang chạy dự đoán AI...")
-            try:
-                ai_res = self.run_ai_prediction_for_dashboard()
-                if ai_res and isinstance(ai_res, tuple) and len(ai_res) >= 2:
-                    result["ai_predictions"] = ai_res[0]
-                    self._log(f"... (AI) {ai_res[1]}")
-                else:
+            with perf_stage("dashboard.ai_predict"):
+                try:
+                    ai_res = self.run_ai_prediction_for_dashboard()
+                    if ai_res and isinstance(ai_res, tuple) and len(ai_res) >= 2:
+                        result["ai_predictions"] = ai_res[0]
+                        self._log(f"... (AI) {ai_res[1]}")
+                    else:
+                        result["ai_predictions"] = []
+                except Exception as e:
+                    self._log(f"Lỗi dự đoán AI: {e}")
                     result["ai_predictions"] = []
-            except Exception as e:
-                self._log(f"Lỗi dự đoán AI: {e}")
-                result["ai_predictions"] = []
 
             # 7. Top memory & Top Score
-            try:
-                top_memory_bridges = self.get_top_memory_bridge_predictions(all_data_ai, last_row, top_n=5) or []
-                result["top_memory_bridges"] = top_memory_bridges
+            with perf_stage("dashboard.top_scores"):
+                try:
+                    top_memory_bridges = self.get_top_memory_bridge_predictions(all_data_ai, last_row, top_n=5) or []
+                    result["top_memory_bridges"] = top_memory_bridges
 
-                self._log("... (6/6) Tính điểm tổng lực...")
-                top_scores = self.get_top_scored_pairs(
-                    result.get("stats_n_day"), result.get("consensus"), result.get("high_win"), 
-                    result.get("pending_k2n_data"), result.get("gan_stats"), top_memory_bridges, 
-                    result.get("ai_predictions")
-                )
-                result["top_scores"] = top_scores or []
-                self._log(f"... (Top Scores) Đã tính được {len(result['top_scores'])} cặp có điểm")
-            except Exception as e:
-                self._log(f"Lỗi tính Điểm Tổng Lực: {e}")
-                result["top_scores"] = []
+                    self._log("... (6/6) Tính điểm tổng lực...")
+                    top_scores = self.get_top_scored_pairs(
+                        result.get("stats_n_day"), result.get("consensus"), result.get("high_win"), 
+                        result.get("pending_k2n_data"), result.get("gan_stats"), top_memory_bridges, 
+                        result.get("ai_predictions")
+                    )
+                    result["top_scores"] = top_scores or []
+                    self._log(f"... (Top Scores) Đã tính được {len(result['top_scores'])} cặp có điểm")
+                except Exception as e:
+                    self._log(f"Lỗi tính Điểm Tổng Lực: {e}")
+                    result["top_scores"] = []
 
         else:
             self._log("⏩ [LÔ] Bỏ qua phân tích Lô.")
@@ -398,13 +412,14 @@ class AnalysisService:
         # =======================================================================
         if de_mode:
             self._log("⚡ [ĐỀ] Bắt đầu tính toán phân hệ Đề...")
-            try:
-                cols = ["NB", "NGAY", "GDB", "G1", "G2", "G3", "G4", "G5", "G6", "G7"]
-                data_for_df = [r[:10] for r in all_data_ai if r and len(r) >= 10]
-                result["df_de"] = pd.DataFrame(data_for_df, columns=cols)
-            except Exception as e:
-                self._log(f"Cảnh báo: Lỗi tạo DataFrame cho DE: {e}")
-                result["df_de"] = None
+            with perf_stage("dashboard.de_frame"):
+                try:
+                    # View Đề dùng chung (mảng, không sao chép lịch sử) cho mọi phân tích Đề
+                    from logic.de_history import get_de_history_view
+                    result["de_history"] = get_de_history_view(all_data_ai)
+                except Exception as e:
+                    self._log(f"Cảnh báo: Lỗi tạo lịch sử Đề: {e}")
+                    result["de_history"] = None
         else:
             self._log("⏩ [ĐỀ] Bỏ qua phân tích Đề.")
             
@@ -451,12 +466,22 @@ class AnalysisService:
             log_callback: Hàm callback để log (nhận message string)
         
         Returns:
-            None (kết quả được log qua callback)
+            ThresholdSweep (số cầu theo ngưỡng + histogram + CDF) với AUTO_ADD_MIN_RATE /
+            AUTO_PRUNE_MIN_RATE / HIGH_WIN_THRESHOLD; None với các tham số khác
+            (kết quả được log qua callback)
         """
         try:
             from logic.config_manager import SETTINGS
-            from logic.data_repository import get_all_managed_bridges
-            from lottery_service import TIM_CAU_TOT_NHAT_V16, TIM_CAU_BAC_NHO_TOT_NHAT
+            from logic.analytics.threshold_sweep import (
+                SWEEP_AT_LEAST,
+                SWEEP_BELOW,
+                high_win_rate_distribution,
+                prune_rate_distribution,
+                refreshed_enabled_bridges,
+                scan_rate_distribution,
+                sweep_thresholds,
+                threshold_range,
+            )
             
             if not all_data_ai or len(all_data_ai) < 2:
                 log_callback("LỖI: Không thể tải dữ liệu A:I.")
@@ -484,68 +509,53 @@ class AnalysisService:
                     log_callback(f"Kiểm thử {p_key} = {n}: Tìm thấy {len(gan_stats)} loto gan.")
                 log_callback(f"--- Hoàn tất kiểm thử {p_key} ---")
             
+            def log_sweep(sweep):
+                """Log số cầu từng ngưỡng + histogram của phân phối tỷ lệ (quét chỉ đọc)."""
+                dist = sweep.distribution
+                log_callback(f"... (Phân phối: {len(dist)} cầu có tỷ lệ, {dist.skipped} cầu N/A)...")
+                for line in sweep.histogram_lines():
+                    log_callback(line)
+            
             def test_high_win_threshold(p_key, v_from, v_to, v_step):
                 log_callback(f"--- Bắt đầu kiểm thử: {p_key} ---")
-                log_callback("... (Chạy Cache K2N một lần để lấy dữ liệu mới nhất)...")
-                self.run_and_update_all_bridge_K2N_cache(all_data_ai, self.db_name)
-                log_callback("... (Cache K2N hoàn tất. Bắt đầu lặp)...")
-                for i in float_range(v_from, v_to, v_step):
-                    high_win_bridges = self.get_high_win_rate_predictions(threshold=i)
-                    log_callback(f"Kiểm thử {p_key} >= {i:.1f}%: Tìm thấy {len(high_win_bridges)} cầu đạt chuẩn.")
+                log_callback("... (Tính K2N trong bộ nhớ để lấy dữ liệu mới nhất, không ghi DB)...")
+                bridges = refreshed_enabled_bridges(all_data_ai, self.db_name)
+                sweep = sweep_thresholds(high_win_rate_distribution(bridges), threshold_range(v_from, v_to, v_step),
+                                         SWEEP_AT_LEAST, p_key)
+                log_sweep(sweep)
+                for i, count in zip(sweep.thresholds, sweep.counts):
+                    log_callback(f"Kiểm thử {p_key} >= {i:.1f}%: Tìm thấy {count} cầu đạt chuẩn.")
                 log_callback(f"--- Hoàn tất kiểm thử {p_key} ---")
+                return sweep
             
             def test_auto_add_rate(p_key, v_from, v_to, v_step):
                 log_callback(f"--- Bắt đầu kiểm thử: {p_key} ---")
-                log_callback("... (Chạy Dò Cầu V17... Rất nặng, vui lòng chờ)...")
-                ky_bat_dau = 2
-                ky_ket_thuc = len(all_data_ai) + (ky_bat_dau - 1)
-                results_v17 = TIM_CAU_TOT_NHAT_V16(all_data_ai, ky_bat_dau, ky_ket_thuc, self.db_name)
-                log_callback("... (Chạy Dò Cầu Bạc Nhớ...)...")
-                results_memory = TIM_CAU_BAC_NHO_TOT_NHAT(all_data_ai, ky_bat_dau, ky_ket_thuc)
-                combined_results = []
-                if results_v17 and len(results_v17) > 1:
-                    combined_results.extend([row for row in results_v17[1:] if "---" not in str(row[0])])
-                if results_memory and len(results_memory) > 1:
-                    combined_results.extend([row for row in results_memory[1:] if "---" not in str(row[0])])
-                if not combined_results:
+                log_callback("... (Tính tỷ lệ dò của mọi cầu V17 + Bạc Nhớ, không ghi DB)...")
+                distribution = scan_rate_distribution(all_data_ai)
+                if not len(distribution):
                     log_callback("LỖI: Không dò được cầu nào.")
-                    return
-                log_callback(f"... (Dò cầu hoàn tất. Tổng cộng {len(combined_results)} cầu. Bắt đầu lặp)...")
-                for i in float_range(v_from, v_to, v_step):
-                    count = 0
-                    for row in combined_results:
-                        try:
-                            rate = float(str(row[3]).replace("%", ""))
-                            if rate >= i:
-                                count += 1
-                        except (ValueError, IndexError):
-                            continue
+                    return None
+                sweep = sweep_thresholds(distribution, threshold_range(v_from, v_to, v_step), SWEEP_AT_LEAST, p_key)
+                log_sweep(sweep)
+                for i, count in zip(sweep.thresholds, sweep.counts):
                     log_callback(f"Kiểm thử {p_key} >= {i:.1f}%: Sẽ thêm/cập nhật {count} cầu.")
                 log_callback(f"--- Hoàn tất kiểm thử {p_key} ---")
+                return sweep
             
             def test_auto_prune_rate(p_key, v_from, v_to, v_step):
                 log_callback(f"--- Bắt đầu kiểm thử: {p_key} ---")
-                log_callback("... (Chạy Cache K2N một lần để lấy dữ liệu mới nhất)...")
-                self.run_and_update_all_bridge_K2N_cache(all_data_ai, self.db_name)
-                log_callback("... (Cache K2N hoàn tất. Bắt đầu lặp)...")
-                enabled_bridges = get_all_managed_bridges(self.db_name, only_enabled=True)
+                log_callback("... (Tính K2N trong bộ nhớ để lấy dữ liệu mới nhất, không ghi DB)...")
+                enabled_bridges = refreshed_enabled_bridges(all_data_ai, self.db_name)
                 if not enabled_bridges:
                     log_callback("LỖI: Không có cầu nào đang Bật để kiểm thử.")
-                    return
-                for i in float_range(v_from, v_to, v_step):
-                    count = 0
-                    for bridge in enabled_bridges:
-                        try:
-                            rate_str = str(bridge.get("win_rate_text", "100%")).replace("%", "")
-                            if not rate_str or rate_str == "N/A":
-                                continue
-                            rate = float(rate_str)
-                            if rate < i:
-                                count += 1
-                        except ValueError:
-                            continue
+                    return None
+                sweep = sweep_thresholds(prune_rate_distribution(enabled_bridges), threshold_range(v_from, v_to, v_step),
+                                         SWEEP_BELOW, p_key)
+                log_sweep(sweep)
+                for i, count in zip(sweep.thresholds, sweep.counts):
                     log_callback(f"Kiểm thử {p_key} < {i:.1f}%: Sẽ TẮT {count} cầu.")
                 log_callback(f"--- Hoàn tất kiểm thử {p_key} ---")
+                return sweep
             
             def test_k2n_risk_logic(p_key, v_from, v_to, v_step):
                 log_callback(f"--- Bắt đầu kiểm thử: {p_key} ---")
@@ -560,31 +570,33 @@ class AnalysisService:
                 top_memory = self.get_top_memory_bridge_predictions(all_data_ai, last_row)
                 ai_preds, _ = self.run_ai_prediction_for_dashboard()
                 log_callback("... (Dữ liệu nền hoàn tất. Bắt đầu lặp)...")
-                original_value = SETTINGS.get_all_settings().get(p_key)
+                # Mỗi giá trị chạy trên một snapshot riêng, không đổi SETTINGS dùng chung
+                base_settings = SETTINGS.snapshot()
                 for i in float_range(v_from, v_to, v_step):
                     val = i
                     if p_key == "K2N_RISK_START_THRESHOLD":
                         val = int(i)
-                    setattr(SETTINGS, p_key, val)
-                    top_scores = self.get_top_scored_pairs(stats_n_day, consensus, high_win, pending_k2n, gan_stats, top_memory, ai_preds)
+                    scenario = base_settings.with_overrides({p_key: val})
+                    top_scores = self.get_top_scored_pairs(
+                        stats_n_day, consensus, high_win, pending_k2n, gan_stats, top_memory, ai_preds,
+                        settings=scenario,
+                    )
                     if not top_scores:
                         log_callback(f"Kiểm thử {p_key} = {val}: Không có cặp nào đạt điểm.")
                     else:
                         top_score_item = top_scores[0]
                         log_callback(f"Kiểm thử {p_key} = {val}: Top 1 là {top_score_item['pair']} (Điểm: {top_score_item['score']})")
-                if original_value is not None:
-                    setattr(SETTINGS, p_key, original_value)
                 log_callback(f"--- Hoàn tất kiểm thử {p_key} ---")
             
             # Dispatch
             if param_key == "GAN_DAYS":
                 test_gan_days(param_key, val_from, val_to, val_step)
             elif param_key == "HIGH_WIN_THRESHOLD":
-                test_high_win_threshold(param_key, val_from, val_to, val_step)
+                return test_high_win_threshold(param_key, val_from, val_to, val_step)
             elif param_key == "AUTO_ADD_MIN_RATE":
-                test_auto_add_rate(param_key, val_from, val_to, val_step)
+                return test_auto_add_rate(param_key, val_from, val_to, val_step)
             elif param_key == "AUTO_PRUNE_MIN_RATE":
-                test_auto_prune_rate(param_key, val_from, val_to, val_step)
+                return test_auto_prune_rate(param_key, val_from, val_to, val_step)
             elif param_key in ["K2N_RISK_START_THRESHOLD", "K2N_RISK_PENALTY_PER_FRAME"]:
                 test_k2n_risk_logic(param_key, val_from, val_to, val_step)
             else:
@@ -611,16 +623,19 @@ class AnalysisService:
         try:
             from logic.config_manager import SETTINGS
             from logic.dashboard_analytics import prepare_daily_features, calculate_score_from_features
+            from logic.analytics.walk_forward import iter_daily_features
             
             if not all_data_ai or len(all_data_ai) < days_to_test + 50:
                 log_callback(f"LỖI: Cần ít nhất {days_to_test + 50} kỳ dữ liệu để kiểm thử.")
                 return
             
             log_callback(f"...Tải dữ liệu thành công ({len(all_data_ai)} kỳ).")
+            # Cài đặt cố định cho cả phiên tối ưu (mỗi tổ hợp là một bản ghi đè của snapshot này)
+            base_settings = SETTINGS.snapshot()
             
             # Data limit
             try:
-                limit = getattr(SETTINGS, "DATA_LIMIT_RESEARCH", 0)
+                limit = getattr(base_settings, "DATA_LIMIT_RESEARCH", 0)
             except:
                 limit = 0
             if limit > 0 and len(all_data_ai) > limit:
@@ -661,7 +676,7 @@ class AnalysisService:
                     combinations.append(temp_config)
                 return combinations
             
-            original_settings = SETTINGS.get_all_settings()
+            original_settings = base_settings.get_all_settings()
             combinations = generate_combinations(param_ranges, original_settings)
             total_combos = len(combinations)
             if total_combos == 0:
@@ -670,14 +685,20 @@ class AnalysisService:
             
             log_callback(f"Đã tạo {total_combos} tổ hợp. Bắt đầu chuẩn bị features cache...")
             
-            # Precompute features
+            # Precompute features (walk-forward: duyệt lịch sử một lần, tiến từng ngày)
             cached_features = []
             offset = len(data_processing) - days_to_test
-            for i in range(days_to_test):
+            try:
+                for day_index, features in iter_daily_features(data_processing, offset, offset + days_to_test - 1, settings=base_settings):
+                    log_callback(f"Đang chuẩn bị dữ liệu ngày {day_index + 1 - offset}/{days_to_test} ...")
+                    cached_features.append(features)
+            except Exception as e:
+                log_callback(f"Lỗi mô phỏng walk-forward ({e}), chuyển sang tính từng ngày...")
+            for i in range(len(cached_features), days_to_test):
                 day_index = offset + i
                 log_callback(f"Đang chuẩn bị dữ liệu ngày {day_index + 1 - offset}/{days_to_test} ...")
                 try:
-                    features = prepare_daily_features(data_processing, day_index)
+                    features = prepare_daily_features(data_processing, day_index, settings=base_settings)
                     cached_features.append(features)
                 except Exception as e:
                     log_callback(f"Lỗi khi prepare features ngày {i+1}: {e}")
@@ -693,7 +714,7 @@ class AnalysisService:
                     if not features:
                         continue
                     try:
-                        top_scores = calculate_score_from_features(features, config)
+                        top_scores = calculate_score_from_features(features, config, settings=base_settings)
                     except Exception as e:
                         log_callback(f"Lỗi tính score ngày {fidx+1}: {e}")
                         continue
@@ -753,7 +774,7 @@ class AnalysisService:
                  self._log(f"Cảnh báo: Cầu '{bridge_name}' thiếu thông tin vị trí (pos1_idx). Kết quả có thể rỗng.")
 
             # Chạy backtest
-            results = run_backtest_lo_30_days(bridge_config, all_data_ai)
+            results = run_backtest_lo_30_days(bridge_config, all_data_ai, db_name=self.db_name)
             return results
     
         except Exception as e:
@@ -782,7 +803,7 @@ class AnalysisService:
             if bridge_config:
                 # Nếu tìm thấy trong DB, chạy ngay với config đó (sẽ dùng pos1_idx chuẩn)
                 self._log(f"-> Chạy Backtest Managed Bridge: {bridge_name}")
-                return run_de_bridge_historical_test(bridge_config, all_data_ai, days=30)
+                return run_de_bridge_historical_test(bridge_config, all_data_ai, days=30, db_name=self.db_name)
 
             # --- 2. NẾU KHÔNG CÓ TRONG DB -> CHẠY LOGIC SCANNER TỪ TÊN ---
             is_scanner = False
@@ -316,6 +316,14 @@ class BridgeService:
             
             self._log(f">>> [DE PRUNING] Tìm thấy {len(de_bridges)} cầu Đề. Đang kiểm tra...")
             
+            # Backtest toàn bộ cầu Đề trong một lượt (vector hóa)
+            batch_max_lose = {}
+            try:
+                from logic.backtest.de_batch_engine import de_max_lose_streaks
+                batch_max_lose = de_max_lose_streaks(de_bridges, all_data)
+            except Exception as e:
+                self._log(f"  ⚠️ Không chạy được backtest lô cầu Đề, tính từng cầu: {e}")
+            
             # Duyệt qua từng cầu và tính toán Max Lose History
             pruned_count = 0
             error_count = 0
@@ -335,7 +343,9 @@ class BridgeService:
                         continue
                     
                     # Tính toán Max Lose History
-                    max_lose = calculate_de_bridge_max_lose_history(bridge, all_data)
+                    max_lose = batch_max_lose.get(bridge_id)
+                    if max_lose is None:
+                        max_lose = calculate_de_bridge_max_lose_history(bridge, all_data, db_name=self.db_name)
                     
                     if max_lose == -1:
                         # Lỗi tính toán, bỏ qua
@@ -0,0 +1,293 @@
+# Tên file: services/de_dashboard_service.py
+# Service layer: Snapshot tính sẵn cho Tab Soi Cầu Đề
+"""
+Tab Soi Cầu Đề cần: danh sách cầu Đề (lọc Bật + phong độ 10 kỳ), cầu Loại,
+ma trận giao thoa, xu hướng chạm/bộ, điểm số học và tổ hợp chạm. Tất cả chỉ
+phụ thuộc (lịch sử, tập cầu Đề, cài đặt), nên được tính MỘT lần cho mỗi khóa
+
+    "<vân tay lịch sử>|<vân tay cầu Đề>|<vân tay cài đặt>"
+
+và lưu vào bảng PipelineResults (tên DE_DASHBOARD_RESULT) + bộ nhớ đệm trong
+tiến trình. Tab chỉ việc đọc snapshot; khi có kỳ mới, snapshot được dựng lại
+trên thread nền (refresh_de_dashboard_snapshot_async).
+
+Phần nào lỗi khi dựng (đọc cầu, quét cầu Loại, phân tích) được ghi vào
+snapshot["errors"]; snapshot thiếu dữ liệu như vậy vẫn được trả về cho lần gọi
+hiện tại nhưng KHÔNG được lưu, nên lần mở tab sau sẽ tính lại.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    from logic.db_manager import DB_NAME
+except ImportError:
+    DB_NAME = "data/xo_so_prizes_all_logic.db"
+
+try:
+    from logic.config_manager import SETTINGS
+except ImportError:
+    SETTINGS = None
+
+try:
+    from logic.instrumentation import timed
+except ImportError:
+    def timed(name): return lambda func: func
+
+from services.pipeline_service import history_fingerprint, load_result, save_result
+
+DE_DASHBOARD_RESULT = "de_dashboard"
+HISTORY_ROWS_KEPT = 30          # Tab chỉ hiển thị 30 kỳ gần nhất + kỳ cuối (tiêu đề)
+
+# Cầu "thuộc Tab Đề" - cùng điều kiện lọc cũ của UiDeDashboard._run_logic (LIKE không phân
+# biệt hoa thường nên là tập cha, chỉ dùng cho vân tay)
+_DE_BRIDGE_WHERE = (
+    "is_enabled = 1 AND (UPPER(type) LIKE 'DE%' OR UPPER(type) LIKE 'CAU_DE%' "
+    "OR name LIKE '%DE%' OR name LIKE '%Đề%')"
+)
+
+_memory_cache = {}              # {db_name: (key, snapshot)}
+_cache_lock = threading.Lock()
+_building = {}                  # {(db_name, key): Event} snapshot đang được dựng
+
+
+def _setting(key, default):
+    if SETTINGS is None:
+        return default
+    return getattr(SETTINGS, key, default)
+
+
+# ===================================================================================
+# KHÓA SNAPSHOT
+# ===================================================================================
+
+def de_bridge_set_fingerprint(db_name=DB_NAME):
+    """CRC của mọi cột các cầu Đề đang bật (đổi khi thêm/xóa/bật/tắt cầu hoặc cập nhật phong độ)."""
+    conn = sqlite3.connect(db_name)
+    try:
+        rows = conn.execute(f"SELECT * FROM ManagedBridges WHERE {_DE_BRIDGE_WHERE} ORDER BY id").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # Chưa có bảng cầu
+    finally:
+        conn.close()
+    crc = 0
+    for row in rows:
+        crc = zlib.crc32(repr(row).encode("utf-8"), crc)
+    return f"{len(rows)}:{crc:08x}"
+
+
+def settings_fingerprint():
+    """CRC của toàn bộ cài đặt (ngưỡng lọc, cửa sổ chạm... đều ảnh hưởng kết quả)."""
+    if SETTINGS is None or not hasattr(SETTINGS, "get_all_settings"):
+        return "default"
+    text = json.dumps(SETTINGS.get_all_settings(), sort_keys=True, default=str)
+    return f"{zlib.crc32(text.encode('utf-8')):08x}"
+
+
+def de_dashboard_key(db_name, all_data_ai):
+    return "|".join((history_fingerprint(all_data_ai), de_bridge_set_fingerprint(db_name), settings_fingerprint()))
+
+
+# ===================================================================================
+# DỰNG SNAPSHOT
+# ===================================================================================
+
+def _to_int(value):
+    if isinstance(value, str):
+        return int(value) if value.isdigit() else 0
+    return value or 0
+
+
+def filter_de_dashboard_bridges(all_bridges, min_recent_wins):
+    """(cầu loại Đề, cầu hiển thị): chỉ cầu Đề đang Bật có phong độ 10 kỳ >= ngưỡng."""
+    de_bridges = [
+        b for b in all_bridges
+        if str(b.get('type', '')).upper().startswith(('DE_', 'CAU_DE'))
+        or "Đề" in str(b.get('name', ''))
+        or "DE" in str(b.get('name', '')).upper()
+    ]
+    shown = [
+        b for b in de_bridges
+        if _to_int(b.get("is_enabled", 0)) == 1 and _to_int(b.get("recent_win_count_10", 0)) >= min_recent_wins
+    ]
+    return de_bridges, shown
+
+
+@timed("de_dashboard.build")
+def build_de_dashboard_snapshot(all_data_ai, db_name=DB_NAME):
+    """Tính toàn bộ dữ liệu của Tab Soi Cầu Đề (chưa lưu); lỗi từng phần ghi vào "errors"."""
+    from logic.de_analytics import (
+        analyze_market_trends,
+        calculate_number_scores,
+        calculate_top_touch_combinations,
+        run_intersection_matrix_analysis,
+    )
+    from logic.de_history import get_de_history_view
+    try:
+        from logic.bridges.de_bridge_scanner import run_de_killer_scan, run_de_scanner
+    except ImportError as e:
+        print(f"[DE Snapshot] Scanner Import Failed: {e}")
+        run_de_scanner = run_de_killer_scan = None
+
+    list_data = all_data_ai.values.tolist() if hasattr(all_data_ai, "values") else list(all_data_ai)
+    min_recent_wins = _setting("DE_DASHBOARD_MIN_RECENT_WINS", 9)
+    errors = []
+
+    def fail(part, e):
+        print(f"[DE Snapshot] {part} failed: {e}")
+        errors.append(f"{part}: {e}")
+
+    bridges = []
+    try:
+        from logic.dashboard_analytics import get_cau_dong_for_tab_soi_cau_de
+        all_bridges = get_cau_dong_for_tab_soi_cau_de(db_name, verbose=False)
+        _, bridges = filter_de_dashboard_bridges(all_bridges, min_recent_wins)
+    except Exception as e:
+        fail("Load bridges", e)
+        # Fallback: quét cầu trực tiếp nếu không đọc được DB
+        if run_de_scanner:
+            try: _, bridges = run_de_scanner(list_data)
+            except Exception: pass
+
+    # Cầu Loại chỉ dùng để trừ điểm, không hiển thị
+    killers = []
+    if run_de_killer_scan:
+        try: killers = run_de_killer_scan(list_data)
+        except Exception as e: fail("Killer scan", e)
+
+    # Lịch sử Đề dạng mảng, dùng chung cho ma trận và xu hướng (không dựng DataFrame)
+    de_history = get_de_history_view(list_data)
+
+    matrix_res = {"ranked": [], "message": "N/A"}
+    try: matrix_res = run_intersection_matrix_analysis(de_history)
+    except Exception as e:
+        matrix_res["message"] = str(e)
+        fail("Matrix", e)
+
+    stats, scores, touch_combinations = {}, [], []
+    try:
+        stats = analyze_market_trends(de_history, n_days=30)
+        scores = calculate_number_scores(list(bridges) + killers, stats)
+        touch_combinations = calculate_top_touch_combinations(list_data, num_touches=4, days=30)
+    except Exception as e:
+        fail("Analytics", e)
+
+    return {
+        "recent_rows": [list(r) for r in list_data[-HISTORY_ROWS_KEPT:]],
+        "bridges": bridges,
+        "matrix_res": matrix_res,
+        "scores": scores,
+        "stats": stats,
+        "touch_combinations": touch_combinations,
+        "min_recent_wins": min_recent_wins,
+        "errors": errors,
+        "built_at": time.time(),
+    }
+
+
+# ===================================================================================
+# ĐỌC / GHI SNAPSHOT
+# ===================================================================================
+
+def load_de_dashboard_snapshot(db_name, all_data_ai, key=None):
+    """Snapshot khớp đúng (lịch sử, cầu Đề, cài đặt) hiện tại, hoặc None."""
+    key = key or de_dashboard_key(db_name, all_data_ai)
+    with _cache_lock:
+        cached = _memory_cache.get(db_name)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        snapshot = load_result(db_name, DE_DASHBOARD_RESULT, key)
+    except Exception as e:
+        print(f"[DE Snapshot] Không đọc được snapshot: {e}")
+        return None
+    if snapshot is not None:
+        with _cache_lock:
+            _memory_cache[db_name] = (key, snapshot)
+    return snapshot
+
+
+def store_de_dashboard_snapshot(db_name, key, snapshot):
+    with _cache_lock:
+        _memory_cache[db_name] = (key, snapshot)
+    try:
+        save_result(db_name, DE_DASHBOARD_RESULT, key, snapshot)
+    except Exception as e:
+        print(f"[DE Snapshot] Không lưu được snapshot: {e}")
+
+
+def _build_and_store(db_name, key, all_data_ai):
+    """
+    Dựng + lưu snapshot; nếu thread khác đang dựng cùng khóa thì chờ và dùng kết quả đó.
+    Snapshot có lỗi (errors) chỉ được trả về, không lưu, để lần sau dựng lại.
+    """
+    with _cache_lock:
+        event = _building.get((db_name, key))
+        owner = event is None
+        if owner:
+            event = _building[(db_name, key)] = threading.Event()
+    if not owner:
+        event.wait()
+        snapshot = load_de_dashboard_snapshot(db_name, all_data_ai, key)
+        if snapshot is not None:
+            return snapshot
+        return _build_and_store(db_name, key, all_data_ai)  # Thread kia lỗi -> tự dựng
+    try:
+        snapshot = build_de_dashboard_snapshot(all_data_ai, db_name)
+        if not snapshot.get("errors"):
+            store_de_dashboard_snapshot(db_name, key, snapshot)
+        return snapshot
+    finally:
+        with _cache_lock:
+            _building.pop((db_name, key), None)
+        event.set()
+
+
+def get_de_dashboard_snapshot(all_data_ai, db_name=DB_NAME):
+    """Đọc snapshot (O(1) khi khớp khóa); chưa có thì dựng, lưu rồi trả về."""
+    key = de_dashboard_key(db_name, all_data_ai)
+    snapshot = load_de_dashboard_snapshot(db_name, all_data_ai, key)
+    if snapshot is None:
+        snapshot = _build_and_store(db_name, key, all_data_ai)
+    return snapshot
+
+
+def refresh_de_dashboard_snapshot_async(db_name=DB_NAME, all_data_ai=None, on_done=None):
+    """
+    Dựng lại snapshot trên thread nền (gọi khi có kỳ mới). all_data_ai=None thì
+    tải lại từ DB. Bỏ qua nếu snapshot đã khớp hoặc đang được dựng cho cùng khóa;
+    tab mở trong lúc đang dựng sẽ chờ kết quả này thay vì tính lại.
+    on_done(snapshot) được gọi trên thread nền khi xong.
+    Trả về Thread đã chạy, hoặc None nếu không có việc.
+    """
+    if all_data_ai is None:
+        from logic.data_repository import load_data_ai_from_db
+        all_data_ai, _ = load_data_ai_from_db(db_name)
+    if not all_data_ai:
+        return None
+    key = de_dashboard_key(db_name, all_data_ai)
+    if load_de_dashboard_snapshot(db_name, all_data_ai, key) is not None:
+        return None
+    with _cache_lock:
+        if (db_name, key) in _building:
+            return None
+
+    def worker():
+        try:
+            snapshot = _build_and_store(db_name, key, all_data_ai)
+            if on_done:
+                on_done(snapshot)
+        except Exception as e:
+            print(f"[DE Snapshot] Lỗi dựng snapshot nền: {e}")
+
+    thread = threading.Thread(target=worker, name="de-dashboard-snapshot", daemon=True)
+    thread.start()
+    return thread
+
+
+def clear_de_dashboard_cache():
+    with _cache_lock:
+        _memory_cache.clear()
@@ -0,0 +1,520 @@
+# Tên file: services/pipeline_service.py
+# Service layer: Chạy chuỗi tác vụ nặng không cần giao diện (nightly job)
+"""
+Pipeline chạy headless các tác vụ mà UI vẫn gọi qua AppController:
+nạp kỳ mới -> dò cầu Lô/Đề -> backtest (cache K2N + tỷ lệ K1N) -> lọc cầu
+-> huấn luyện AI -> tính sẵn Bảng Tổng Hợp và snapshot Tab Soi Cầu Đề.
+
+- Lịch sử A:I chỉ tải MỘT lần (sau bước append) và dùng chung cho mọi bước.
+- Các bước là một DAG (PIPELINE_STEPS); bước nào đủ điều kiện thì chạy. Với
+  jobs > 1 các bước độc lập chạy trên thread, nhưng bước ghi CSDL (writes_db)
+  luôn chạy lần lượt (một khóa ghi chung) để hai kết nối SQLite không ghi cùng
+  lúc; chỉ bước không ghi CSDL (train) chạy chồng lên bước khác. Các bước là
+  Python thuần nặng CPU nên GIL cũng giới hạn mức tăng tốc.
+- Mỗi bước xong ghi checkpoint (bảng PipelineCheckpoints) kèm dấu vân tay
+  lịch sử; resume=True bỏ qua bước đã chạy thành công trên cùng dữ liệu.
+- Kết quả Bảng Tổng Hợp được lưu vào bảng PipelineResults để UI mở ra dùng ngay.
+
+Cách dùng (xem scripts/jobs/run_pipeline.py):
+    python scripts/jobs/run_pipeline.py --input new_draws.txt --jobs 2 --resume
+"""
+
+import argparse
+import contextlib
+import pickle
+import sqlite3
+import threading
+import time
+import traceback
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+try:
+    from logic.db_manager import DB_NAME
+except ImportError:
+    DB_NAME = "data/xo_so_prizes_all_logic.db"
+
+try:
+    from logic.config_manager import SETTINGS
+except ImportError:
+    SETTINGS = None
+
+try:
+    from logic.instrumentation import get_recorder, perf_stage, timed
+except ImportError:
+    get_recorder = None
+    def perf_stage(name): return contextlib.nullcontext()
+    def timed(name): return lambda func: func
+
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"      # Bước không có việc để làm (VD: append không có file)
+STATUS_RESUMED = "resumed"      # Đã chạy xong trên cùng dữ liệu (checkpoint)
+STATUS_BLOCKED = "blocked"      # Bước phụ thuộc bị lỗi
+
+DASHBOARD_RESULT = "dashboard"
+
+PIPELINE_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS PipelineCheckpoints (
+        step TEXT PRIMARY KEY,
+        fingerprint TEXT,
+        status TEXT NOT NULL,
+        finished_at TEXT NOT NULL,
+        duration_s REAL,
+        summary TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS PipelineResults (
+        name TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        payload BLOB NOT NULL
+    )""",
+)
+
+
+class StepSkipped(Exception):
+    """Bước không có việc để làm (không tính là lỗi)."""
+
+
+def _setting(key, default):
+    if SETTINGS is None:
+        return default
+    return getattr(SETTINGS, key, default)
+
+
+# ===================================================================================
+# CHECKPOINT & KẾT QUẢ TÍNH SẴN
+# ===================================================================================
+
+def history_fingerprint(all_data_ai):
+    """Dấu vân tay lịch sử: số kỳ, kỳ cuối và CRC của hàng cuối (đổi khi có kỳ mới/sửa kỳ cuối)."""
+    if not all_data_ai:
+        return "0"
+    last_row = all_data_ai[-1]
+    crc = zlib.crc32("|".join(str(v) for v in last_row).encode("utf-8"))
+    return f"{len(all_data_ai)}:{last_row[0]}:{crc:08x}"
+
+
+def ensure_pipeline_tables(conn):
+    for statement in PIPELINE_SCHEMA:
+        conn.execute(statement)
+
+
+def load_checkpoints(db_name=DB_NAME):
+    """Đọc checkpoint: {step: {fingerprint, status, finished_at, duration_s, summary}}."""
+    conn = sqlite3.connect(db_name)
+    try:
+        ensure_pipeline_tables(conn)
+        rows = conn.execute(
+            "SELECT step, fingerprint, status, finished_at, duration_s, summary FROM PipelineCheckpoints"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        r[0]: {"fingerprint": r[1], "status": r[2], "finished_at": r[3], "duration_s": r[4], "summary": r[5]}
+        for r in rows
+    }
+
+
+def save_checkpoint(db_name, step, fingerprint, status, duration_s, summary):
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        ensure_pipeline_tables(conn)
+        conn.execute(
+            """INSERT INTO PipelineCheckpoints (step, fingerprint, status, finished_at, duration_s, summary)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(step) DO UPDATE SET fingerprint = excluded.fingerprint, status = excluded.status,
+                   finished_at = excluded.finished_at, duration_s = excluded.duration_s,
+                   summary = excluded.summary""",
+            (step, fingerprint, status, datetime.now().isoformat(timespec="seconds"), duration_s, summary),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def save_result(db_name, name, fingerprint, value):
+    """Lưu kết quả tính sẵn (pickle) gắn với dấu vân tay lịch sử."""
+    payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    conn = sqlite3.connect(db_name, timeout=30)
+    try:
+        ensure_pipeline_tables(conn)
+        conn.execute(
+            """INSERT INTO PipelineResults (name, fingerprint, created_at, payload) VALUES (?, ?, ?, ?)
+               ON CONFLICT(name) DO UPDATE SET fingerprint = excluded.fingerprint,
+                   created_at = excluded.created_at, payload = excluded.payload""",
+            (name, fingerprint, datetime.now().isoformat(timespec="seconds"), sqlite3.Binary(payload)),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_result(db_name, name, fingerprint=None):
+    """Đọc kết quả tính sẵn; None nếu chưa có hoặc dấu vân tay không khớp."""
+    conn = sqlite3.connect(db_name)
+    try:
+        ensure_pipeline_tables(conn)
+        row = conn.execute(
+            "SELECT fingerprint, payload FROM PipelineResults WHERE name = ?", (name,)
+        ).fetchone()
+    finally:
+        conn.close()
+    if row is None or (fingerprint is not None and row[0] != fingerprint):
+        return None
+    return pickle.loads(row[1])
+
+
+def load_dashboard_snapshot(db_name, all_data_ai):
+    """Bảng Tổng Hợp do pipeline tính sẵn cho đúng lịch sử hiện tại (hoặc None)."""
+    try:
+        return load_result(db_name, DASHBOARD_RESULT, history_fingerprint(all_data_ai))
+    except Exception as e:
+        print(f"[Pipeline] Không đọc được Bảng Tổng Hợp tính sẵn: {e}")
+        return None
+
+
+# ===================================================================================
+# NGỮ CẢNH CHẠY
+# ===================================================================================
+
+class PipelineContext:
+    """Trạng thái dùng chung giữa các bước: DB, file đầu vào và lịch sử (tải một lần)."""
+
+    def __init__(self, db_name=DB_NAME, input_files=(), logger=None):
+        self.db_name = db_name
+        self.input_files = list(input_files or [])
+        self.logger = logger
+        self._history = None
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        if self.logger:
+            self.logger.log(message)
+        else:
+            print(message, flush=True)
+
+    @property
+    def history(self):
+        """Lịch sử A:I (tải lần đầu khi cần, sau đó dùng chung cho mọi bước)."""
+        with self._lock:
+            if self._history is None:
+                from logic.data_repository import load_data_ai_from_db
+                rows, message = load_data_ai_from_db(self.db_name)
+                if not rows:
+                    raise RuntimeError(f"Không tải được dữ liệu A:I: {message}")
+                self._history = rows
+                self.log(f"[Pipeline] Đã tải {len(rows)} kỳ từ {self.db_name}")
+            return self._history
+
+    def invalidate_history(self):
+        with self._lock:
+            self._history = None
+
+    @property
+    def fingerprint(self):
+        return history_fingerprint(self.history)
+
+    def scan_data(self):
+        """Lịch sử giới hạn theo DATA_LIMIT_SCANNER (như nút Dò Tìm Cầu Mới)."""
+        limit = int(_setting("DATA_LIMIT_SCANNER", 500) or 0)
+        data = self.history
+        return data[-limit:] if 0 < limit < len(data) else data
+
+
+# ===================================================================================
+# CÁC BƯỚC
+# ===================================================================================
+
+def step_append(ctx):
+    """Nạp kỳ mới từ các file đầu vào (INSERT OR IGNORE, không xóa Cầu Đã Lưu)."""
+    if not ctx.input_files:
+        raise StepSkipped("Không có file kỳ mới")
+    from logic.data_parser import parse_and_APPEND_data
+    from logic.db_manager import setup_database
+
+    total = 0
+    for path in ctx.input_files:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            raw_data = f.read()
+        conn, cursor = setup_database(ctx.db_name)
+        try:
+            total += parse_and_APPEND_data(raw_data, conn, cursor) or 0
+        finally:
+            conn.close()
+    ctx.invalidate_history()
+    return f"Đã thêm {total} kỳ mới từ {len(ctx.input_files)} file"
+
+
+def step_scan_lo(ctx):
+    """Dò cầu Lô (V17 Shadow, Bạc Nhớ, cố định) và lưu vào DB."""
+    from logic.bridges.bridge_manager_core import find_and_auto_manage_bridges
+    message = find_and_auto_manage_bridges(ctx.scan_data(), ctx.db_name)
+    if isinstance(message, str) and message.startswith("Lỗi"):
+        raise RuntimeError(message)
+    return message
+
+
+def step_scan_de(ctx):
+    """Dò cầu Đề và nhập thẳng từng lô ứng viên qua BridgeImporter."""
+    from logic.bridge_importer import create_importer_from_settings
+    from logic.bridges.de_bridge_scanner import DeBridgeScanner
+
+    settings = SETTINGS.get_all_settings() if SETTINGS is not None else None
+    importer = create_importer_from_settings(settings)
+    importer.db_name = ctx.db_name
+    batches = DeBridgeScanner().iter_candidate_batches(ctx.scan_data(), ctx.db_name)
+    result = importer.import_candidate_stream(batches)
+    return (f"Đề: nhập {result['imported']} cầu, trùng {result['duplicates']}, "
+            f"loại {result['rejected']}, lỗi {result['errors']}")
+
+
+def step_backtest(ctx):
+    """Làm mới cache K2N và tỷ lệ/phong độ K1N của mọi Cầu Đã Lưu."""
+    from logic.backtester import run_and_update_all_bridge_K2N_cache, run_and_update_all_bridge_rates
+    _, cache_count, cache_message = run_and_update_all_bridge_K2N_cache(ctx.history, ctx.db_name)
+    _, rate_message = run_and_update_all_bridge_rates(ctx.history, ctx.db_name)
+    return f"K2N: {cache_message} ({cache_count} cầu) | K1N: {rate_message}"
+
+
+def step_prune(ctx):
+    """Tắt cầu yếu, bật lại cầu tốt (Lô & Đề) và loại cầu Đề gãy quá ngưỡng."""
+    from services.bridge_service import BridgeService
+    service = BridgeService(ctx.db_name, logger=ctx.logger)
+    msg_prune, msg_manage = service.smart_optimization(ctx.history)
+    msg_de = service.prune_bad_de_bridges(ctx.history)
+    return f"Lọc: {msg_prune} | Quản lý: {msg_manage} | Đề: {msg_de}"
+
+
+def step_train(ctx):
+    """Huấn luyện lại mô hình AI (đồng bộ, không qua luồng nền của UI)."""
+    from logic.ai_feature_extractor import _get_daily_bridge_predictions
+    from logic.ml_model import train_ai_model
+    predictions = _get_daily_bridge_predictions(ctx.history, db_name=ctx.db_name)
+    success, message = train_ai_model(ctx.history, predictions)
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+
+def step_dashboard(ctx):
+    """Tính sẵn Bảng Tổng Hợp (Lô + Đề) và lưu vào PipelineResults."""
+    from services.analysis_service import AnalysisService
+    limit = int(_setting("DATA_LIMIT_DASHBOARD", 2000) or 0)
+    result = AnalysisService(ctx.db_name, logger=ctx.logger).prepare_dashboard_data(
+        ctx.history, data_limit=limit if limit > 0 else None
+    )
+    if not result:
+        raise RuntimeError("Không thể chuẩn bị dữ liệu dashboard")
+    save_result(ctx.db_name, DASHBOARD_RESULT, ctx.fingerprint, result)
+    return f"Đã lưu Bảng Tổng Hợp cho {result.get('next_ky')} ({len(result.get('top_scores') or [])} cặp có điểm)"
+
+
+def step_de_dashboard(ctx):
+    """Tính sẵn snapshot Tab Soi Cầu Đề (theo lịch sử + tập cầu Đề sau khi lọc)."""
+    from services.de_dashboard_service import de_dashboard_key, get_de_dashboard_snapshot, load_de_dashboard_snapshot
+    if load_de_dashboard_snapshot(ctx.db_name, ctx.history) is not None:
+        raise StepSkipped("Snapshot Soi Cầu Đề đã khớp dữ liệu hiện tại")
+    snapshot = get_de_dashboard_snapshot(ctx.history, ctx.db_name)
+    if snapshot.get("errors"):
+        raise RuntimeError(f"Snapshot Soi Cầu Đề thiếu dữ liệu, chưa lưu: {'; '.join(snapshot['errors'])}")
+    return f"Đã lưu snapshot Soi Cầu Đề ({len(snapshot['bridges'])} cầu hiển thị, khóa {de_dashboard_key(ctx.db_name, ctx.history)})"
+
+
+class PipelineStep:
+    """
+    Một nút của DAG: tên, các bước phải xong trước và hàm chạy (nhận PipelineContext).
+    writes_db: bước ghi vào CSDL -> không chạy cùng lúc với bước ghi khác.
+    """
+
+    __slots__ = ("name", "deps", "func", "writes_db")
+
+    def __init__(self, name, func, deps=(), writes_db=False):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.writes_db = writes_db
+
+
+# Thứ tự khai báo cũng là thứ tự chạy khi jobs = 1
+PIPELINE_STEPS = {
+    step.name: step for step in (
+        PipelineStep("append", step_append, writes_db=True),
+        PipelineStep("scan_lo", step_scan_lo, deps=("append",), writes_db=True),
+        PipelineStep("scan_de", step_scan_de, deps=("append",), writes_db=True),
+        PipelineStep("backtest", step_backtest, deps=("append", "scan_lo", "scan_de"), writes_db=True),
+        PipelineStep("prune", step_prune, deps=("backtest",), writes_db=True),
+        PipelineStep("train", step_train, deps=("prune",)),  # Chỉ đọc CSDL, ghi file mô hình
+        PipelineStep("dashboard", step_dashboard, deps=("prune", "train"), writes_db=True),
+        PipelineStep("de_dashboard", step_de_dashboard, deps=("prune",), writes_db=True),
+    )
+}
+
+
+# ===================================================================================
+# BỘ CHẠY
+# ===================================================================================
+
+class PipelineRunner:
+    """
+    Chạy các bước đã chọn theo DAG.
+
+    Args:
+        db_name: CSDL dùng cho mọi bước (dữ liệu, cầu, checkpoint, kết quả)
+        steps: Tên các bước cần chạy (mặc định PIPELINE_STEPS); phụ thuộc tới bước
+               không được chọn thì bỏ qua
+        jobs: Số bước chạy song song tối đa (bước ghi CSDL vẫn chạy lần lượt)
+        resume: Bỏ qua bước đã thành công trên cùng dấu vân tay lịch sử
+        input_files: File kỳ mới cho bước append
+        registry: DAG thay thế (dict tên -> PipelineStep), mặc định PIPELINE_STEPS
+    """
+
+    def __init__(self, db_name=DB_NAME, steps=None, jobs=1, resume=False, input_files=(),
+                 logger=None, registry=None):
+        self.registry = registry if registry is not None else PIPELINE_STEPS
+        names = list(steps) if steps else list(self.registry)
+        unknown = [n for n in names if n not in self.registry]
+        if unknown:
+            raise ValueError(f"Bước không tồn tại: {', '.join(unknown)}")
+        # Giữ thứ tự khai báo của DAG, bất kể thứ tự người dùng nhập
+        self.steps = [n for n in self.registry if n in set(names)]
+        self.jobs = max(1, int(jobs))
+        self.resume = resume
+        self.ctx = PipelineContext(db_name, input_files, logger)
+        self._write_lock = threading.Lock()  # Một bước ghi CSDL tại một thời điểm
+
+    def _deps(self, name):
+        return [d for d in self.registry[name].deps if d in self.steps]
+
+    def _execute(self, name):
+        """Chạy một bước; trả về (status, duration_s, summary)."""
+        step = self.registry[name]
+        start = time.perf_counter()
+        try:
+            with self._write_lock if step.writes_db else contextlib.nullcontext(), perf_stage(f"pipeline.{name}"):
+                summary = step.func(self.ctx)
+            status = STATUS_OK
+        except StepSkipped as e:
+            status, summary = STATUS_SKIPPED, str(e)
+        except Exception as e:
+            status, summary = STATUS_FAILED, f"{type(e).__name__}: {e}"
+            self.ctx.log(traceback.format_exc())
+        return status, time.perf_counter() - start, "" if summary is None else str(summary)
+
+    def _checkpoint(self, name, status, duration, summary):
+        if status not in (STATUS_OK, STATUS_FAILED) or name == "append":
+            return
+        try:
+            fingerprint = self.ctx.fingerprint if status == STATUS_OK else None
+            save_checkpoint(self.ctx.db_name, name, fingerprint, status, duration, summary)
+        except Exception as e:
+            self.ctx.log(f"[Pipeline] Lỗi ghi checkpoint '{name}': {e}")
+
+    def _resumable(self, name, checkpoints):
+        if not self.resume or name == "append":
+            return False
+        saved = checkpoints.get(name)
+        return bool(saved) and saved["status"] == STATUS_OK and saved["fingerprint"] == self.ctx.fingerprint
+
+    @timed("pipeline.run")
+    def run(self):
+        """
+        Chạy pipeline.
+
+        Returns:
+            dict: {tên bước: {"status", "duration_s", "summary"}} theo thứ tự DAG
+        """
+        report = {}
+        pending = list(self.steps)
+        running = {}
+        checkpoints = load_checkpoints(self.ctx.db_name) if self.resume else {}
+
+        def finish(name, status, duration, summary):
+            report[name] = {"status": status, "duration_s": round(duration, 3), "summary": summary}
+            self.ctx.log(f"[Pipeline] {name}: {status.upper()} ({duration:.1f}s) {summary}")
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                # Lấy lần lượt bước đầu tiên (theo thứ tự DAG) có đủ phụ thuộc cho tới khi đầy jobs
+                ready = True
+                while ready and len(running) < self.jobs:
+                    ready = False
+                    for name in pending:
+                        deps = self._deps(name)
+                        if all(d in report for d in deps):
+                            pending.remove(name)
+                            ready = True
+                            break
+                    if not ready:
+                        break
+                    failed = [d for d in deps if report[d]["status"] in (STATUS_FAILED, STATUS_BLOCKED)]
+                    if failed:
+                        finish(name, STATUS_BLOCKED, 0.0, f"Bỏ qua do lỗi ở: {', '.join(failed)}")
+                        continue
+                    try:
+                        resumable = self._resumable(name, checkpoints)
+                    except Exception as e:  # Không tải được lịch sử
+                        finish(name, STATUS_FAILED, 0.0, f"{type(e).__name__}: {e}")
+                        continue
+                    if resumable:
+                        finish(name, STATUS_RESUMED, 0.0, checkpoints[name]["summary"] or "")
+                        continue
+                    self.ctx.log(f"[Pipeline] >>> {name}...")
+                    running[pool.submit(self._execute, name)] = name
+
+                if not running:
+                    if pending:  # Không bước nào chạy được mà vẫn còn bước chờ: DAG có vòng
+                        raise ValueError(f"DAG có vòng phụ thuộc: {', '.join(pending)}")
+                    break
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    status, duration, summary = future.result()
+                    self._checkpoint(name, status, duration, summary)
+                    finish(name, status, duration, summary)
+
+        return {name: report[name] for name in self.steps}
+
+
+# ===================================================================================
+# CLI
+# ===================================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy pipeline xử lý nặng không cần giao diện (nightly).")
+    parser.add_argument("--db", default=DB_NAME, help=f"Đường dẫn CSDL (mặc định: {DB_NAME})")
+    parser.add_argument("--input", action="append", default=[],
+                        help="File kỳ mới cho bước append (lặp lại để nạp nhiều file)")
+    parser.add_argument("--steps", default=None,
+                        help=f"Các bước cần chạy, cách nhau dấu phẩy ({', '.join(PIPELINE_STEPS)})")
+    parser.add_argument("--skip", default="", help="Các bước bỏ qua, cách nhau dấu phẩy")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Số bước độc lập chạy song song (thread). Bước ghi CSDL luôn chạy lần lượt, "
+                             "chỉ bước chỉ đọc (train) chạy chồng; tính toán Python thuần bị GIL giới hạn "
+                             "nên thường tăng tốc ít")
+    parser.add_argument("--resume", action="store_true",
+                        help="Bỏ qua bước đã chạy thành công trên cùng dữ liệu (checkpoint)")
+    args = parser.parse_args(argv)
+
+    steps = [s.strip() for s in (args.steps or ",".join(PIPELINE_STEPS)).split(",") if s.strip()]
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    steps = [s for s in steps if s not in skip]
+    try:
+        runner = PipelineRunner(args.db, steps=steps, jobs=args.jobs, resume=args.resume,
+                                input_files=args.input)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if get_recorder is not None and get_recorder().db_path is None:
+        get_recorder().db_path = args.db  # Thời gian từng bước vào perf_log của đúng CSDL
+
+    started = time.perf_counter()
+    report = runner.run()
+    width = max([len("Bước")] + [len(name) for name in report]) + 2
+    print(f"\n{'Bước':<{width}}{'Trạng thái':<12}{'Thời gian':>10}  Kết quả")
+    for name, item in report.items():
+        print(f"{name:<{width}}{item['status']:<12}{item['duration_s']:>9.1f}s  {item['summary']}")
+    print(f"Tổng thời gian: {time.perf_counter() - started:.1f}s")
+    return 1 if any(item["status"] in (STATUS_FAILED, STATUS_BLOCKED) for item in report.values()) else 0
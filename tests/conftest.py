@@ -180,3 +180,19 @@ def reset_config():
     yield
     # Cleanup if needed
     pass
+
+
+@pytest.fixture(autouse=True)
+def isolate_perf_log(tmp_path):
+    """Redirect perf_log / perf_log.json writes to a temp dir (never the real DB or logs/)"""
+    try:
+        from logic.instrumentation import get_recorder
+    except ImportError:
+        yield
+        return
+    recorder = get_recorder()
+    saved = recorder.db_path, recorder.json_path
+    recorder.db_path = str(tmp_path / "perf_log.db")
+    recorder.json_path = str(tmp_path / "perf_log.json")
+    yield
+    recorder.db_path, recorder.json_path = saved
@@ -0,0 +1,156 @@
+# tests/test_backtest_result.py
+"""
+Tests for the structured (numeric) backtest results.
+
+The string tables must still come out exactly as the ResultsViewer expects,
+while background callers read the outcome matrix and summary arrays directly.
+"""
+
+import random
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from logic import backtester_core as core
+from logic.backtest import (
+    OUTCOME_HIT_N1,
+    OUTCOME_HIT_N2,
+    OUTCOME_MISS_N1,
+    OUTCOME_NO_PRED,
+    PENDING_N2,
+    BacktestResult,
+    BacktestResultBuilder,
+)
+from logic.backtest.result import KIND_MANAGED_K2N, decode_stl, encode_stl
+from logic.backtester_aggregation import tonghop_top_cau_core
+from logic.backtester_scoring import score_by_rate
+from logic.bridges.bridges_memory import get_27_loto_names
+
+
+def _make_history(n_days, seed=5):
+    rng = random.Random(seed)
+
+    def nums(count, width):
+        return ",".join(f"{rng.randrange(10 ** width):0{width}d}" for _ in range(count))
+
+    return [
+        [str(100 + i), nums(1, 5), nums(1, 5), nums(2, 5), nums(6, 5),
+         nums(4, 4), nums(6, 4), nums(3, 3), nums(4, 2), "x"]
+        for i in range(n_days)
+    ]
+
+
+def _managed_bridges():
+    names = get_27_loto_names()
+    return [
+        {"name": "LO_STL_FIXED_03", "pos1_idx": 0, "pos2_idx": 0},
+        {"name": "GDB[0]+G1[1]", "pos1_idx": 2, "pos2_idx": 7},
+        {"name": f"LO_MEM_SUM_{names[0]}_{names[5]}", "pos1_idx": -1, "pos2_idx": -1},
+        {"name": "Tổng(1+4)", "pos1_idx": -1, "pos2_idx": -1},
+        {"name": "BROKEN", "pos1_idx": None, "pos2_idx": None},
+        {"name": "DE_SOMETHING", "pos1_idx": 1, "pos2_idx": 2},
+    ]
+
+
+@pytest.fixture
+def data():
+    rows = _make_history(60)
+    rows[25][2] = ""  # hàng lỗi dữ liệu
+    return rows
+
+
+@pytest.fixture
+def managed():
+    with patch.object(core, "get_all_managed_bridges", lambda db, only_enabled=True: _managed_bridges()):
+        yield
+
+
+class TestStlCodec:
+    def test_round_trip(self):
+        assert decode_stl(encode_stl(["05", "50"])) == "05,50"
+
+    @pytest.mark.parametrize("pred", [["5", "50"], ["ab", "12"], ["12"], None, [1, 2]])
+    def test_non_standard_pairs_are_rejected(self, pred):
+        assert encode_stl(pred) == -1
+
+    def test_builder_keeps_non_standard_pairs(self):
+        builder = BacktestResultBuilder(KIND_MANAGED_K2N, ["Kỳ", "A"], ["A"], 1)
+        r = builder.add_row("1")
+        builder.set_cell(r, 0, OUTCOME_HIT_N1, ["7", "70"])
+        result = builder.build()
+        assert result.to_table()[-1][1] == "7,70 ✅ (Ăn N1)"
+
+
+class TestClassicK2N:
+    def test_result_matches_table(self, data):
+        result = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1, as_result=True)
+        table = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1)
+
+        assert isinstance(result, BacktestResult)
+        assert result.to_table() == table
+        assert result.outcomes.dtype == np.int8
+        assert result.outcomes.shape == (len(table) - 5, 15)
+        assert result.total_days == len(table) - 6  # một hàng lỗi dữ liệu
+        assert table[1][1:16] == [f"{r:.2f}%" for r in result.win_rates]
+
+    def test_history_rows_newest_first(self, data):
+        table = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1)
+        assert table[5][0] == data[-1][0]
+        assert any(row[1] == "Lỗi dữ liệu hàng" for row in table[5:])
+
+    def test_summary_arrays_agree_with_outcomes(self, data):
+        result = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1, as_result=True)
+        hits = result.hit_mask
+        assert hits.sum(axis=0).tolist() == result.win_counts.tolist()
+        assert result.recent_wins().tolist() == hits[-10:].sum(axis=0).tolist()
+
+    def test_cache_matches_string_parser(self, data):
+        result = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1, as_result=True)
+        table = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1, history=False)
+
+        cache, pending = core.parse_k2n_results(result)
+        legacy_cache, legacy_pending = core.parse_k2n_results(table)
+
+        # Bộ phân tích chuỗi đọc nhầm cột "Tổng Trúng" thành một cầu
+        assert cache == legacy_cache[:15]
+        assert pending == {k: v for k, v in legacy_pending.items() if k != "Tổng Trúng"}
+        assert all(v["is_n2"] == (result.pending_state[j] == PENDING_N2)
+                   for j, v in enumerate(pending.values()))
+
+    def test_invalid_params_return_error_table(self):
+        assert core.BACKTEST_15_CAU_K2N_V30_AI_V8([], 2, 3, as_result=True) == [["LỖI:", "Cần đủ tham số."]]
+
+
+class TestManagedBridges:
+    def test_k1n_table_layout(self, data, managed):
+        result = core.BACKTEST_MANAGED_BRIDGES_K1N(data, 2, len(data) + 1, "x", as_result=True)
+        table = result.to_table()
+
+        assert result.bridge_names == [b["name"] for b in _managed_bridges()[:5]]
+        assert table[2][0] == "Chuỗi Thắng Max"
+        assert table[4][0] == "Kỳ 160"
+        assert table[4][5] == "Lỗi"  # cầu không có vị trí
+        assert set(np.unique(result.outcomes[:, :4])) <= {0, OUTCOME_HIT_N1, OUTCOME_MISS_N1}
+        assert (result.outcomes[result.row_status == 0, 4] == OUTCOME_NO_PRED).all()
+
+    def test_k2n_recent_form_is_counted(self, data, managed):
+        result = core.BACKTEST_MANAGED_BRIDGES_K2N(data, 2, len(data) + 1, "x", as_result=True)
+        table = result.to_table(history=False)
+
+        assert len(table) == 5
+        assert table[3][1:] == [f"{w}/10" for w in result.recent_wins()]
+        assert (result.outcomes == OUTCOME_HIT_N2).any()
+
+    def test_no_bridges_keeps_legacy_return(self, data):
+        with patch.object(core, "get_all_managed_bridges", lambda db, only_enabled=True: []):
+            assert core.BACKTEST_MANAGED_BRIDGES_K2N(data, 2, len(data) + 1, "x", as_result=True) == []
+
+
+class TestAggregation:
+    def test_top_bridges_from_result_match_table(self, data):
+        result = core.BACKTEST_15_CAU_K2N_V30_AI_V8(data, 2, len(data) + 1, as_result=True)
+        table = [result.headers] + result.to_table()[5:][::-1]
+
+        assert tonghop_top_cau_core(result, data[-1], 3, score_by_rate) == \
+            tonghop_top_cau_core(table, data[-1], 3, score_by_rate)
@@ -0,0 +1,75 @@
+# tests/test_benchmarks.py
+"""
+Tests for the benchmark suite helpers (seeded generator, measurement and
+baseline comparison). The hot paths themselves are not timed here.
+"""
+
+import json
+
+from benchmarks.generator import (
+    HISTORY_SIZES,
+    build_benchmark_db,
+    generate_history,
+    generate_managed_bridges,
+)
+from benchmarks.run_benchmarks import compare, main, measure
+from logic.bridges.bridges_classic import is_standard_row
+from logic.data_repository import get_all_managed_bridges, load_data_ai_from_db
+
+
+def test_history_is_seeded_and_standard():
+    first, again, other = generate_history(30, seed=1), generate_history(30, seed=1), generate_history(30, seed=2)
+    assert first == again
+    assert first != other
+    assert all(is_standard_row(row) for row in first)
+    assert [row[0] for row in first[:2]] == [23000, 23001]
+    assert HISTORY_SIZES["20y"] == 20 * HISTORY_SIZES["1y"]
+
+
+def test_managed_bridges_are_unique_and_mixed():
+    bridges = generate_managed_bridges(120, seed=3)
+    assert len(bridges) == 120
+    assert len({b["name"] for b in bridges}) == 120
+    assert {b["type"] for b in bridges} == {"LO_STL_FIXED", "LO_POS", "LO_MEM", "DE_POS"}
+    assert bridges == generate_managed_bridges(120, seed=3)
+
+
+def test_build_db_round_trip(tmp_path):
+    db_path = str(tmp_path / "bench.db")
+    rows = build_benchmark_db(db_path, 40, 25, seed=5)
+
+    loaded, _ = load_data_ai_from_db(db_path)
+    assert [list(row) for row in loaded] == rows
+    assert len(get_all_managed_bridges(db_path, only_enabled=True)) == 25
+
+
+def test_measure_reports_time_and_memory():
+    calls = []
+    stats = measure(lambda: calls.append(bytearray(1024 * 1024)), warmup=2, repeats=3)
+    assert len(calls) == 2 + 3 + 1
+    assert stats["repeats"] == 3 and stats["warmup"] == 2
+    assert stats["min_s"] <= stats["median_s"]
+    assert stats["peak_mb"] >= 1.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"a@1y": {"median_s": 1.0}, "b@1y": {"median_s": 1.0},
+                            "c@1y": {"median_s": 1.0}, "d@1y": {"median_s": 0.001}}}
+    current = {"results": {"a@1y": {"median_s": 1.5}, "b@1y": {"median_s": 0.5},
+                           "c@1y": {"median_s": 1.1}, "d@1y": {"median_s": 0.005},
+                           "e@1y": {"median_s": 2.0}, "f@1y": {"error": "boom"}}}
+    status = {row[0]: row[4] for row in compare(current, baseline, threshold=0.2, min_delta=0.01)}
+    assert status == {"a@1y": "REGRESSION", "b@1y": "FASTER", "c@1y": "OK", "d@1y": "OK",
+                      "e@1y": "NEW", "f@1y": "ERROR"}
+
+
+def test_main_writes_json_and_fails_on_regression(tmp_path, monkeypatch):
+    fake = {"meta": {}, "results": {"managed_k2n@1y": {"median_s": 2.0}}}
+    monkeypatch.setattr("benchmarks.run_benchmarks.run_suite", lambda *a, **k: fake)
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"managed_k2n@1y": {"median_s": 1.0}}}))
+    output = tmp_path / "out.json"
+
+    assert main(["--sizes", "1y", "--cases", "managed_k2n", "--output", str(output)]) == 0
+    assert json.loads(output.read_text()) == fake
+    assert main(["--sizes", "1y", "--cases", "managed_k2n", "--baseline", str(baseline)]) == 1
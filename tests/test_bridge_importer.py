@@ -10,11 +10,13 @@ Tests:
 - Bulk import operations
 """
 
+import sys
+
 import pytest
 from unittest.mock import Mock, patch
 
 from logic.bridge_importer import BridgeImporter, create_importer_from_settings
-from logic.models import Candidate, ImportConfig
+from logic.models import Candidate, CandidateBatch, ImportConfig
 
 
 @pytest.fixture
@@ -443,6 +445,139 @@ class TestBridgeImporter:
         assert "Duration: 1.23s" in summary
 
 
+class TestCandidateStream:
+    """Test streaming import (per-batch filter, dedup and quota cut-off)."""
+    
+    @staticmethod
+    def _de(name, reason, k1n=95.0):
+        return Candidate(name=name, normalized_name=name.lower(), type="de",
+                         kind="single", k1n_de=k1n, reason=reason)
+    
+    @patch('logic.bridge_importer.get_all_managed_bridge_names')
+    def test_stream_filters_and_dedups_per_batch(self, mock_get_names, temp_db):
+        """Duplicates are detected against the DB and earlier batches."""
+        conn, cursor, db_path = temp_db
+        mock_get_names.return_value = {"old"}
+        importer = BridgeImporter(ImportConfig(threshold_k1n_de=90.0), db_name=db_path)
+        
+        batches = [
+            ("DE_SET", [self._de("A", "DE_SET"), self._de("OLD", "DE_SET"), self._de("LOW", "DE_SET", 50.0)]),
+            ("DE_PASCAL", [self._de("a", "DE_PASCAL"), self._de("B", "DE_PASCAL")]),
+        ]
+        results = list(importer.preview_import_stream(batches))
+        
+        assert [r['strategy'] for r in results] == ["DE_SET", "DE_PASCAL"]
+        assert [c.name for c in results[0]['accepted']] == ["A"]
+        assert [c.name for c in results[0]['duplicates']] == ["OLD"]
+        assert [c.name for c in results[0]['rejected']] == ["LOW"]
+        assert [c.name for c in results[1]['duplicates']] == ["a"]
+        assert results[1]['totals']['accepted'] == 2
+        assert results[1]['totals']['candidates'] == 5
+    
+    @patch('logic.bridge_importer.get_all_managed_bridge_names')
+    def test_stream_quota_cuts_off_upstream(self, mock_get_names, temp_db):
+        """Once every quota is full the upstream generator is closed."""
+        conn, cursor, db_path = temp_db
+        mock_get_names.return_value = set()
+        importer = BridgeImporter(ImportConfig(threshold_k1n_de=90.0), db_name=db_path)
+        produced = []
+        
+        def scan():
+            for i in range(10):
+                produced.append(i)
+                yield [self._de(f"S{i}_{j}", "DE_SET") for j in range(3)]
+        
+        results = list(importer.preview_import_stream(scan(), quota_per_strategy={"DE_SET": 4}))
+        
+        assert len(results) == 2
+        assert produced == [0, 1]
+        assert results[-1]['cut_off'] is True
+        assert results[-1]['totals']['accepted'] == 4
+        assert len(results[-1]['over_quota']) == 2
+    
+    @patch('logic.bridge_importer.get_all_managed_bridge_names')
+    @patch('logic.bridge_importer.bulk_upsert_managed_bridges')
+    def test_import_stream_writes_each_batch(self, mock_bulk_upsert, mock_get_names, temp_db):
+        """Accepted candidates are written batch by batch."""
+        conn, cursor, db_path = temp_db
+        mock_get_names.return_value = set()
+        mock_bulk_upsert.side_effect = lambda bridges, **kw: {'added': len(bridges), 'updated': 0, 'errors': 0}
+        importer = BridgeImporter(ImportConfig(threshold_k1n_de=90.0), db_name=db_path)
+        
+        batches = [[self._de("A", "DE_SET")], [], [self._de("B", "DE_MEMORY"), self._de("C", "DE_MEMORY", 10.0)]]
+        result = importer.import_candidate_stream(batches)
+        
+        assert mock_bulk_upsert.call_count == 2
+        assert result['imported'] == 2
+        assert result['rejected'] == 1
+        assert result['cut_off'] is False
+
+
+class TestCandidateBatch:
+    """Test slotted Candidate and columnar CandidateBatch."""
+    
+    @pytest.mark.skipif(sys.version_info < (3, 10), reason="dataclass slots need Python 3.10+")
+    def test_candidate_is_slotted(self, sample_candidates):
+        assert not hasattr(sample_candidates[0], '__dict__')
+    
+    def test_round_trip_and_dicts(self, sample_candidates):
+        sample_candidates[3].pos1_idx = 12
+        batch = CandidateBatch.from_candidates(sample_candidates)
+        
+        assert len(batch) == 4
+        assert batch.to_dicts() == [c.to_dict() for c in sample_candidates]
+        restored = batch[3]
+        assert restored.name == "Good-LO-Bridge"
+        assert restored.pos1_idx == 12 and restored.pos2_idx is None
+        assert restored.to_dict() == sample_candidates[3].to_dict()
+
+    def test_round_trip_keeps_negative_position(self, sample_candidates):
+        # LO memory bridges use pos1_idx = pos2_idx = -1; it must not become None / NULL
+        sample_candidates[0].pos1_idx = -1
+        sample_candidates[0].pos2_idx = -1
+        batch = CandidateBatch.from_candidates(sample_candidates)
+
+        assert batch[0].pos1_idx == -1 and batch[0].pos2_idx == -1
+        assert batch[1].pos1_idx is None
+        assert batch.to_dicts() == [c.to_dict() for c in sample_candidates]
+        assert batch.take([0]).to_dicts()[0]['pos1_idx'] == -1
+
+    @pytest.mark.parametrize("policy", ["k1n_primary", "k2n_primary", "combined"])
+    @pytest.mark.parametrize("fallback", [True, False])
+    def test_threshold_mask_matches_meets_threshold(self, sample_candidates, policy, fallback):
+        config = ImportConfig(policy_type=policy, fallback_to_k2n=fallback, threshold_k2n_lo=85.0)
+        batch = CandidateBatch.from_candidates(sample_candidates)
+        
+        expected = [config.meets_threshold(c) for c in sample_candidates]
+        assert config.threshold_mask(batch).tolist() == expected
+        assert batch.filter(config).names == [c.name for c, ok in zip(sample_candidates, expected) if ok]
+    
+    def test_sort_by_score(self, sample_candidates):
+        for score, candidate in zip([1.0, 5.0, 1.0, 3.0], sample_candidates):
+            candidate.metadata['ranking_score'] = score
+        batch = CandidateBatch.from_candidates(sample_candidates).sort_by_score()
+        
+        assert batch.names == ["Low-K1N-Bridge", "Good-LO-Bridge", "High-K1N-Bridge", "Missing-K1N-Bridge"]
+    
+    @patch('logic.bridge_importer.get_all_managed_bridge_names')
+    @patch('logic.bridge_importer.bulk_upsert_managed_bridges')
+    def test_importer_accepts_batch(self, mock_bulk_upsert, mock_get_names, sample_candidates, temp_db):
+        conn, cursor, db_path = temp_db
+        mock_get_names.return_value = {"goodlobridge"}
+        mock_bulk_upsert.return_value = {'added': 2, 'updated': 0, 'errors': 0, 'skipped': 0}
+        config = ImportConfig(threshold_k1n_de=90.0, threshold_k1n_lo=85.0, auto_approve=True)
+        importer = BridgeImporter(config, db_name=db_path)
+        
+        result = importer.import_candidates(CandidateBatch.from_candidates(sample_candidates))
+        
+        assert isinstance(result['accepted_list'], CandidateBatch)
+        assert result['accepted_list'].names == ["High-K1N-Bridge", "Missing-K1N-Bridge"]
+        assert result['duplicates'] == 1 and result['rejected'] == 1
+        bridges_arg = mock_bulk_upsert.call_args[0][0]
+        assert [b['name'] for b in bridges_arg] == ["High-K1N-Bridge", "Missing-K1N-Bridge"]
+        assert all(b['is_enabled'] == 1 and b['is_pending'] == 0 for b in bridges_arg)
+
+
 class TestFactoryFunctions:
     """Test factory functions."""
     
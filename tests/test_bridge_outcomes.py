@@ -0,0 +1,164 @@
+# tests/test_bridge_outcomes.py
+"""
+Tests for logic.bridge_outcomes: incremental sync, equality between stored and
+recomputed popup backtests, window metrics and invalidation on bridge edits.
+"""
+
+import sqlite3
+
+import pytest
+
+from benchmarks.generator import build_benchmark_db
+from logic.backtester import run_backtest_lo_30_days
+from logic.bridge_outcomes import (
+    PRED_NONE,
+    decode_prediction,
+    encode_prediction,
+    ensure_bridge_outcomes_tables,
+    fetch_outcome_window,
+    load_bridge_outcomes,
+    load_window_metrics,
+    sync_bridge_outcomes,
+)
+from logic.data_repository import get_all_managed_bridges, load_data_ai_from_db
+from logic.db_manager import delete_ky_from_db
+from logic.de_backtester_core import (
+    calculate_de_bridge_max_lose_history,
+    run_de_bridge_historical_test,
+)
+
+
+@pytest.fixture
+def setup(tmp_path):
+    path = str(tmp_path / "outcomes.db")
+    build_benchmark_db(path, 80, 60, seed=11)
+    history, _ = load_data_ai_from_db(path)
+    return path, history, get_all_managed_bridges(path)
+
+
+def _count(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM BridgeOutcomes").fetchone()[0]
+
+
+def test_incremental_sync_only_adds_new_draws(setup):
+    db_path, history, bridges = setup
+    _, first = sync_bridge_outcomes(history[:-3], db_path, max_days=40)
+    assert first == _count(db_path) > 0
+
+    _, added = sync_bridge_outcomes(history, db_path, max_days=40)
+    lo_pos = [b for b in bridges if b["type"] in ("LO_POS", "DE_POS")]
+    assert 0 < added <= 3 * len(lo_pos)
+
+    # Không có kỳ mới -> không ghi gì; dòng ngoài cửa sổ bị xóa
+    assert sync_bridge_outcomes(history, db_path, max_days=40)[1] == 0
+    with sqlite3.connect(db_path) as conn:
+        oldest = conn.execute("SELECT MIN(ky) FROM BridgeOutcomes").fetchone()[0]
+    assert oldest >= history[-40][0]
+
+
+def test_stored_history_matches_recompute(setup):
+    db_path, history, bridges = setup
+    sync_bridge_outcomes(history, db_path, max_days=40)
+
+    for bridge in bridges:
+        if bridge["type"].startswith("DE_"):
+            assert run_de_bridge_historical_test(bridge, history, 30, db_name=db_path) == \
+                run_de_bridge_historical_test(bridge, history, 30)
+            # Một phần từ bảng, phần cũ hơn tính trực tiếp
+            assert calculate_de_bridge_max_lose_history(bridge, history, db_name=db_path) == \
+                calculate_de_bridge_max_lose_history(bridge, history)
+        else:
+            assert run_backtest_lo_30_days(bridge, history, db_name=db_path) == \
+                run_backtest_lo_30_days(bridge, history)
+
+
+def test_window_queries(setup):
+    db_path, history, bridges = setup
+    sync_bridge_outcomes(history, db_path, max_days=40)
+    bridge = next(b for b in bridges if b["type"] == "LO_POS")
+
+    with sqlite3.connect(db_path) as conn:
+        window = fetch_outcome_window(conn, bridge["id"], 10)
+    assert [ky for ky, _, _ in window] == [row[0] for row in history[-10:]]
+
+    popup = run_backtest_lo_30_days(bridge, history)[-10:]
+    assert [bool(o) for _, o, _ in window] == [r["is_win"] for r in popup]
+
+    metrics = load_window_metrics(db_path, 10)[bridge["id"]]
+    assert metrics["total"] == 10
+    assert metrics["wins"] == sum(r["is_win"] for r in popup)
+    streak = 0
+    for r in reversed(popup):
+        if r["is_win"] != popup[-1]["is_win"]:
+            break
+        streak += 1
+    assert metrics["current_streak"] == (streak if popup[-1]["is_win"] else -streak)
+
+
+def test_edited_bridge_and_deleted_draw_invalidate_rows(setup):
+    db_path, history, bridges = setup
+    sync_bridge_outcomes(history, db_path, max_days=40)
+    bridge = dict(next(b for b in bridges if b["type"] == "LO_POS"))
+    assert load_bridge_outcomes(db_path, bridge)
+
+    moved = dict(bridge, pos2_idx=(bridge["pos2_idx"] + 1) % 214)
+    assert load_bridge_outcomes(db_path, moved) == {}  # Chữ ký khác -> không dùng lịch sử cũ
+    sync_bridge_outcomes(history, db_path, bridges=[moved], max_days=40)
+    assert run_backtest_lo_30_days(moved, history, db_name=db_path) == run_backtest_lo_30_days(moved, history)
+
+    last_ky = history[-1][0]
+    delete_ky_from_db(history[-1][1], db_path)
+    assert last_ky not in load_bridge_outcomes(db_path, moved)
+
+
+@pytest.mark.parametrize("text", [
+    "05-50", "99-00", "Chạm 3,8", "Chạm 0", "Chạm 9,0,1,2,3,4,5,6,7,8", "LOẠI Chạm 4",
+    "Bộ 00", "Bộ 12", "Bộ ?? (07)", "Lỗi: Cầu Bộ thiếu Vị trí 2",
+])
+def test_prediction_code_round_trip(text):
+    code = encode_prediction(text)
+    assert isinstance(code, int) and code >= 0
+    assert decode_prediction(code) == text
+
+
+def test_unknown_prediction_is_recomputed(setup):
+    assert encode_prediction("Chạm x") == encode_prediction(None) == PRED_NONE
+    assert decode_prediction(PRED_NONE) is None
+
+    db_path, history, bridges = setup
+    sync_bridge_outcomes(history, db_path, max_days=40)
+    bridge = next(b for b in bridges if b["type"] == "LO_POS")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE BridgeOutcomes SET prediction = ? WHERE bridge_id = ? AND ky = ?",
+                     (PRED_NONE, bridge["id"], history[-1][0]))
+    assert history[-1][0] not in load_bridge_outcomes(db_path, bridge)
+    assert run_backtest_lo_30_days(bridge, history, db_name=db_path) == run_backtest_lo_30_days(bridge, history)
+
+
+def test_text_prediction_table_is_rebuilt(tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE BridgeOutcomes (bridge_id INTEGER NOT NULL, ky INTEGER NOT NULL, "
+                     "outcome INTEGER NOT NULL, prediction TEXT, PRIMARY KEY (bridge_id, ky)) WITHOUT ROWID")
+        conn.execute("INSERT INTO BridgeOutcomes VALUES (1, 10, 1, '05-50')")
+        ensure_bridge_outcomes_tables(conn)
+        types = {r[1]: r[2] for r in conn.execute("PRAGMA table_info(BridgeOutcomes)")}
+        assert types["prediction"] == "INTEGER"
+        assert conn.execute("SELECT COUNT(*) FROM BridgeOutcomes").fetchone()[0] == 0
+
+
+def test_bridges_without_outcomes_are_not_resynced(setup):
+    db_path, history, _ = setup
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO ManagedBridges (name, description, is_enabled, type, pos1_idx, pos2_idx) VALUES (?, '', 1, ?, ?, ?)",
+            [("LO_MEM_KHONG_DOC_DUOC", "LO_MEM", -1, -1), ("LO_STL_FIXED_TEST", "LO_STL_FIXED", None, None)])
+    updated, written = sync_bridge_outcomes(history, db_path, max_days=40)
+    assert updated > 0 and written > 0
+    assert sync_bridge_outcomes(history, db_path, max_days=40) == (0, 0)
+
+    # Kỳ bị xóa thì được tính lại khi nạp lại
+    delete_ky_from_db(history[-1][1], db_path)
+    assert sync_bridge_outcomes(history, db_path, max_days=40)[0] > 0
+    assert sync_bridge_outcomes(history, db_path, max_days=40) == (0, 0)
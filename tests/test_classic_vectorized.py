@@ -0,0 +1,110 @@
+# tests/test_classic_vectorized.py
+"""
+Equivalence tests: the vectorized 15 classic bridges (classic_stl_codes /
+classic_stl_matrix) must match ALL_15_BRIDGE_FUNCTIONS_V5 on every row.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from logic.backtest.k2n_engine import _positions_matrix, classic_stl_matrix
+from logic.bridges.bridges_classic import (
+    ALL_15_BRIDGE_FUNCTIONS_V5,
+    CLASSIC_POSITION_PLAN,
+    classic_stl_codes,
+    is_standard_row,
+)
+from logic.bridges.bridges_v16 import getAllPositions_V16
+from logic.data_repository import load_data_ai_from_db
+
+
+def _make_history(n_days, seed=11):
+    rng = random.Random(seed)
+
+    def nums(count, width):
+        return ",".join(f"{rng.randrange(10 ** width):0{width}d}" for _ in range(count))
+
+    return [
+        [str(100 + i), "d", nums(1, 5), nums(1, 5), nums(2, 5), nums(6, 5),
+         nums(4, 4), nums(6, 4), nums(3, 3), nums(4, 2)]
+        for i in range(n_days)
+    ]
+
+
+def _broken_history():
+    rows = _make_history(40, seed=5)
+    rows[1] = rows[1][:6]                           # thiếu giải
+    rows[2][9] = ""                                 # thiếu G7
+    rows[3][2] = "1234"                             # GĐB thiếu chữ số
+    rows[4][8] = "123,45"                           # G6 thiếu một số
+    rows[5][9] = "1a,22,33,44"                      # ký tự lạ
+    rows[6][2] = None
+    rows[7] = None
+    rows[8][5] = " 12345, 23456,34567,45678,56789,67890 "  # khoảng trắng vẫn chuẩn
+    rows[9][4] = "123456,12345"                     # số quá dài
+    return rows
+
+
+def _load_db_history():
+    rows, _ = load_data_ai_from_db()
+    if not rows:
+        pytest.skip("Không có CSDL lịch sử thật")
+    return [list(row) for row in rows]
+
+
+def _reference_codes(rows):
+    def code(value):
+        return int(value) if len(value) == 2 and value.isdigit() else -1
+
+    return np.array([[[code(v) for v in func(row)] for func in ALL_15_BRIDGE_FUNCTIONS_V5]
+                     for row in rows], dtype=np.int16).reshape(len(rows), 15, 2)
+
+
+@pytest.fixture(params=["synthetic", "broken", "database"])
+def history(request):
+    if request.param == "database":
+        return _load_db_history()
+    if request.param == "broken":
+        return _broken_history()
+    return _make_history(300)
+
+
+def test_codes_match_row_functions(history):
+    codes = classic_stl_codes(_positions_matrix(history), history)
+    assert codes.shape == (len(history), 15, 2)
+    assert np.array_equal(codes, _reference_codes(history))
+
+
+def test_matrix_matches_row_functions(history):
+    matrix = classic_stl_matrix(history)
+    for i, row in enumerate(history):
+        for j, func in enumerate(ALL_15_BRIDGE_FUNCTIONS_V5):
+            assert matrix.stl_text(i, j) == ",".join(func(row)), (i, j)
+
+
+def test_positions_cube_matches_v16(history):
+    expected = [[-1 if d is None else d for d in getAllPositions_V16(row)] if row else [-1] * 107
+                for row in history]
+    assert np.array_equal(_positions_matrix(history)[:, :107], np.array(expected))
+
+
+def test_standard_rows_need_no_fallback():
+    rows = _make_history(50)
+    assert all(is_standard_row(row) for row in rows)
+    assert np.array_equal(classic_stl_codes(_positions_matrix(rows)), _reference_codes(rows))
+
+
+def test_broken_rows_are_detected():
+    standard = [is_standard_row(row) for row in _broken_history()[:10]]
+    assert standard == [True, False, False, False, False, False, False, False, True, False]
+
+
+def test_position_plan_covers_all_bridges():
+    assert len(CLASSIC_POSITION_PLAN) == len(ALL_15_BRIDGE_FUNCTIONS_V5)
+    assert all(0 <= a < 107 and 0 <= b < 107 for a, b, _ in CLASSIC_POSITION_PLAN)
+
+
+def test_empty_positions():
+    assert classic_stl_codes(np.zeros((0, 214), dtype=np.int8)).shape == (0, 15, 2)
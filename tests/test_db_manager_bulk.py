@@ -7,6 +7,7 @@ Tests:
 - bulk_upsert_managed_bridges()
 - update_managed_bridges_batch()
 - delete_managed_bridges_batch()
+- upsert_managed_bridges_batch() / upsert_bridge_rows() (ON CONFLICT engine)
 - Atomic transactions and rollback behavior
 """
 
@@ -20,7 +21,9 @@ from logic.db_manager import (
     get_all_managed_bridge_names,
     bulk_upsert_managed_bridges,
     update_managed_bridges_batch,
-    delete_managed_bridges_batch
+    delete_managed_bridges_batch,
+    upsert_managed_bridges_batch,
+    upsert_bridge_rows
 )
 
 
@@ -143,6 +146,24 @@ class TestBulkUpsertManagedBridges:
         assert rows[1][0] == 'Bridge-02'
         assert rows[1][2] == 87.3  # k1n_rate_lo
     
+    def test_insert_candidate_batch(self, temp_db_bulk):
+        """Test a columnar CandidateBatch is accepted directly."""
+        from logic.models import Candidate, CandidateBatch
+        conn, cursor, db_path = temp_db_bulk
+        
+        batch = CandidateBatch.from_candidates([
+            Candidate(name='Bridge-01', normalized_name='bridge01', type='de', kind='single', k1n_de=95.5),
+            Candidate(name='Bridge-02', normalized_name='bridge02', type='lo', kind='single', k1n_lo=87.3, pos1_idx=4),
+        ])
+        
+        result = bulk_upsert_managed_bridges(batch, db_path)
+        
+        assert result['added'] == 2
+        cursor.execute("SELECT name, type, k1n_rate_de, k1n_rate_lo, pos1_idx FROM ManagedBridges ORDER BY name")
+        rows = cursor.fetchall()
+        assert rows[0] == ('Bridge-01', 'DE_SINGLE', 95.5, 0.0, None)
+        assert rows[1] == ('Bridge-02', 'LO_SINGLE', 0.0, 87.3, 4)
+    
     def test_update_existing_bridges(self, temp_db_bulk):
         """Test updating existing bridges."""
         conn, cursor, db_path = temp_db_bulk
@@ -395,3 +416,46 @@ class TestAtomicTransactions:
         cursor.execute("SELECT k1n_rate_de FROM ManagedBridges WHERE name='Bridge-01'")
         rate = cursor.fetchone()[0]
         assert rate == 95.0
+
+
+class TestUpsertEngine:
+    """Test the INSERT ... ON CONFLICT upsert engine."""
+    
+    def test_counts_added_and_updated(self, temp_db_bulk):
+        """Added/updated come from total_changes, including repeated names."""
+        conn, cursor, db_path = temp_db_bulk
+        cursor.execute("INSERT INTO ManagedBridges (name) VALUES ('A')")
+        conn.commit()
+        
+        rows = [('A', 'a'), ('B', 'b'), ('C', 'c'), ('B', 'b2')]
+        added, updated = upsert_bridge_rows(conn, ('name', 'description'), rows, chunk_size=2)
+        conn.commit()
+        
+        assert (added, updated) == (2, 2)
+        cursor.execute("SELECT name, description FROM ManagedBridges ORDER BY name")
+        assert cursor.fetchall() == [('A', 'a'), ('B', 'b2'), ('C', 'c')]
+    
+    def test_batch_upsert_preserves_existing_values(self, temp_db_bulk):
+        """Merge semantics match upsert_managed_bridge (keep old values when input is empty)."""
+        conn, cursor, db_path = temp_db_bulk
+        cursor.execute(
+            "INSERT INTO ManagedBridges (name, win_rate_text, search_rate_text, pos1_idx, pos2_idx, search_period) "
+            "VALUES ('LO_POS_A', '70.00%', '65.00%', 3, 4, 30)"
+        )
+        conn.commit()
+        
+        result = upsert_managed_bridges_batch([
+            {'name': 'LO_POS_A', 'description': 'upd', 'type': 'LO_POS'},
+            {'name': 'LO_POS_B', 'description': 'new', 'search_rate_text': '55.00%', 'pos1_idx': 1, 'pos2_idx': 2},
+            {'description': 'no name'},
+        ], db_path)
+        
+        assert result == {'added': 1, 'updated': 1, 'skipped': 1, 'errors': 0}
+        cursor.execute(
+            "SELECT name, description, type, win_rate_text, search_rate_text, pos1_idx, pos2_idx, search_period "
+            "FROM ManagedBridges ORDER BY name"
+        )
+        rows = cursor.fetchall()
+        assert rows[0] == ('LO_POS_A', 'upd', 'LO_POS', '70.00%', '65.00%', 3, 4, 30)
+        # New bridge: N/A win rate is healed from search rate
+        assert rows[1] == ('LO_POS_B', 'new', 'UNKNOWN', '55.00%', '55.00%', 1, 2, 0)
@@ -0,0 +1,113 @@
+# tests/test_de_batch_engine.py
+"""
+Tests for logic.backtest.de_batch_engine: the batch DE backtest must give the
+same logs and max lose streaks as run_de_bridge_historical_test, bridge by
+bridge, for every DE logic (SET / DYNAMIC K / POS_SUM / KILLER / CLASSIC).
+"""
+
+import pytest
+
+from benchmarks.generator import build_benchmark_db
+from logic.backtest.de_batch_engine import (
+    DE_LOSS,
+    DE_PENDING,
+    DE_WIN,
+    de_max_lose_streaks,
+    prepare_de_bridge,
+    run_de_batch,
+)
+from logic.data_repository import get_all_managed_bridges, load_data_ai_from_db
+from logic.de_backtester_core import (
+    calculate_de_bridge_max_lose_history,
+    run_de_bridge_historical_test,
+)
+
+KINDS = [
+    ("DE_SET", "DE_SET_{}"),
+    ("DE_DYNAMIC_K", "DE_DYN_{}_K3"),
+    ("DE_POS_SUM", "DE_POS_{}"),
+    ("DE_KILLER", "DE_KILLER_{}"),
+    ("DE_CLASSIC", "DE_MEM_{}"),
+]
+
+
+@pytest.fixture(scope="module")
+def history_and_bridges(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("de_batch") / "de.db")
+    build_benchmark_db(path, 120, 60, seed=21)
+    history, _ = load_data_ai_from_db(path)
+    base = [b for b in get_all_managed_bridges(path) if b["type"].startswith("DE_")][:4]
+
+    bridges = []
+    for i, bridge in enumerate(base):
+        for bridge_type, name in KINDS:
+            cfg = dict(bridge, type=bridge_type, name=name.format(i))
+            if i == 0:
+                cfg["pos2_idx"] = None  # Cầu 1 vị trí
+            bridges.append(cfg)
+    # pos2_idx = -1 là vị trí cuối với run_de_bridge_historical_test, không phải cầu 1 vị trí
+    bridges.append(dict(base[1], type="DE_DYNAMIC_K", name="DE_DYN_NEG_K3", pos2_idx=-1))
+    bridges.append(dict(base[1], type="DE_SET", name="DE_SET_NEG", pos2_idx=-1))
+    # Cầu không vector hóa được -> chạy từng ngày
+    bridges.append(dict(base[0], name="DE_POS_NAMED", pos1_idx=None, pos1_name="GDB", pos2_name="G1"))
+    bridges.append(dict(base[0], name="DE_POS_OUT", pos1_idx=999))
+    return history, bridges
+
+
+def test_logs_and_max_lose_match_single_bridge_backtest(history_and_bridges):
+    history, bridges = history_and_bridges
+    run = run_de_batch(bridges, history)
+    streaks = run.max_lose_streaks()
+    for j, bridge in enumerate(bridges):
+        assert run.history_log(j, 60) == run_de_bridge_historical_test(bridge, history, days=60), bridge["name"]
+        assert streaks[j] == calculate_de_bridge_max_lose_history(bridge, history), bridge["name"]
+
+
+def test_pending_last_draw(history_and_bridges):
+    history, bridges = history_and_bridges
+    pending = [list(row) for row in history]
+    pending[-1][2] = ""
+    run = run_de_batch(bridges, pending)
+    for j, bridge in enumerate(bridges):
+        assert run.history_log(j, 5) == run_de_bridge_historical_test(bridge, pending, days=5)
+    assert run.history_log(1, 1)[0]["status"] == "Chờ"
+    assert run.outcomes[-1, 1] == DE_PENDING
+
+
+def test_streaks_and_summary(history_and_bridges):
+    history, bridges = history_and_bridges
+    run = run_de_batch(bridges, history, start=len(history) - 30)
+    j = 1
+    done = [o for o in run.outcomes[:, j] if o in (DE_WIN, DE_LOSS)]
+    summary = run.summary(j, log_days=10)
+    assert summary["total_days"] == len(done)
+    assert summary["wins"] == sum(done) == run.win_counts()[j]
+    assert run.win_counts(last_n=5)[j] == sum(done[-5:])
+    last, streak = done[-1], 0
+    for o in reversed(done):
+        if o != last:
+            break
+        streak += 1
+    assert summary["current_streak"] == (streak if last == DE_WIN else -streak)
+    assert len(summary["history_log"]) == 10
+
+
+def test_unsupported_bridges_and_max_lose_map(history_and_bridges):
+    history, bridges = history_and_bridges
+    assert prepare_de_bridge(bridges[-1]) is None
+    assert prepare_de_bridge(dict(bridges[0], is_scanner_result=True)) is None
+
+    with_ids = [dict(b, id=100 + j) for j, b in enumerate(bridges)]
+    result = de_max_lose_streaks(with_ids, history)
+    assert result[100 + len(bridges) - 1] == -1  # Vị trí ngoài ma trận -> FAIL
+    assert all(v >= 0 for k, v in result.items() if k != 100 + len(bridges) - 1)
+
+
+def test_negative_pos2_idx_is_not_single_position(history_and_bridges):
+    history, bridges = history_and_bridges
+    neg = [b for b in bridges if b.get("pos2_idx") == -1]
+    assert neg and all(prepare_de_bridge(b) is None for b in neg)
+    run = run_de_batch(neg, history)
+    for j, bridge in enumerate(neg):
+        assert run.history_log(j, 60) == run_de_bridge_historical_test(bridge, history, days=60)
+        assert run.max_lose_streak(j) == calculate_de_bridge_max_lose_history(bridge, history)
@@ -0,0 +1,115 @@
+# tests/test_de_dashboard_service.py
+"""
+Tests for the precomputed DE dashboard snapshot: built once per (history,
+DE bridge set, settings) key, reloaded from PipelineResults without
+recomputing, and rebuilt in the background when a new draw arrives.
+"""
+
+import sqlite3
+
+import pytest
+
+import services.de_dashboard_service as service
+from benchmarks.generator import build_benchmark_db
+from logic.data_repository import load_data_ai_from_db
+from logic.de_analytics import analyze_market_trends, run_intersection_matrix_analysis
+from services.pipeline_service import STATUS_FAILED, STATUS_OK, STATUS_SKIPPED, PipelineRunner
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "de_dashboard.db")
+    build_benchmark_db(path, 60, 30, seed=9)
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE ManagedBridges SET recent_win_count_10 = 10 WHERE type LIKE 'DE_%' AND id % 2 = 0")
+    service.clear_de_dashboard_cache()
+    yield path
+    service.clear_de_dashboard_cache()
+
+
+@pytest.fixture
+def build_calls(monkeypatch):
+    calls = []
+    original = service.build_de_dashboard_snapshot
+    monkeypatch.setattr(service, "build_de_dashboard_snapshot",
+                        lambda data, db_name: calls.append(len(data)) or original(data, db_name))
+    return calls
+
+
+def test_snapshot_content_and_single_build(db_path, build_calls):
+    history, _ = load_data_ai_from_db(db_path)
+    snapshot = service.get_de_dashboard_snapshot(history, db_path)
+
+    assert snapshot["recent_rows"] == [list(r) for r in history[-30:]]
+    assert snapshot["bridges"] and all(b["recent_win_count_10"] >= 9 and b["is_enabled"] == 1
+                                       for b in snapshot["bridges"])
+    assert snapshot["stats"] == analyze_market_trends(history, n_days=30)
+    assert snapshot["matrix_res"] == run_intersection_matrix_analysis(history)
+
+    # Lần sau: bộ nhớ đệm, rồi bảng PipelineResults (không tính lại)
+    assert service.get_de_dashboard_snapshot(history, db_path) is snapshot
+    service.clear_de_dashboard_cache()
+    assert service.get_de_dashboard_snapshot(history, db_path)["scores"] == snapshot["scores"]
+    assert build_calls == [len(history)]
+
+
+def test_key_follows_history_and_de_bridges(db_path):
+    history, _ = load_data_ai_from_db(db_path)
+    key = service.de_dashboard_key(db_path, history)
+    assert service.de_dashboard_key(db_path, history[:-1]) != key
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE ManagedBridges SET current_streak = current_streak + 1 WHERE type LIKE 'LO_%'")
+    assert service.de_dashboard_key(db_path, history) == key  # Cầu Lô không ảnh hưởng Tab Đề
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE ManagedBridges SET is_enabled = 0 WHERE id = "
+                     "(SELECT MIN(id) FROM ManagedBridges WHERE type LIKE 'DE_%')")
+    assert service.de_dashboard_key(db_path, history) != key
+
+
+def test_background_refresh_on_new_draw(db_path, build_calls):
+    history, _ = load_data_ai_from_db(db_path)
+    service.get_de_dashboard_snapshot(history[:-1], db_path)
+
+    done = []
+    thread = service.refresh_de_dashboard_snapshot_async(db_path, on_done=done.append)
+    assert thread is not None
+    thread.join(timeout=60)
+    assert done and done[0]["recent_rows"][-1] == list(history[-1])
+
+    # Đã khớp -> không dựng lại, tab đọc ngay
+    assert service.refresh_de_dashboard_snapshot_async(db_path) is None
+    assert service.get_de_dashboard_snapshot(history, db_path) is done[0]
+    assert build_calls == [len(history) - 1, len(history)]
+
+
+def test_pipeline_step_stores_snapshot(db_path):
+    report = PipelineRunner(db_path, steps=["de_dashboard"]).run()
+    assert report["de_dashboard"]["status"] == STATUS_OK
+
+    service.clear_de_dashboard_cache()
+    history, _ = load_data_ai_from_db(db_path)
+    assert service.load_de_dashboard_snapshot(db_path, history) is not None
+    assert PipelineRunner(db_path, steps=["de_dashboard"]).run()["de_dashboard"]["status"] == STATUS_SKIPPED
+
+
+def test_partial_failure_is_not_stored(db_path, build_calls, monkeypatch):
+    import logic.bridges.de_bridge_scanner as scanner
+
+    def broken(data):
+        raise RuntimeError("boom")
+
+    original = scanner.run_de_killer_scan
+    monkeypatch.setattr(scanner, "run_de_killer_scan", broken)
+    history, _ = load_data_ai_from_db(db_path)
+    snapshot = service.get_de_dashboard_snapshot(history, db_path)
+    assert snapshot["errors"] and "boom" in snapshot["errors"][0]
+    assert service.load_de_dashboard_snapshot(db_path, history) is None
+    assert PipelineRunner(db_path, steps=["de_dashboard"]).run()["de_dashboard"]["status"] == STATUS_FAILED
+
+    # Hết lỗi -> cùng khóa được dựng lại và lưu
+    monkeypatch.setattr(scanner, "run_de_killer_scan", original)
+    fixed = service.get_de_dashboard_snapshot(history, db_path)
+    assert fixed["errors"] == [] and service.load_de_dashboard_snapshot(db_path, history) is fixed
+    assert len(build_calls) == 3
@@ -0,0 +1,85 @@
+# tests/test_de_history.py
+"""
+Tests for logic.de_history: the shared typed DE history view must agree with
+the per-row helpers (get_gdb_last_2 / de_number_codes), be cached per history
+list, and give the same matrix analysis as the old DataFrame string loops.
+"""
+
+from collections import Counter
+import random
+
+import pandas as pd
+import pytest
+
+from logic.de_analytics import analyze_independent_factors, analyze_market_trends, run_intersection_matrix_analysis
+from logic.de_history import DeHistoryView, get_de_history_view
+from logic.de_utils import de_bo_ids, de_number_codes, get_gdb_last_2
+
+
+def _history(n, seed):
+    rng = random.Random(seed)
+    rows = []
+    for ky in range(n):
+        gdb = f"{rng.randint(0, 99999):05d}"
+        roll = rng.random()
+        if roll < 0.05: gdb = ""
+        elif roll < 0.08: gdb = str(rng.randint(0, 9))
+        elif roll < 0.1: gdb = None
+        elif roll < 0.12: gdb = f"x{rng.randint(0, 99)}"
+        rows.append([ky + 1, f"{ky % 28 + 1:02d}/01/2024", gdb] + ["12345"] * 7)
+    return rows
+
+
+def _legacy_factors(gdb_values):
+    """Các vòng chuỗi df.tail(n)['De'] cũ của analyze_independent_factors (chỉ phần chạm)."""
+    de_vals = []
+    for x in gdb_values[-15:]:
+        d = "".join(filter(str.isdigit, str(x)))
+        if d: de_vals.append(int(d))
+    ct = [k for k, v in Counter([x % 10 for x in de_vals]).most_common(4)]
+    d = "".join(filter(str.isdigit, str(gdb_values[-1])))
+    last = int(d) if d else 0
+    t = (last // 10 + last % 10) % 10
+    return ct, list(set([t, (t + 5) % 10, (t + 1) % 10, (t - 1) % 10]))
+
+
+def test_view_columns_match_row_helpers():
+    rows = _history(300, seed=1)
+    view = DeHistoryView.from_rows(rows)
+    assert len(view) == len(rows)
+    assert view.de_codes.tolist() == de_number_codes(rows).tolist()
+    assert [f"{c:02d}" if c >= 0 else None for c in view.de_codes] == [get_gdb_last_2(r) for r in rows]
+    assert view.bo_ids.tolist() == de_bo_ids(view.de_codes).tolist()
+    valid = view.de_codes >= 0
+    assert (view.head[valid] * 10 + view.tail[valid] == view.de_codes[valid]).all()
+    assert (view.head[~valid] == -1).all()
+    with pytest.raises(ValueError):
+        view.de_codes[0] = 1
+
+
+def test_view_is_shared_per_history_list():
+    rows = _history(50, seed=2)
+    view = get_de_history_view(rows)
+    assert get_de_history_view(rows) is view
+    assert get_de_history_view(view) is view
+    rows.append([51, "01/02/2024", "00077"] + ["12345"] * 7)
+    newer = get_de_history_view(rows)
+    assert newer is not view and newer.de_codes[-1] == 77
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_matrix_analysis_matches_legacy_string_loops(seed):
+    rows = _history(random.Random(seed).randint(1, 80), seed)
+    ct, ctl, bo = analyze_independent_factors(get_de_history_view(rows))
+    assert (ct, ctl) == _legacy_factors([r[2] for r in rows])
+    assert len(bo) == 2
+
+    frame = pd.DataFrame({"De": [r[2] for r in rows]})
+    assert run_intersection_matrix_analysis(rows) == run_intersection_matrix_analysis(frame) \
+        == run_intersection_matrix_analysis(get_de_history_view(rows))
+    assert analyze_market_trends(get_de_history_view(rows), n_days=30) == analyze_market_trends(rows, n_days=30)
+
+
+def test_empty_and_frame_without_de_column():
+    assert analyze_independent_factors(get_de_history_view([])) == ([], [], [])
+    assert analyze_independent_factors(pd.DataFrame({"GDB": ["12345"]})) == ([0, 1, 2, 3], [4, 5, 6, 7], ["00"])
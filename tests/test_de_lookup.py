@@ -0,0 +1,78 @@
+# tests/test_de_lookup.py
+"""
+Tests for logic.de_lookup: the precomputed touch / dàn tables must match the
+original per-call formulas, and hits()/touch_hits() must work on arrays.
+"""
+
+import numpy as np
+import pytest
+
+from logic.de_lookup import (
+    DAN_MASKS,
+    dan_list,
+    dan_mask,
+    dan_of_touches,
+    gdb_code,
+    hits,
+    touch_bits,
+    touch_hits,
+    touch_set,
+)
+from logic.de_utils import check_cham, generate_dan_de_from_touches, get_touches_by_offset
+
+
+def _reference_touches(base, k, logic_type):
+    if logic_type == "TONG":
+        v1, v2 = (base + k) % 10, (base + k + 1) % 10
+        return sorted({v1, (v1 + 5) % 10, v2, (v2 + 5) % 10})
+    v = (base + k) % 10
+    return sorted({v, (v + 5) % 10})
+
+
+def _reference_dan(touches):
+    return [f"{i:02d}" for i in range(100) if i // 10 in touches or i % 10 in touches]
+
+
+@pytest.mark.parametrize("logic_type", ["TONG", "VITRI"])
+def test_tables_match_reference_formulas(logic_type):
+    for base in range(-5, 25):
+        for k in range(-3, 13):
+            touches = _reference_touches(base, k, logic_type)
+            assert get_touches_by_offset(base, k, logic_type) == touches
+            assert list(touch_set(base, k, logic_type)) == touches
+            assert list(dan_list(base, k, logic_type)) == _reference_dan(touches)
+            assert np.flatnonzero(dan_mask(base, k, logic_type)).tolist() == \
+                [int(x) for x in _reference_dan(touches)]
+
+
+def test_generate_dan_keeps_membership_semantics():
+    assert generate_dan_de_from_touches([3, 8]) == _reference_dan([3, 8])
+    assert generate_dan_de_from_touches([]) == []
+    assert generate_dan_de_from_touches(["3", 12, -1]) == []  # Không phải chữ số 0-9
+    assert dan_of_touches((0,)) == tuple(_reference_dan([0]))
+    # Có lọc bộ vẫn đi đường cũ
+    assert set(generate_dan_de_from_touches([1], bo_filter_seeds=[1, 6])) <= set(_reference_dan([1]))
+
+
+def test_hits_on_scalars_and_arrays():
+    mask = dan_mask(2, 0)  # chạm 2, 3, 7, 8
+    assert hits(37, mask) is True
+    assert hits(-1, mask) is False
+    codes = np.array([37, 5, -1, 82])
+    assert hits(codes, mask).tolist() == [True, False, False, True]
+    # Một dàn riêng cho từng kỳ
+    per_day = np.stack([dan_mask(b, 0) for b in (2, 0, 2, 5)])
+    assert hits(codes, per_day).tolist() == [True, True, False, False]
+
+    bits = touch_bits(2, 0)
+    assert touch_hits(codes, bits).tolist() == hits(codes, mask).tolist()
+    for n in range(100):
+        assert touch_hits(n, bits) == check_cham(f"{n:02d}", list(touch_set(2, 0)))
+
+
+def test_tables_are_read_only_and_gdb_code():
+    with pytest.raises(ValueError):
+        DAN_MASKS[0, 0, 0, 0] = True
+    assert gdb_code("07") == 7
+    assert gdb_code(None) == -1
+    assert gdb_code("??") == -1
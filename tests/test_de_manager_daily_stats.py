@@ -0,0 +1,109 @@
+# tests/test_de_manager_daily_stats.py
+"""
+Tests for the incremental DeBridgeManager.update_daily_stats: the 10-slot
+outcome ring must give the same Win10 as replaying the last 10 draws, and a
+new adjacent draw must not replay history.
+"""
+
+import sqlite3
+
+import pytest
+
+import logic.bridges.bridge_manager_de as manager_module
+from benchmarks.generator import build_benchmark_db
+from logic.bridges.bridge_manager_de import DeBridgeManager
+from logic.bridges.bridges_v16 import getAllPositions_V17_Shadow, getPositionName_V17_Shadow
+from logic.data_repository import load_data_ai_from_db
+from logic.de_utils import get_gdb_last_2
+
+POSITION_PAIRS = [(0, 5), (3, 10), (12, 20), (30, 50), (70, 100), (5, 12)]
+
+
+def _safe(idx):
+    return getPositionName_V17_Shadow(idx).replace("[", ".").replace("]", "")
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "de_stats.db")
+    build_benchmark_db(path, 40, 10, seed=4)
+    rows = []
+    for i, (p1, p2) in enumerate(POSITION_PAIRS):
+        rows.append((f"DE_DYN_{_safe(p1)}_{_safe(p2)}_K{i}", "DE_DYNAMIC_K"))
+        rows.append((f"DE_POS_{_safe(p1)}_{_safe(p2)}", "DE_POS_SUM"))
+        rows.append((f"DE_SET_{_safe(p1)}_{_safe(p2)}", "DE_SET"))
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO ManagedBridges (name, description, is_enabled, type, current_streak, recent_win_count_10) "
+            "VALUES (?, 'Cầu Đề', 1, ?, 0, 3)", rows)
+    return path
+
+
+def _reference_wins_10(manager, name, b_type, history):
+    idx1, idx2, k, mode = manager._parse_bridge_id_v2(name, b_type)
+    wins = 0
+    for i in range(len(history) - 10, len(history)):
+        gdb = get_gdb_last_2(history[i])
+        dan = manager._calculate_dan_logic(getAllPositions_V17_Shadow(history[i - 1]), idx1, idx2, k, mode)
+        wins += bool(gdb and gdb in dan)
+    return wins
+
+
+def _rows(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT name, type, recent_win_count_10, recent_ring_10, recent_ring_ky, is_enabled "
+            "FROM ManagedBridges WHERE type LIKE 'DE_%'").fetchall()
+
+
+def test_ring_matches_full_replay_day_by_day(db_path):
+    history, _ = load_data_ai_from_db(db_path)
+    manager = DeBridgeManager()
+    for end in range(len(history) - 4, len(history) + 1):
+        count, active = manager.update_daily_stats(history[:end], db_path)
+        assert count == len(active) > 0
+        for name, b_type, wins_10, ring, ring_ky, enabled in _rows(db_path):
+            if not ring_ky:
+                continue  # Cầu đã bị tắt trước kỳ này
+            if ring_ky == str(history[end - 1][0]):
+                assert len(ring) == 10
+                assert wins_10 == ring.count("1") == _reference_wins_10(manager, name, b_type, history[:end])
+
+
+def test_adjacent_draw_does_not_replay_history(db_path, monkeypatch):
+    history, _ = load_data_ai_from_db(db_path)
+    manager = DeBridgeManager()
+    manager.update_daily_stats(history[:-1], db_path)
+
+    calls = []
+    original = manager_module.getAllPositions_V17_Shadow
+    monkeypatch.setattr(manager_module, "getAllPositions_V17_Shadow", lambda row: calls.append(1) or original(row))
+    manager.update_daily_stats(history, db_path)
+    assert len(calls) == 2  # Chỉ kỳ hôm nay và hôm qua
+
+    # Vòng lệch (ví dụ cầu vừa bật lại) thì dựng lại 10 kỳ một lần cho mọi cầu
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE ManagedBridges SET recent_ring_ky = '' WHERE type LIKE 'DE_%'")
+    calls.clear()
+    manager.update_daily_stats(history, db_path)
+    assert len(calls) == 2 + 10
+
+
+def test_pending_draw_is_not_pushed_into_ring(db_path):
+    history, _ = load_data_ai_from_db(db_path)
+    manager = DeBridgeManager()
+    manager.update_daily_stats(history[:-1], db_path)
+    before = {name: (ring, ring_ky) for name, _, _, ring, ring_ky, _ in _rows(db_path)}
+
+    pending = [list(row) for row in history]
+    pending[-1][2] = ""  # Kỳ mới chưa có GĐB
+    manager.update_daily_stats(pending, db_path)
+    for name, _, _, ring, ring_ky, _ in _rows(db_path):
+        if before[name][1]:
+            assert (ring, ring_ky) == before[name]
+
+    # Kết quả về cho cùng kỳ -> vòng được cập nhật như chưa từng có kỳ chờ
+    manager.update_daily_stats(history, db_path)
+    for name, b_type, wins_10, ring, ring_ky, _ in _rows(db_path):
+        if ring_ky == str(history[-1][0]):
+            assert wins_10 == ring.count("1") == _reference_wins_10(manager, name, b_type, history)
@@ -0,0 +1,134 @@
+# tests/test_de_number_scoring.py
+"""
+Tests for the matrix-based DE number scoring.
+
+calculate_number_scores must give exactly the same ranking as the original
+number-by-number dict updates, while compiled bridges can be re-scored with
+different weights without re-parsing.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from logic.de_analytics import (
+    BO_SO_DICT,
+    DeBridgeMatrix,
+    _bridge_target_numbers,
+    _market_base_scores,
+    calculate_number_scores,
+    compile_de_bridges,
+)
+
+
+def _reference_scores(bridges, market_stats=None):
+    """Cách tính cũ: cộng/trừ điểm từng số trong dict 100 số."""
+    scores = {f"{i:02d}": v for i, v in enumerate(_market_base_scores(market_stats).tolist())}
+    counts = {k: 0 for k in scores}
+    for bridge in bridges:
+        try:
+            streak = float(bridge.get('streak', 0))
+            target_numbers = _bridge_target_numbers(bridge)
+        except Exception:
+            continue
+        if not target_numbers:
+            continue
+        density = (40.0 if len(target_numbers) <= 12 else 3.0) / float(len(target_numbers))
+        abs_score = density * (1.0 + streak * 0.15)
+        is_killer = 'KILLER' in str(bridge.get('type', '')).upper() or \
+            'LOẠI' in str(bridge.get('predicted_value', '')).upper()
+        for num_str in target_numbers:
+            if num_str in scores:
+                if is_killer:
+                    scores[num_str] -= abs_score
+                else:
+                    scores[num_str] += abs_score
+                    counts[num_str] += 1
+    return sorted([(k, v, f"{counts[k]} cầu") for k, v in scores.items()], key=lambda x: x[1], reverse=True)
+
+
+def _random_bridges(n, seed=1):
+    rng = random.Random(seed)
+    bo_keys = list(BO_SO_DICT)
+    bridges = []
+    for _ in range(n):
+        kind = rng.randrange(5)
+        if kind == 0:
+            bridges.append({"type": "DE_SET", "predicted_value": f"Bộ {rng.choice(bo_keys)}",
+                            "streak": rng.randrange(10)})
+        elif kind == 1:
+            bridges.append({"type": "DE_DYNAMIC_K", "predicted_value": f"{rng.randrange(10)},{rng.randrange(10)}",
+                            "streak": rng.random() * 8})
+        elif kind == 2:
+            bridges.append({"type": "DE_KILLER", "predicted_value": f"Loại {rng.randrange(10)}",
+                            "numbers": [f"{rng.randrange(100):02d}" for _ in range(rng.randrange(1, 20))],
+                            "streak": rng.randrange(5)})
+        elif kind == 3:
+            bridges.append({"type": "DE_POS", "streak": rng.randrange(9),
+                            "numbers": [f"{rng.randrange(100):02d}" for _ in range(rng.randrange(1, 30))]})
+        else:
+            bridges.append({"type": "X", "predicted_value": ",".join(str(rng.randrange(100)) for _ in range(5)),
+                            "streak": str(rng.randrange(4))})
+    return bridges
+
+
+MARKET = {"freq_cham": {1: 3, 5: 2, 8: 1}, "gan_cham": {0: 25, 3: 40, 7: 2}}
+
+
+class TestTargetNumbers:
+    def test_set_bridge_uses_bo_members(self):
+        key = next(iter(BO_SO_DICT))
+        numbers = _bridge_target_numbers({"type": "DE_SET", "predicted_value": f"Bộ {key}"})
+        assert numbers == {f"{n:02d}" for n in BO_SO_DICT[key]}
+
+    def test_touch_bridge_covers_both_digits(self):
+        numbers = _bridge_target_numbers({"type": "DE_DYNAMIC_K", "predicted_value": "Chạm 3"})
+        assert len(numbers) == 19 and "30" in numbers and "03" in numbers
+
+    def test_explicit_numbers_win_over_text(self):
+        bridge = {"type": "DE_SET", "predicted_value": "Bộ 00", "numbers": ["12", "21"]}
+        assert _bridge_target_numbers(bridge) == {"12", "21"}
+
+
+class TestCompiledMatrix:
+    def test_masks_and_killer_weights(self):
+        matrix = compile_de_bridges([
+            {"type": "DE_POS", "numbers": ["05", "50"], "streak": 2},
+            {"type": "DE_KILLER", "numbers": ["05"], "streak": 0},
+        ])
+        assert isinstance(matrix, DeBridgeMatrix)
+        assert matrix.masks.shape == (2, 100)
+        assert matrix.masks[0, [5, 50]].all() and matrix.masks[0].sum() == 2
+        assert matrix.weights().tolist() == pytest.approx([20.0 * 1.3, -40.0])
+        assert matrix.bridge_counts()[5] == 1
+
+    def test_invalid_bridges_are_skipped(self):
+        matrix = compile_de_bridges([{"streak": "bad"}, None, {"numbers": [], "streak": 1}])
+        assert len(matrix) == 1
+        assert matrix.weights().tolist() == [0.0]
+
+    def test_reweighting_without_recompiling(self):
+        matrix = compile_de_bridges(_random_bridges(50))
+        base = _market_base_scores(MARKET)
+        plain = matrix.scores(base)
+        boosted = matrix.scores(base, matrix.weights(streak_bonus=0.3))
+        assert not np.allclose(plain, boosted)
+        assert np.allclose(matrix.scores(base, np.zeros(len(matrix))), base)
+
+
+class TestCalculateNumberScores:
+    @pytest.mark.parametrize("seed", [1, 2, 3])
+    def test_matches_reference(self, seed):
+        bridges = _random_bridges(300, seed=seed)
+        assert calculate_number_scores(bridges, MARKET) == _reference_scores(bridges, MARKET)
+
+    def test_accepts_compiled_matrix(self):
+        bridges = _random_bridges(100)
+        assert calculate_number_scores(compile_de_bridges(bridges), MARKET) == \
+            calculate_number_scores(bridges, MARKET)
+
+    def test_empty_input_gives_base_scores(self):
+        result = calculate_number_scores(None)
+        assert len(result) == 100
+        assert all(score == 10.0 and info == "0 cầu" for _, score, info in result)
@@ -0,0 +1,166 @@
+# tests/test_de_scanner_vectorized.py
+"""
+Tests for the vectorized DE scanner engines.
+
+Each engine is checked against a straightforward reference implementation
+of the original per-day / per-pair loops.
+"""
+
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from logic.bridges.de_bridge_scanner import DeBridgeScanner, _pascal_coefficients
+from logic.de_utils import check_cham, get_gdb_last_2
+
+
+def _reference_pascal(digits):
+    """Layer-by-layer reduction (original implementation)."""
+    current_layer = digits
+    while len(current_layer) > 2:
+        current_layer = [(current_layer[i] + current_layer[i + 1]) % 10 for i in range(len(current_layer) - 1)]
+    if len(current_layer) == 2:
+        return (current_layer[0], current_layer[1])
+    return None
+
+
+def _reference_killer_streaks(data, data_matrix, scan_depth, limit_pos=117):
+    """Pair-by-pair, day-by-day walk (original implementation)."""
+    streaks = {}
+    scan_end_idx = len(data)
+    for i in range(limit_pos):
+        for j in range(i, limit_pos):
+            killer_streak = 0
+            for k in range(scan_end_idx - 1, 0, -1):
+                if scan_end_idx - k > scan_depth:
+                    break
+                gdb = get_gdb_last_2(data[k])
+                v1, v2 = data_matrix[k - 1][i], data_matrix[k - 1][j]
+                if not gdb or v1 is None or v2 is None:
+                    break
+                if check_cham(gdb, [(v1 + v2) % 10]):
+                    break
+                killer_streak += 1
+            streaks[(i, j)] = killer_streak
+    return streaks
+
+
+def _make_history(n_days, seed=7):
+    rng = random.Random(seed)
+
+    def nums(count, width):
+        return ",".join(f"{rng.randrange(10 ** width):0{width}d}" for _ in range(count))
+
+    return [
+        (i + 1, str(i + 1), nums(1, 5), nums(1, 5), nums(2, 5), nums(6, 5),
+         nums(4, 4), nums(6, 4), nums(3, 3), nums(4, 2))
+        for i in range(n_days)
+    ]
+
+
+class TestPascalReduction:
+    """Binomial-mod-10 coefficient reduction."""
+
+    @pytest.mark.parametrize("length", [2, 3, 5, 10, 17, 40])
+    def test_matches_layer_reduction(self, length):
+        rng = random.Random(length)
+        scanner = DeBridgeScanner()
+        for _ in range(50):
+            digits = [rng.randrange(10) for _ in range(length)]
+            assert scanner._compute_pascal_reduction(digits) == _reference_pascal(digits)
+
+    def test_short_input_returns_none(self):
+        scanner = DeBridgeScanner()
+        assert scanner._compute_pascal_reduction([]) is None
+        assert scanner._compute_pascal_reduction([7]) is None
+
+    def test_coefficients_are_cached_and_read_only(self):
+        coeffs = _pascal_coefficients(10)
+        assert coeffs is _pascal_coefficients(10)
+        assert coeffs.shape == (2, 10)
+        assert not coeffs.flags.writeable
+
+    def test_batch_handles_mixed_lengths(self):
+        scanner = DeBridgeScanner()
+        rows = [[1, 2, 3, 4, 5], None, [9], [4, 4, 4, 4, 4, 1, 2, 3, 4, 5], [6, 7]]
+        pairs = scanner._compute_pascal_reduction_batch(rows)
+
+        assert pairs.shape == (5, 2)
+        for row, pair in zip(rows, pairs.tolist()):
+            expected = _reference_pascal(row) if row else None
+            assert (tuple(pair) if pair[0] >= 0 else None) == expected
+
+
+class TestMemoryPatternHistograms:
+    """One-pass trigger -> next-day touch histograms."""
+
+    def test_histograms_match_counter(self):
+        data = _make_history(300)
+        scanner = DeBridgeScanner()
+        signals = np.array([scanner._signal_code(row, 2, "GDB_Tail") for row in data[:-1]], dtype=np.int64)
+        tails = scanner._gdb_tail_array(data[1:])
+
+        touch_hist, match_counts, _ = scanner._touch_histograms(signals, tails)
+
+        for signal in range(10):
+            matched = [get_gdb_last_2(data[k + 1]) for k in range(len(data) - 1) if signals[k] == signal]
+            counter = Counter()
+            for gdb in matched:
+                counter[int(gdb[0])] += 1
+                counter[int(gdb[1])] += 1
+            assert match_counts[signal] == len(matched)
+            assert touch_hist[signal].tolist() == [counter[t] for t in range(10)]
+
+    def test_scan_reports_best_touch(self):
+        data = _make_history(200, seed=3)
+        scanner = DeBridgeScanner()
+        scanner.min_memory_confidence = 0.0
+
+        results = scanner._scan_memory_pattern(data)
+
+        assert len(results) == 3
+        for bridge in results:
+            assert bridge["type"] == "DE_MEMORY"
+            assert bridge["predicted_value"].startswith("CHẠM ")
+            assert 0.0 < bridge["win_rate"] <= 200.0
+
+
+class TestKillerEngine:
+    """All-pairs "no touch" matrix with streak pruning and top-k selection."""
+
+    @pytest.mark.parametrize("min_streak", [0, 3, 6])
+    def test_streaks_match_reference(self, min_streak):
+        data = [list(row) for row in _make_history(40, seed=min_streak)]
+        data[-5][3] = ""  # missing G1 breaks every pair using it
+        scanner = DeBridgeScanner()
+        scanner.min_killer_streak = min_streak
+        data_matrix = scanner._preprocess_data(data)
+
+        reference = _reference_killer_streaks(data, data_matrix, scanner.scan_depth)
+        results = scanner._scan_killer_bridges(data, data_matrix)
+
+        expected = sorted(
+            (pair for pair, streak in reference.items() if streak >= min_streak),
+            key=lambda pair: reference[pair], reverse=True
+        )[:scanner.killer_top_k]
+        assert [(b["pos1_idx"], b["pos2_idx"]) for b in results] == expected
+        assert [b["streak"] for b in results] == [reference[p] for p in expected]
+
+    def test_killer_prediction_fields(self):
+        data = _make_history(60, seed=11)
+        scanner = DeBridgeScanner()
+        scanner.min_killer_streak = 2
+
+        results = scanner.scan_killers(data)
+
+        assert 0 < len(results) <= scanner.killer_top_k
+        for bridge in results:
+            touch = int(bridge["predicted_value"].split()[-1])
+            assert bridge["type"] == "DE_KILLER"
+            assert all(str(touch) in number for number in bridge["numbers"])
+            assert len(bridge["numbers"]) == 19
+
+    def test_short_history_returns_empty(self):
+        assert DeBridgeScanner().scan_killers(_make_history(1)) == []
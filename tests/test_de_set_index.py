@@ -0,0 +1,116 @@
+# tests/test_de_set_index.py
+"""
+Tests for the inverse number -> set/touch/sum tables in de_utils and the
+array-based DE market statistics built on them.
+"""
+
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from logic import de_utils
+from logic.de_analytics import analyze_market_trends
+from logic.de_utils import (
+    BO_MASKS,
+    BO_SO_DE,
+    BO_SO_NAMES,
+    CHAM_MASKS,
+    NUMBER_TO_BO_ID,
+    TONG_MASKS,
+    bo_frequency,
+    bo_last_index,
+    cham_last_index,
+    de_number_codes,
+)
+
+
+def _rows(de_values):
+    return [[str(100 + i), "d", de] + [""] * 7 for i, de in enumerate(de_values)]
+
+
+class TestInverseTables:
+    def test_every_number_belongs_to_its_set(self):
+        for bo_id, name in enumerate(BO_SO_NAMES):
+            for num in BO_SO_DE[name]:
+                assert NUMBER_TO_BO_ID[int(num)] == bo_id
+            assert BO_MASKS[bo_id].sum() == len(set(BO_SO_DE[name]))
+        assert (NUMBER_TO_BO_ID >= 0).all()
+
+    @pytest.mark.parametrize("digit", range(10))
+    def test_touch_and_sum_masks(self, digit):
+        cham = {f"{n:02d}" for n in np.flatnonzero(CHAM_MASKS[digit])}
+        tong = {f"{n:02d}" for n in np.flatnonzero(TONG_MASKS[digit])}
+        assert cham == {f"{n:02d}" for n in range(100) if de_utils.check_cham(f"{n:02d}", [digit])}
+        assert tong == {f"{n:02d}" for n in range(100) if de_utils.check_tong(f"{n:02d}", [digit])}
+
+    def test_name_lookups_use_table(self):
+        assert de_utils.get_set_name_of_number("50") == "00"
+        assert de_utils.get_set_name_of_number("7") is None
+        assert de_utils.get_bo_name_by_pair(2, 7) == "22"
+        assert de_utils.get_bo_name_by_pair(12, 3) is None
+
+
+class TestArrayStats:
+    def test_codes_skip_bad_rows(self):
+        codes = de_number_codes(_rows(["12345", "", None, "7", "00099"]))
+        assert codes.tolist() == [45, -1, -1, -1, 99]
+
+    def test_set_frequency_and_last_index(self):
+        rng = random.Random(3)
+        codes = np.array([rng.randrange(-1, 100) for _ in range(200)])
+        names = [BO_SO_NAMES[NUMBER_TO_BO_ID[c]] for c in codes if c >= 0]
+        counter = Counter(names)
+
+        assert bo_frequency(codes).tolist() == [counter.get(name, 0) for name in BO_SO_NAMES]
+        last = bo_last_index(codes)
+        for bo_id, name in enumerate(BO_SO_NAMES):
+            hits = [i for i, c in enumerate(codes) if c >= 0 and NUMBER_TO_BO_ID[c] == bo_id]
+            assert last[bo_id] == (hits[-1] if hits else -1)
+
+    def test_touch_last_index(self):
+        codes = np.array([12, -1, 34, 15])
+        assert cham_last_index(codes).tolist() == [-1, 3, 0, 2, 2, 3, -1, -1, -1, -1]
+
+
+def _reference_market_trends(all_data, n_days):
+    """Cách tính cũ: duyệt 15 bộ cho từng kỳ."""
+    recent = all_data[-n_days:] if len(all_data) > n_days else all_data
+    freq_cham, freq_tong, freq_bo = Counter(), Counter(), Counter()
+    for row in recent:
+        de = de_utils.get_gdb_last_2(row)
+        if de:
+            n1, n2 = int(de[0]), int(de[1])
+            freq_cham[n1] += 1
+            if n1 != n2:
+                freq_cham[n2] += 1
+            freq_tong[(n1 + n2) % 10] += 1
+            freq_bo[de_utils.get_set_name_of_number(de)] += 1
+    total = len(all_data)
+    gan_cham = {i: total for i in range(10)}
+    gan_bo = {bo: total for bo in BO_SO_NAMES}
+    seen = set()
+    for i, row in enumerate(reversed(all_data)):
+        de = de_utils.get_gdb_last_2(row)
+        if de:
+            for key, target in ((int(de[0]), gan_cham), (int(de[1]), gan_cham),
+                                (de_utils.get_set_name_of_number(de), gan_bo)):
+                if (id(target), key) not in seen:
+                    seen.add((id(target), key))
+                    target[key] = i
+    return {"freq_cham": dict(freq_cham), "freq_tong": dict(freq_tong), "freq_bo": dict(freq_bo),
+            "gan_cham": gan_cham, "gan_tong": {}, "gan_bo": gan_bo}
+
+
+@pytest.mark.parametrize("seed,n_rows,n_days", [(1, 40, 30), (2, 500, 30), (3, 12, 30), (4, 300, 0)])
+def test_market_trends_match_reference(seed, n_rows, n_days):
+    rng = random.Random(seed)
+    data = _rows([rng.choice([f"{rng.randrange(100000):05d}"] * 5 + ["", "7"]) for _ in range(n_rows)])
+
+    result = analyze_market_trends(data, n_days=n_days)
+    expected = _reference_market_trends(data, n_days)
+
+    assert result == expected
+    # Thứ tự khóa giữ như Counter (UI duyệt theo thứ tự này)
+    assert [list(result[k]) for k in result] == [list(expected[k]) for k in expected]
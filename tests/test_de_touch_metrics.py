@@ -0,0 +1,91 @@
+# tests/test_de_touch_metrics.py
+"""
+Tests for the bitmask touch-combination (chạm) engine.
+"""
+
+import random
+from itertools import combinations
+
+import numpy as np
+
+from logic.de_analytics import (
+    calculate_top_touch_combinations,
+    compute_touch_metrics,
+    de_touch_day_masks,
+    touch_hit_matrix,
+    touch_mask,
+)
+
+
+def _rows(de_values):
+    return [[str(100 + i), "d", de] + [""] * 7 for i, de in enumerate(de_values)]
+
+
+def _reference_runs(hit_list):
+    """Đếm trúng, chuỗi dài nhất và chuỗi cuối bằng vòng lặp thường."""
+    total = best = current = 0
+    for hit in hit_list:
+        if hit:
+            total += 1
+            current += 1
+            best = max(best, current)
+        else:
+            current = 0
+    return total, best, current
+
+
+def test_day_masks_encode_both_digits():
+    masks = de_touch_day_masks(_rows(["12345", "00011", "", None, "7"]))
+    assert masks.tolist() == [(1 << 4) | (1 << 5), 1 << 1, 0, 0, 0]
+
+
+def test_touch_mask_ignores_out_of_range_digits():
+    assert touch_mask([1, "3", 12]) == (1 << 1) | (1 << 3)
+
+
+def test_hit_matrix_matches_loop_for_all_combos():
+    rng = random.Random(5)
+    day_masks = de_touch_day_masks(_rows([f"{rng.randrange(100000):05d}" for _ in range(80)]))
+    combos = list(combinations(range(10), 4))
+    hits, totals, best, at_end = touch_hit_matrix(day_masks, [touch_mask(c) for c in combos])
+
+    assert hits.shape == (210, 80)
+    for k, combo in enumerate(combos):
+        expected = [bool(int(m) & touch_mask(combo)) for m in day_masks]
+        assert hits[k].tolist() == expected
+        assert (totals[k], best[k], at_end[k]) == _reference_runs(expected)
+
+
+def test_hit_matrix_empty_window():
+    hits, totals, best, at_end = touch_hit_matrix(np.zeros(0, dtype=np.uint16), [touch_mask([1, 2])])
+    assert hits.shape == (1, 0)
+    assert totals.tolist() == best.tolist() == at_end.tolist() == [0]
+
+
+def test_compute_touch_metrics_window_and_streaks():
+    data = _rows(["00012", "00099", "00031", "00041", "00015"])
+    metrics = compute_touch_metrics([1], data, window_n=4, require_consecutive_end_n=3)
+
+    assert metrics["window"] == 4
+    assert metrics["total_count"] == 3
+    assert metrics["max_consecutive"] == 3
+    assert metrics["consecutive_at_end"] == 3
+    assert metrics["covers_last_n_at_end"] is True
+    assert metrics["covers_last_n"] is False
+    assert metrics["rate_percent"] == 75.0
+    assert metrics["occur_kys"] == ["102", "103", "104"]
+
+
+def test_top_combinations_can_use_every_digit():
+    rng = random.Random(2)
+    data = _rows([f"{rng.randrange(100000):05d}" for _ in range(40)])
+
+    default = calculate_top_touch_combinations(data, num_touches=4)
+    every = calculate_top_touch_combinations(data, num_touches=4, top_digit_count=10)
+
+    assert default and every
+    key = ("covers_last_n_at_end", "consecutive_at_end", "total_count")
+    assert [every[0][k] for k in key] >= [default[0][k] for k in key]
+    for item in every:
+        metrics = compute_touch_metrics(item["touches"], data)
+        assert all(item[k] == metrics[k] for k in metrics)
@@ -0,0 +1,141 @@
+# tests/test_instrumentation.py
+"""
+Tests for logic.instrumentation: nested stages, counters, the perf_log table,
+the rolling JSON file, the min-duration filter and the profiling modes.
+"""
+
+import json
+import os
+
+import pytest
+
+from logic import instrumentation
+from logic.config_manager import SETTINGS
+from logic.instrumentation import (
+    PerfRecorder,
+    load_perf_records,
+    perf_count,
+    perf_stage,
+    summarize_stages,
+    timed,
+    write_perf_records,
+)
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    rec = PerfRecorder(db_path=str(tmp_path / "perf.db"), json_path=str(tmp_path / "logs" / "perf.json"))
+    monkeypatch.setattr(instrumentation, "_recorder", rec)
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_ENABLED", True, raising=False)
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_MIN_SECONDS", 0.0, raising=False)
+    monkeypatch.setattr(SETTINGS, "PERF_PROFILE_MODE", "off", raising=False)
+    return rec
+
+
+def test_nested_stages_record_parent_and_counters(recorder):
+    @timed("outer")
+    def outer():
+        perf_count("days_scanned", 10)
+        with perf_stage("inner") as stage:
+            stage.count("bridges_evaluated", 3)
+            perf_count("bridges_evaluated", 2)
+        perf_count("days_scanned", 5)
+
+    outer()
+    records = {r["stage"]: r for r in load_perf_records(recorder.db_path)}
+    assert set(records) == {"outer", "inner"}
+    assert records["inner"]["parent"] == "outer"
+    assert records["outer"]["parent"] is None
+    assert records["outer"]["counters"] == {"days_scanned": 15}
+    assert records["inner"]["counters"] == {"bridges_evaluated": 5}
+    assert records["outer"]["duration_s"] >= records["inner"]["duration_s"]
+
+
+def test_perf_count_without_stage_is_ignored(recorder):
+    perf_count("days_scanned", 3)
+    assert recorder.current() is None
+    assert load_perf_records(recorder.db_path) == []
+
+
+def test_error_status_and_exception_propagates(recorder, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_MIN_SECONDS", 60.0, raising=False)
+    with pytest.raises(ValueError):
+        with perf_stage("boom"):
+            raise ValueError("x")
+    # Lỗi luôn được ghi, kể cả khi ngắn hơn ngưỡng
+    records = load_perf_records(recorder.db_path)
+    assert [(r["stage"], r["status"]) for r in records] == [("boom", "error")]
+    assert recorder.current() is None
+
+
+def test_short_stages_are_skipped(recorder, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_MIN_SECONDS", 60.0, raising=False)
+    with perf_stage("fast"):
+        pass
+    assert load_perf_records(recorder.db_path) == []
+
+
+def test_disabled_setting_records_nothing(recorder, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_ENABLED", False, raising=False)
+    with perf_stage("off") as stage:
+        stage.count("x")
+        perf_count("x")
+    assert load_perf_records(recorder.db_path) == []
+
+
+def test_json_file_is_capped_and_strips_profile(recorder, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "PERF_LOG_JSON_MAX", 3, raising=False)
+    monkeypatch.setattr(SETTINGS, "PERF_PROFILE_MODE", "cprofile", raising=False)
+    for i in range(5):
+        with perf_stage(f"s{i}"):
+            sum(range(1000))
+
+    with open(recorder.json_path, encoding="utf-8") as f:
+        history = json.load(f)
+    assert [r["stage"] for r in history] == ["s2", "s3", "s4"]
+    assert all(r["profile"] is None for r in history)
+    # Profile đầy đủ vẫn nằm trong perf_log
+    assert "function calls" in load_perf_records(recorder.db_path, stage="s4")[0]["profile"]
+
+
+def test_tracemalloc_mode_records_peak_memory(recorder, monkeypatch):
+    monkeypatch.setattr(SETTINGS, "PERF_PROFILE_MODE", "tracemalloc", raising=False)
+    with perf_stage("alloc"):
+        data = bytearray(2 * 1024 * 1024)
+    del data
+    record = load_perf_records(recorder.db_path)[0]
+    assert record["peak_mb"] >= 2.0
+    assert record["profile"] is None
+
+
+def test_load_filters_and_summarize(tmp_path):
+    db_path = str(tmp_path / "perf.db")
+    base = {"parent": None, "peak_mb": None, "profile": None}
+    write_perf_records(db_path, [
+        dict(base, started_at="2000-01-01T00:00:00", stage="old", duration_s=9.0, status="ok", counters={}),
+        dict(base, started_at="2999-01-01T00:00:00", stage="scan", duration_s=1.0, status="ok",
+             counters={"days_scanned": 10}),
+        dict(base, started_at="2999-01-02T00:00:00", stage="scan", duration_s=3.0, status="error",
+             counters={"days_scanned": 5}),
+        dict(base, started_at="2999-01-01T00:00:00", stage="db", duration_s=0.5, status="ok", counters={}),
+    ])
+
+    recent = load_perf_records(db_path, since_days=7)
+    assert {r["stage"] for r in recent} == {"scan", "db"}
+    assert recent[0]["started_at"] == "2999-01-02T00:00:00"
+    assert len(load_perf_records(db_path, limit=2)) == 2
+
+    summary = summarize_stages(recent)
+    assert [s["stage"] for s in summary] == ["scan", "db"]
+    scan = summary[0]
+    assert (scan["runs"], scan["total_s"], scan["avg_s"], scan["max_s"]) == (2, 4.0, 2.0, 3.0)
+    assert scan["last_s"] == 3.0 and scan["errors"] == 1
+    assert scan["counters"] == {"days_scanned": 15}
+
+
+def test_json_path_does_not_depend_on_cwd():
+    from logic.db_manager import DB_NAME
+
+    assert os.path.isabs(instrumentation.PERF_JSON_FILE)
+    project_root = os.path.dirname(os.path.dirname(DB_NAME))
+    assert instrumentation.PERF_JSON_FILE == os.path.join(project_root, "logs", "perf_log.json")
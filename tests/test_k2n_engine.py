@@ -0,0 +1,180 @@
+# tests/test_k2n_engine.py
+"""
+Tests for the batched K2N engine.
+
+The engine is checked against a straightforward per-bridge, per-day
+reference of the original K2N frame logic.
+"""
+
+import random
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from logic import backtester_core as core
+from logic.backtest.k2n_engine import (
+    PRED_ERROR,
+    PRED_NONE,
+    PRED_OK,
+    classic_stl_matrix,
+    loto_presence,
+    managed_stl_matrix,
+    run_k2n,
+)
+from logic.backtest.result import decode_stl
+from logic.bridges.bridges_classic import ALL_15_BRIDGE_FUNCTIONS_V5, getAllLoto_V30
+from logic.bridges.bridges_memory import get_27_loto_names, get_27_loto_positions
+from logic.bridges.bridges_v16 import getAllPositions_V17_Shadow
+
+
+def _make_history(n_days, seed=3):
+    rng = random.Random(seed)
+
+    def nums(count, width):
+        return ",".join(f"{rng.randrange(10 ** width):0{width}d}" for _ in range(count))
+
+    return [
+        [str(100 + i), "d", nums(1, 5), nums(1, 5), nums(2, 5), nums(6, 5),
+         nums(4, 4), nums(6, 4), nums(3, 3), nums(4, 2)]
+        for i in range(n_days)
+    ]
+
+
+def _random_bridges(n, seed=1):
+    rng = random.Random(seed)
+    names = get_27_loto_names()
+    bridges = [{"name": f"V17_{i}", "pos1_idx": rng.randrange(214), "pos2_idx": rng.randrange(214)}
+               for i in range(n)]
+    bridges += [
+        {"name": f"LO_MEM_SUM_{names[1]}_{names[7]}", "pos1_idx": -1, "pos2_idx": -1},
+        {"name": f"LO_MEM_DIFF_{names[20]}_{names[2]}", "pos1_idx": -1, "pos2_idx": -1},
+        {"name": "LO_STL_FIXED_07", "pos1_idx": 0, "pos2_idx": 0},
+        {"name": "Hiệu(40-1)", "pos1_idx": -1, "pos2_idx": -1},
+        {"name": "NO_POS", "pos1_idx": None, "pos2_idx": None},
+    ]
+    return bridges
+
+
+def _reference_k2n(bridges, data):
+    """Cầu-theo-cầu, ngày-theo-ngày (cài đặt gốc)."""
+    n = len(bridges)
+    in_frame, pending = [False] * n, [None] * n
+    wins, streak, lose, max_lose = [0] * n, [0] * n, [0] * n, [0] * n
+    for d in range(1, len(data)):
+        prev, lotos = data[d - 1], set(getAllLoto_V30(data[d]))
+        positions, prev_lotos = getAllPositions_V17_Shadow(prev), get_27_loto_positions(prev)
+        for j, bridge in enumerate(bridges):
+            if in_frame[j]:
+                hit = pending[j][0] in lotos or pending[j][1] in lotos
+                if hit:
+                    wins[j] += 1; streak[j] += 1; lose[j] = 0
+                else:
+                    streak[j] = 0; lose[j] += 1; max_lose[j] = max(max_lose[j], lose[j])
+                in_frame[j], pending[j] = False, None
+                continue
+            try:
+                pred = core._managed_bridge_stl(bridge, prev, positions, prev_lotos)
+            except Exception:
+                continue
+            if not pred:
+                continue
+            if pred[0] in lotos or pred[1] in lotos:
+                wins[j] += 1; streak[j] += 1; lose[j] = 0
+            else:
+                in_frame[j], pending[j] = True, pred
+    return wins, streak, max_lose, in_frame
+
+
+class TestStlMatrices:
+    def test_managed_matrix_matches_bridge_helper(self):
+        data = _make_history(40)
+        bridges = _random_bridges(30)
+        matrix = managed_stl_matrix(bridges, data)
+
+        for i, row in enumerate(data):
+            positions, lotos = getAllPositions_V17_Shadow(row), get_27_loto_positions(row)
+            for j, bridge in enumerate(bridges):
+                try:
+                    pred = core._managed_bridge_stl(bridge, row, positions, lotos)
+                except Exception:
+                    assert matrix.flags[i, j] == PRED_ERROR
+                    continue
+                if not pred:
+                    assert matrix.flags[i, j] == PRED_NONE
+                else:
+                    assert matrix.flags[i, j] == PRED_OK
+                    assert matrix.stl_text(i, j) == ",".join(pred)
+
+    def test_classic_matrix_matches_functions(self):
+        data = _make_history(20)
+        matrix = classic_stl_matrix(data)
+        for i, row in enumerate(data):
+            for j, func in enumerate(ALL_15_BRIDGE_FUNCTIONS_V5):
+                assert decode_stl(int(matrix.codes[i, j])) == ",".join(func(row))
+
+    def test_classic_matrix_records_exceptions(self):
+        def broken(row):
+            raise ValueError("boom")
+
+        functions = list(ALL_15_BRIDGE_FUNCTIONS_V5)
+        functions[2] = broken
+        with patch("logic.backtest.k2n_engine.ALL_15_BRIDGE_FUNCTIONS_V5", functions):
+            matrix = classic_stl_matrix(_make_history(3))
+        assert (matrix.flags[:, 2] == PRED_ERROR).all()
+        assert matrix.errors[(0, 2)] == "boom"
+
+
+class TestRunK2N:
+    @pytest.mark.parametrize("seed", [1, 2])
+    def test_matches_reference(self, seed):
+        data = _make_history(120, seed=seed)
+        bridges = _random_bridges(60, seed=seed)
+        matrix = managed_stl_matrix(bridges, data)
+        days = len(data) - 1
+
+        run = run_k2n(matrix, np.arange(days), loto_presence(data[1:]), np.ones(days, dtype=bool))
+        wins, streak, max_lose, in_frame = _reference_k2n(bridges, data)
+
+        assert run.win_counts.tolist() == wins
+        assert run.current_streak.tolist() == streak
+        assert run.max_lose_streak.tolist() == max_lose
+        assert run.in_frame.tolist() == in_frame
+
+    def test_invalid_days_keep_state(self):
+        data = _make_history(30)
+        matrix = classic_stl_matrix(data)
+        days = len(data) - 1
+        valid = np.ones(days, dtype=bool)
+        valid[5:10] = False
+
+        run = run_k2n(matrix, np.arange(days), loto_presence(data[1:]), valid)
+
+        assert (run.outcomes[5:10] == 0).all()
+        assert run.win_counts.sum() == np.isin(run.outcomes, (1, 2)).sum()
+
+    def test_abort_row_stops_later_bridges(self):
+        data = _make_history(10)
+        matrix = classic_stl_matrix(data)
+        matrix.put_error(0, 4, "boom")  # ngày đầu: chưa cầu nào trong khung
+        days = len(data) - 1
+
+        run = run_k2n(matrix, np.arange(days), loto_presence(data[1:]), np.ones(days, dtype=bool),
+                      abort_row_on_error=True)
+
+        assert run.row_abort == {0: (0, 4)}
+        assert (run.outcomes[0, 4:] == 0).all()
+        assert (run.outcomes[0, :4] != 0).all()
+
+
+class TestBacktestIntegration:
+    def test_managed_k2n_uses_engine(self):
+        data = _make_history(80)
+        bridges = _random_bridges(20)
+        with patch.object(core, "get_all_managed_bridges", lambda db, only_enabled=True: bridges):
+            result = core.BACKTEST_MANAGED_BRIDGES_K2N(data, 2, len(data) + 1, "x", as_result=True)
+        wins, streak, max_lose, in_frame = _reference_k2n(bridges, data)
+
+        assert result.win_counts.tolist() == wins
+        assert result.max_lose_streak.tolist() == max_lose
+        assert [s == 2 for s in result.pending_state.tolist()] == in_frame
@@ -0,0 +1,52 @@
+# tests/test_lazy_imports.py
+"""
+Tests for logic.lazy_imports: heavy libraries load only on first use, and
+the startup import report parses `python -X importtime` output.
+"""
+
+import sys
+
+from logic.lazy_imports import (
+    format_import_report,
+    lazy_import,
+    lazy_import_costs,
+    loaded_heavy_modules,
+    measure_import_costs,
+    parse_importtime,
+)
+
+
+def test_proxy_imports_on_first_attribute(tmp_path, monkeypatch):
+    (tmp_path / "lazy_probe_mod.py").write_text("VALUE = 42\n", encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "lazy_probe_mod", raising=False)
+
+    proxy = lazy_import("lazy_probe_mod")
+    assert lazy_import("lazy_probe_mod") is proxy
+    assert not proxy.is_loaded and "lazy_probe_mod" not in sys.modules
+    assert proxy.VALUE == 42
+    assert proxy.is_loaded and "lazy_probe_mod" in lazy_import_costs()
+    monkeypatch.delitem(sys.modules, "lazy_probe_mod")
+
+
+def test_parse_and_format_report():
+    text = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       500 |        500 |     numpy.core\n"
+        "import time:      2000 |     900000 |   pandas\n"
+        "import time:      3000 |    1000000 | main_app\n"
+    )
+    entries = parse_importtime(text)
+    assert [(e["module"], e["depth"]) for e in entries] == [("numpy.core", 2), ("pandas", 1), ("main_app", 0)]
+    assert entries[-1]["cumulative_s"] == 1.0
+    report = format_import_report(entries, top=2)
+    assert "Tổng thời gian import: 1.000s" in report
+    assert "pandas (0.900s)" in report
+    assert loaded_heavy_modules({e["module"] for e in entries}) == ["pandas"]
+
+
+def test_app_modules_do_not_load_heavy_libraries():
+    entries = measure_import_costs(["lottery_service", "logic.ml_model", "logic.meta_learner", "services"])
+    modules = {e["module"] for e in entries}
+    assert "logic.ml_model" in modules
+    assert loaded_heavy_modules(modules) == []
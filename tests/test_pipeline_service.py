@@ -0,0 +1,182 @@
+# tests/test_pipeline_service.py
+"""
+Tests for the headless pipeline runner: DAG ordering, failure blocking,
+parallel steps, checkpoints/resume and the precomputed dashboard store.
+"""
+
+import threading
+
+import pytest
+
+from benchmarks.generator import build_benchmark_db
+from logic.data_repository import load_data_ai_from_db
+from services.pipeline_service import (
+    STATUS_BLOCKED,
+    STATUS_FAILED,
+    STATUS_OK,
+    STATUS_RESUMED,
+    STATUS_SKIPPED,
+    PipelineRunner,
+    PipelineStep,
+    StepSkipped,
+    history_fingerprint,
+    load_checkpoints,
+    load_dashboard_snapshot,
+    load_result,
+    main,
+    save_result,
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "pipeline.db")
+    build_benchmark_db(path, 40, 20, seed=7)
+    return path
+
+
+def _registry(calls, **overrides):
+    def make(name):
+        def func(ctx):
+            calls.append(name)
+            return f"{name} xong ({len(ctx.history)} kỳ)"
+        return overrides.get(name, func)
+
+    return {
+        "a": PipelineStep("a", make("a")),
+        "b": PipelineStep("b", make("b"), deps=("a",)),
+        "c": PipelineStep("c", make("c"), deps=("a",)),
+        "d": PipelineStep("d", make("d"), deps=("b", "c")),
+    }
+
+
+def test_fingerprint_tracks_new_and_edited_draws():
+    rows = [[1, "1", "12345"], [2, "2", "67890"]]
+    base = history_fingerprint(rows)
+    assert history_fingerprint([list(r) for r in rows]) == base
+    assert history_fingerprint(rows + [[3, "3", "11111"]]) != base
+    assert history_fingerprint([rows[0], [2, "2", "67891"]]) != base
+    assert history_fingerprint([]) == "0"
+
+
+def test_result_store_round_trip(db_path):
+    save_result(db_path, "dashboard", "fp1", {"top_scores": [("01-10", 9.5)]})
+    assert load_result(db_path, "dashboard", "fp1") == {"top_scores": [("01-10", 9.5)]}
+    assert load_result(db_path, "dashboard", "other") is None
+    assert load_result(db_path, "missing") is None
+
+
+def test_runs_in_dag_order_and_loads_history_once(db_path, monkeypatch):
+    import logic.data_repository as repo
+    loads = []
+    original = repo.load_data_ai_from_db
+    monkeypatch.setattr(repo, "load_data_ai_from_db", lambda db: loads.append(db) or original(db))
+
+    calls = []
+    report = PipelineRunner(db_path, steps=["d", "b", "c", "a"], registry=_registry(calls)).run()
+    assert calls == ["a", "b", "c", "d"]
+    assert list(report) == ["a", "b", "c", "d"]
+    assert all(item["status"] == STATUS_OK for item in report.values())
+    assert report["a"]["summary"] == "a xong (40 kỳ)"
+    assert loads == [db_path]
+
+
+def test_failure_blocks_dependents_only(db_path):
+    calls = []
+
+    def boom(ctx):
+        raise RuntimeError("hỏng")
+
+    def nothing(ctx):
+        raise StepSkipped("không có việc")
+
+    report = PipelineRunner(db_path, registry=_registry(calls, b=boom, c=nothing)).run()
+    assert report["b"]["status"] == STATUS_FAILED and "hỏng" in report["b"]["summary"]
+    assert report["c"]["status"] == STATUS_SKIPPED
+    assert report["d"]["status"] == STATUS_BLOCKED
+    assert calls == ["a"]
+    assert load_checkpoints(db_path)["b"]["status"] == STATUS_FAILED
+
+
+def test_independent_steps_run_in_parallel(db_path):
+    barrier = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def meet(ctx):
+        barrier.wait()  # Chỉ qua được khi b và c chạy cùng lúc
+        return "ok"
+
+    report = PipelineRunner(db_path, jobs=2, registry=_registry(calls, b=meet, c=meet)).run()
+    assert [report[n]["status"] for n in "abcd"] == [STATUS_OK] * 4
+
+
+def test_resume_skips_steps_done_on_same_history(db_path):
+    calls = []
+    PipelineRunner(db_path, registry=_registry(calls)).run()
+    assert calls == ["a", "b", "c", "d"]
+
+    calls.clear()
+    report = PipelineRunner(db_path, resume=True, registry=_registry(calls)).run()
+    assert calls == []
+    assert report["d"] == {"status": STATUS_RESUMED, "duration_s": 0.0, "summary": "d xong (40 kỳ)"}
+
+    # Lịch sử đổi (kỳ mới) -> chạy lại
+    build_benchmark_db(db_path, 41, 20, seed=7)
+    report = PipelineRunner(db_path, resume=True, registry=_registry(calls)).run()
+    assert calls == ["a", "b", "c", "d"]
+
+
+def test_invalid_plans_are_rejected(db_path):
+    with pytest.raises(ValueError):
+        PipelineRunner(db_path, steps=["a", "nope"], registry=_registry([]))
+    cyclic = {"x": PipelineStep("x", lambda ctx: "", deps=("y",)),
+              "y": PipelineStep("y", lambda ctx: "", deps=("x",))}
+    with pytest.raises(ValueError):
+        PipelineRunner(db_path, registry=cyclic).run()
+
+
+def test_real_steps_precompute_dashboard(db_path):
+    report = PipelineRunner(db_path, steps=["append", "backtest", "dashboard"]).run()
+    assert report["append"]["status"] == STATUS_SKIPPED
+    assert report["backtest"]["status"] == STATUS_OK
+    assert report["dashboard"]["status"] == STATUS_OK
+
+    history, _ = load_data_ai_from_db(db_path)
+    snapshot = load_dashboard_snapshot(db_path, history)
+    assert snapshot["next_ky"] == f"Kỳ {history[-1][0] + 1}"
+    assert load_dashboard_snapshot(db_path, history[:-1]) is None
+
+
+def test_main_exit_code(db_path, monkeypatch):
+    monkeypatch.setattr("services.pipeline_service.PIPELINE_STEPS", _registry([], b=lambda ctx: 1 / 0))
+    assert main(["--db", db_path, "--steps", "a,c"]) == 0
+    assert main(["--db", db_path, "--skip", "d"]) == 1
+
+
+def test_db_writers_never_overlap(db_path):
+    active, overlaps = [], []
+
+    def writer(name):
+        def func(ctx):
+            active.append(name)
+            overlaps.append(len(active))
+            threading.Event().wait(0.05)
+            active.remove(name)
+            return "ok"
+        return func
+
+    registry = _registry([])
+    registry["b"] = PipelineStep("b", writer("b"), deps=("a",), writes_db=True)
+    registry["c"] = PipelineStep("c", writer("c"), deps=("a",), writes_db=True)
+    report = PipelineRunner(db_path, jobs=2, registry=registry).run()
+    assert [report[n]["status"] for n in "abcd"] == [STATUS_OK] * 4
+    assert overlaps == [1, 1]
+
+
+def test_report_column_fits_longest_step(db_path, monkeypatch, capsys):
+    registry = {"a": PipelineStep("a", lambda ctx: "ok"),
+                "de_dashboard_long": PipelineStep("de_dashboard_long", lambda ctx: "ok")}
+    monkeypatch.setattr("services.pipeline_service.PIPELINE_STEPS", registry)
+    assert main(["--db", db_path]) == 0
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith(("a ", "de_dashboard_long"))]
+    assert len(lines) == 2 and lines[0].index("ok") == lines[1].index("ok")
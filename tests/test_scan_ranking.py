@@ -0,0 +1,98 @@
+# tests/test_scan_ranking.py
+"""
+Tests for scan-result post-processing: per-strategy top-k quota selection must
+match the old filter + stable sort + slice, and the normalized bridge name is
+memoized and stored once in ManagedBridges.normalized_name (UNIQUE).
+"""
+
+import random
+import sqlite3
+
+import pytest
+
+from logic.bridges.de_bridge_scanner import STRATEGY_CONFIG, DeBridgeScanner
+from logic.common_utils import _normalize_bridge_name_cached, normalize_bridge_name
+from logic.db_manager import (
+    get_all_managed_bridge_names,
+    load_rates_cache,
+    setup_database,
+    upsert_bridge_rows,
+    upsert_managed_bridges_batch,
+)
+
+
+def _legacy_process(bridges, config):
+    """Bộ lọc + sort + quota cũ của _process_strategy_results."""
+    filtered = [b for b in bridges
+                if b['win_rate'] >= config["min_win_rate"] and b['streak'] >= config["min_streak"]]
+    for b in filtered:
+        b['strategy_score'] = b['streak'] * config["streak_weight"] + int((b['win_rate'] / 100.0) * 10)
+    filtered.sort(key=lambda x: x['strategy_score'], reverse=True)
+    return filtered[:config["quota"]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_quota_selection_matches_stable_sort(seed):
+    rng = random.Random(seed)
+    bridges = [{"name": f"b{i}", "streak": rng.randint(0, 15),
+                "win_rate": rng.choice([rng.randint(0, 10) * 10.0, rng.uniform(0, 100)])}
+               for i in range(rng.choice([0, 3, 80, 400]))]
+    scanner = DeBridgeScanner()
+    for strategy_type, config in STRATEGY_CONFIG.items():
+        expected = _legacy_process([dict(b) for b in bridges], config)
+        result = scanner._process_strategy_results([dict(b) for b in bridges], strategy_type)
+        assert [(b["name"], b["strategy_score"]) for b in result] == \
+            [(b["name"], b["strategy_score"]) for b in expected]
+
+
+def test_normalize_bridge_name_is_memoized():
+    _normalize_bridge_name_cached.cache_clear()
+    assert normalize_bridge_name("Cầu Đề-01") == normalize_bridge_name("Cầu Đề-01") == "caude01"
+    assert _normalize_bridge_name_cached.cache_info().hits == 1
+    assert normalize_bridge_name(None) == "" and normalize_bridge_name(12) == "12"
+
+
+def test_normalized_name_column_backfill_and_duplicates(tmp_path):
+    path = str(tmp_path / "names.db")
+    conn, _ = setup_database(path)
+    # Cầu cũ (ghi trực tiếp, chưa có normalized_name), 2 tên trùng sau chuẩn hóa
+    conn.executemany("INSERT INTO ManagedBridges (name, k1n_rate_de) VALUES (?, ?)",
+                     [("Cầu Đề 01", 80.0), ("cau-de-01", 60.0), ("LO_POS_A", 0.0)])
+    conn.commit()
+    conn.close()
+
+    conn, _ = setup_database(path)  # Migration điền cột
+    stored = dict(conn.execute("SELECT name, normalized_name FROM ManagedBridges"))
+    assert stored == {"Cầu Đề 01": "caude01", "cau-de-01": None, "LO_POS_A": "loposa"}
+    indexes = {row[1]: row[2] for row in conn.execute("PRAGMA index_list(ManagedBridges)")}
+    assert indexes["idx_bridges_normalized_name"] == 1
+    conn.close()
+
+    # Upsert ghi tên chuẩn hóa cùng câu INSERT; tên trùng cách viết không làm hỏng lô
+    stats = upsert_managed_bridges_batch([{"name": "LO-POS-A"}, {"name": "Cầu Mới"}], path)
+    assert (stats["added"], stats["errors"]) == (2, 0)
+    with sqlite3.connect(path) as conn:
+        stored = dict(conn.execute("SELECT name, normalized_name FROM ManagedBridges"))
+    assert stored["Cầu Mới"] == "caumoi" and stored["LO-POS-A"] is None
+
+    assert get_all_managed_bridge_names(path) == {"caude01", "loposa", "caumoi"}
+    assert load_rates_cache(path)["caude01"]["k1n_rate_de"] == 60.0  # Như trước: cầu sau ghi đè
+
+
+def test_upsert_only_reads_incoming_normalized_names(tmp_path):
+    conn, _ = setup_database(str(tmp_path / "upsert.db"))
+    upsert_bridge_rows(conn, ("name",), [(f"LO_POS_{i}",) for i in range(50)])
+    conn.commit()
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    for name in ("Cầu Mới", "LO-POS-1"):
+        upsert_bridge_rows(conn, ("name",), [(name,)])
+    conn.set_trace_callback(None)
+
+    owner_reads = [sql for sql in statements if "SELECT normalized_name, name" in sql]
+    assert len(owner_reads) == 2 and all("IN (" in sql for sql in owner_reads)
+    assert not any("table_info" in sql for sql in statements)  # Đã biết cột từ lần gọi đầu
+    stored = dict(conn.execute("SELECT name, normalized_name FROM ManagedBridges WHERE name IN ('Cầu Mới', 'LO-POS-1')"))
+    assert stored == {"Cầu Mới": "caumoi", "LO-POS-1": None}  # LO_POS_1 đã giữ khóa
+    conn.close()
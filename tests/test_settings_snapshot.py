@@ -0,0 +1,81 @@
+# tests/test_settings_snapshot.py
+"""
+Tests for SETTINGS.snapshot(): snapshots are immutable and hashable,
+with_overrides() builds a new scenario without touching the original or the
+global SETTINGS, and the scorers take the snapshot explicitly instead of
+reading (or setattr-ing) the global object.
+"""
+
+import pickle
+
+import pytest
+
+from logic.analytics.dashboard_scorer import calculate_score_from_features, get_top_scored_pairs
+from logic.config_manager import SETTINGS, SettingsSnapshot, resolve_settings
+
+
+def test_snapshot_is_immutable_and_hashable():
+    snap = SETTINGS.snapshot()
+    assert isinstance(snap, SettingsSnapshot)
+    assert snap.GAN_DAYS == SETTINGS.GAN_DAYS
+    with pytest.raises(AttributeError):
+        snap.GAN_DAYS = 99
+    with pytest.raises(AttributeError):
+        del snap.GAN_DAYS
+    assert snap == SETTINGS.snapshot()
+    assert hash(snap) == hash(SETTINGS.snapshot())
+    assert len({snap, SETTINGS.snapshot()}) == 1
+    assert snap.snapshot() is snap
+    assert resolve_settings(snap) is snap
+
+
+def test_with_overrides_leaves_original_and_global_untouched():
+    base = SETTINGS.snapshot()
+    gan_days = SETTINGS.GAN_DAYS
+    scenario = base.with_overrides({"GAN_DAYS": gan_days + 7}, AI_SCORE_WEIGHT=0.9)
+    assert scenario.GAN_DAYS == gan_days + 7 and scenario.AI_SCORE_WEIGHT == 0.9
+    assert base.GAN_DAYS == gan_days and SETTINGS.GAN_DAYS == gan_days
+    assert scenario != base and scenario.fingerprint != base.fingerprint
+    assert base.with_overrides({"GAN_DAYS": gan_days}) is base
+    assert base.with_overrides() is base
+
+
+def test_nested_values_are_copied():
+    base = SETTINGS.snapshot()
+    name, value = next((k, v) for k, v in base.get_all_settings().items() if isinstance(v, dict))
+    value["__probe__"] = 1
+    base.get_all_settings()[name]["__probe__"] = 1
+    assert "__probe__" not in getattr(base, name)
+    assert "__probe__" not in SETTINGS.get_all_settings()[name]
+
+
+def test_snapshot_survives_pickle():
+    scenario = SETTINGS.snapshot().with_overrides(K2N_RISK_PENALTY_PER_FRAME=2.5)
+    restored = pickle.loads(pickle.dumps(scenario))
+    assert restored == scenario and hash(restored) == hash(scenario)
+    assert restored.K2N_RISK_PENALTY_PER_FRAME == 2.5
+
+
+def _features(max_lose):
+    return {
+        "stats_n_day": [], "consensus": [("05-50", 4, "")], "high_win": [],
+        "pending_k2n": {"C1": {"stl": "05,50", "max_lose": max_lose}},
+        "gan_stats": [], "top_memory": [], "ai_predictions": [], "recent_data": None,
+    }
+
+
+def test_scorer_honours_snapshot_overrides_without_mutating_settings():
+    before = SETTINGS.get_all_settings()
+    fixed = SETTINGS.snapshot().with_overrides(
+        K2N_RISK_PROGRESSIVE=False, K2N_RISK_START_THRESHOLD=4, K2N_RISK_PENALTY_PER_FRAME=0.0)
+    penalised = fixed.with_overrides(K2N_RISK_PENALTY_PER_FRAME=5.0)
+    f = _features(max_lose=5)
+    args = (f["stats_n_day"], f["consensus"], f["high_win"], f["pending_k2n"], f["gan_stats"], f["top_memory"])
+
+    no_penalty = get_top_scored_pairs(*args, settings=fixed)[0]["score"]
+    with_penalty = get_top_scored_pairs(*args, settings=penalised)[0]["score"]
+    assert with_penalty == pytest.approx(no_penalty - 5.0, abs=0.05)
+
+    via_config = calculate_score_from_features(f, {"K2N_RISK_PENALTY_PER_FRAME": 5.0}, settings=fixed)
+    assert via_config[0]["score"] == with_penalty
+    assert SETTINGS.get_all_settings() == before
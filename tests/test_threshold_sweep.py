@@ -0,0 +1,82 @@
+# tests/test_threshold_sweep.py
+"""
+Tests for the read-only threshold sweep used by the parameter tuner: every
+threshold is answered from one sorted rate array, the scan rates match the
+Lô scanners, and sweeping never writes to ManagedBridges.
+"""
+
+import random
+import sqlite3
+
+import numpy as np
+import pytest
+
+from benchmarks.generator import build_benchmark_db
+from logic.analytics.threshold_sweep import (
+    SWEEP_AT_LEAST,
+    SWEEP_BELOW,
+    RateDistribution,
+    scan_rate_distribution,
+    sweep_thresholds,
+    threshold_range,
+)
+from logic.config_manager import SETTINGS
+from logic.data_repository import load_data_ai_from_db
+from services.analysis_service import AnalysisService
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "sweep.db")
+    build_benchmark_db(path, 40, 60, seed=4)
+    return path
+
+
+def _dump(path):
+    with sqlite3.connect(path) as conn:
+        return list(conn.iterdump())
+
+
+def test_counts_match_legacy_string_loops():
+    rng = random.Random(0)
+    texts = [f"{rng.uniform(0, 100):.2f}%" for _ in range(500)] + ["N/A", "", None, "50.00%", "50.00%"]
+    dist = RateDistribution.from_values(texts)
+    assert (len(dist), dist.skipped) == (502, 3)
+
+    thresholds = threshold_range(40.0, 60.0, 0.5)
+    at_least = sweep_thresholds(dist, thresholds, SWEEP_AT_LEAST)
+    below = sweep_thresholds(dist, thresholds, SWEEP_BELOW)
+    for k, t in enumerate(thresholds):
+        rates = [float(x.replace("%", "")) for x in texts if x and x != "N/A"]
+        assert at_least.counts[k] == sum(r >= t for r in rates)
+        assert below.counts[k] == sum(r < t for r in rates)
+        assert at_least.cdf[k] == pytest.approx(sum(r <= t for r in rates) / len(rates))
+    assert at_least.hist_counts.sum() == len(dist)
+    assert at_least.as_dict()["counts"] == at_least.counts.tolist()
+
+
+def test_scan_rates_match_scanners_and_leave_db_untouched(db_path, monkeypatch):
+    from logic.bridges.lo_bridge_scanner import TIM_CAU_BAC_NHO_TOT_NHAT, TIM_CAU_TOT_NHAT_V16
+
+    history, _ = load_data_ai_from_db(db_path)
+    before = _dump(db_path)
+    dist = scan_rate_distribution(history)
+    assert _dump(db_path) == before
+
+    monkeypatch.setattr(SETTINGS, "AUTO_ADD_MIN_RATE", -1.0)  # Bản cũ: giữ mọi cầu trong bảng kết quả
+    end = len(history) + 1
+    legacy = TIM_CAU_TOT_NHAT_V16(history, 2, end, db_path)[1:] + TIM_CAU_BAC_NHO_TOT_NHAT(history, 2, end, db_path)[1:]
+    assert np.round(dist.rates, 2).tolist() == sorted(float(row[3].rstrip("%")) for row in legacy)
+
+
+@pytest.mark.parametrize("param_key", ["AUTO_ADD_MIN_RATE", "AUTO_PRUNE_MIN_RATE", "HIGH_WIN_THRESHOLD"])
+def test_tuning_sweep_is_read_only(db_path, param_key):
+    history, _ = load_data_ai_from_db(db_path)
+    before = _dump(db_path)
+    logs = []
+    sweep = AnalysisService(db_path).run_parameter_tuning(history, param_key, 30, 60, 5, logs.append)
+
+    assert _dump(db_path) == before
+    assert sweep is not None and sweep.thresholds.tolist() == [30, 35, 40, 45, 50, 55, 60]
+    assert (np.diff(sweep.counts) <= 0).all() if sweep.comparison == SWEEP_AT_LEAST else (np.diff(sweep.counts) >= 0).all()
+    assert sum(line.startswith(f"Kiểm thử {param_key} ") for line in logs) == 7
@@ -330,14 +330,11 @@ class BridgeScannerTab(ttk.Frame):
             from logic.bridges.de_bridge_scanner import DeBridgeScanner
             scanner = DeBridgeScanner()
             
-            # [V11.4] Call scanner with options
-            candidates, meta = scanner.scan_all(all_data, self.db_name, scan_options)
-            
-            # Process Candidate objects and display results
-            count = meta.get('returned_count', len(candidates))
-            
-            if candidates and count > 0:
-                for candidate in candidates:
+            # [V11.5] Stream từng batch theo chiến lược: hiển thị ngay khi có kết quả
+            stats = {}
+            count = 0
+            for strategy_type, batch in scanner.iter_candidate_batches(all_data, self.db_name, scan_options, stats):
+                for candidate in batch:
                     # Extract from Candidate object
                     name = candidate.name
                     desc = candidate.description or "N/A"
@@ -375,9 +372,11 @@ class BridgeScannerTab(ttk.Frame):
                     # Add to results table
                     self.after(0, lambda n=name_with_type, d=desc, r=rate_str, s=streak_str, bt=bridge_type: 
                         self._add_de_result_to_table(n, d, r, s, bt))
-                
+                count += len(batch)
+            
+            if count > 0:
                 # Show summary with per-strategy breakdown
-                by_strategy = meta.get('by_strategy', {})
+                by_strategy = stats.get('by_strategy', {})
                 summary_parts = [f"Đã tìm thấy {count} cầu Đề."]
                 if by_strategy:
                     summary_parts.append("\n\nPhân loại:")
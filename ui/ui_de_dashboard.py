@@ -14,40 +14,17 @@ except ImportError as e:
     def get_gdb_last_2(r): return "00"
     BO_SO_DE = {}
 
-# --- 2. IMPORT ANALYTICS ---
+# --- 2. IMPORT SNAPSHOT SERVICE (Cầu + phân tích tính sẵn theo dữ liệu / tập cầu Đề) ---
 try:
-    from logic.de_analytics import (
-        analyze_market_trends,
-        calculate_number_scores,
-        run_intersection_matrix_analysis,
-        calculate_top_touch_combinations
-    )
-    HAS_ANALYTICS = True
+    from services.de_dashboard_service import get_de_dashboard_snapshot
+    HAS_SNAPSHOT = True
 except ImportError as e:
-    print(f"[UI ERROR] Analytics Import Failed: {e}")
-    HAS_ANALYTICS = False
-    def analyze_market_trends(*a, **k): return {}
-    def calculate_number_scores(*a, **k): return []
-    def run_intersection_matrix_analysis(*a): return {"ranked": [], "message": str(e)}
-    def calculate_top_touch_combinations(*a, **k): return []
-
-# --- 3. IMPORT SCANNER (Legacy - not used in PR1) ---
-try:
-    from logic.bridges.de_bridge_scanner import run_de_scanner
-    HAS_SCANNER = True
-except ImportError as e:
-    print(f"[UI ERROR] Scanner Import Failed: {e}")
-    HAS_SCANNER = False
-    def run_de_scanner(d): return 0, []
-
-# --- 4. IMPORT DB LOADER (PR1: Load bridges from DB instead of scanning) ---
-try:
-    from logic.dashboard_analytics import get_cau_dong_for_tab_soi_cau_de
-    HAS_DB_LOADER = True
-except ImportError as e:
-    print(f"[UI ERROR] DB Loader Import Failed: {e}")
-    HAS_DB_LOADER = False
-    def get_cau_dong_for_tab_soi_cau_de(*a, **k): return []
+    print(f"[UI ERROR] DE Snapshot Import Failed: {e}")
+    HAS_SNAPSHOT = False
+    _snapshot_error = str(e)
+    def get_de_dashboard_snapshot(data, db_name=None):
+        return {"recent_rows": list(data)[-30:], "bridges": [], "scores": [], "stats": {},
+                "touch_combinations": [], "matrix_res": {"ranked": [], "message": _snapshot_error}}
 
 # --- 5. IMPORT CONFIG MANAGER ---
 try:
@@ -279,72 +256,24 @@ class UiDeDashboard(ttk.Frame):
     def _run_logic(self, data):
         list_data = data
         if hasattr(data, "values"): list_data = data.values.tolist()
-        
-        # PR1: Load bridges from DB (Managed Bridges) instead of scanning
-        bridges = []
-        if HAS_DB_LOADER:
-            try:
-                # Get min recent wins threshold from config
-                try:
-                    config_mgr = ConfigManager.get_instance()
-                    min_recent_wins = config_mgr.get_config("DE_DASHBOARD_MIN_RECENT_WINS", 9)
-                except:
-                    min_recent_wins = 9  # Safe fallback
-                
-                # Lấy tất cả cầu (có thể lẫn cả Lô)
-                all_bridges = get_cau_dong_for_tab_soi_cau_de()
-                
-                # [FIX] LỌC CHỈ LẤY CẦU ĐỀ (DE)
-                # Loại bỏ các cầu bắt đầu bằng LO_ hoặc không phải loại Đề
-                de_bridges = [
-                    b for b in all_bridges 
-                    if str(b.get('type', '')).upper().startswith(('DE_', 'CAU_DE')) 
-                    or "Đề" in str(b.get('name', ''))
-                    or "DE" in str(b.get('name', '')).upper()
-                ]
-                
-                # [NEW V8.2] Apply smart filtering: Only show ENABLED bridges with high recent form
-                bridges = []
-                for b in de_bridges:
-                    # Parse values safely (handle both int and string)
-                    recent_wins = b.get("recent_win_count_10", 0)
-                    if isinstance(recent_wins, str):
-                        recent_wins = int(recent_wins) if recent_wins.isdigit() else 0
-                    
-                    is_enabled = b.get("is_enabled", 0)
-                    if isinstance(is_enabled, str):
-                        is_enabled = int(is_enabled) if is_enabled.isdigit() else 0
-                    
-                    # Filter: Must be ENABLED + Recent form >= threshold
-                    if is_enabled == 1 and recent_wins >= min_recent_wins:
-                        bridges.append(b)
-                
-                print(f"[UI] DE dashboard: loaded {len(all_bridges)} total, {len(de_bridges)} DE-type, {len(bridges)} shown (>={min_recent_wins} & enabled)")
-            except Exception as e:
-                print(f"[UI ERROR] Failed to load bridges from DB: {e}")
-                # Fallback to scanner if DB load fails
-                if HAS_SCANNER:
-                    try: _, bridges = run_de_scanner(list_data)
-                    except: pass
-        elif HAS_SCANNER:
-            # Legacy fallback: use scanner
-            try: _, bridges = run_de_scanner(list_data)
-            except: pass
-        
-        matrix_res = {"ranked": [], "message": "N/A"}
-        if HAS_ANALYTICS:
-            try: matrix_res = run_intersection_matrix_analysis(data)
-            except Exception as e: matrix_res["message"] = str(e)
-                
-        stats, scores, touch_combinations = {}, [], []
-        if HAS_ANALYTICS:
-            try:
-                stats = analyze_market_trends(list_data, n_days=30)
-                scores = calculate_number_scores(bridges, stats)
-                touch_combinations = calculate_top_touch_combinations(list_data, num_touches=4, days=30)
-            except: pass
 
-        self.after(0, lambda: self._update_ui(list_data, bridges, matrix_res, scores, stats, touch_combinations))
+        # Snapshot tính sẵn cho (dữ liệu, tập cầu Đề, cài đặt): đọc O(1), chỉ dựng lại khi khóa đổi
+        db_name = getattr(self.controller, 'db_name', None)
+        try:
+            snapshot = get_de_dashboard_snapshot(list_data, db_name) if db_name else get_de_dashboard_snapshot(list_data)
+        except Exception as e:
+            message = f"Lỗi: {e}"
+            print(f"[UI ERROR] DE snapshot failed: {e}")
+            self.after(0, lambda: self.lbl_status.config(text=message, foreground="red"))
+            return
+
+        self.after(0, lambda: self._update_ui(
+            snapshot["recent_rows"], list(snapshot["bridges"]), snapshot["matrix_res"],
+            snapshot["scores"], snapshot["stats"], snapshot["touch_combinations"]))
+        if snapshot.get("errors"):
+            # Snapshot thiếu dữ liệu không được lưu -> lần mở sau sẽ tính lại
+            message = f"Thiếu dữ liệu: {'; '.join(snapshot['errors'])}"
+            self.after(0, lambda: self.lbl_status.config(text=message, foreground="orange"))
 
     def _update_ui(self, data, bridges, matrix_res, scores, stats, touch_combinations):
         self.lbl_status.config(text="Hoàn tất.", foreground="green")
@@ -238,6 +238,9 @@ class DataAnalysisApp:
 
         # NOTE: Removed "Dò Tìm Cầu Mới" button - Now it's a dedicated tab "🔍 Dò Tìm Cầu Mới"
 
+        self.btn_performance = ttk.Button(sys_frame, text="⏱️ Hiệu Năng", command=self.show_performance_window)
+        self.btn_performance.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+
         self.btn_vote_stats = ttk.Button(sys_frame, text="📈 Thống Kê Vote", command=self.show_vote_statistics_window)
         self.btn_vote_stats.grid(row=0, column=2, sticky="ew", padx=5, pady=2)
 
@@ -398,6 +401,10 @@ class DataAnalysisApp:
         from ui.ui_vote_statistics import VoteStatisticsWindow
         VoteStatisticsWindow(self)
 
+    def show_performance_window(self):
+        from ui.ui_performance import PerformanceWindow
+        PerformanceWindow(self)
+
     def show_settings_window(self):
         SettingsWindow(self)
 
@@ -0,0 +1,201 @@
+# ui/ui_performance.py
+# Bảng hiệu năng - Thời gian chạy từng stage (đọc từ bảng perf_log)
+
+import tkinter as tk
+from tkinter import ttk, messagebox
+
+try:
+    from logic.instrumentation import load_perf_records, summarize_stages
+except ImportError:
+    print("LỖI: ui_performance.py không thể import logic.instrumentation.")
+
+    def load_perf_records(db_path=None, since_days=None, stage=None, limit=None):
+        return []
+
+    def summarize_stages(records):
+        return []
+
+
+# Nhãn hiển thị -> số ngày lọc
+PERIOD_OPTIONS = {
+    "1 ngày": 1,
+    "7 ngày": 7,
+    "30 ngày": 30,
+}
+
+SLOWEST_LIMIT = 50
+
+
+def _format_counters(counters):
+    return ", ".join(f"{name}={value}" for name, value in sorted((counters or {}).items()))
+
+
+class PerformanceWindow:
+    """Cửa sổ hiển thị thời gian chạy các stage nặng (quét cầu, backtest, dashboard, AI)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.root = app.root
+
+        # Ngăn mở nhiều cửa sổ
+        if (
+            hasattr(self.app, "performance_window")
+            and self.app.performance_window
+            and self.app.performance_window.winfo_exists()
+        ):
+            self.app.performance_window.lift()
+            return
+
+        self.app.logger.log("Đang mở cửa sổ Hiệu Năng...")
+
+        self.window = tk.Toplevel(self.root)
+        self.window.title("⏱️ Hiệu Năng - Thời Gian Theo Stage")
+        self.app.performance_window = self.window
+        self.window.geometry("900x600")
+
+        self.window.transient(self.root)
+
+        main_frame = ttk.Frame(self.window, padding=10)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+
+        # Thanh lọc thời gian
+        filter_frame = ttk.Frame(main_frame)
+        filter_frame.pack(fill=tk.X, pady=(0, 5))
+
+        ttk.Label(filter_frame, text="Khoảng thời gian:").pack(side=tk.LEFT)
+        self.period_var = tk.StringVar(value="7 ngày")
+        period_combo = ttk.Combobox(
+            filter_frame,
+            textvariable=self.period_var,
+            values=list(PERIOD_OPTIONS),
+            state="readonly",
+            width=10,
+        )
+        period_combo.pack(side=tk.LEFT, padx=5)
+        period_combo.bind("<<ComboboxSelected>>", lambda _event: self.load_performance())
+
+        # Bảng tổng hợp theo stage
+        ttk.Label(main_frame, text="Tổng hợp theo stage", font=("TkDefaultFont", 10, "bold")).pack(anchor="w")
+        self.summary_tree = self._create_tree(
+            main_frame,
+            (
+                ("stage", "Stage", 220, "w"),
+                ("runs", "Số lần", 60, "center"),
+                ("avg", "TB (s)", 80, "e"),
+                ("max", "Max (s)", 80, "e"),
+                ("total", "Tổng (s)", 90, "e"),
+                ("last", "Gần nhất", 150, "center"),
+                ("counters", "Bộ đếm", 260, "w"),
+            ),
+            height=10,
+        )
+
+        # Các lần chạy chậm nhất
+        ttk.Label(main_frame, text=f"{SLOWEST_LIMIT} lần chạy chậm nhất", font=("TkDefaultFont", 10, "bold")).pack(
+            anchor="w", pady=(10, 0)
+        )
+        self.slow_tree = self._create_tree(
+            main_frame,
+            (
+                ("started_at", "Thời điểm", 150, "center"),
+                ("stage", "Stage", 220, "w"),
+                ("parent", "Stage cha", 160, "w"),
+                ("duration", "Thời gian (s)", 100, "e"),
+                ("status", "Trạng thái", 80, "center"),
+                ("peak", "Bộ nhớ đỉnh (MB)", 110, "e"),
+            ),
+            height=10,
+        )
+
+        # Buttons frame
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(fill=tk.X, pady=(10, 0))
+
+        refresh_button = ttk.Button(button_frame, text="🔄 Làm Mới", command=self.load_performance)
+        refresh_button.pack(side=tk.LEFT, padx=5)
+
+        close_button = ttk.Button(button_frame, text="Đóng", command=self.window.destroy)
+        close_button.pack(side=tk.RIGHT, padx=5)
+
+        self.status_label = ttk.Label(main_frame, text="", font=("TkDefaultFont", 9), foreground="blue")
+        self.status_label.pack(pady=(5, 0))
+
+        self.load_performance()
+
+    def _create_tree(self, parent, columns, height):
+        frame = ttk.Frame(parent)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        scroll = ttk.Scrollbar(frame, orient="vertical")
+        scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        tree = ttk.Treeview(
+            frame,
+            columns=[c[0] for c in columns],
+            show="headings",
+            height=height,
+            yscrollcommand=scroll.set,
+        )
+        scroll.config(command=tree.yview)
+        for key, title, width, anchor in columns:
+            tree.heading(key, text=title)
+            tree.column(key, width=width, anchor=anchor, stretch=key in ("stage", "counters"))
+        tree.tag_configure("error", background="#FFCCCC")
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        return tree
+
+    def load_performance(self):
+        """Đọc perf_log theo khoảng thời gian đã chọn và hiển thị."""
+        for tree in (self.summary_tree, self.slow_tree):
+            for item in tree.get_children():
+                tree.delete(item)
+
+        days = PERIOD_OPTIONS.get(self.period_var.get(), 7)
+        try:
+            records = load_perf_records(since_days=days)
+        except Exception as e:
+            self.status_label["text"] = f"Lỗi: {e}"
+            self.status_label["foreground"] = "red"
+            self.app.logger.log(f"Lỗi khi tải dữ liệu hiệu năng: {e}")
+            messagebox.showerror("Lỗi", f"Không thể đọc perf_log:\n{e}", parent=self.window)
+            return
+
+        if not records:
+            self.status_label["text"] = "Chưa có dữ liệu hiệu năng trong khoảng thời gian này."
+            self.status_label["foreground"] = "red"
+            return
+
+        for item in summarize_stages(records):
+            self.summary_tree.insert(
+                "",
+                "end",
+                values=(
+                    item["stage"],
+                    item["runs"],
+                    f"{item['avg_s']:.3f}",
+                    f"{item['max_s']:.3f}",
+                    f"{item['total_s']:.2f}",
+                    item["last_at"],
+                    _format_counters(item["counters"]),
+                ),
+                tags=("error",) if item["errors"] else (),
+            )
+
+        slowest = sorted(records, key=lambda r: r["duration_s"], reverse=True)[:SLOWEST_LIMIT]
+        for r in slowest:
+            self.slow_tree.insert(
+                "",
+                "end",
+                values=(
+                    r["started_at"],
+                    r["stage"],
+                    r["parent"] or "",
+                    f"{r['duration_s']:.3f}",
+                    r["status"],
+                    "" if r["peak_mb"] is None else f"{r['peak_mb']:.1f}",
+                ),
+                tags=("error",) if r["status"] != "ok" else (),
+            )
+
+        self.status_label["text"] = f"✅ {len(records)} bản ghi trong {days} ngày gần nhất."
+        self.status_label["foreground"] = "green"